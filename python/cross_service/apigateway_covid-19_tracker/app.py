@@ -89,6 +89,34 @@ def list_states():
     return {"states": ", ".join(sorted(storage.STATES))}
 
 
+@app.route("/dates/{date}", methods=["GET"])
+def date_cases(date):
+    """
+    Gets the records of many states for a single date in one request. The states
+    are given as a comma-separated list in the `states` query parameter. When no
+    states are given, records for all states are returned.
+
+    :param date: The date of the current request.
+    :return: The records that exist for the date, keyed by state, in the response
+             body in JSON format.
+    """
+    logger.info("Got %s to /dates/%s.", app.current_request.method, date)
+
+    date = urllib.parse.unquote(date)
+    params = app.current_request.query_params or {}
+    if "states" in params:
+        states = [state.strip() for state in params["states"].split(",")]
+    else:
+        states = sorted(storage.STATES)
+    for state in states:
+        verify_input(state, date=date)
+
+    return json.dumps(
+        {"date": date, "states": storage.get_states_date_data(states, date)},
+        default=convert_decimal_to_int,
+    )
+
+
 @app.route("/states/{state}", methods=["DELETE", "GET", "POST", "PUT"])
 def state_cases(state):
     """
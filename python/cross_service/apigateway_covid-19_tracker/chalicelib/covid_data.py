@@ -12,10 +12,82 @@ serverless deployment package created by AWS Chalice.
 import datetime
 import os
 import random
+import threading
+import time
+from collections import OrderedDict
 
 import boto3
 from boto3.dynamodb.conditions import Key
 
+# Dashboards ask for the same few keys again and again, so results are kept in a
+# cache for a short time. The cache holds enough entries for every state.
+CACHE_TTL = 30
+CACHE_SIZE = 64
+# The most keys that a single batch_get_item request can ask for.
+MAX_BATCH_KEYS = 100
+MAX_BATCH_TRIES = 5
+
+
+class StateCache:
+    """
+    A least recently used cache of state data whose entries also expire after a
+    fixed number of seconds. A warm AWS Lambda container keeps the cache between
+    invocations, so repeated requests for a state don't read the table.
+    """
+
+    def __init__(self, ttl=CACHE_TTL, max_size=CACHE_SIZE, clock=time.monotonic):
+        """
+        :param ttl: The number of seconds that an entry is kept.
+        :param max_size: The most entries that are kept. When the cache is full,
+                         the least recently used entry is dropped.
+        :param clock: A function that returns the current time in seconds.
+        """
+        self.ttl = ttl
+        self.max_size = max_size
+        self.clock = clock
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, key):
+        """
+        :param key: The key of the entry.
+        :return: The cached value, or None when the key isn't cached or has expired.
+        """
+        with self._lock:
+            entry = self._entries.get(key)
+            if entry is None:
+                return None
+            if entry[0] <= self.clock():
+                del self._entries[key]
+                return None
+            self._entries.move_to_end(key)
+            return entry[1]
+
+    def put(self, key, value):
+        """
+        Caches a value, dropping the least recently used entry when the cache is
+        full.
+
+        :param key: The key of the entry.
+        :param value: The value to cache.
+        """
+        if self.ttl <= 0 or self.max_size <= 0:
+            return
+        with self._lock:
+            self._entries[key] = (self.clock() + self.ttl, value)
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+
+    def invalidate(self, key):
+        """
+        Removes an entry from the cache.
+
+        :param key: The key of the entry.
+        """
+        with self._lock:
+            self._entries.pop(key, None)
+
 
 class Storage:
     """
@@ -75,8 +147,16 @@ class Storage:
         "Wyoming",
     }
 
-    def __init__(self, table):
+    def __init__(self, table, cache=None, sleep=time.sleep):
+        """
+        :param table: A Boto3 Table resource that contains the data.
+        :param cache: A cache of the data records of each state. When not
+                      specified, a cache with default settings is used.
+        :param sleep: A function that sleeps for a number of seconds.
+        """
         self._table = table
+        self._cache = StateCache() if cache is None else cache
+        self._sleep = sleep
 
     @classmethod
     def from_env(cls):
@@ -105,21 +185,86 @@ class Storage:
             "deaths": random.randint(1, 100),
         }
 
+    def _query_state(self, state):
+        """
+        Gets all data records for a state, following LastEvaluatedKey until every
+        page of the query is read.
+
+        :param state: The state to retrieve.
+        :return: The retrieved records.
+        """
+        query_kwargs = {"KeyConditionExpression": Key("state").eq(state)}
+        items = []
+        while True:
+            response = self._table.query(**query_kwargs)
+            items += response.get("Items", [])
+            if "LastEvaluatedKey" not in response:
+                return items
+            query_kwargs["ExclusiveStartKey"] = response["LastEvaluatedKey"]
+
     def get_state_data(self, state):
         """
         Gets the data records for the specified state. If there are no records,
         a new one is generated with random values for today's date and stored in
         the table before it is returned.
 
+        Records are cached for a short time, so repeated requests for the same
+        state are answered without reading the table.
+
         :param state: The state to retrieve.
         :return: The retrieved data.
         """
-        response = self._table.query(KeyConditionExpression=Key("state").eq(state))
-        items = response.get("Items", [])
-        if len(items) == 0:
-            items.append(self._generate_random_data(state))
-            self._table.put_item(Item=items[0])
-        return items
+        items = self._cache.get(state)
+        if items is None:
+            items = self._query_state(state)
+            if len(items) == 0:
+                items.append(self._generate_random_data(state))
+                self._table.put_item(Item=items[0])
+            self._cache.put(state, items)
+        return list(items)
+
+    def get_states_date_data(self, states, date):
+        """
+        Gets the records of many states for a single date. Records of states that
+        are cached are taken from the cache, and the rest are read with
+        batch_get_item requests of up to 100 keys. Keys that DynamoDB doesn't
+        process are requested again after an exponential backoff, up to five
+        times.
+
+        :param states: The states of the records to retrieve.
+        :param date: The date of the records to retrieve.
+        :return: A dict of the retrieved records, keyed by state. States that have
+                 no record for the date are not included.
+        """
+        records = {}
+        keys = []
+        for state in dict.fromkeys(states):
+            cached = self._cache.get(state)
+            if cached is None:
+                keys.append({"state": state, "date": date})
+                continue
+            for item in cached:
+                if item["date"] == date:
+                    records[state] = item
+        client = self._table.meta.client
+        for start in range(0, len(keys), MAX_BATCH_KEYS):
+            request = {self._table.name: {"Keys": keys[start : start + MAX_BATCH_KEYS]}}
+            sleepy_time = 0.1
+            for tries in range(1, MAX_BATCH_TRIES + 1):
+                response = client.batch_get_item(RequestItems=request)
+                for item in response.get("Responses", {}).get(self._table.name, []):
+                    records[item["state"]] = item
+                request = response.get("UnprocessedKeys")
+                if not request:
+                    break
+                if tries == MAX_BATCH_TRIES:
+                    raise RuntimeError(
+                        f"Couldn't get {len(request[self._table.name]['Keys'])} "
+                        f"records after {tries} tries."
+                    )
+                self._sleep(sleepy_time)
+                sleepy_time = min(sleepy_time * 2, 5)
+        return records
 
     def put_state_data(self, state, state_data):
         """
@@ -129,6 +274,7 @@ class Storage:
         :param state_data: The data record to store.
         """
         self._table.put_item(Item=state_data)
+        self._cache.invalidate(state)
 
     def delete_state_data(self, state):
         """
@@ -136,11 +282,11 @@ class Storage:
 
         :param state: The state to delete.
         """
-        response = self._table.query(KeyConditionExpression=Key("state").eq(state))
-        items = response.get("Items", [])
+        items = self._query_state(state)
         with self._table.batch_writer() as batch:
             for item in items:
                 batch.delete_item(Key={"state": item["state"], "date": item["date"]})
+        self._cache.invalidate(state)
 
     def post_state_data(self, state, state_data):
         """
@@ -150,6 +296,7 @@ class Storage:
         :param state_data: The data record to store.
         """
         self._table.put_item(Item=state_data)
+        self._cache.invalidate(state)
 
     def get_state_date_data(self, state, date):
         """
@@ -171,3 +318,4 @@ class Storage:
         :param date: The date of the record to remove.
         """
         self._table.delete_item(Key={"state": state, "date": date})
+        self._cache.invalidate(state)
@@ -105,3 +105,38 @@ def test_state_date_cases(monkeypatch, state, date, method, status_code):
         with pytest.raises(error) as exc_info:
             app.state_date_cases(state, date)
         assert exc_info.value.STATUS_CODE == status_code
+
+
+@pytest.mark.parametrize(
+    "query_params,states,status_code",
+    [
+        ({"states": "Iowa, Ohio"}, ["Iowa", "Ohio"], 200),
+        (None, None, 200),
+        ({"states": "Iowa,Despair"}, None, 400),
+    ],
+)
+def test_date_cases(monkeypatch, query_params, states, status_code):
+    date = "2020-04-20"
+
+    def get_states_date_data(sts, dt):
+        assert dt == date
+        if states is None:
+            assert len(sts) == 50
+        else:
+            assert sts == states
+        return {st: {"state": st, "date": dt, "cases": 7} for st in sts}
+
+    monkeypatch.setattr(
+        app.app,
+        "current_request",
+        unittest.mock.MagicMock(method="GET", query_params=query_params),
+    )
+    monkeypatch.setattr(app.storage, "get_states_date_data", get_states_date_data)
+
+    if status_code == 200:
+        got_response = json.loads(app.date_cases(date))
+        assert got_response["date"] == date
+        assert len(got_response["states"]) == (50 if states is None else len(states))
+    else:
+        with pytest.raises(chalice.BadRequestError):
+            app.date_cases(date)
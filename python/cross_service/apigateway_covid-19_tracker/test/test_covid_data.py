@@ -6,7 +6,7 @@ import boto3
 import pytest
 from boto3.dynamodb.conditions import Key
 from botocore.exceptions import ClientError
-from chalicelib.covid_data import Storage
+from chalicelib.covid_data import StateCache, Storage
 
 
 def test_from_env(monkeypatch):
@@ -176,3 +176,84 @@ def test_delete_state_date_data(make_stubber, error_code):
         with pytest.raises(ClientError) as exc_info:
             storage.delete_state_date_data(state, date)
         assert exc_info.value.response["Error"]["Code"] == error_code
+
+
+def test_get_state_data_paginated_and_cached(make_stubber):
+    dyn_resource = boto3.resource("dynamodb")
+    dyn_stubber = make_stubber(dyn_resource.meta.client)
+    table = dyn_resource.Table("test-table")
+    storage = Storage(table)
+    state = "Utah"
+    items = [
+        {"state": state, "date": f"2020-05-{day:02}", "cases": day}
+        for day in range(1, 6)
+    ]
+    last_key = {"state": {"S": state}, "date": {"S": items[2]["date"]}}
+
+    dyn_stubber.stub_query(
+        table.name, items[:3], key_condition=Key("state").eq(state), last_key=last_key
+    )
+    dyn_stubber.stub_query(
+        table.name, items[3:], key_condition=Key("state").eq(state), start_key=last_key
+    )
+    assert storage.get_state_data(state) == items
+    # The second request is answered from the cache.
+    assert storage.get_state_data(state) == items
+
+    dyn_stubber.stub_put_item(table.name, items[0])
+    storage.put_state_data(state, items[0])
+    dyn_stubber.stub_query(table.name, items, key_condition=Key("state").eq(state))
+    assert storage.get_state_data(state) == items
+
+
+def test_state_cache_expires_and_evicts():
+    now = [0]
+    cache = StateCache(ttl=10, max_size=2, clock=lambda: now[0])
+    cache.put("Ohio", [1])
+    cache.put("Iowa", [2])
+    assert cache.get("Ohio") == [1]
+    cache.put("Utah", [3])
+    # Iowa was used least recently, so it was dropped.
+    assert cache.get("Iowa") is None
+    assert cache.get("Ohio") == [1]
+    now[0] = 10
+    assert cache.get("Ohio") is None
+
+
+def test_get_states_date_data(make_stubber):
+    dyn_resource = boto3.resource("dynamodb")
+    dyn_stubber = make_stubber(dyn_resource.meta.client)
+    table = dyn_resource.Table("test-table")
+    sleeps = []
+    storage = Storage(table, sleep=sleeps.append)
+    date = "2020-05-01"
+    cached_item = {"state": "Utah", "date": date, "cases": 3}
+    storage._cache.put("Utah", [cached_item])
+    states = ["Utah", "Ohio", "Iowa", "Maine"]
+    keys = [{"state": state, "date": date} for state in states[1:]]
+
+    dyn_stubber.stub_batch_get_item(
+        {table.name: {"Keys": keys}},
+        response_items={table.name: [{"state": {"S": "Ohio"}, "date": {"S": date}}]},
+        unprocessed_keys={
+            table.name: {
+                "Keys": [
+                    {"state": {"S": key["state"]}, "date": {"S": date}}
+                    for key in keys[1:]
+                ]
+            }
+        },
+    )
+    dyn_stubber.stub_batch_get_item(
+        {table.name: {"Keys": keys[1:]}},
+        response_items={table.name: [{"state": {"S": "Iowa"}, "date": {"S": date}}]},
+    )
+
+    records = storage.get_states_date_data(states, date)
+
+    assert records == {
+        "Utah": cached_item,
+        "Ohio": {"state": "Ohio", "date": date},
+        "Iowa": {"state": "Iowa", "date": date},
+    }
+    assert len(sleeps) == 1
@@ -15,14 +15,22 @@ Logs written by this handler can be found in Amazon CloudWatch.
 
 import json
 import logging
+import math
 import os
+import time
+from concurrent.futures import ThreadPoolExecutor
 
 import boto3
+from botocore.config import Config
 from botocore.exceptions import ClientError
 
 logger = logging.getLogger()
 logger.setLevel(logging.INFO)
 
+# Posts to connections are network bound, so many of them can run at once
+# from a single Lambda invocation.
+MAX_POST_WORKERS = 32
+
 
 def handle_connect(user_name, table, connection_id):
     """
@@ -66,11 +74,129 @@ def handle_disconnect(table, connection_id):
     return status_code
 
 
+def get_connection_ids(table):
+    """
+    Gets the IDs of all connections tracked in the DynamoDB table. The table is
+    scanned page by page, because a single scan returns at most 1 MB of data.
+
+    :param table: The DynamoDB connection table.
+    :return: The list of connection IDs.
+    """
+    connection_ids = []
+    scan_kwargs = {"ProjectionExpression": "connection_id"}
+    while True:
+        scan_response = table.scan(**scan_kwargs)
+        connection_ids += [item["connection_id"] for item in scan_response["Items"]]
+        start_key = scan_response.get("LastEvaluatedKey")
+        if start_key is None:
+            break
+        scan_kwargs["ExclusiveStartKey"] = start_key
+    return connection_ids
+
+
+def post_to_connection(apig_management_client, connection_id, message):
+    """
+    Posts a message to a single connection.
+
+    :param apig_management_client: A Boto3 API Gateway Management API client.
+    :param connection_id: The ID of the connection to post to.
+    :param message: The message to post, as bytes.
+    :return: The connection ID, the outcome of the post, which is one of 'sent',
+             'gone', or 'failed', and the time taken by the post, in seconds.
+    """
+    start = time.perf_counter()
+    outcome = "sent"
+    try:
+        apig_management_client.post_to_connection(
+            Data=message, ConnectionId=connection_id
+        )
+    except ClientError as err:
+        if err.response["Error"]["Code"] == "GoneException":
+            logger.info("Connection %s is gone.", connection_id)
+            outcome = "gone"
+        else:
+            logger.exception("Couldn't post to connection %s.", connection_id)
+            outcome = "failed"
+    return connection_id, outcome, time.perf_counter() - start
+
+
+def latency_percentiles(latencies, percentiles=(50, 90, 99)):
+    """
+    Calculates latency percentiles by the nearest-rank method.
+
+    :param latencies: A list of latencies, in seconds.
+    :param percentiles: The percentiles to calculate.
+    :return: A dict of percentiles and their latencies, in milliseconds.
+    """
+    if not latencies:
+        return {}
+    ordered = sorted(latencies)
+    return {
+        f"p{pct}": round(
+            ordered[max(0, math.ceil(pct / 100 * len(ordered)) - 1)] * 1000, 1
+        )
+        for pct in percentiles
+    }
+
+
+def broadcast(
+    apig_management_client, connection_ids, message, max_workers=MAX_POST_WORKERS
+):
+    """
+    Posts a message to many connections at once from a bounded pool of threads.
+    Boto3 clients are thread safe, so all threads share the same client.
+
+    :param apig_management_client: A Boto3 API Gateway Management API client.
+    :param connection_ids: The IDs of the connections to post to.
+    :param message: The message to post, as bytes.
+    :param max_workers: The maximum number of posts that run at the same time.
+    :return: A dict with the number of connections the message was sent to, the
+             IDs of connections that are gone, the IDs of connections that failed,
+             and delivery latency percentiles.
+    """
+    results = {"sent": 0, "gone": [], "failed": []}
+    latencies = []
+    if connection_ids:
+        with ThreadPoolExecutor(
+            max_workers=min(max_workers, len(connection_ids))
+        ) as executor:
+            for conn_id, outcome, latency in executor.map(
+                lambda conn_id: post_to_connection(
+                    apig_management_client, conn_id, message
+                ),
+                connection_ids,
+            ):
+                latencies.append(latency)
+                if outcome == "sent":
+                    results["sent"] += 1
+                else:
+                    results[outcome].append(conn_id)
+    results["latency_ms"] = latency_percentiles(latencies)
+    return results
+
+
+def remove_connections(table, connection_ids):
+    """
+    Removes connections from the DynamoDB table in batches.
+
+    :param table: The DynamoDB connection table.
+    :param connection_ids: The IDs of the connections to remove.
+    """
+    try:
+        with table.batch_writer() as batch:
+            for conn_id in connection_ids:
+                batch.delete_item(Key={"connection_id": conn_id})
+        logger.info("Removed %s gone connections.", len(connection_ids))
+    except ClientError:
+        logger.exception("Couldn't remove connections %s.", connection_ids)
+
+
 def handle_message(table, connection_id, event_body, apig_management_client):
     """
     Handles messages sent by a participant in the chat. Looks up all connections
     currently tracked in the DynamoDB table, and uses the API Gateway Management API
-    to post the message to each other connection.
+    to post the message to each other connection. Posts are sent concurrently, so
+    a message reaches thousands of connections within the Lambda timeout.
 
     When posting to a connection results in a GoneException, the connection is
     considered disconnected and is removed from the table. This is necessary
@@ -95,8 +221,7 @@ def handle_message(table, connection_id, event_body, apig_management_client):
 
     connection_ids = []
     try:
-        scan_response = table.scan(ProjectionExpression="connection_id")
-        connection_ids = [item["connection_id"] for item in scan_response["Items"]]
+        connection_ids = get_connection_ids(table)
         logger.info("Found %s active connections.", len(connection_ids))
     except ClientError:
         logger.exception("Couldn't get connections.")
@@ -105,25 +230,20 @@ def handle_message(table, connection_id, event_body, apig_management_client):
     message = f"{user_name}: {event_body['msg']}".encode()  # utf-8
     logger.info("Message: %s", message)
 
-    for other_conn_id in connection_ids:
-        try:
-            if other_conn_id != connection_id:
-                send_response = apig_management_client.post_to_connection(
-                    Data=message, ConnectionId=other_conn_id
-                )
-                logger.info(
-                    "Posted message to connection %s, got response %s.",
-                    other_conn_id,
-                    send_response,
-                )
-        except ClientError:
-            logger.exception("Couldn't post to connection %s.", other_conn_id)
-        except apig_management_client.exceptions.GoneException:
-            logger.info("Connection %s is gone, removing.", other_conn_id)
-            try:
-                table.delete_item(Key={"connection_id": other_conn_id})
-            except ClientError:
-                logger.exception("Couldn't remove connection %s.", other_conn_id)
+    results = broadcast(
+        apig_management_client,
+        [conn_id for conn_id in connection_ids if conn_id != connection_id],
+        message,
+    )
+    logger.info(
+        "Posted message to %s connections, %s gone, %s failed. Latency: %s.",
+        results["sent"],
+        len(results["gone"]),
+        len(results["failed"]),
+        results["latency_ms"],
+    )
+    if results["gone"]:
+        remove_connections(table, results["gone"])
 
     return status_code
 
@@ -178,8 +298,12 @@ def lambda_handler(event, context):
             )
             response["statusCode"] = 400
         else:
+            # The connection pool must be as large as the broadcast pool, or
+            # workers wait for connections.
             apig_management_client = boto3.client(
-                "apigatewaymanagementapi", endpoint_url=f"https://{domain}/{stage}"
+                "apigatewaymanagementapi",
+                endpoint_url=f"https://{domain}/{stage}",
+                config=Config(max_pool_connections=MAX_POST_WORKERS),
             )
             response["statusCode"] = handle_message(
                 table, connection_id, body, apig_management_client
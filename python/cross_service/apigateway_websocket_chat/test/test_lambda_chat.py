@@ -6,8 +6,10 @@ Unit tests for lambda_chat.py.
 """
 
 import json
+from unittest.mock import MagicMock
 
 import boto3
+from botocore.exceptions import ClientError
 import lambda_chat
 import pytest
 
@@ -56,6 +58,7 @@ def test_handle_disconnect(make_stubber, error_code, status_code):
         ("TestException", "stub_get_item", 200),
         ("TestException", "stub_scan", 404),
         ("TestException", "stub_post_to_connection", 200),
+        ("GoneException", "stub_post_to_connection", 200),
     ],
 )
 def test_handle_message(
@@ -89,9 +92,17 @@ def test_handle_message(
         apig_management_stubber.stub_post_to_connection(
             f"{user_name}: {msg}".encode(),  # utf-8
             other_connection_id,
-            error_code=error_code
-            if error_method == "stub_post_to_connection"
-            else None,
+            error_code=(
+                error_code if error_method == "stub_post_to_connection" else None
+            ),
+        )
+    if error_code == "GoneException":
+        dynamodb_stubber.stub_batch_write_item(
+            {
+                table.name: [
+                    {"DeleteRequest": {"Key": {"connection_id": other_connection_id}}}
+                ]
+            }
         )
 
     got_status_code = lambda_chat.handle_message(
@@ -100,6 +111,65 @@ def test_handle_message(
     assert got_status_code == status_code
 
 
+def test_get_connection_ids(make_stubber):
+    dynamodb_resource = boto3.resource("dynamodb")
+    dynamodb_stubber = make_stubber(dynamodb_resource.meta.client)
+    table = dynamodb_resource.Table("test-table")
+    last_key = {"connection_id": {"S": "conn-1"}}
+
+    dynamodb_stubber.stub_scan(
+        table.name,
+        [{"connection_id": "conn-0"}, {"connection_id": "conn-1"}],
+        projection_expression="connection_id",
+        last_key=last_key,
+    )
+    dynamodb_stubber.stub_scan(
+        table.name,
+        [{"connection_id": "conn-2"}],
+        projection_expression="connection_id",
+        start_key={"connection_id": "conn-1"},
+    )
+
+    got_ids = lambda_chat.get_connection_ids(table)
+    assert got_ids == ["conn-0", "conn-1", "conn-2"]
+
+
+def test_broadcast():
+    apig_management_client = MagicMock()
+    gone_error = ClientError({"Error": {"Code": "GoneException"}}, "PostToConnection")
+    other_error = ClientError({"Error": {"Code": "TestException"}}, "PostToConnection")
+
+    def post(Data, ConnectionId):
+        if ConnectionId.startswith("gone"):
+            raise gone_error
+        if ConnectionId.startswith("bad"):
+            raise other_error
+        return {}
+
+    apig_management_client.post_to_connection.side_effect = post
+    connection_ids = [f"conn-{index}" for index in range(100)] + ["gone-0", "bad-0"]
+
+    results = lambda_chat.broadcast(
+        apig_management_client, connection_ids, b"test-msg", max_workers=8
+    )
+
+    assert results["sent"] == 100
+    assert results["gone"] == ["gone-0"]
+    assert results["failed"] == ["bad-0"]
+    assert set(results["latency_ms"]) == {"p50", "p90", "p99"}
+    assert apig_management_client.post_to_connection.call_count == len(connection_ids)
+
+
+def test_latency_percentiles():
+    latencies = [index / 1000 for index in range(1, 101)]
+    assert lambda_chat.latency_percentiles(latencies) == {
+        "p50": 50.0,
+        "p90": 90.0,
+        "p99": 99.0,
+    }
+    assert lambda_chat.latency_percentiles([]) == {}
+
+
 @pytest.mark.parametrize(
     "table_name,route,connection_id,user_name,msg_body,domain,stage,status_code",
     [
@@ -168,6 +238,7 @@ def test_lambda_handler(
         assert conn == connection_id
         assert body == json.loads(msg_body if msg_body is not None else '{"msg": ""}')
         assert apig.meta.endpoint_url == f"https://{domain}/{stage}"
+        assert apig.meta.config.max_pool_connections == lambda_chat.MAX_POST_WORKERS
         return status_code
 
     monkeypatch.setenv("table_name", "test-table")
@@ -18,6 +18,7 @@ React client, see the accompanying README.
 """
 
 import boto3
+from data_api import make_rdsdata_client
 from flask import Flask
 from flask_cors import CORS
 from item_list import ItemList
@@ -76,7 +77,7 @@ def create_app(test_config=None):
         rdsdata_client = app.config.get("RDSDATA_CLIENT")
         ses_client = app.config.get("SES_CLIENT")
     else:
-        rdsdata_client = boto3.client("rds-data")
+        rdsdata_client = make_rdsdata_client()
         ses_client = boto3.client("ses")
 
     storage = Storage(cluster_arn, secret_arn, database, table_name, rdsdata_client)
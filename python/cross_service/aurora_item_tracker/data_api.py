@@ -0,0 +1,250 @@
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: Apache-2.0
+
+"""
+Purpose
+
+Shows how to run statements with the Amazon RDS Data Service from several threads
+that share one client with a connection pool sized for them, and how to map the
+records returned by a query to rows.
+
+The same module is used by the aurora_item_tracker and
+aurora_rest_lending_library examples. Each example is deployed on its own, so each
+keeps its own copy.
+"""
+
+import datetime
+import decimal
+import json
+import logging
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+import boto3
+from botocore.config import Config
+
+logger = logging.getLogger(__name__)
+
+# The number of statements that run at the same time on the worker pool.
+DEFAULT_MAX_WORKERS = 10
+# The client's connection pool has room for the worker pool and for as many
+# request handler threads again, so none of them wait for a connection.
+DEFAULT_POOL_CONNECTIONS = 2 * DEFAULT_MAX_WORKERS
+
+# Converts values of some database types from the form the Data API returns them
+# in. Types that aren't listed are returned as they are.
+TYPE_CONVERTERS = {
+    "date": datetime.date.fromisoformat,
+    "timestamp": datetime.datetime.fromisoformat,
+    "datetime": datetime.datetime.fromisoformat,
+    "numeric": decimal.Decimal,
+    "decimal": decimal.Decimal,
+}
+
+
+def make_rdsdata_client(max_pool_connections=DEFAULT_POOL_CONNECTIONS, session=None):
+    """
+    Creates a Data Service client that can be shared by a pool of workers.
+
+    The default connection pool of a Boto3 client holds 10 connections, and threads
+    that find it empty open connections that are thrown away after one request. A
+    pool that is as large as the number of threads that share the client keeps
+    every connection open and reused, and TCP keepalive stops idle connections
+    from being dropped between requests.
+
+    :param max_pool_connections: The number of connections to keep in the pool.
+    :param session: The Boto3 session used to create the client. When not
+                    specified, the default session is used.
+    :return: A Boto3 Amazon RDS Data Service client.
+    """
+    config = Config(
+        max_pool_connections=max_pool_connections,
+        tcp_keepalive=True,
+        retries={"max_attempts": 5, "mode": "adaptive"},
+    )
+    return (session or boto3).client("rds-data", config=config)
+
+
+def _column_values(fields, converter=None):
+    """
+    Gets the values of one column of records. All fields of a column use the same
+    value key except for nulls, so the key is found once and each value is a
+    single lookup.
+    """
+    value_key = next(
+        (next(iter(field)) for field in fields if not field.get("isNull")), None
+    )
+    if value_key is None:
+        return [None] * len(fields)
+    values = [field.get(value_key) for field in fields]
+    if converter is not None:
+        values = [None if val is None else converter(val) for val in values]
+    return values
+
+
+def records_to_rows(result, names=None, converters=None):
+    """
+    Maps the records returned by a query to rows in one pass per column.
+
+    When the query was run with records formatted as JSON, the rows are parsed
+    from the formattedRecords field. Otherwise, each record is a list of typed
+    fields, which are unpacked column by column.
+
+    :param result: The result of a call to execute_statement.
+    :param names: The names of the columns of each record. When not specified,
+                  names are taken from the column metadata of the result, so the
+                  query must be run with metadata included.
+    :param converters: Functions that convert the value of each column, or None
+                       for a column that is returned as it is. When not specified,
+                       converters are chosen by the type names in the column
+                       metadata, when it is included.
+    :return: The rows, as a list of dicts of column names and values.
+    """
+    metadata = result.get("columnMetadata")
+    if names is None and metadata is not None:
+        names = [col.get("label") or col["name"] for col in metadata]
+    if converters is None and metadata is not None:
+        converters = [TYPE_CONVERTERS.get(col.get("typeName", "")) for col in metadata]
+    if "formattedRecords" in result:
+        rows = json.loads(result["formattedRecords"])
+        if names is not None and converters is not None:
+            for name, converter in zip(names, converters):
+                if converter is None:
+                    continue
+                for row in rows:
+                    if row.get(name) is not None:
+                        row[name] = converter(row[name])
+        return rows
+    records = result.get("records", [])
+    if not records:
+        return []
+    if names is None:
+        raise ValueError(
+            "Column names must be specified when the result has no column metadata."
+        )
+    if converters is None:
+        converters = [None] * len(names)
+    columns = [
+        _column_values(fields, converter)
+        for fields, converter in zip(zip(*records), converters)
+    ]
+    return [dict(zip(names, values)) for values in zip(*columns)]
+
+
+class DataApiExecutor:
+    """
+    Runs statements with the Amazon RDS Data Service, either one at a time or
+    concurrently on a bounded pool of worker threads that share one client.
+    """
+
+    def __init__(
+        self,
+        cluster_arn,
+        secret_arn,
+        db_name,
+        rdsdata_client,
+        max_workers=DEFAULT_MAX_WORKERS,
+    ):
+        """
+        :param cluster_arn: The Amazon Resource Name (ARN) of the Aurora DB cluster.
+        :param secret_arn: The ARN of an AWS Secrets Manager secret that contains
+                           credentials used to connect to the database.
+        :param db_name: The name of the database.
+        :param rdsdata_client: A Boto3 Amazon RDS Data Service client. To run
+                               statements concurrently, create it with
+                               make_rdsdata_client.
+        :param max_workers: The maximum number of statements that run at the same
+                            time. Keep this no larger than the connection pool of
+                            the client.
+        """
+        self.cluster_arn = cluster_arn
+        self.secret_arn = secret_arn
+        self.db_name = db_name
+        self.rdsdata_client = rdsdata_client
+        self.max_workers = max_workers
+        self._executor = None
+        self._lock = threading.Lock()
+
+    def _run_args(self, sql, transaction_id):
+        run_args = {
+            "database": self.db_name,
+            "resourceArn": self.cluster_arn,
+            "secretArn": self.secret_arn,
+            "sql": sql,
+        }
+        if transaction_id is not None:
+            run_args["transactionId"] = transaction_id
+        return run_args
+
+    def execute(self, sql, sql_params=None, transaction_id=None):
+        """
+        Runs a SQL statement.
+
+        :param sql: The SQL statement to run.
+        :param sql_params: The parameters associated with the SQL statement.
+        :param transaction_id: The ID of a transaction to run the statement in.
+        :return: The result of running the SQL statement.
+        """
+        run_args = self._run_args(sql, transaction_id)
+        if sql_params is not None:
+            run_args["parameters"] = sql_params
+        result = self.rdsdata_client.execute_statement(**run_args)
+        logger.info("Ran statement on %s.", self.db_name)
+        return result
+
+    def execute_batch(self, sql, sql_param_sets, transaction_id=None):
+        """
+        Runs a SQL statement once for each of a list of parameter sets.
+
+        :param sql: The SQL statement to run.
+        :param sql_param_sets: The parameter sets associated with the SQL statement.
+        :param transaction_id: The ID of a transaction to run the statement in.
+        :return: The result of running the batch SQL statement.
+        """
+        run_args = self._run_args(sql, transaction_id)
+        run_args["parameterSets"] = sql_param_sets
+        result = self.rdsdata_client.batch_execute_statement(**run_args)
+        logger.info("Ran batch statement on %s.", self.db_name)
+        return result
+
+    def _get_executor(self):
+        with self._lock:
+            if self._executor is None:
+                self._executor = ThreadPoolExecutor(max_workers=self.max_workers)
+            return self._executor
+
+    def submit(self, run, *args, **kwargs):
+        """
+        Runs a function on the worker pool. Use this to run a statement concurrently
+        with others, such as with
+        executor.submit(executor.execute, sql).
+
+        :param run: The function to run.
+        :return: A future that holds the result of the function.
+        """
+        return self._get_executor().submit(run, *args, **kwargs)
+
+    def run_all(self, run, statements):
+        """
+        Runs independent statements concurrently and waits for all of them.
+        Statements in a transaction must not be run this way, because the
+        statements of a transaction run one at a time.
+
+        :param run: The function that runs one statement, such as execute.
+        :param statements: A list of argument tuples, one for each call to run.
+        :return: The results, in the same order as the statements. When a statement
+                 fails, its error is raised after all statements have finished.
+        """
+        futures = [self.submit(run, *args) for args in statements]
+        errors = [future.exception() for future in futures]
+        for error in errors:
+            if error is not None:
+                raise error
+        return [future.result() for future in futures]
+
+    def shutdown(self):
+        """Waits for running statements to finish and stops the worker pool."""
+        with self._lock:
+            if self._executor is not None:
+                self._executor.shutdown()
+                self._executor = None
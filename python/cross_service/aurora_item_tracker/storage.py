@@ -11,6 +11,7 @@ interact with an Amazon Aurora Serverless database.
 import logging
 
 from botocore.exceptions import ClientError
+from data_api import DataApiExecutor, records_to_rows
 
 logger = logging.getLogger(__name__)
 
@@ -23,6 +24,14 @@ class StorageError(Exception):
     pass
 
 
+# The columns of a work item, in the order they are selected.
+WORK_ITEM_COLUMNS = ["iditem", "description", "guide", "status", "username", "archived"]
+
+# The number of work items read from the database at a time when work items are
+# iterated.
+DEFAULT_PAGE_SIZE = 1000
+
+
 class Storage:
     """
     Wraps calls to the Amazon RDS Data Service.
@@ -43,6 +52,7 @@ class Storage:
         self._db_name = db_name
         self._table_name = table_name
         self._rdsdata_client = rdsdata_client
+        self._data_api = DataApiExecutor(cluster, secret, db_name, rdsdata_client)
 
     def _run_statement(self, sql, sql_params=None):
         """
@@ -53,16 +63,7 @@ class Storage:
         :return: The result of running the SQL statement.
         """
         try:
-            run_args = {
-                "database": self._db_name,
-                "resourceArn": self._cluster,
-                "secretArn": self._secret,
-                "sql": sql,
-            }
-            if sql_params is not None:
-                run_args["parameters"] = sql_params
-            result = self._rdsdata_client.execute_statement(**run_args)
-            logger.info("Ran statement on %s.", self._db_name)
+            result = self._data_api.execute(sql, sql_params=sql_params)
         except ClientError as error:
             if (
                 error.response["Error"]["Code"] == "BadRequestException"
@@ -87,7 +88,7 @@ class Storage:
                          returned. Otherwise, all work items are returned.
         :return: The list of retrieved work items.
         """
-        sql_select = "SELECT iditem, description, guide, status, username, archived"
+        sql_select = f"SELECT {', '.join(WORK_ITEM_COLUMNS)}"
         sql_where = ""
         sql_params = None
         if archived is not None:
@@ -96,18 +97,59 @@ class Storage:
         sql = f"{sql_select} FROM {self._table_name} {sql_where}"
         print(sql)
         results = self._run_statement(sql, sql_params=sql_params)
-        output = [
-            {
-                "iditem": record[0]["longValue"],
-                "description": record[1]["stringValue"],
-                "guide": record[2]["stringValue"],
-                "status": record[3]["stringValue"],
-                "username": record[4]["stringValue"],
-                "archived": record[5]["booleanValue"],
-            }
-            for record in results["records"]
-        ]
-        return output
+        return records_to_rows(results, names=WORK_ITEM_COLUMNS)
+
+    def iter_work_items(self, archived=None, page_size=DEFAULT_PAGE_SIZE):
+        """
+        Yields work items from the database one at a time, reading them one page at a
+        time in order of their IDs. Only a single page is held in memory, so this can
+        be used to go through more work items than fit in memory.
+
+        :param archived: When specified, only archived or non-archived work items are
+                         returned. Otherwise, all work items are returned.
+        :param page_size: The number of work items to read at a time.
+        :return: A generator of work items.
+        """
+        after = None
+        while True:
+            wheres = []
+            sql_params = []
+            if archived is not None:
+                wheres.append("archived=:archived")
+                sql_params.append(
+                    {"name": "archived", "value": {"booleanValue": archived}}
+                )
+            if after is not None:
+                wheres.append("iditem > :after")
+                sql_params.append({"name": "after", "value": {"longValue": after}})
+            sql = f"SELECT {', '.join(WORK_ITEM_COLUMNS)} FROM {self._table_name}"
+            if wheres:
+                sql += f" WHERE {' AND '.join(wheres)}"
+            sql += f" ORDER BY iditem LIMIT {int(page_size)}"
+            results = self._run_statement(sql, sql_params=sql_params or None)
+            work_items = records_to_rows(results, names=WORK_ITEM_COLUMNS)
+            yield from work_items
+            if len(work_items) < page_size:
+                break
+            after = work_items[-1]["iditem"]
+
+    def get_work_item(self, iditem):
+        """
+        Gets a single work item from the database.
+
+        :param iditem: The ID of the work item to get.
+        :return: The work item.
+        """
+        sql = (
+            f"SELECT {', '.join(WORK_ITEM_COLUMNS)} FROM {self._table_name} "
+            "WHERE iditem=:iditem"
+        )
+        sql_params = [{"name": "iditem", "value": {"longValue": int(iditem)}}]
+        results = self._run_statement(sql, sql_params=sql_params)
+        work_items = records_to_rows(results, names=WORK_ITEM_COLUMNS)
+        if not work_items:
+            raise StorageError(f"Work item {iditem} doesn't exist.")
+        return work_items[0]
 
     def add_work_item(self, work_item):
         """
@@ -5,10 +5,17 @@
 Unit tests for the dynamodb_item_tracker example.
 """
 
+import csv
+import email
+import gzip
+import io
+
 import boto3
 import pytest
+import report
 from app import create_app  # pylint: disable=E0611
 from botocore.stub import ANY
+from storage import Storage
 
 
 class MockManager:
@@ -112,6 +119,13 @@ class MockManager:
                     f"FROM {self.table_name} "
                 )
                 sql_params = None
+        elif kind == "REPORT":
+            sql = (
+                "SELECT iditem, description, guide, status, username, archived "
+                f"FROM {self.table_name} WHERE archived=:archived "
+                "ORDER BY iditem LIMIT 1000"
+            )
+            sql_params = [{"name": "archived", "value": {"booleanValue": False}}]
         elif kind == "INSERT":
             sql = (
                 f"INSERT INTO {self.table_name} (description, guide, status, username) "
@@ -278,7 +292,7 @@ def test_archive_item_bad_action(mock_mgr):
 
 
 def test_report_small(mock_mgr):
-    sql, sql_params = mock_mgr.make_query("SELECT", False)
+    sql, sql_params = mock_mgr.make_query("REPORT", None)
     mock_mgr.setup_stubs(None, None, sql, sql_params, report="small")
 
     with mock_mgr.app.test_client() as client:
@@ -288,7 +302,7 @@ def test_report_small(mock_mgr):
 
 
 def test_report_large(mock_mgr):
-    sql, sql_params = mock_mgr.make_query("SELECT", False)
+    sql, sql_params = mock_mgr.make_query("REPORT", None)
     mock_mgr.setup_stubs(None, None, sql, sql_params, report="large")
 
     with mock_mgr.app.test_client() as client:
@@ -305,7 +319,7 @@ def test_report_large(mock_mgr):
     ],
 )
 def test_report_error(mock_mgr, err, stop_on, msg):
-    sql, sql_params = mock_mgr.make_query("SELECT", False)
+    sql, sql_params = mock_mgr.make_query("REPORT", None)
     mock_mgr.setup_stubs(err, stop_on, sql, sql_params, report="small")
 
     with mock_mgr.app.test_client() as client:
@@ -313,3 +327,78 @@ def test_report_error(mock_mgr, err, stop_on, msg):
         rv = client.post(rte, json={"email": mock_mgr.recipient})
         assert rv.status_code == 500
         assert msg in rv.json
+
+
+class CaptureArg:
+    """Matches any argument and keeps it, so a test can look at it later."""
+
+    def __eq__(self, other):
+        self.value = other
+        return True
+
+
+@pytest.mark.parametrize("compress_min_size", [1024 * 1024, 0])
+def test_report_large_attachment(mock_mgr, monkeypatch, compress_min_size):
+    monkeypatch.setattr(report, "COMPRESS_MIN_SIZE", compress_min_size)
+    sql, sql_params = mock_mgr.make_query("REPORT", None)
+    mock_mgr.stubber.stub_execute_statement(
+        mock_mgr.cluster_arn,
+        mock_mgr.secret_arn,
+        mock_mgr.db_name,
+        sql,
+        sql_params,
+        records=[item.values() for item in mock_mgr.data_items] * 3,
+    )
+    raw_msg = CaptureArg()
+    mock_mgr.ses_stubber.stub_send_raw_email(
+        mock_mgr.sender, [mock_mgr.recipient], "test-msg-id", msg=raw_msg
+    )
+
+    with mock_mgr.app.test_client() as client:
+        rv = client.post("/api/items:report", json={"email": mock_mgr.recipient})
+        assert rv.status_code == 200
+
+    msg = email.message_from_bytes(raw_msg.value)
+    assert msg["To"] == mock_mgr.recipient
+    body, attachment = msg.get_payload()
+    assert body.get_content_type() == "multipart/alternative"
+    data = attachment.get_payload(decode=True)
+    if compress_min_size == 0:
+        assert attachment.get_filename() == "work_items.csv.gz"
+        data = gzip.decompress(data)
+    else:
+        assert attachment.get_filename() == "work_items.csv"
+    rows = list(csv.DictReader(io.StringIO(data.decode())))
+    assert len(rows) == len(mock_mgr.data_items) * 3
+    assert rows[0]["description"] == mock_mgr.data_items[0]["description"]
+
+
+def test_iter_work_items(mock_mgr):
+    storage = Storage(
+        mock_mgr.cluster_arn,
+        mock_mgr.secret_arn,
+        mock_mgr.db_name,
+        mock_mgr.table_name,
+        mock_mgr.client,
+    )
+    select = (
+        "SELECT iditem, description, guide, status, username, archived "
+        f"FROM {mock_mgr.table_name}"
+    )
+    mock_mgr.stubber.stub_execute_statement(
+        mock_mgr.cluster_arn,
+        mock_mgr.secret_arn,
+        mock_mgr.db_name,
+        f"{select} ORDER BY iditem LIMIT 3",
+        records=[item.values() for item in mock_mgr.data_items[:3]],
+    )
+    mock_mgr.stubber.stub_execute_statement(
+        mock_mgr.cluster_arn,
+        mock_mgr.secret_arn,
+        mock_mgr.db_name,
+        f"{select} WHERE iditem > :after ORDER BY iditem LIMIT 3",
+        [{"name": "after", "value": {"longValue": 3}}],
+        records=[item.values() for item in mock_mgr.data_items[3:]],
+    )
+
+    assert list(storage.iter_work_items(page_size=3)) == mock_mgr.data_items
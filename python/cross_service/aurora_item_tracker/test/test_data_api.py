@@ -0,0 +1,119 @@
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: Apache-2.0
+
+"""
+Unit tests for data_api.py functions.
+"""
+
+import datetime
+import decimal
+import json
+import threading
+import time
+from unittest.mock import MagicMock
+
+import boto3
+import pytest
+from botocore.exceptions import ClientError
+from data_api import DataApiExecutor, make_rdsdata_client, records_to_rows
+
+CLUSTER_ARN = "arn:aws:rds:us-west-2:123456789012:cluster:test-cluster"
+SECRET_ARN = "arn:aws:secretsmanager:us-west-2:123456789012:secret:test-secret"
+DB_NAME = "test-db"
+
+
+def test_make_rdsdata_client():
+    client = make_rdsdata_client(max_pool_connections=32)
+    assert client.meta.config.max_pool_connections == 32
+    assert client.meta.config.tcp_keepalive
+
+
+def test_records_to_rows():
+    result = {
+        "records": [
+            [{"longValue": 1}, {"stringValue": "one"}, {"booleanValue": True}],
+            [{"longValue": 2}, {"isNull": True}, {"booleanValue": False}],
+        ]
+    }
+    assert records_to_rows(result, names=["id", "name", "flag"]) == [
+        {"id": 1, "name": "one", "flag": True},
+        {"id": 2, "name": None, "flag": False},
+    ]
+
+
+def test_records_to_rows_metadata():
+    result = {
+        "columnMetadata": [
+            {"name": "id", "label": "id", "typeName": "int4"},
+            {"name": "lent", "label": "lent", "typeName": "date"},
+            {"name": "price", "label": "price", "typeName": "numeric"},
+        ],
+        "records": [
+            [{"longValue": 1}, {"stringValue": "2021-03-04"}, {"stringValue": "1.50"}],
+            [{"longValue": 2}, {"isNull": True}, {"stringValue": "2.25"}],
+        ],
+    }
+    assert records_to_rows(result) == [
+        {"id": 1, "lent": datetime.date(2021, 3, 4), "price": decimal.Decimal("1.50")},
+        {"id": 2, "lent": None, "price": decimal.Decimal("2.25")},
+    ]
+
+
+def test_records_to_rows_json():
+    rows = [{"id": 1, "lent": "2021-03-04"}, {"id": 2, "lent": None}]
+    result = {
+        "formattedRecords": json.dumps(rows),
+        "columnMetadata": [
+            {"name": "id", "typeName": "int4"},
+            {"name": "lent", "typeName": "date"},
+        ],
+    }
+    assert records_to_rows(result) == [
+        {"id": 1, "lent": datetime.date(2021, 3, 4)},
+        {"id": 2, "lent": None},
+    ]
+
+
+def test_records_to_rows_no_names():
+    with pytest.raises(ValueError):
+        records_to_rows({"records": [[{"longValue": 1}]]})
+
+
+def test_run_all():
+    client = MagicMock()
+    lock = threading.Lock()
+    running = {"now": 0, "max": 0}
+
+    def execute_statement(**kwargs):
+        with lock:
+            running["now"] += 1
+            running["max"] = max(running["max"], running["now"])
+        time.sleep(0.01)
+        with lock:
+            running["now"] -= 1
+        return {"records": [[{"stringValue": kwargs["sql"]}]]}
+
+    client.execute_statement.side_effect = execute_statement
+    executor = DataApiExecutor(CLUSTER_ARN, SECRET_ARN, DB_NAME, client, max_workers=3)
+
+    results = executor.run_all(
+        executor.execute, [(f"SELECT {index}",) for index in range(9)]
+    )
+    executor.shutdown()
+
+    assert [result["records"][0][0]["stringValue"] for result in results] == [
+        f"SELECT {index}" for index in range(9)
+    ]
+    assert 1 < running["max"] <= 3
+
+
+def test_run_all_error():
+    client = MagicMock()
+    error = ClientError({"Error": {"Code": "TestException"}}, "ExecuteStatement")
+    client.execute_statement.side_effect = [{"records": []}, error]
+    executor = DataApiExecutor(CLUSTER_ARN, SECRET_ARN, DB_NAME, client, max_workers=1)
+
+    with pytest.raises(ClientError):
+        executor.run_all(executor.execute, [("SELECT 1",), ("SELECT 2",)])
+    assert client.execute_statement.call_count == 2
+    executor.shutdown()
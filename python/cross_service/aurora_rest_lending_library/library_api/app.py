@@ -14,7 +14,7 @@ import logging
 import urllib.parse
 
 import chalicelib.library_data
-from chalice import Chalice
+from chalice import BadRequestError, Chalice
 from chalice.app import RequestTimeoutError
 
 logger = logging.getLogger(__name__)
@@ -25,6 +25,9 @@ app.debug = True  # Set this to False for production use.
 
 _STORAGE = None
 
+# The largest page of rows that a client can request.
+MAX_PAGE_SIZE = 1000
+
 
 def get_storage():
     """Creates or gets the storage object that calls the database."""
@@ -46,6 +49,43 @@ def storage_timeout(func):
     return _timeout
 
 
+def get_page_args():
+    """
+    Gets the page_size and page_token query string parameters of the current request.
+
+    :return: The page size and page token, or None when the request doesn't ask for
+             a page.
+    """
+    params = app.current_request.query_params or {}
+    if "page_size" not in params and "page_token" not in params:
+        return None
+    try:
+        page_size = int(params.get("page_size", MAX_PAGE_SIZE))
+    except ValueError:
+        raise BadRequestError("page_size must be an integer.")
+    if not 0 < page_size <= MAX_PAGE_SIZE:
+        raise BadRequestError(f"page_size must be from 1 to {MAX_PAGE_SIZE}.")
+    return page_size, params.get("page_token")
+
+
+def list_page(key, get_page, **kwargs):
+    """
+    Gets one page of rows and formats it as a response.
+
+    :param key: The key of the rows in the response.
+    :param get_page: The storage function that gets a page of rows.
+    :return: The rows and the token to pass as page_token to get the next page.
+    """
+    page_size, page_token = get_page_args()
+    try:
+        rows, next_token = get_page(
+            page_size=page_size, page_token=page_token, **kwargs
+        )
+    except ValueError as err:
+        raise BadRequestError(str(err))
+    return {key: rows, "next_page_token": next_token}
+
+
 @app.route("/")
 def index():
     """Briefly describes the REST API."""
@@ -55,14 +95,41 @@ def index():
     }
 
 
+@app.route("/overview", methods=["GET"])
+@storage_timeout
+def get_overview():
+    """
+    Gets the first page of authors, books, and patrons in a single request.
+    The page_size query string parameter sets the number of rows from each table.
+
+    :return: The rows of each table and the token to pass as page_token to get the
+             next page of that table.
+    """
+    page_args = get_page_args()
+    overview = get_storage().get_overview(
+        page_size=None if page_args is None else page_args[0]
+    )
+    return {
+        name.lower(): {
+            name.lower(): page["rows"],
+            "next_page_token": page["next_page_token"],
+        }
+        for name, page in overview.items()
+    }
+
+
 @app.route("/books", methods=["GET"])
 @storage_timeout
 def list_books():
     """
-    Lists the books in the library.
+    Lists the books in the library. To list books one page at a time, add a
+    page_size query string parameter, and pass the next_page_token of each page
+    as the page_token parameter of the next request.
 
     :return: The list of books.
     """
+    if get_page_args() is not None:
+        return list_page("books", get_storage().get_books_page)
     return {"books": get_storage().get_books()}
 
 
@@ -94,6 +161,8 @@ def list_books_by_author(author_id):
     :return: The list of books written by the specified author.
     """
     author_id = int(urllib.parse.unquote(author_id))
+    if get_page_args() is not None:
+        return list_page("books", get_storage().get_books_page, author_id=author_id)
     return {"books": get_storage().get_books(author_id=author_id)}
 
 
@@ -101,10 +170,12 @@ def list_books_by_author(author_id):
 @storage_timeout
 def list_authors():
     """
-    Lists the authors in the library.
+    Lists the authors in the library. Pages are requested as they are for books.
 
     :return: The list of authors.
     """
+    if get_page_args() is not None:
+        return list_page("authors", get_storage().get_authors_page)
     return {"authors": get_storage().get_authors()}
 
 
@@ -112,10 +183,12 @@ def list_authors():
 @storage_timeout
 def list_patrons():
     """
-    Lists the patrons of the library.
+    Lists the patrons of the library. Pages are requested as they are for books.
 
     :return: The list of patrons.
     """
+    if get_page_args() is not None:
+        return list_page("patrons", get_storage().get_patrons_page)
     return {"patrons": get_storage().get_patrons()}
 
 
@@ -10,13 +10,19 @@ PostgreSQL-compatible database.
 This file is deployed to AWS Lambda as part of the Chalice deployment.
 """
 
+import base64
+import binascii
 import datetime
+import json
 import logging
 import os
+import time
+from concurrent.futures import ThreadPoolExecutor
 
 import boto3
 from botocore.exceptions import ClientError
 
+from .data_api import DataApiExecutor, make_rdsdata_client, records_to_rows
 from .postgresql_helper import (
     Column,
     ForeignKey,
@@ -25,6 +31,7 @@ from .postgresql_helper import (
     delete,
     insert,
     insert_returning,
+    insert_rows_returning,
     insert_without_batch,
     query,
     unpack_insert_results,
@@ -35,11 +42,84 @@ from .postgresql_helper import (
 
 logger = logging.getLogger(__name__)
 
+# The Data API returns at most 1 MB of data from a single query, so rows are read
+# in pages that stay well under that limit.
+DEFAULT_PAGE_SIZE = 1000
+
+
+# Bulk loads split rows into chunks that stay well under the Data API limits on
+# the size of a request and the number of parameter sets in a batch.
+MAX_CHUNK_ROWS = 1000
+MAX_CHUNK_BYTES = 64 * 1024
+
 
 class DataServiceNotReadyException(Exception):
     pass
 
 
+def _is_not_ready(error):
+    """
+    Determines whether a ClientError means that an Aurora Serverless cluster is
+    still resuming and the request can be tried again later.
+    """
+    return (
+        error.response["Error"]["Code"] == "BadRequestException"
+        and "Communications link failure" in error.response["Error"]["Message"]
+    )
+
+
+def chunk_rows(rows, max_rows=MAX_CHUNK_ROWS, max_bytes=MAX_CHUNK_BYTES):
+    """
+    Splits rows into chunks that hold no more than a maximum number of rows and
+    no more than about a maximum number of bytes of values.
+
+    :param rows: The rows to split. Each row is a dict of column names and values.
+    :param max_rows: The maximum number of rows in a chunk.
+    :param max_bytes: The maximum size of the values in a chunk.
+    :return: A generator of chunks, each of which is a list of rows.
+    """
+    chunk = []
+    chunk_bytes = 0
+    for row in rows:
+        row_bytes = sum(len(str(val)) for val in row.values())
+        if chunk and (len(chunk) >= max_rows or chunk_bytes + row_bytes > max_bytes):
+            yield chunk
+            chunk = []
+            chunk_bytes = 0
+        chunk.append(row)
+        chunk_bytes += row_bytes
+    if chunk:
+        yield chunk
+
+
+def encode_page_token(key):
+    """
+    Encodes the primary key of the last row of a page as an opaque page token.
+
+    :param key: The primary key of the last row of a page.
+    :return: The page token.
+    """
+    return base64.urlsafe_b64encode(json.dumps({"after": key}).encode()).decode()
+
+
+def decode_page_token(page_token):
+    """
+    Decodes a page token made by encode_page_token.
+
+    :param page_token: The page token.
+    :return: The primary key of the last row of the previous page.
+    """
+    try:
+        key = json.loads(base64.urlsafe_b64decode(page_token.encode()))["after"]
+    except (binascii.Error, ValueError, KeyError, TypeError) as err:
+        raise ValueError(f"Invalid page token: {page_token}") from err
+    # Primary keys are integers or strings. Any other value can't be compared
+    # with a key, so the token was not made by encode_page_token.
+    if isinstance(key, bool) or not isinstance(key, (int, str)):
+        raise ValueError(f"Invalid page token: {page_token}")
+    return key
+
+
 class Storage:
     """
     Wraps calls to the Amazon RDS Data Service.
@@ -61,6 +141,9 @@ class Storage:
         self._secret = secret
         self._db_name = db_name
         self._rdsdata_client = rdsdata_client
+        self._data_api = DataApiExecutor(
+            cluster["DBClusterArn"], secret["ARN"], db_name, rdsdata_client
+        )
         self._tables = {
             "Authors": Table(
                 "Authors",
@@ -138,9 +221,15 @@ class Storage:
             DBClusterIdentifier=cluster_name
         )["DBClusters"][0]
         secret = boto3.client("secretsmanager").describe_secret(SecretId=secret_name)
-        rdsdata_client = boto3.client("rds-data")
+        rdsdata_client = make_rdsdata_client()
         return cls(cluster, secret, db_name, rdsdata_client)
 
+    def close(self):
+        """
+        Stops the worker pool that runs independent statements concurrently.
+        """
+        self._data_api.shutdown()
+
     def _begin_transaction(self):
         """
         Begins a database transaction.
@@ -190,23 +279,11 @@ class Storage:
         :return: The result of running the SQL statement.
         """
         try:
-            run_args = {
-                "database": self._db_name,
-                "resourceArn": self._cluster["DBClusterArn"],
-                "secretArn": self._secret["ARN"],
-                "sql": sql,
-            }
-            if sql_params is not None:
-                run_args["parameters"] = sql_params
-            if transaction_id is not None:
-                run_args["transactionId"] = transaction_id
-            result = self._rdsdata_client.execute_statement(**run_args)
-            logger.info("Ran statement on %s.", self._db_name)
+            result = self._data_api.execute(
+                sql, sql_params=sql_params, transaction_id=transaction_id
+            )
         except ClientError as error:
-            if (
-                error.response["Error"]["Code"] == "BadRequestException"
-                and "Communications link failure" in error.response["Error"]["Message"]
-            ):
+            if _is_not_ready(error):
                 raise DataServiceNotReadyException(
                     "The Aurora Data Service is not ready."
                 ) from error
@@ -220,31 +297,63 @@ class Storage:
         else:
             return result
 
-    def _run_batch_statement(self, sql, sql_param_sets):
+    def _run_batch_statement(self, sql, sql_param_sets, transaction_id=None):
         """
         Runs a batch SQL statement and associated parameter sets using RDS Data Service.
 
         :param sql: The SQL statement to run.
         :param sql_param_sets: The parameter sets associated with the SQL statement.
                                Each parameter set represents an item in the batch.
+        :param transaction_id: The ID of a previously created transaction.
         :return: The result of running the batch SQL statement.
         """
         try:
-            run_args = {
-                "database": self._db_name,
-                "resourceArn": self._cluster["DBClusterArn"],
-                "secretArn": self._secret["ARN"],
-                "sql": sql,
-                "parameterSets": sql_param_sets,
-            }
-            result = self._rdsdata_client.batch_execute_statement(**run_args)
-            logger.info("Ran batch statement on %s.", self._db_name)
-        except ClientError:
+            result = self._data_api.execute_batch(
+                sql, sql_param_sets, transaction_id=transaction_id
+            )
+        except ClientError as error:
+            if _is_not_ready(error):
+                raise DataServiceNotReadyException(
+                    "The Aurora Data Service is not ready."
+                ) from error
             logger.exception("Run batch statement on %s failed.", self._db_name)
             raise
         else:
             return result
 
+    def _run_in_transaction(self, run, max_attempts=5, base_delay=1):
+        """
+        Runs a function inside a transaction. The transaction is committed when the
+        function succeeds and rolled back when it fails. When the cluster is not
+        ready, the whole transaction is tried again after an exponential backoff.
+
+        :param run: A function that takes a transaction ID and runs statements in
+                    that transaction.
+        :param max_attempts: The number of times to try the transaction.
+        :param base_delay: The time, in seconds, to wait before the first retry.
+        :return: The result of the function.
+        """
+        for attempt in range(max_attempts):
+            transaction_id = None
+            try:
+                transaction_id = self._begin_transaction()
+                result = run(transaction_id)
+                self._commit_transaction(transaction_id)
+                return result
+            except (DataServiceNotReadyException, ClientError) as error:
+                if transaction_id is not None:
+                    try:
+                        self._rollback_transaction(transaction_id)
+                    except ClientError:
+                        logger.warning("Couldn't roll back %s.", transaction_id)
+                not_ready = isinstance(error, DataServiceNotReadyException) or (
+                    isinstance(error, ClientError) and _is_not_ready(error)
+                )
+                if not not_ready or attempt == max_attempts - 1:
+                    raise
+                logger.info("The database is not ready, trying again.")
+                time.sleep(base_delay * 2**attempt)
+
     def bootstrap_tables(self):
         """
         Creates tables in the database. The tables are defined in the constructor.
@@ -332,16 +441,154 @@ class Storage:
         logger.info("Added %s books to the database.", book_count)
         return author_count, book_count
 
-    def get_books(self, author_id=None):
+    def bulk_add_books(
+        self,
+        books,
+        max_rows=MAX_CHUNK_ROWS,
+        max_bytes=MAX_CHUNK_BYTES,
+        max_workers=4,
+    ):
+        """
+        Adds a large list of books and their authors to the database.
+
+        Authors are deduplicated and then inserted in chunks, and their generated IDs
+        are read back from each chunk. Books are then inserted in chunks with
+        batch_execute_statement. Each chunk runs in its own transaction, and chunks
+        run concurrently. A chunk that fails because the cluster is still resuming
+        is tried again.
+
+        :param books: The books to add. Each book is a dict with 'title' and 'author'
+                      keys.
+        :param max_rows: The maximum number of rows in a chunk.
+        :param max_bytes: The maximum size of the values in a chunk.
+        :param max_workers: The maximum number of chunks loaded at the same time.
+        :return: The counts of authors and books added to the database and the
+                 number of rows added per second.
+        """
+        start = time.perf_counter()
+        authors = {}
+        for book in books:
+            if book["author"] not in authors:
+                names = book["author"].split(" ")
+                authors[book["author"]] = {
+                    "FirstName": " ".join(names[:-1]),
+                    "LastName": names[-1],
+                }
+
+        def add_authors(chunk):
+            sql, params = insert_rows_returning(self._tables["Authors"], chunk)
+            result = self._run_in_transaction(
+                lambda transaction_id: self._run_statement(
+                    sql, sql_params=params, transaction_id=transaction_id
+                )
+            )
+            rows = records_to_rows(result, names=["AuthorID", "FirstName", "LastName"])
+            return {
+                (row["FirstName"], row["LastName"]): row["AuthorID"] for row in rows
+            }
+
+        def add_books(chunk):
+            sql, param_sets = insert(self._tables["Books"], chunk)
+            result = self._run_in_transaction(
+                lambda transaction_id: self._run_batch_statement(
+                    sql, param_sets, transaction_id=transaction_id
+                )
+            )
+            return len(result["updateResults"])
+
+        generated_ids = {}
+        with ThreadPoolExecutor(max_workers=max_workers) as executor:
+            for ids in executor.map(
+                add_authors, chunk_rows(authors.values(), max_rows, max_bytes)
+            ):
+                generated_ids.update(ids)
+            author_ids = {
+                name: generated_ids[(author["FirstName"], author["LastName"])]
+                for name, author in authors.items()
+            }
+            book_rows = (
+                {"Title": book["title"], "AuthorID": author_ids[book["author"]]}
+                for book in books
+            )
+            book_count = sum(
+                executor.map(add_books, chunk_rows(book_rows, max_rows, max_bytes))
+            )
+        elapsed = time.perf_counter() - start
+        rows_per_second = (len(authors) + book_count) / elapsed if elapsed > 0 else 0
+        logger.info(
+            "Added %s authors and %s books at %.0f rows/sec.",
+            len(authors),
+            book_count,
+            rows_per_second,
+        )
+        return len(authors), book_count, rows_per_second
+
+    def _query_page(self, primary_name, where_clauses=None, page_size=None, after=None):
         """
-        Gets books from the database.
+        Gets one page of rows, ordered by the primary key of the primary table.
 
-        :param author_id: When specified, only books by this author are returned.
-                          Otherwise, all books are returned.
-        :returns: The list of books.
+        :param primary_name: The name of the primary table to query.
+        :param where_clauses: A list of WHERE clauses that limit the rows to get.
+        :param page_size: The maximum number of rows to get.
+        :param after: The primary key of the last row of the previous page, or None
+                      to get the first page.
+        :return: The rows and the primary key of the last row. The key is None when
+                 there are no more rows.
         """
-        logger.info("Listing by author %s.", "All" if author_id is None else author_id)
-        where_clauses = (
+        page_size = DEFAULT_PAGE_SIZE if page_size is None else page_size
+        sql, columns, params = query(
+            primary_name, self._tables, where_clauses, limit=page_size, after=after
+        )
+        results = self._run_statement(sql, sql_params=params)
+        rows = unpack_query_results(columns, results)
+        last_key = None
+        if len(rows) == page_size:
+            key_name = next(
+                col.name for col in self._tables[primary_name].cols if col.primary_key
+            )
+            last_key = rows[-1][f"{primary_name}.{key_name}"]
+        return rows, last_key
+
+    def _iter_rows(self, primary_name, where_clauses=None, page_size=None):
+        """
+        Yields all rows of a query one at a time while reading them from the database
+        one page at a time, so only a single page is held in memory.
+
+        :param primary_name: The name of the primary table to query.
+        :param where_clauses: A list of WHERE clauses that limit the rows to get.
+        :param page_size: The number of rows to read in each page.
+        :return: A generator of rows.
+        """
+        after = None
+        while True:
+            rows, after = self._query_page(
+                primary_name, where_clauses, page_size, after
+            )
+            yield from rows
+            if after is None:
+                break
+
+    def _get_page(
+        self, primary_name, where_clauses=None, page_size=None, page_token=None
+    ):
+        """
+        Gets one page of rows for a REST request.
+
+        :param primary_name: The name of the primary table to query.
+        :param where_clauses: A list of WHERE clauses that limit the rows to get.
+        :param page_size: The maximum number of rows to get.
+        :param page_token: The token returned with the previous page, or None to get
+                           the first page.
+        :return: The rows and the token of the next page. The token is None when
+                 there are no more rows.
+        """
+        after = None if page_token is None else decode_page_token(page_token)
+        rows, last_key = self._query_page(primary_name, where_clauses, page_size, after)
+        return rows, None if last_key is None else encode_page_token(last_key)
+
+    @staticmethod
+    def _author_where(author_id):
+        return (
             None
             if author_id is None
             else [
@@ -353,10 +600,69 @@ class Storage:
                 }
             ]
         )
-        sql, columns, params = query("Books", self._tables, where_clauses)
-        results = self._run_statement(sql, sql_params=params)
-        output = unpack_query_results(columns, results)
-        return output
+
+    def iter_books(self, author_id=None, page_size=None):
+        """
+        Yields books from the database one at a time, reading them one page at a
+        time so that even very large catalogs are listed in constant memory.
+
+        :param author_id: When specified, only books by this author are returned.
+                          Otherwise, all books are returned.
+        :param page_size: The number of books to read from the database at a time.
+        :return: A generator of books.
+        """
+        logger.info("Listing by author %s.", "All" if author_id is None else author_id)
+        return self._iter_rows("Books", self._author_where(author_id), page_size)
+
+    def get_books(self, author_id=None):
+        """
+        Gets books from the database.
+
+        :param author_id: When specified, only books by this author are returned.
+                          Otherwise, all books are returned.
+        :returns: The list of books.
+        """
+        return list(self.iter_books(author_id))
+
+    def get_books_page(self, author_id=None, page_size=None, page_token=None):
+        """
+        Gets one page of books from the database.
+
+        :param author_id: When specified, only books by this author are returned.
+        :param page_size: The maximum number of books to return.
+        :param page_token: The token returned with the previous page, or None to get
+                           the first page.
+        :return: The list of books and the token of the next page, or None when there
+                 are no more books.
+        """
+        logger.info(
+            "Getting page of books by author %s.",
+            "All" if author_id is None else author_id,
+        )
+        return self._get_page(
+            "Books", self._author_where(author_id), page_size, page_token
+        )
+
+    def get_overview(self, page_size=None):
+        """
+        Gets the first page of authors, books, and patrons. The three queries don't
+        depend on each other, so they run at the same time on the worker pool of the
+        Data API executor instead of one after another.
+
+        :param page_size: The maximum number of rows to get from each table.
+        :return: A dict keyed by table name. Each value holds the rows of the first
+                 page and the token of the next page, or None when there are no
+                 more rows.
+        """
+        logger.info("Getting the library overview.")
+        names = ["Authors", "Books", "Patrons"]
+        pages = self._data_api.run_all(
+            self._get_page, [(name, None, page_size) for name in names]
+        )
+        return {
+            name: {"rows": rows, "next_page_token": next_token}
+            for name, (rows, next_token) in zip(names, pages)
+        }
 
     def add_book(self, book):
         """
@@ -423,10 +729,19 @@ class Storage:
         :return: The authors in the database.
         """
         logger.info("Listing all authors.")
-        sql, columns, _ = query("Authors", self._tables)
-        results = self._run_statement(sql)
-        output = unpack_query_results(columns, results)
-        return output
+        return list(self._iter_rows("Authors"))
+
+    def get_authors_page(self, page_size=None, page_token=None):
+        """
+        Gets one page of authors from the database.
+
+        :param page_size: The maximum number of authors to return.
+        :param page_token: The token returned with the previous page, or None to get
+                           the first page.
+        :return: The list of authors and the token of the next page, or None when
+                 there are no more authors.
+        """
+        return self._get_page("Authors", page_size=page_size, page_token=page_token)
 
     def get_patrons(self):
         """
@@ -435,10 +750,19 @@ class Storage:
         :return: The patrons in the database.
         """
         logger.info("Listing all patrons.")
-        sql, columns, _ = query("Patrons", self._tables)
-        results = self._run_statement(sql)
-        output = unpack_query_results(columns, results)
-        return output
+        return list(self._iter_rows("Patrons"))
+
+    def get_patrons_page(self, page_size=None, page_token=None):
+        """
+        Gets one page of patrons from the database.
+
+        :param page_size: The maximum number of patrons to return.
+        :param page_token: The token returned with the previous page, or None to get
+                           the first page.
+        :return: The list of patrons and the token of the next page, or None when
+                 there are no more patrons.
+        """
+        return self._get_page("Patrons", page_size=page_size, page_token=page_token)
 
     def add_patron(self, patron):
         """
@@ -13,6 +13,7 @@ This code is intended for demonstration only and does not guarantee best practic
 """
 
 import datetime
+import functools
 import logging
 
 logger = logging.getLogger(__name__)
@@ -20,6 +21,11 @@ logger = logging.getLogger(__name__)
 # Maps from Python types to PostgreSQL columns types used in a CREATE TABLE statement.
 COL_TYPES = {int: "int", str: "varchar", datetime.date: "date"}
 
+# The number of statement shapes whose SQL text and parameter plans are cached.
+# Each distinct table, column list, or WHERE clause shape is one entry, and the
+# least recently used entries are evicted first.
+STATEMENT_CACHE_SIZE = 256
+
 # Maps from Python types to Amazon RDS Data Service types.
 VALUE_KEYS = {
     bytes: "blobValue",
@@ -73,37 +79,97 @@ class Table:
         self.cols = cols
 
 
-def _make_params(values):
+@functools.lru_cache(maxsize=STATEMENT_CACHE_SIZE)
+def _param_plan(shape):
     """
-    Makes an RDS Data Service parameter structure out of a Python dictionary.
+    Makes a plan to marshal values of one shape into RDS Data Service parameters, so
+    the type dispatch is done once per shape instead of once per value.
 
-    :param values: A Python dictionary of parameters.
-    :return: The parameters as a list of dicts that can be passed to RDS Data Service.
+    :param shape: A tuple of (parameter name, Python type) pairs.
+    :return: A tuple of (name, value key, converter, type hint) entries. The
+             converter is None when the value is passed as it is.
     """
+    plan = []
+    for name, val_type in shape:
+        value_key = VALUE_KEYS[val_type]
+        if issubclass(val_type, datetime.date):
+            convert = str
+        elif val_type is type(None):
+            convert = _null_value
+        else:
+            convert = None
+        type_hint = (
+            "DATE"
+            if issubclass(val_type, (datetime.date, datetime.datetime, datetime.time))
+            else None
+        )
+        plan.append((f"{name}", value_key, convert, type_hint))
+    return tuple(plan)
+
+
+def _null_value(_):
+    return True
+
+
+def _apply_plan(plan, vals):
     params = []
-    for key, val in values.items():
+    for (name, value_key, convert, type_hint), val in zip(plan, vals):
         param = {
-            "name": f"{key}",
-            "value": {
-                VALUE_KEYS[type(val)]: (
-                    str(val)
-                    if isinstance(val, datetime.date)
-                    else val
-                    if val is not None
-                    else True
-                )
-            },
+            "name": name,
+            "value": {value_key: val if convert is None else convert(val)},
         }
-        if (
-            isinstance(val, datetime.date)
-            or isinstance(val, datetime.datetime)
-            or isinstance(val, datetime.time)
-        ):
-            param["typeHint"] = "DATE"
+        if type_hint is not None:
+            param["typeHint"] = type_hint
         params.append(param)
     return params
 
 
+def _make_params(values):
+    """
+    Makes an RDS Data Service parameter structure out of a Python dictionary.
+
+    :param values: A Python dictionary of parameters.
+    :return: The parameters as a list of dicts that can be passed to RDS Data Service.
+    """
+    plan = _param_plan(tuple((key, type(val)) for key, val in values.items()))
+    return _apply_plan(plan, values.values())
+
+
+def _make_param_sets(value_sets):
+    """
+    Makes RDS Data Service parameter sets out of a list of Python dictionaries.
+
+    Rows of a batch usually have the same columns, so the parameters are built a
+    column at a time. A column whose values all have one type that needs no
+    conversion is built in a single pass; other columns fall back to a plan per
+    value. Rows that don't share their columns are marshalled one by one.
+
+    :param value_sets: A list of Python dictionaries of parameters.
+    :return: The parameter sets that can be passed to RDS Data Service.
+    """
+    value_sets = list(value_sets)
+    if not value_sets:
+        return []
+    keys = tuple(value_sets[0])
+    if any(tuple(values) != keys for values in value_sets):
+        return [_make_params(values) for values in value_sets]
+    columns = []
+    for key in keys:
+        vals = [values[key] for values in value_sets]
+        val_types = set(map(type, vals))
+        if len(val_types) == 1:
+            ((name, value_key, convert, type_hint),) = _param_plan(
+                ((key, val_types.pop()),)
+            )
+            if convert is None and type_hint is None:
+                columns.append(
+                    [{"name": name, "value": {value_key: val}} for val in vals]
+                )
+                continue
+        columns.append([_make_params({key: val})[0] for val in vals])
+    return [list(params) for params in zip(*columns)]
+
+
 def _make_where_parts(where_clauses):
     """
     Makes PostgreSQL-compatible WHERE clauses and associated RDS Data Service parameters
@@ -125,21 +191,34 @@ def _make_where_parts(where_clauses):
     sql = ""
     sql_params = None
     if where_clauses is not None:
-        wheres = [
-            f"{item['table']}.{item['column']} {item['op']} "
-            f":{item['table']}_{item['column']}"
-            for item in where_clauses
-        ]
-        sql = f" WHERE {' AND '.join(wheres)}"
+        sql, names = _where_sql(_where_shape(where_clauses))
         sql_params = _make_params(
-            {
-                f"{item['table']}_{item['column']}": item["value"]
-                for item in where_clauses
-            }
+            dict(zip(names, (item["value"] for item in where_clauses)))
         )
     return sql, sql_params
 
 
+def _where_shape(where_clauses):
+    if where_clauses is None:
+        return None
+    return tuple((item["table"], item["column"], item["op"]) for item in where_clauses)
+
+
+@functools.lru_cache(maxsize=STATEMENT_CACHE_SIZE)
+def _where_sql(where_shape):
+    """
+    Makes the text of a WHERE clause for a shape of WHERE clause definitions.
+
+    :param where_shape: A tuple of (table, column, op) entries.
+    :return: The WHERE clause and the names of its parameters.
+    """
+    wheres = [
+        f"{table}.{column} {op} :{table}_{column}" for table, column, op in where_shape
+    ]
+    names = tuple(f"{table}_{column}" for table, column, _ in where_shape)
+    return f" WHERE {' AND '.join(wheres)}", names
+
+
 def create_table(table):
     """
     Generates a CREATE TABLE PostgreSQL statement from a Table object.
@@ -184,6 +263,13 @@ def insert(table, value_sets):
     :return: The PostgreSQL INSERT statement and parameter sets that can be passed to
              the RDS Data Service.
     """
+    sql = _insert_sql(table)
+    param_sets = _make_param_sets(value_sets)
+    return sql, param_sets
+
+
+@functools.lru_cache(maxsize=STATEMENT_CACHE_SIZE)
+def _insert_sql(table):
     insert_clause = f"INSERT INTO {table.name}"
     returning_clause = "RETURNING *"
     cols = [col.name for col in table.cols if not col.auto_increment]
@@ -192,8 +278,7 @@ def insert(table, value_sets):
     # That might not be a permanent limitation though. So set it up in case the response eventually includes
     # the columns mentioned in RETURNING.
     sql = f"{insert_clause} ({', '.join(cols)}) VALUES ({', '.join(vals)}) {returning_clause}"
-    param_sets = [_make_params(values) for values in value_sets]
-    return sql, param_sets
+    return sql
 
 
 def insert_returning(table, value_sets):
@@ -216,13 +301,56 @@ def insert_returning(table, value_sets):
     :return: The PostgreSQL INSERT statement and parameter sets that can be passed to
              the RDS Data Service.
     """
+    sql = _insert_returning_sql(table)
+    param_sets = _make_param_sets(value_sets)
+    return sql, param_sets
+
+
+@functools.lru_cache(maxsize=STATEMENT_CACHE_SIZE)
+def _insert_returning_sql(table):
     insert_clause = f"INSERT INTO {table.name}"
     returning_clause = "RETURNING *"
     cols = [col.name for col in table.cols if not col.auto_increment]
     vals = [f":{col}" for col in cols]
     sql = f"WITH derived AS ({insert_clause} ({', '.join(cols)}) VALUES ({', '.join(vals)}) {returning_clause}) SELECT * FROM derived"
-    param_sets = [_make_params(values) for values in value_sets]
-    return sql, param_sets
+    return sql
+
+
+def insert_rows_returning(table, value_sets):
+    """
+    Generates a single PostgreSQL INSERT statement that inserts several rows into a
+    table and returns them, including generated columns. Unlike insert_without_batch,
+    values are passed as parameters instead of being formatted into the SQL text.
+    (The caller must treat the SQL statement like a query, and unpack the 'records'
+    field of the return value.)
+
+    :param table: The table where the values are inserted.
+    :param value_sets: The rows to insert into the table. Each row is a Python dict
+                       where the keys are column names and the values are the values
+                       to insert into the table.
+    :return: The PostgreSQL INSERT statement and the parameters that can be passed to
+             the RDS Data Service.
+    """
+    value_sets = list(value_sets)
+    sql, cols = _insert_rows_returning_sql(table, len(value_sets))
+    values = {}
+    for index, value_set in enumerate(value_sets):
+        values.update({f"{col}_{index}": value_set[col] for col in cols})
+    return sql, _make_params(values)
+
+
+@functools.lru_cache(maxsize=STATEMENT_CACHE_SIZE)
+def _insert_rows_returning_sql(table, row_count):
+    cols = tuple(col.name for col in table.cols if not col.auto_increment)
+    rows = [
+        f"({', '.join(f':{col}_{index}' for col in cols)})"
+        for index in range(row_count)
+    ]
+    sql = (
+        f"WITH derived AS (INSERT INTO {table.name} ({', '.join(cols)}) "
+        f"VALUES {', '.join(rows)} RETURNING *) SELECT * FROM derived"
+    )
+    return sql, cols
 
 
 def insert_without_batch(table, values_clause):
@@ -266,28 +394,68 @@ def update(table_name, set_values, where_clauses):
     :return: The PostgreSQL UPDATE statement and parameters that can be passed to the
              RDS Data Service.
     """
-    set_clauses = [f"{key}=:set_{key}" for key in set_values.keys()]
+    sql = _update_sql(table_name, tuple(set_values), _where_shape(where_clauses))
     set_params = _make_params({f"set_{key}": val for key, val in set_values.items()})
-    where_sql, where_params = _make_where_parts(where_clauses)
-    sql = f"UPDATE {table_name} SET {', '.join(set_clauses)}{where_sql}"
+    _, where_params = _make_where_parts(where_clauses)
     return sql, set_params + where_params
 
 
-def query(primary_name, tables, where_clauses=None):
+@functools.lru_cache(maxsize=STATEMENT_CACHE_SIZE)
+def _update_sql(table_name, set_keys, where_shape):
+    set_clauses = [f"{key}=:set_{key}" for key in set_keys]
+    where_sql = _where_sql(where_shape)[0] if where_shape is not None else ""
+    return f"UPDATE {table_name} SET {', '.join(set_clauses)}{where_sql}"
+
+
+def query(primary_name, tables, where_clauses=None, limit=None, after=None):
     """
     Generates a PostgreSQL SELECT statement to retrieve data. This function recursively
     walks the tree of foreign key relationships to build a query that joins all
     tables necessary to retrieve full data rows.
 
+    When a limit is specified, rows are ordered by the primary key of the primary
+    table and at most `limit` rows are returned. To get the next page, pass the
+    primary key of the last row of a page as `after`. This keyset pagination
+    reads each page with an index seek, so later pages are as fast as the first.
+
     :param primary_name: The name of the primary table to query.
     :param tables: The full list of tables in the database. These are used to
                    resolve foreign key relationships.
     :param where_clauses: A list of WHERE clauses that limit the data to retrieve.
                           These clauses are a list of dicts as defined in the
                           _make_where_clauses function.
+    :param limit: The maximum number of rows to return.
+    :param after: The primary key value after which to start returning rows. This
+                  is used only when a limit is specified.
     :return: The PostgreSQL SELECT statement, the list of columns that were included in
              the query, and the parameters that can be passed to the RDS Data Service.
     """
+    sql, columns = _query_sql(
+        primary_name,
+        tuple(tables.items()),
+        _where_shape(where_clauses),
+        limit,
+        after is not None,
+    )
+    _, sql_params = _make_where_parts(where_clauses)
+    if limit is not None and after is not None:
+        sql_params = (sql_params or []) + _make_params({"page_after": after})
+    return sql, dict(columns), sql_params
+
+
+@functools.lru_cache(maxsize=STATEMENT_CACHE_SIZE)
+def _query_sql(primary_name, tables_key, where_shape, limit, has_after):
+    """
+    Makes the text of a SELECT statement and its columns for one query shape.
+
+    :param primary_name: The name of the primary table to query.
+    :param tables_key: The full list of tables as a tuple of (name, Table) pairs.
+    :param where_shape: The shape of the WHERE clauses, as made by _where_shape.
+    :param limit: The maximum number of rows to return, or None.
+    :param has_after: Whether the query starts after a primary key value.
+    :return: The SELECT statement and the columns that are included in the query.
+    """
+    tables = dict(tables_key)
     columns = {}
     joins = []
 
@@ -305,10 +473,20 @@ def query(primary_name, tables, where_clauses=None):
 
     build_query(tables[primary_name])
     sql = f"SELECT {', '.join(columns.keys())} FROM {primary_name} {' '.join(joins)}"
-    where_sql, sql_params = _make_where_parts(where_clauses)
-    sql += where_sql
-
-    return sql, columns, sql_params
+    if where_shape is not None:
+        sql += _where_sql(where_shape)[0]
+    if limit is not None:
+        key_name = next(
+            col.name for col in tables[primary_name].cols if col.primary_key
+        )
+        key = f"{primary_name}.{key_name}"
+        sql = sql.rstrip()
+        if has_after:
+            sql += (
+                f"{' AND' if where_shape is not None else ' WHERE'} {key} > :page_after"
+            )
+        sql += f" ORDER BY {key} LIMIT {int(limit)}"
+    return sql, columns
 
 
 def unpack_query_results(columns, results):
@@ -321,14 +499,16 @@ def unpack_query_results(columns, results):
     :param results: The results returned from the SELECT query.
     :return: The query records as a list of Python dicts.
     """
-    output = [
-        {
-            col_key: val.get(VALUE_KEYS[col.data_type], None)
-            for col_key, col, val in zip(columns.keys(), columns.values(), record)
-        }
-        for record in results["records"]
-    ]
-    return output
+    records = results["records"]
+    if not records:
+        return []
+    # Unpack the records one column at a time, so the value key of each column is
+    # looked up once instead of once for every field.
+    values = []
+    for col, fields in zip(columns.values(), zip(*records)):
+        value_key = VALUE_KEYS[col.data_type]
+        values.append([field.get(value_key) for field in fields])
+    return [dict(zip(columns.keys(), row)) for row in zip(*values)]
 
 
 def unpack_insert_results(results):
@@ -376,8 +556,14 @@ def delete(table, value_sets):
     :return: The PostgreSQL DELETE statement and parameter sets that can be passed to
              the RDS Data Service.
     """
+    sql = _delete_sql(table)
+    param_sets = _make_param_sets(value_sets)
+    return sql, param_sets
+
+
+@functools.lru_cache(maxsize=STATEMENT_CACHE_SIZE)
+def _delete_sql(table):
     delete_clause = f"DELETE FROM {table.name}"
     wheres = [f"{col.name}=:{col.name}" for col in table.cols if col.primary_key]
     sql = f"{delete_clause} WHERE {' AND '.join(wheres)}"
-    param_sets = [_make_params(values) for values in value_sets]
-    return sql, param_sets
+    return sql
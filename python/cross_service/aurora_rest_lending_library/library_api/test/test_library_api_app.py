@@ -19,6 +19,7 @@ from chalicelib.library_data import DataServiceNotReadyException
 def mock_storage(monkeypatch):
     _storage = MagicMock(
         get_books=MagicMock(return_value=["book1", "book2"]),
+        get_books_page=MagicMock(return_value=(["book1"], "token-2")),
         add_book=MagicMock(return_value=("author1", "book1")),
         get_authors=MagicMock(return_value=["author1", "author2"]),
         get_patrons=MagicMock(return_value=["patron1", "patron2"]),
@@ -27,6 +28,13 @@ def mock_storage(monkeypatch):
         get_borrowed_books=MagicMock(return_value=["book1", "book2"]),
         borrow_book=MagicMock(return_value="borrow_book"),
         return_book=MagicMock(return_value="return_book"),
+        get_overview=MagicMock(
+            return_value={
+                "Authors": {"rows": ["author1"], "next_page_token": "token-a"},
+                "Books": {"rows": ["book1"], "next_page_token": None},
+                "Patrons": {"rows": [], "next_page_token": None},
+            }
+        ),
     )
     monkeypatch.setattr(app, "get_storage", lambda: _storage)
     return _storage
@@ -81,6 +89,33 @@ def test_list_books_by_author(mock_storage):
         assert response.json_body == {"books": ["book1", "book2"]}
 
 
+def test_list_books_page(mock_storage):
+    with Client(app.app) as client:
+        response = client.http.get("/books?page_size=1&page_token=token-1")
+        mock_storage.get_books_page.assert_called_with(
+            page_size=1, page_token="token-1"
+        )
+        assert response.json_body == {"books": ["book1"], "next_page_token": "token-2"}
+
+
+def test_get_overview(mock_storage):
+    with Client(app.app) as client:
+        response = client.http.get("/overview?page_size=1")
+        mock_storage.get_overview.assert_called_with(page_size=1)
+        assert response.json_body == {
+            "authors": {"authors": ["author1"], "next_page_token": "token-a"},
+            "books": {"books": ["book1"], "next_page_token": None},
+            "patrons": {"patrons": [], "next_page_token": None},
+        }
+
+
+@pytest.mark.parametrize("page_size", ["ten", "0", "5000"])
+def test_list_books_page_bad_size(mock_storage, page_size):
+    with Client(app.app) as client:
+        response = client.http.get(f"/books?page_size={page_size}")
+        assert response.status_code == 400
+
+
 def test_list_authors(mock_storage):
     with Client(app.app) as client:
         response = client.http.get("/authors")
@@ -5,13 +5,20 @@
 Unit tests for library_data.py functions.
 """
 
+import base64
 import datetime
+from unittest.mock import MagicMock
 
 import boto3
 import pytest
 from botocore.exceptions import ClientError
 from botocore.stub import ANY
-from chalicelib.library_data import Storage
+from chalicelib.library_data import (
+    Storage,
+    chunk_rows,
+    decode_page_token,
+    encode_page_token,
+)
 
 CLUSTER_ARN = "arn:aws:rds:us-west-2:123456789012:cluster:test-cluster"
 SECRET_ARN = "arn:aws:secretsmanager:us-west-2:123456789012:secret:test-secret-111111"
@@ -92,6 +99,81 @@ def test_add_books(make_stubber):
     assert book_count == 3
 
 
+def test_chunk_rows():
+    rows = [{"Title": "x" * size} for size in (10, 10, 30, 5, 5, 5)]
+    chunks = list(chunk_rows(rows, max_rows=3, max_bytes=40))
+    assert [len(chunk) for chunk in chunks] == [2, 3, 1]
+
+
+def test_bulk_add_books(monkeypatch):
+    monkeypatch.setattr("chalicelib.library_data.time.sleep", lambda _: None)
+    rdsdata_client = MagicMock()
+    storage = Storage(
+        {"DBClusterArn": CLUSTER_ARN}, {"ARN": SECRET_ARN}, DB_NAME, rdsdata_client
+    )
+    books = [
+        {"title": f"Book {index}", "author": f"Author Number{index % 7}"}
+        for index in range(50)
+    ]
+    not_ready = ClientError(
+        {
+            "Error": {
+                "Code": "BadRequestException",
+                "Message": "Communications link failure",
+            }
+        },
+        "ExecuteStatement",
+    )
+    calls = {"authors": 0}
+
+    def execute_statement(**kwargs):
+        calls["authors"] += 1
+        if calls["authors"] == 1:
+            raise not_ready
+        params = {
+            param["name"]: param["value"]["stringValue"]
+            for param in kwargs["parameters"]
+        }
+        count = len(params) // 2
+        return {
+            "records": [
+                [
+                    {"longValue": int(params[f"LastName_{index}"][-1])},
+                    {"stringValue": params[f"FirstName_{index}"]},
+                    {"stringValue": params[f"LastName_{index}"]},
+                ]
+                for index in range(count)
+            ]
+        }
+
+    def batch_execute_statement(**kwargs):
+        for param_set in kwargs["parameterSets"]:
+            title = next(p for p in param_set if p["name"] == "Title")
+            author = next(p for p in param_set if p["name"] == "AuthorID")
+            book_index = int(title["value"]["stringValue"].split(" ")[-1])
+            assert author["value"]["longValue"] == book_index % 7
+        return {"updateResults": [{} for _ in kwargs["parameterSets"]]}
+
+    rdsdata_client.begin_transaction.return_value = {"transactionId": "trid"}
+    rdsdata_client.commit_transaction.return_value = {"transactionStatus": "done"}
+    rdsdata_client.rollback_transaction.return_value = {"transactionStatus": "done"}
+    rdsdata_client.execute_statement.side_effect = execute_statement
+    rdsdata_client.batch_execute_statement.side_effect = batch_execute_statement
+
+    author_count, book_count, rows_per_second = storage.bulk_add_books(
+        books, max_rows=4, max_workers=3
+    )
+
+    assert author_count == 7
+    assert book_count == 50
+    assert rows_per_second > 0
+    # Two author chunks plus a retry, and thirteen book chunks.
+    assert rdsdata_client.execute_statement.call_count == 3
+    assert rdsdata_client.batch_execute_statement.call_count == 13
+    assert rdsdata_client.commit_transaction.call_count == 15
+    assert rdsdata_client.rollback_transaction.call_count == 1
+
+
 @pytest.mark.parametrize(
     "author_id,error_code", [(None, None), (13, None), (None, "TestException")]
 )
@@ -106,6 +188,7 @@ def test_get_books(make_stubber, author_id, error_code):
     if author_id is not None:
         sql += " WHERE Authors.AuthorID = :Authors_AuthorID"
         sql_params = [{"name": "Authors_AuthorID", "value": {"longValue": author_id}}]
+    sql += " ORDER BY Books.BookID LIMIT 1000"
     records = [
         [1, "Title One", 1, "Freddy", "Fake"],
         [2, "Title Two", 13, "Peter", "Pretend"],
@@ -130,6 +213,96 @@ def test_get_books(make_stubber, author_id, error_code):
             assert exc_info.value.response["Error"]["Code"] == error_code
 
 
+BOOKS_SQL = (
+    "SELECT Books.BookID, Books.Title, Authors.AuthorID, "
+    "Authors.FirstName, Authors.LastName FROM Books "
+    "INNER JOIN Authors ON Books.AuthorID=Authors.AuthorID"
+)
+
+
+def test_iter_books_pages(make_stubber):
+    storage, rdsdata_stubber = make_storage_n_stubber(make_stubber)
+    records = [[index, f"Title {index}", 1, "Freddy", "Fake"] for index in range(5)]
+
+    for page, after in ((records[:2], None), (records[2:4], 1), (records[4:], 3)):
+        sql = BOOKS_SQL
+        sql_params = None
+        if after is not None:
+            sql += " WHERE Books.BookID > :page_after"
+            sql_params = [{"name": "page_after", "value": {"longValue": after}}]
+        rdsdata_stubber.stub_execute_statement(
+            CLUSTER_ARN,
+            SECRET_ARN,
+            DB_NAME,
+            sql + " ORDER BY Books.BookID LIMIT 2",
+            sql_params=sql_params,
+            records=page,
+        )
+
+    got_books = list(storage.iter_books(page_size=2))
+    assert [list(book.values()) for book in got_books] == records
+
+
+def test_get_books_page(make_stubber):
+    storage, rdsdata_stubber = make_storage_n_stubber(make_stubber)
+    records = [[index, f"Title {index}", 13, "Peter", "Pretend"] for index in (4, 7)]
+    page_token = encode_page_token(2)
+
+    rdsdata_stubber.stub_execute_statement(
+        CLUSTER_ARN,
+        SECRET_ARN,
+        DB_NAME,
+        BOOKS_SQL + " WHERE Authors.AuthorID = :Authors_AuthorID "
+        "AND Books.BookID > :page_after ORDER BY Books.BookID LIMIT 2",
+        sql_params=[
+            {"name": "Authors_AuthorID", "value": {"longValue": 13}},
+            {"name": "page_after", "value": {"longValue": 2}},
+        ],
+        records=records,
+    )
+
+    got_books, next_token = storage.get_books_page(
+        author_id=13, page_size=2, page_token=page_token
+    )
+    assert [list(book.values()) for book in got_books] == records
+    assert decode_page_token(next_token) == 7
+
+
+def test_get_overview():
+    rdsdata_client = MagicMock()
+    rdsdata_client.execute_statement.side_effect = lambda **kwargs: {
+        "records": [[{"longValue": 1}, {"stringValue": kwargs["sql"].split()[1]}]]
+    }
+    storage = Storage(
+        {"DBClusterArn": CLUSTER_ARN}, {"ARN": SECRET_ARN}, DB_NAME, rdsdata_client
+    )
+
+    overview = storage.get_overview(page_size=1)
+    storage.close()
+
+    assert list(overview) == ["Authors", "Books", "Patrons"]
+    assert rdsdata_client.execute_statement.call_count == 3
+    for name, page in overview.items():
+        assert list(page["rows"][0].values())[1].startswith(name)
+        assert decode_page_token(page["next_page_token"]) == 1
+
+
+@pytest.mark.parametrize(
+    "page_token",
+    [
+        "not-a-token",
+        base64.urlsafe_b64encode(b'{"after": [1, 2]}').decode(),
+        base64.urlsafe_b64encode(b'{"after": {"id": 1}}').decode(),
+        base64.urlsafe_b64encode(b'{"after": null}').decode(),
+        base64.urlsafe_b64encode(b'{"after": true}').decode(),
+        base64.urlsafe_b64encode(b"[1]").decode(),
+    ],
+)
+def test_decode_page_token_invalid(page_token):
+    with pytest.raises(ValueError):
+        decode_page_token(page_token)
+
+
 @pytest.mark.parametrize(
     "error_code,stop_on_method",
     [(None, None), ("TestException", "stub_execute_statement")],
@@ -207,6 +380,7 @@ def test_add_book(make_stubber, stub_runner, error_code, stop_on_method):
 def test_get_authors(make_stubber, error_code):
     storage, rdsdata_stubber = make_storage_n_stubber(make_stubber)
     sql = "SELECT Authors.AuthorID, Authors.FirstName, Authors.LastName FROM Authors "
+    sql = sql.rstrip() + " ORDER BY Authors.AuthorID LIMIT 1000"
     records = [[1, "Freddy", "Fake"], [13, "Peter", "Pretend"]]
 
     rdsdata_stubber.stub_execute_statement(
@@ -226,6 +400,7 @@ def test_get_authors(make_stubber, error_code):
 def test_get_patrons(make_stubber, error_code):
     storage, rdsdata_stubber = make_storage_n_stubber(make_stubber)
     sql = "SELECT Patrons.PatronID, Patrons.FirstName, Patrons.LastName FROM Patrons "
+    sql = sql.rstrip() + " ORDER BY Patrons.PatronID LIMIT 1000"
     records = [[1, "Randall", "Reader"], [13, "Bob", "Booker"]]
 
     rdsdata_stubber.stub_execute_statement(
@@ -7,6 +7,8 @@ Unit tests for mysql_helper.py functions.
 
 import datetime
 
+import pytest
+
 import chalicelib.mysql_helper as mysql_helper
 from chalicelib.mysql_helper import Column, ForeignKey, Table
 
@@ -181,6 +183,62 @@ def test_query():
     ]
 
 
+@pytest.mark.parametrize(
+    "where_clauses,after,where_sql",
+    [
+        (None, None, ""),
+        (None, 21, " WHERE Test.TestID > :page_after"),
+        (
+            [{"table": "Test", "column": "LastName", "op": "=", "value": "Smith"}],
+            21,
+            " WHERE Test.LastName = :Test_LastName AND Test.TestID > :page_after",
+        ),
+    ],
+)
+def test_query_page(where_clauses, after, where_sql):
+    tables = {"Test": make_table(), "OtherTable": make_foreign_table()}
+    sql, _, sql_params = mysql_helper.query(
+        "Test", tables, where_clauses, limit=50, after=after
+    )
+    assert sql.endswith(f"{where_sql} ORDER BY Test.TestID LIMIT 50")
+    if after is not None:
+        assert sql_params[-1] == {"name": "page_after", "value": {"longValue": after}}
+
+
+def test_query_sql_is_cached():
+    tables = {"Test": make_table(), "OtherTable": make_foreign_table()}
+    mysql_helper._query_sql.cache_clear()
+    for last_name in ("Smith", "Jones", "Brown"):
+        sql, _, sql_params = mysql_helper.query(
+            "Test",
+            tables,
+            [{"table": "Test", "column": "LastName", "op": "=", "value": last_name}],
+        )
+        assert sql_params == [
+            {"name": "Test_LastName", "value": {"stringValue": last_name}}
+        ]
+    cache_info = mysql_helper._query_sql.cache_info()
+    assert cache_info.misses == 1
+    assert cache_info.hits == 2
+
+
+@pytest.mark.parametrize(
+    "value_sets",
+    [
+        [{"TestID": index, "LastName": f"Name{index}"} for index in range(5)],
+        [
+            {"TestID": 1, "Birthday": datetime.date(2000, 1, 1), "LastName": None},
+            {"TestID": 2, "Birthday": datetime.date(2001, 2, 2), "LastName": "Two"},
+        ],
+        [{"TestID": 1}, {"LastName": "Shape"}, {"TestID": 3, "LastName": None}],
+    ],
+)
+def test_make_param_sets(value_sets):
+    assert mysql_helper._make_param_sets(value_sets) == [
+        mysql_helper._make_params(values) for values in value_sets
+    ]
+
+
 def test_unpack_query():
     columns = {"test1": Column("test1", str), "test2": Column("test2", int)}
     results = {"records": [[{"stringValue": "Hello"}, {"longValue": 13}]]}
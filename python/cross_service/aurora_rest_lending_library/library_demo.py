@@ -140,7 +140,7 @@ def fill_db_tables(books_url, storage):
     logger.info("Found %s books.", len(books))
 
     logger.info("Adding books and authors to the library database.")
-    author_count, book_count = storage.add_books(books)
+    author_count, book_count, _ = storage.bulk_add_books(books)
     return author_count, book_count
 
 
@@ -24,7 +24,7 @@ from flask import Flask
 from flask_cors import CORS
 from item_list import ItemList
 from report import Report
-from storage import Storage
+from storage import DEFAULT_CACHE_TTL, Storage
 
 logger = logging.getLogger(__name__)
 
@@ -66,7 +66,12 @@ def create_app(test_config=None):
         dynamodb_resource = boto3.resource("dynamodb")
         ses_client = boto3.client("ses")
     table = dynamodb_resource.Table(app.config["TABLE_NAME"])
-    storage = Storage(table)  # pylint: disable=E1120
+    storage = Storage(  # pylint: disable=E1120,E1123
+        table,
+        archived_index=app.config.get("ARCHIVED_INDEX_NAME"),
+        scan_segments=app.config.get("SCAN_SEGMENTS", 1),
+        cache_ttl=app.config.get("CACHE_TTL", DEFAULT_CACHE_TTL),
+    )
 
     item_list_view = ItemList.as_view("item_list_api", storage)
     report_view = Report.as_view("report_api", storage, sender_email, ses_client)
@@ -3,3 +3,11 @@
 TABLE_NAME = "NEED-TABLE-NAME"
 SENDER_EMAIL = "NEED-SENDER-EMAIL"
 SECRET_KEY = "change-for-production!"
+# Optional. The name of a global secondary index of the table that has a String
+# partition key named archived_key. When set, active and archived work items are
+# listed with a query of this index instead of a scan of the table.
+ARCHIVED_INDEX_NAME = None
+# The number of segments that are scanned in parallel to list all work items.
+SCAN_SEGMENTS = 1
+# The number of seconds that lists of work items are cached. Use 0 to turn off the cache.
+CACHE_TTL = 5
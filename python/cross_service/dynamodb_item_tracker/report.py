@@ -7,14 +7,22 @@ HTML and text formats, and use Amazon Simple Email Service (Amazon SES) to send
 an email report.
 
 When the list of items is longer than a specified threshold, it is included as a CSV
-attachment to the email instead of in the body of the email itself.
+attachment to the email instead of in the body of the email itself. Work items are
+read from storage a page at a time and written to a temporary file that is kept in
+memory only while it is small, so large reports don't have to fit in memory.
 """
 
+import base64
+import csv
+import gzip
 import logging
+import shutil
+import tempfile
+import uuid
 from datetime import datetime
-from email.mime.application import MIMEApplication
 from email.mime.multipart import MIMEMultipart
 from email.mime.text import MIMEText
+from io import BytesIO
 
 from botocore.exceptions import ClientError
 from flask import jsonify, render_template
@@ -25,6 +33,27 @@ from webargs.flaskparser import use_kwargs
 
 logger = logging.getLogger(__name__)
 
+CSV_HEADER = ["Description", "Guide", "Status", "User name", "Archived"]
+# Reports with more work items than this are sent as a CSV attachment.
+MAX_INLINE_ITEMS = 10
+# CSV files larger than this are compressed with gzip before they are attached.
+COMPRESS_MIN_SIZE = 256 * 1024
+# Temporary files are kept in memory until they grow larger than this.
+SPOOL_MAX_SIZE = 1024 * 1024
+# Base64 encodes 57 bytes to one 76 character line, the longest line allowed by
+# MIME, so the attachment is encoded in chunks that are a multiple of 57 bytes.
+BASE64_CHUNK_SIZE = 57 * 1024
+
+
+class _Utf8Writer:
+    """Lets a CSV writer write text to a binary file."""
+
+    def __init__(self, binary_file):
+        self.binary_file = binary_file
+
+    def write(self, text):
+        return self.binary_file.write(text.encode("utf-8"))
+
 
 class Report(MethodView):
     """
@@ -43,27 +72,101 @@ class Report(MethodView):
         self.email_sender = email_sender
         self.ses_client = ses_client
 
-    def _format_mime_message(self, recipient, text, html, attachment, charset="utf-8"):
+    def _make_raw_message(
+        self, recipient, text, html, attachment, file_name, content_type
+    ):
         """
-        Formats the report as a MIME message. When the the email contains an attachment,
+        Makes the report as a raw MIME message. When the email contains an attachment,
         it must be sent in MIME format.
+
+        The attachment is base64 encoded a chunk at a time straight into the message,
+        so it is not copied into a separate MIME part first.
+
+        :param recipient: The email address of the recipient.
+        :param text: The text version of the report.
+        :param html: The HTML version of the report.
+        :param attachment: A binary file that contains the attachment.
+        :param file_name: The file name of the attachment.
+        :param content_type: The MIME type of the attachment.
+        :return: The message, as bytes.
         """
-        msg = MIMEMultipart("mixed")
-        msg["Subject"] = "Work items"
-        msg["From"] = self.email_sender
-        msg["To"] = recipient
         msg_body = MIMEMultipart("alternative")
+        msg_body.attach(MIMEText(text, "plain", "utf-8"))
+        msg_body.attach(MIMEText(html, "html", "utf-8"))
+        boundary = f"=={uuid.uuid4().hex}=="
 
-        textpart = MIMEText(text.encode(charset), "plain", charset)
-        htmlpart = MIMEText(html.encode(charset), "html", charset)
-        msg_body.attach(textpart)
-        msg_body.attach(htmlpart)
+        message = BytesIO()
+        message.write(
+            (
+                f"Subject: Work items\n"
+                f"From: {self.email_sender}\n"
+                f"To: {recipient}\n"
+                "MIME-Version: 1.0\n"
+                f'Content-Type: multipart/mixed; boundary="{boundary}"\n'
+                f"\n--{boundary}\n"
+            ).encode()
+        )
+        message.write(msg_body.as_bytes())
+        message.write(
+            (
+                f"\n--{boundary}\n"
+                f"Content-Type: {content_type}\n"
+                "Content-Transfer-Encoding: base64\n"
+                f'Content-Disposition: attachment; filename="{file_name}"\n\n'
+            ).encode()
+        )
+        attachment.seek(0)
+        while True:
+            chunk = attachment.read(BASE64_CHUNK_SIZE)
+            if not chunk:
+                break
+            message.write(base64.encodebytes(chunk))
+        message.write(f"\n--{boundary}--\n".encode())
+        return message.getvalue()
 
-        att = MIMEApplication(attachment.encode(charset))
-        att.add_header("Content-Disposition", "attachment", filename="work_items.csv")
-        msg.attach(msg_body)
-        msg.attach(att)
-        return msg
+    @staticmethod
+    def _spool_csv(work_items, csv_file):
+        """
+        Writes work items to a binary file in CSV format, with the column names as a
+        header row.
+
+        :param work_items: An iterable of the work items to write.
+        :param csv_file: The binary file to write to.
+        :return: The number of work items written, and the first work items, up to
+                 the number that can be included in the body of an email.
+        """
+        writer = csv.writer(_Utf8Writer(csv_file))
+        writer.writerow(CSV_HEADER)
+        item_count = 0
+        first_items = []
+        for work_item in work_items:
+            writer.writerow(
+                [
+                    work_item["description"],
+                    work_item["guide"],
+                    work_item["status"],
+                    work_item["username"],
+                    "Yes" if work_item["archived"] else "No",
+                ]
+            )
+            if item_count < MAX_INLINE_ITEMS:
+                first_items.append(work_item)
+            item_count += 1
+        return item_count, first_items
+
+    @staticmethod
+    def _compress(csv_file):
+        """
+        Compresses a file with gzip into a new temporary file.
+
+        :param csv_file: The binary file to compress.
+        :return: The compressed file.
+        """
+        gz_file = tempfile.SpooledTemporaryFile(max_size=SPOOL_MAX_SIZE)
+        csv_file.seek(0)
+        with gzip.GzipFile(fileobj=gz_file, mode="wb") as gz:
+            shutil.copyfileobj(csv_file, gz)
+        return gz_file
 
     @use_kwargs({"email": fields.Str(required=True)})
     def post(self, email):
@@ -73,6 +176,7 @@ class Report(MethodView):
 
         When 10 or fewer items are in the report, the items are included in the body
         of the email. Otherwise, the items are included as an attachment in CSV format.
+        Large attachments are compressed with gzip.
 
         When your Amazon SES account is in the sandbox, both the sender and recipient
         email addresses must be registered with Amazon SES.
@@ -83,43 +187,61 @@ class Report(MethodView):
         response = None
         result = 200
         try:
-            work_items = self.storage.get_work_items(archived=False)
-            snap_time = datetime.now()
-            print(f"Sending report of {len(work_items)} items to {email}.")
-            html_report = render_template(
-                "report.html",
-                work_items=work_items,
-                item_count=len(work_items),
-                snap_time=snap_time,
-            )
-            text_report = render_template(
-                "report.txt",
-                work_items=work_items,
-                item_count=len(work_items),
-                snap_time=snap_time,
-            )
-            if len(work_items) > 10:
-                item_csv = render_template("work_items.csv", work_items=work_items)
-                mime_msg = self._format_mime_message(
-                    email, text_report, html_report, item_csv
+            with tempfile.SpooledTemporaryFile(max_size=SPOOL_MAX_SIZE) as csv_file:
+                item_count, work_items = self._spool_csv(
+                    self.storage.iter_work_items(archived=False), csv_file
                 )
-                response = self.ses_client.send_raw_email(
-                    Source=self.email_sender,
-                    Destinations=[email],
-                    RawMessage={"Data": mime_msg.as_string()},
+                snap_time = datetime.now()
+                print(f"Sending report of {item_count} items to {email}.")
+                html_report = render_template(
+                    "report.html",
+                    work_items=work_items,
+                    item_count=item_count,
+                    snap_time=snap_time,
                 )
-            else:
-                self.ses_client.send_email(
-                    Source=self.email_sender,
-                    Destination={"ToAddresses": [email]},
-                    Message={
-                        "Subject": {"Data": "Work items"},
-                        "Body": {
-                            "Html": {"Data": html_report},
-                            "Text": {"Data": text_report},
-                        },
-                    },
+                text_report = render_template(
+                    "report.txt",
+                    work_items=work_items,
+                    item_count=item_count,
+                    snap_time=snap_time,
                 )
+                if item_count > MAX_INLINE_ITEMS:
+                    if csv_file.tell() > COMPRESS_MIN_SIZE:
+                        with self._compress(csv_file) as gz_file:
+                            raw_message = self._make_raw_message(
+                                email,
+                                text_report,
+                                html_report,
+                                gz_file,
+                                "work_items.csv.gz",
+                                "application/gzip",
+                            )
+                    else:
+                        raw_message = self._make_raw_message(
+                            email,
+                            text_report,
+                            html_report,
+                            csv_file,
+                            "work_items.csv",
+                            "text/csv",
+                        )
+                    response = self.ses_client.send_raw_email(
+                        Source=self.email_sender,
+                        Destinations=[email],
+                        RawMessage={"Data": raw_message},
+                    )
+                else:
+                    self.ses_client.send_email(
+                        Source=self.email_sender,
+                        Destination={"ToAddresses": [email]},
+                        Message={
+                            "Subject": {"Data": "Work items"},
+                            "Body": {
+                                "Html": {"Data": html_report},
+                                "Text": {"Data": text_report},
+                            },
+                        },
+                    )
         except StorageError as err:
             logger.exception(
                 "Couldn't get work items from storage. Here's why: %s", err
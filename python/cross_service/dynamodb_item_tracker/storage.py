@@ -9,46 +9,154 @@ in a table.
 """
 
 import logging
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
 from uuid import uuid4
 
-from boto3.dynamodb.conditions import Attr
+from boto3.dynamodb.conditions import Attr, Key
+from boto3.dynamodb.types import TypeDeserializer
 from botocore.exceptions import ClientError
 
 logger = logging.getLogger(__name__)
 
+# The attribute that keys the archived index. DynamoDB can't use a Boolean
+# attribute as an index key, so the archived status is also stored as a string.
+ARCHIVED_KEY = "archived_key"
+# The number of seconds that a list of work items is served from the cache.
+DEFAULT_CACHE_TTL = 5
+
 
 class StorageError(Exception):
     pass
 
 
+class TtlCache:
+    """
+    A small read-through cache whose entries expire after a fixed number of seconds.
+    """
+
+    def __init__(self, ttl, clock=time.monotonic):
+        """
+        :param ttl: The number of seconds that an entry is kept. When this is 0,
+                    nothing is cached.
+        :param clock: A function that returns the current time in seconds.
+        """
+        self.ttl = ttl
+        self.clock = clock
+        self._entries = {}
+        self._lock = threading.Lock()
+        # Counts the calls to clear, so that a value that was loaded before a clear
+        # is not stored after it.
+        self._generation = 0
+
+    def get_or_load(self, key, load):
+        """
+        Gets a value from the cache, or loads and caches it when it is missing or
+        has expired.
+
+        :param key: The key of the value.
+        :param load: A function that loads the value.
+        :return: The value.
+        """
+        now = self.clock()
+        with self._lock:
+            entry = self._entries.get(key)
+            generation = self._generation
+        if entry is not None and entry[0] > now:
+            return entry[1]
+        value = load()
+        if self.ttl > 0:
+            with self._lock:
+                if self._generation == generation:
+                    self._entries[key] = (now + self.ttl, value)
+        return value
+
+    def clear(self):
+        """Removes all entries from the cache."""
+        with self._lock:
+            self._generation += 1
+            self._entries.clear()
+
+
 class Storage:
     """
     Encapsulates work item data in a DynamoDB table.
     """
 
-    def __init__(self, table):
+    def __init__(
+        self, table, archived_index=None, scan_segments=1, cache_ttl=DEFAULT_CACHE_TTL
+    ):
         """
         :param table: A Boto3 DynamoDB Table object that represents an existing DynamoDB
                       table. This object is a high-level object that wraps low-level
                       DynamoDB service actions.
+        :param archived_index: The name of a global secondary index that is keyed by
+                               the archived_key attribute. When specified, work items
+                               are listed by archived status with a query of this
+                               index instead of a scan of the whole table.
+        :param scan_segments: The number of segments that are scanned in parallel
+                              when all work items are listed.
+        :param cache_ttl: The number of seconds that a list of work items is kept
+                          in the cache. Use 0 to turn off the cache.
         """
         self.table = table
+        self.archived_index = archived_index
+        self.scan_segments = scan_segments
+        self.cache = TtlCache(cache_ttl)
 
     def get_work_items(self, archived=None):
         """
-        Gets work items currently stored in the table.
+        Gets work items currently stored in the table. Lists are cached for a few
+        seconds, so a list view that is loaded again and again doesn't read the
+        table every time.
 
         :param archived: When specified, only archived or non-archived work items are
                          returned. Otherwise, all work items are returned.
         :return: A list of work items currently stored in the table.
         """
+
+        def load():
+            if archived is None and self.scan_segments > 1:
+                return self._scan_segments()
+            return list(self.iter_work_items(archived))
+
+        return list(self.cache.get_or_load(archived, load))
+
+    def iter_work_items(self, archived=None):
+        """
+        Yields work items from the table one at a time, reading them one page at a
+        time. Only a single page is held in memory, so this can be used to go
+        through more work items than fit in memory.
+
+        When an archived index is configured and archived is specified, the index
+        is queried, so only the matching work items are read. Otherwise, the table
+        is scanned and the work items are filtered by DynamoDB.
+
+        :param archived: When specified, only archived or non-archived work items are
+                         returned. Otherwise, all work items are returned.
+        :return: A generator of work items.
+        """
+        if archived is not None and self.archived_index is not None:
+            read = self.table.query
+            read_kwargs = {
+                "IndexName": self.archived_index,
+                "KeyConditionExpression": Key(ARCHIVED_KEY).eq(
+                    self._archived_key(archived)
+                ),
+            }
+        else:
+            read = self.table.scan
+            read_kwargs = {}
+            if archived is not None:
+                read_kwargs["FilterExpression"] = Attr("archived").eq(archived)
         try:
-            if archived is None:
-                work_items = self.table.scan().get("Items", [])
-            else:
-                work_items = self.table.scan(
-                    FilterExpression=Attr("archived").eq(archived)
-                ).get("Items", [])
+            while True:
+                response = read(**read_kwargs)
+                yield from response.get("Items", [])
+                if "LastEvaluatedKey" not in response:
+                    break
+                read_kwargs["ExclusiveStartKey"] = response["LastEvaluatedKey"]
         except ClientError as err:
             logger.exception(
                 "Couldn't get items from table %s with archived %s.",
@@ -56,8 +164,45 @@ class Storage:
                 archived,
             )
             raise StorageError(err)
-        else:
-            return work_items
+
+    def _scan_segments(self):
+        """
+        Scans all segments of the table in parallel. Each segment is scanned by its
+        own worker with the low-level client, which is safe to share between
+        threads.
+
+        :return: The list of all work items in the table.
+        """
+        client = self.table.meta.client
+        deserializer = TypeDeserializer()
+
+        def scan_segment(segment):
+            paginator = client.get_paginator("scan")
+            return [
+                {key: deserializer.deserialize(val) for key, val in item.items()}
+                for page in paginator.paginate(
+                    TableName=self.table.name,
+                    Segment=segment,
+                    TotalSegments=self.scan_segments,
+                )
+                for item in page.get("Items", [])
+            ]
+
+        try:
+            with ThreadPoolExecutor(max_workers=self.scan_segments) as executor:
+                segments = list(executor.map(scan_segment, range(self.scan_segments)))
+        except ClientError as err:
+            logger.exception(
+                "Couldn't scan table %s in %s segments.",
+                self.table.name,
+                self.scan_segments,
+            )
+            raise StorageError(err)
+        return [item for items in segments for item in items]
+
+    @staticmethod
+    def _archived_key(archived):
+        return "true" if archived else "false"
 
     def get_work_item(self, iditem):
         """
@@ -85,6 +230,10 @@ class Storage:
         :param item: The item to add or update.
         :return: The ID of the item.
         """
+        if self.archived_index is not None and (
+            "archived" in item or item.get("iditem") is None
+        ):
+            item[ARCHIVED_KEY] = self._archived_key(item.get("archived", False))
         try:
             if item.get("iditem") is None:
                 item["iditem"] = str(uuid4())
@@ -101,4 +250,5 @@ class Storage:
         except ClientError as err:
             logger.exception("Couldn't add or update item %s in table %s.")
             raise StorageError(err)
+        self.cache.clear()
         return item["iditem"]
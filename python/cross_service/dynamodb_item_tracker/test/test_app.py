@@ -4,10 +4,18 @@
 """
 Unit tests for the dynamodb_item_tracker example.
 """
+import csv
+import email
+import gzip
+import io
+from unittest.mock import MagicMock
+
 import boto3
 import pytest
+import report
 import storage
 from app import create_app  # pylint: disable=E0611
+from boto3.dynamodb.conditions import Key
 from botocore.stub import ANY
 from storage import Storage
 
@@ -313,3 +321,156 @@ def test_report_error(mock_mgr, monkeypatch, err, stop_on):
         rte = "/api/items:report"
         rv = client.post(rte, json={"email": mock_mgr.recipient})
         assert rv.status_code == 500
+
+
+class CaptureArg:
+    """Matches any argument and keeps it, so a test can look at it later."""
+
+    def __eq__(self, other):
+        self.value = other
+        return True
+
+
+@pytest.mark.parametrize("compress_min_size", [1024 * 1024, 0])
+def test_report_large_paged(mock_mgr, monkeypatch, compress_min_size):
+    monkeypatch.setattr(report, "COMPRESS_MIN_SIZE", compress_min_size)
+    work_items = mock_mgr.data_items * 3
+    last_key = {"iditem": {"S": work_items[5]["iditem"]}}
+    mock_mgr.stubber.stub_scan(
+        mock_mgr.table.name,
+        work_items[:6],
+        filter_expression=ANY,
+        last_key=last_key,
+    )
+    mock_mgr.stubber.stub_scan(
+        mock_mgr.table.name,
+        work_items[6:],
+        filter_expression=ANY,
+        start_key=last_key,
+    )
+    raw_msg = CaptureArg()
+    mock_mgr.ses_stubber.stub_send_raw_email(
+        mock_mgr.sender, [mock_mgr.recipient], "test-msg-id", msg=raw_msg
+    )
+
+    with mock_mgr.app.test_client() as client:
+        rv = client.post("/api/items:report", json={"email": mock_mgr.recipient})
+        assert rv.status_code == 200
+
+    msg = email.message_from_bytes(raw_msg.value)
+    _, attachment = msg.get_payload()
+    data = attachment.get_payload(decode=True)
+    if compress_min_size == 0:
+        assert attachment.get_filename() == "work_items.csv.gz"
+        data = gzip.decompress(data)
+    else:
+        assert attachment.get_filename() == "work_items.csv"
+    rows = list(csv.reader(io.StringIO(data.decode())))
+    assert rows[0] == report.CSV_HEADER
+    assert [row[0] for row in rows[1:]] == [item["description"] for item in work_items]
+
+
+def test_get_items_archived_index(mock_mgr):
+    store = Storage(mock_mgr.table, archived_index="archived-index")
+    last_key = {"iditem": {"S": mock_mgr.data_items[1]["iditem"]}}
+    key_condition = Key(storage.ARCHIVED_KEY).eq("false")
+    mock_mgr.stubber.stub_query(
+        mock_mgr.table.name,
+        mock_mgr.data_items[:2],
+        key_condition=key_condition,
+        index_name="archived-index",
+        last_key=last_key,
+    )
+    mock_mgr.stubber.stub_query(
+        mock_mgr.table.name,
+        mock_mgr.data_items[2:],
+        key_condition=key_condition,
+        index_name="archived-index",
+        start_key=last_key,
+    )
+
+    assert store.get_work_items(archived=False) == mock_mgr.data_items
+    # The second call is served from the cache.
+    assert store.get_work_items(archived=False) == mock_mgr.data_items
+
+
+def test_get_items_cache_cleared_on_write(mock_mgr, monkeypatch):
+    store = Storage(mock_mgr.table)
+    monkeypatch.setattr(storage, "uuid4", lambda: "new-id")
+    new_item = dict(mock_mgr.data_items[0], iditem="new-id")
+    mock_mgr.stubber.stub_scan(mock_mgr.table.name, mock_mgr.data_items)
+    mock_mgr.stubber.stub_put_item(mock_mgr.table.name, new_item)
+    mock_mgr.stubber.stub_scan(mock_mgr.table.name, mock_mgr.data_items + [new_item])
+
+    assert store.get_work_items() == mock_mgr.data_items
+    assert store.get_work_items() == mock_mgr.data_items
+    item = {key: val for key, val in new_item.items() if key != "iditem"}
+    assert store.add_or_update_work_item(item) == "new-id"
+    assert store.get_work_items() == mock_mgr.data_items + [new_item]
+
+
+def test_ttl_cache_expires():
+    now = [100]
+    cache = storage.TtlCache(5, clock=lambda: now[0])
+    loads = []
+
+    def load():
+        loads.append(now[0])
+        return len(loads)
+
+    assert cache.get_or_load("key", load) == 1
+    now[0] += 4
+    assert cache.get_or_load("key", load) == 1
+    now[0] += 2
+    assert cache.get_or_load("key", load) == 2
+
+
+def test_ttl_cache_clear_during_load():
+    cache = storage.TtlCache(5)
+    loads = []
+
+    def stale_load():
+        # A write clears the cache while this read is still running.
+        loads.append("stale")
+        cache.clear()
+        return "stale"
+
+    assert cache.get_or_load("key", stale_load) == "stale"
+    assert cache.get_or_load("key", lambda: loads.append("fresh") or "fresh") == (
+        "fresh"
+    )
+    assert loads == ["stale", "fresh"]
+
+
+def test_get_items_segmented_scan():
+    items = [{"iditem": f"id-{index}", "archived": False} for index in range(9)]
+    table = MagicMock()
+    table.name = "test-table"
+    paginator = table.meta.client.get_paginator.return_value
+
+    def paginate(TableName, Segment, TotalSegments):
+        assert TotalSegments == 3
+        segment_items = items[Segment::TotalSegments]
+        return [
+            {
+                "Items": [
+                    {"iditem": {"S": item["iditem"]}, "archived": {"BOOL": False}}
+                    for item in segment_items[:2]
+                ]
+            },
+            {
+                "Items": [
+                    {"iditem": {"S": item["iditem"]}, "archived": {"BOOL": False}}
+                    for item in segment_items[2:]
+                ]
+            },
+        ]
+
+    paginator.paginate.side_effect = paginate
+    store = Storage(table, scan_segments=3)
+
+    got_items = store.get_work_items()
+
+    assert sorted(got_items, key=lambda item: item["iditem"]) == items
+    assert paginator.paginate.call_count == 3
+    table.scan.assert_not_called()
@@ -21,6 +21,7 @@ from analysis import Analysis
 from flask import Flask
 from flask_cors import CORS
 from flask_restful import Api
+from label_cache import LabelCache
 from photo import Photo
 from photo_list import PhotoList
 from report import Report
@@ -66,10 +67,12 @@ def create_app(test_config=None):
         "/photos/<string:photo_key>/labels",
         resource_class_args=(bucket.name, rekognition_client),
     )
+    label_cache = LabelCache(app.config.get("LABEL_CACHE_FILE", ":memory:"))
     api.add_resource(
         Report,
         "/photos/report",
-        resource_class_args=(bucket, rekognition_client, ses_client),
+        "/photos/report/<string:report_format>",
+        resource_class_args=(bucket, rekognition_client, ses_client, label_cache),
     )
 
     return app
@@ -2,3 +2,6 @@
 # SPDX-License-Identifier: Apache-2.0
 BUCKET_NAME = "NEED-BUCKET-NAME"
 SECRET_KEY = "change-for-production!"
+# The SQLite file that caches labels detected in each photo. Use ":memory:" to
+# keep the cache only while the app runs.
+LABEL_CACHE_FILE = "label_cache.db"
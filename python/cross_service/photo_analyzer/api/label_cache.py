@@ -0,0 +1,66 @@
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: Apache-2.0
+
+import json
+import logging
+import sqlite3
+import threading
+
+logger = logging.getLogger(__name__)
+
+
+class LabelCache:
+    """
+    Caches the labels that Amazon Rekognition detects in each photo in a local SQLite
+    database. Labels are keyed by the object key and ETag of the photo, so a photo
+    that is replaced in the bucket is analyzed again.
+    """
+
+    def __init__(self, file_name=":memory:"):
+        """
+        :param file_name: The SQLite database file. By default, the cache is kept in
+                          memory and lasts as long as the app runs.
+        """
+        self.lock = threading.Lock()
+        self.connection = sqlite3.connect(file_name, check_same_thread=False)
+        with self.lock, self.connection:
+            self.connection.execute(
+                "CREATE TABLE IF NOT EXISTS labels ("
+                "photo_key TEXT PRIMARY KEY, etag TEXT NOT NULL, labels TEXT NOT NULL)"
+            )
+
+    def get(self, photo_key, etag):
+        """
+        Gets the cached labels for a photo.
+
+        :param photo_key: The key of the photo object in S3.
+        :param etag: The current ETag of the photo object.
+        :return: The list of labels, or None when the photo is not cached or has
+                 changed since it was cached.
+        """
+        if etag is None:
+            return None
+        with self.lock:
+            row = self.connection.execute(
+                "SELECT labels FROM labels WHERE photo_key = ? AND etag = ?",
+                (photo_key, etag),
+            ).fetchone()
+        return json.loads(row[0]) if row is not None else None
+
+    def put(self, photo_key, etag, labels):
+        """
+        Caches the labels for a photo, replacing any labels cached for an earlier
+        version of it.
+
+        :param photo_key: The key of the photo object in S3.
+        :param etag: The ETag of the photo object that was analyzed.
+        :param labels: The list of labels detected in the photo.
+        """
+        if etag is None:
+            return
+        with self.lock, self.connection:
+            self.connection.execute(
+                "INSERT OR REPLACE INTO labels (photo_key, etag, labels) "
+                "VALUES (?, ?, ?)",
+                (photo_key, etag, json.dumps(labels)),
+            )
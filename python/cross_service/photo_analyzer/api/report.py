@@ -2,13 +2,19 @@
 # SPDX-License-Identifier: Apache-2.0
 
 import logging
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from itertools import chain, islice
 
 from botocore.exceptions import ClientError
-from flask import render_template
+from flask import Response, render_template
 from flask_restful import Resource, reqparse
 
 logger = logging.getLogger(__name__)
 
+# Label detection is network bound, so many photos can be analyzed at once.
+MAX_WORKERS = 10
+
 
 class Report(Resource):
     """
@@ -16,52 +22,120 @@ class Report(Resource):
     Amazon Simple Storage Service (Amazon S3) bucket and send emails about them.
     """
 
-    def __init__(self, photo_bucket, rekognition_client, ses_client):
+    def __init__(
+        self,
+        photo_bucket,
+        rekognition_client,
+        ses_client,
+        label_cache=None,
+        max_workers=MAX_WORKERS,
+    ):
         """
         :param photo_bucket: The S3 bucket where your photos are stored.
         :param rekognition_client: A Boto3 Amazon Rekognition client.
         :param ses_client: A Boto3 Amazon Simple Email Service (Amazon SES) client.
+        :param label_cache: A LabelCache that holds the labels of photos that were
+                            already analyzed. When this is None, every photo is
+                            analyzed on every request.
+        :param max_workers: The maximum number of photos that are analyzed at the
+                            same time.
         """
         self.photo_bucket = photo_bucket
         self.rekognition_client = rekognition_client
         self.ses_client = ses_client
+        self.label_cache = label_cache
+        self.max_workers = max_workers
 
-    def get(self):
+    def _detect_labels(self, photo_key, etag):
         """
-        Uses Amazon Rekognition to analyze all images in your S3 bucket and returns a
-        report as a list of comma-separated value (CSV) records.
+        Gets the labels of a photo, from the cache when the photo hasn't changed
+        since it was last analyzed, or from Amazon Rekognition otherwise.
 
-        :return: The CSV report and an HTTP code.
+        :param photo_key: The key of the photo object in S3.
+        :param etag: The ETag of the photo object.
+        :return: The labels as a list of (name, confidence) pairs.
         """
-        result = 200
-        report_csv = ["Photo,Label,Confidence"]
+        if self.label_cache is not None:
+            labels = self.label_cache.get(photo_key, etag)
+            if labels is not None:
+                return labels
         try:
+            response = self.rekognition_client.detect_labels(
+                Image={
+                    "S3Object": {
+                        "Bucket": self.photo_bucket.name,
+                        "Name": photo_key,
+                    }
+                }
+            )
+            logger.info("Found %s labels in %s.", len(response["Labels"]), photo_key)
+        except ClientError as err:
+            logger.warning(
+                "Couldn't detect labels in %s. Here's why: %s: %s",
+                photo_key,
+                err.response["Error"]["Code"],
+                err.response["Error"]["Message"],
+            )
+            return []
+        labels = [
+            (label["Name"], label["Confidence"]) for label in response.get("Labels", [])
+        ]
+        if self.label_cache is not None:
+            self.label_cache.put(photo_key, etag, labels)
+        return labels
+
+    def report_rows(self):
+        """
+        Analyzes all images in your S3 bucket on a bounded pool of threads and yields
+        the report one CSV record at a time, in the order the photos are listed.
+        Only a window of photos ahead of the one being yielded is held in memory.
+
+        :return: A generator of CSV records, starting with the header record.
+        """
+        yield "Photo,Label,Confidence"
+        with ThreadPoolExecutor(max_workers=self.max_workers) as executor:
+            pending = deque()
             for photo in self.photo_bucket.objects.all():
-                try:
-                    response = self.rekognition_client.detect_labels(
-                        Image={
-                            "S3Object": {
-                                "Bucket": self.photo_bucket.name,
-                                "Name": photo.key,
-                            }
-                        }
-                    )
-                    logger.info(
-                        "Found %s labels in %s.", len(response["Labels"]), photo.key
-                    )
-                    for label in response.get("Labels", []):
-                        report_csv.append(
-                            ",".join(
-                                (photo.key, label["Name"], str(label["Confidence"]))
-                            )
-                        )
-                except ClientError as err:
-                    logger.warning(
-                        "Couldn't detect labels in %s. Here's why: %s: %s",
+                pending.append(
+                    (
                         photo.key,
-                        err.response["Error"]["Code"],
-                        err.response["Error"]["Message"],
+                        executor.submit(self._detect_labels, photo.key, photo.e_tag),
                     )
+                )
+                if len(pending) >= self.max_workers * 2:
+                    yield from self._labels_to_csv(*pending.popleft())
+            while pending:
+                yield from self._labels_to_csv(*pending.popleft())
+
+    @staticmethod
+    def _labels_to_csv(photo_key, future):
+        for name, confidence in future.result():
+            yield ",".join((photo_key, name, str(confidence)))
+
+    def get(self, report_format=None):
+        """
+        Uses Amazon Rekognition to analyze all images in your S3 bucket and returns a
+        report as a list of comma-separated value (CSV) records.
+
+        When the report format is 'csv', the report is streamed back as a CSV file
+        while the photos are analyzed, instead of being built in memory first.
+
+        :param report_format: The format of the report. When this is 'csv', a CSV
+                              file is streamed. Otherwise, a list of CSV records is
+                              returned.
+        :return: The CSV report and an HTTP code.
+        """
+        rows = self.report_rows()
+        try:
+            if report_format == "csv":
+                # Get the first record now, so an error listing the photos is
+                # reported in the status code.
+                first_rows = list(islice(rows, 2))
+                return Response(
+                    (row + "\n" for row in chain(first_rows, rows)),
+                    mimetype="text/csv",
+                )
+            return list(rows), 200
         except ClientError as err:
             logger.error(
                 "Couldn't list photos in bucket '%s'. Here's why: %s: %s",
@@ -69,10 +143,9 @@ class Report(Resource):
                 err.response["Error"]["Code"],
                 err.response["Error"]["Message"],
             )
-            result = 400
-        return report_csv, result
+            return ["Photo,Label,Confidence"], 400
 
-    def post(self):
+    def post(self, report_format=None):
         """
         Sends an email of a previously created report. Two versions of the email are
         included:
@@ -93,7 +166,12 @@ class Report(Resource):
             message: The body of the email message.
             analysis_labels: A previously generated report of image labels formatted
                              as CSV records.
+
+        :param report_format: Set by the route of a CSV download. Reports can only be
+                              downloaded, so a POST to that route is rejected.
         """
+        if report_format is not None:
+            return "Reports can only be sent from /photos/report.", 400
         result = 200
         parser = reqparse.RequestParser()
         parser.add_argument("sender", location="json")
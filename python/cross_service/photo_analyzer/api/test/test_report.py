@@ -9,6 +9,8 @@ from unittest.mock import MagicMock
 
 import boto3
 import pytest
+from app import create_app
+from label_cache import LabelCache
 from report import Report
 from flask_restful import reqparse
 
@@ -27,7 +29,7 @@ def test_get_report(make_stubber, stub_runner, error_code, stop_on_method):
     rekognition_client = boto3.client("rekognition")
     rekognition_stubber = make_stubber(rekognition_client)
     bucket = s3_resource.Bucket("test-bucket")
-    report = Report(bucket, rekognition_client, None)
+    report = Report(bucket, rekognition_client, None, max_workers=1)
     photos = [f"photo-{index}" for index in range(3)]
     labels = {}
     for index, photo in enumerate(photos):
@@ -57,6 +59,66 @@ def test_get_report(make_stubber, stub_runner, error_code, stop_on_method):
         assert result == 400
 
 
+def make_photo_bucket(photos):
+    bucket = MagicMock()
+    bucket.name = "test-bucket"
+    bucket.objects.all.return_value = [
+        MagicMock(key=key, e_tag=etag) for key, etag in photos
+    ]
+    return bucket
+
+
+def test_get_report_concurrent_and_cached():
+    photos = [(f"photo-{index}", f'"etag-{index}"') for index in range(25)]
+    rekognition_client = MagicMock()
+    rekognition_client.detect_labels.side_effect = lambda Image: {
+        "Labels": [{"Name": f"label-{Image['S3Object']['Name']}", "Confidence": 90.5}]
+    }
+    report = Report(
+        make_photo_bucket(photos), rekognition_client, None, LabelCache(), max_workers=4
+    )
+    expected = ["Photo,Label,Confidence"] + [
+        f"{key},label-{key},90.5" for key, _ in photos
+    ]
+
+    got_report, result = report.get()
+    assert result == 200
+    assert got_report == expected
+    assert rekognition_client.detect_labels.call_count == len(photos)
+
+    # Unchanged photos come from the cache; a replaced photo is analyzed again.
+    photos[3] = ("photo-3", '"etag-new"')
+    report.photo_bucket = make_photo_bucket(photos)
+    got_report, result = report.get()
+    assert got_report == expected
+    assert rekognition_client.detect_labels.call_count == len(photos) + 1
+
+
+def test_get_report_csv():
+    photos = [(f"photo-{index}", f'"etag-{index}"') for index in range(3)]
+    rekognition_client = MagicMock()
+    rekognition_client.detect_labels.return_value = {
+        "Labels": [{"Name": "label", "Confidence": 50.0}]
+    }
+    report = Report(make_photo_bucket(photos), rekognition_client, None)
+
+    response = report.get("csv")
+
+    assert response.mimetype == "text/csv"
+    assert response.get_data(as_text=True) == (
+        "Photo,Label,Confidence\n" + "".join(f"{key},label,50.0\n" for key, _ in photos)
+    )
+
+
+def test_post_report_format():
+    app = create_app({"BUCKET_NAME": "test-bucket", "TESTING": True})
+
+    with app.test_client() as client:
+        response = client.post("/photos/report/csv", json={})
+
+    assert response.status_code == 400
+
+
 @pytest.mark.parametrize("error_code", [None, "TestException"])
 def test_post_report(make_stubber, monkeypatch, error_code):
     ses_client = boto3.client("ses")
@@ -92,7 +154,7 @@ def test_post_report(make_stubber, monkeypatch, error_code):
         error_code=error_code,
     )
 
-    _, result = report.post() # pylint: disable=E1120
+    _, result = report.post()  # pylint: disable=E1120
     if error_code is None:
         assert result == 200
     else:
@@ -0,0 +1,414 @@
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: Apache-2.0
+
+"""
+Waits for many long-running AWS jobs at the same time on a single scheduler
+thread, in place of a polling loop on its own thread for each job.
+
+Each job is polled with an adaptive delay. The delay starts short, grows while the
+status of the job stays the same, shrinks again when the status changes, and grows
+faster when the service throttles the requests. A random jitter is added so that
+jobs that start together don't poll together.
+
+When jobs report their progress as Amazon EventBridge events, the events can be
+sent to an Amazon SQS queue and read by an SqsEventListener. An event that names a
+job makes the waiter poll that job right away, so the job is finished as soon as
+the event arrives and polling is only a fallback for events that are missed.
+"""
+
+import heapq
+import itertools
+import json
+import logging
+import random
+import threading
+import time
+from concurrent.futures import Future, InvalidStateError
+
+from botocore.exceptions import BotoCoreError, ClientError
+
+logger = logging.getLogger(__name__)
+
+# Error codes that services return when requests are throttled.
+THROTTLING_ERROR_CODES = {
+    "Throttling",
+    "ThrottlingException",
+    "TooManyRequestsException",
+    "RequestLimitExceeded",
+}
+
+
+class JobFailedError(Exception):
+    def __init__(self, key, status):
+        super().__init__(f"Job {key} ended with status {status}.")
+        self.key = key
+        self.status = status
+
+
+class JobTimeoutError(Exception):
+    def __init__(self, key, status, timeout):
+        super().__init__(
+            f"Job {key} is still {status} after {timeout:.0f} seconds of waiting."
+        )
+        self.key = key
+        self.status = status
+
+
+class _Job:
+    def __init__(self, key, poll, done_states, failed_states, deadline, delay):
+        self.key = key
+        self.poll = poll
+        self.done_states = done_states
+        self.failed_states = failed_states
+        self.deadline = deadline
+        self.delay = delay
+        self.status = None
+        self.started = time.monotonic()
+        self.entry = None
+        self.future = Future()
+
+
+class JobWaiter:
+    """
+    Polls any number of jobs on one thread, and resolves a future for each job when
+    the job reaches a final status.
+    """
+
+    def __init__(self, min_delay=1, max_delay=60, backoff=1.5):
+        """
+        :param min_delay: The delay, in seconds, before the first poll of a job and
+                          after each change in its status.
+        :param max_delay: The longest delay, in seconds, between two polls of a job.
+        :param backoff: The factor that the delay grows by each time a job is
+                        polled and its status hasn't changed. The delay grows by the
+                        square of this factor when the request is throttled.
+        """
+        self.min_delay = min_delay
+        self.max_delay = max_delay
+        self.backoff = backoff
+        self._schedule = []
+        self._jobs = {}
+        self._counter = itertools.count()
+        self._condition = threading.Condition()
+        self._thread = None
+        self._stopped = False
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *args):
+        self.stop()
+
+    def submit(self, key, poll, done_states, failed_states=(), timeout=None):
+        """
+        Starts waiting for a job.
+
+        :param key: The ID that names the job, such as a job ID or a data store ID.
+                    Events that contain this ID make the job be polled right away.
+        :param poll: A function that gets the current status of the job.
+        :param done_states: The statuses that mean the job succeeded.
+        :param failed_states: The statuses that mean the job failed.
+        :param timeout: The number of seconds to wait before giving up. When not
+                        specified, the waiter waits until the job finishes.
+        :return: A future that resolves to the final status of the job. The future
+                 raises a JobFailedError when the job fails, a JobTimeoutError when
+                 the timeout passes, and the error raised by poll when the job
+                 can't be polled.
+        """
+        now = time.monotonic()
+        job = _Job(
+            key,
+            poll,
+            set(done_states),
+            set(failed_states),
+            None if timeout is None else now + timeout,
+            self.min_delay,
+        )
+        with self._condition:
+            if self._stopped:
+                raise RuntimeError("The job waiter is stopped.")
+            self._jobs.setdefault(key, []).append(job)
+            self._schedule_job(job, now)
+            if self._thread is None:
+                self._thread = threading.Thread(
+                    target=self._run, name="JobWaiter", daemon=True
+                )
+                self._thread.start()
+        return job.future
+
+    def wait(self, key, poll, done_states, failed_states=(), timeout=None):
+        """
+        Waits for a job and returns its final status. The arguments are the same
+        as those of submit.
+
+        :return: The final status of the job.
+        """
+        return self.submit(key, poll, done_states, failed_states, timeout).result()
+
+    def notify(self, *keys):
+        """
+        Polls the jobs with the specified keys right away, such as when an event
+        reports that their status changed. Keys that don't name a job are ignored.
+
+        :param keys: The keys of the jobs.
+        """
+        now = time.monotonic()
+        with self._condition:
+            for key in keys:
+                for job in self._jobs.get(key, []):
+                    self._schedule_job(job, now)
+
+    def notify_event(self, event):
+        """
+        Polls the jobs that are named anywhere in an Amazon EventBridge event. The
+        event only makes the waiter poll sooner, so events of any shape can be
+        passed safely.
+
+        :param event: The event, as a dict.
+        """
+        values = set()
+        pending = [event.get("detail", {})]
+        while pending:
+            value = pending.pop()
+            if isinstance(value, dict):
+                pending.extend(value.values())
+            elif isinstance(value, list):
+                pending.extend(value)
+            elif isinstance(value, str):
+                values.add(value)
+        for arn in event.get("resources", []):
+            values.add(arn)
+            values.add(arn.rsplit("/", 1)[-1])
+        self.notify(*values)
+
+    def stop(self):
+        """
+        Stops the scheduler thread. Jobs that are still waiting are cancelled.
+        """
+        with self._condition:
+            self._stopped = True
+            self._condition.notify()
+            thread = self._thread
+        if thread is not None and thread is not threading.current_thread():
+            thread.join()
+        with self._condition:
+            for jobs in self._jobs.values():
+                for job in jobs:
+                    job.future.cancel()
+            self._jobs.clear()
+
+    def _schedule_job(self, job, due):
+        if job.deadline is not None:
+            due = min(due, job.deadline)
+        job.entry = (due, next(self._counter), job)
+        heapq.heappush(self._schedule, job.entry)
+        self._condition.notify()
+
+    def _finish(self, job):
+        with self._condition:
+            jobs = self._jobs.get(job.key, [])
+            if job in jobs:
+                jobs.remove(job)
+            if not jobs:
+                self._jobs.pop(job.key, None)
+
+    def _run(self):
+        while True:
+            with self._condition:
+                while not self._stopped:
+                    if self._schedule:
+                        due, _, job = self._schedule[0]
+                        if job.entry is not self._schedule[0]:
+                            # The job was finished or scheduled again by notify.
+                            heapq.heappop(self._schedule)
+                            continue
+                        timeout = due - time.monotonic()
+                        if timeout <= 0:
+                            break
+                    else:
+                        timeout = None
+                    self._condition.wait(timeout)
+                if self._stopped:
+                    return
+                heapq.heappop(self._schedule)
+                job.entry = None
+            if job.future.done():
+                self._finish(job)
+                continue
+            try:
+                self._poll(job)
+            except Exception as err:
+                logger.exception("Couldn't poll job %s.", job.key)
+                self._finish(job)
+                self._resolve(job, exception=err)
+
+    @staticmethod
+    def _resolve(job, result=None, exception=None):
+        """
+        Sets the result or the exception of the future of a job. The caller can
+        cancel the future at any time, so a future that is already done is left
+        as it is.
+        """
+        if job.future.done():
+            return
+        try:
+            if exception is not None:
+                job.future.set_exception(exception)
+            else:
+                job.future.set_result(result)
+        except InvalidStateError:
+            # The future was cancelled after it was checked.
+            pass
+
+    def _poll(self, job):
+        now = time.monotonic()
+        try:
+            status = job.poll()
+        except ClientError as err:
+            if err.response["Error"]["Code"] not in THROTTLING_ERROR_CODES:
+                self._finish(job)
+                self._resolve(job, exception=err)
+                return
+            job.delay = min(job.delay * self.backoff**2, self.max_delay)
+            logger.info("Polling job %s was throttled.", job.key)
+            status = job.status
+        except Exception as err:
+            self._finish(job)
+            self._resolve(job, exception=err)
+            return
+        else:
+            if status != job.status:
+                job.delay = self.min_delay
+            else:
+                job.delay = min(job.delay * self.backoff, self.max_delay)
+
+        if status in job.done_states:
+            self._finish(job)
+            self._resolve(job, result=status)
+        elif status in job.failed_states:
+            self._finish(job)
+            self._resolve(job, exception=JobFailedError(job.key, status))
+        elif job.deadline is not None and now >= job.deadline:
+            self._finish(job)
+            self._resolve(
+                job,
+                exception=JobTimeoutError(job.key, status, job.deadline - job.started),
+            )
+        else:
+            if status != job.status:
+                logger.info(
+                    "Job %s is %s after %d seconds.",
+                    job.key,
+                    status,
+                    now - job.started,
+                )
+            job.status = status
+            with self._condition:
+                if job.entry is None and not self._stopped:
+                    self._schedule_job(
+                        job, now + random.uniform(job.delay / 2, job.delay)
+                    )
+
+
+class SqsEventListener:
+    """
+    Reads Amazon EventBridge events from an Amazon SQS queue on a background thread
+    and passes them to a JobWaiter. To use it, create an EventBridge rule that
+    matches the events of the service and sends them to the queue.
+    """
+
+    def __init__(self, sqs_client, queue_url, job_waiter, wait_time=20):
+        """
+        :param sqs_client: A Boto3 Amazon SQS client.
+        :param queue_url: The URL of the queue that receives the events.
+        :param job_waiter: The JobWaiter to pass the events to.
+        :param wait_time: The number of seconds that each receive request waits
+                          for messages to arrive.
+        """
+        self.sqs_client = sqs_client
+        self.queue_url = queue_url
+        self.job_waiter = job_waiter
+        self.wait_time = wait_time
+        self._stopped = threading.Event()
+        self._thread = None
+
+    def __enter__(self):
+        self.start()
+        return self
+
+    def __exit__(self, *args):
+        self.stop()
+
+    def start(self):
+        """
+        Starts reading events from the queue.
+        """
+        self._stopped.clear()
+        self._thread = threading.Thread(
+            target=self._run, name="SqsEventListener", daemon=True
+        )
+        self._thread.start()
+
+    def stop(self):
+        """
+        Stops reading events. This can take as long as one receive request.
+        """
+        self._stopped.set()
+        if self._thread is not None:
+            self._thread.join()
+            self._thread = None
+
+    def receive(self):
+        """
+        Receives one batch of events from the queue, passes them to the job waiter,
+        and deletes them from the queue.
+
+        :return: The number of messages received.
+        """
+        try:
+            response = self.sqs_client.receive_message(
+                QueueUrl=self.queue_url,
+                MaxNumberOfMessages=10,
+                WaitTimeSeconds=self.wait_time,
+            )
+        except ClientError as err:
+            logger.error(
+                "Couldn't receive messages from queue %s. Here's why: %s: %s",
+                self.queue_url,
+                err.response["Error"]["Code"],
+                err.response["Error"]["Message"],
+            )
+            raise
+        messages = response.get("Messages", [])
+        for message in messages:
+            try:
+                event = json.loads(message["Body"])
+            except json.JSONDecodeError:
+                logger.warning("Message %s is not an event.", message["MessageId"])
+            else:
+                if isinstance(event, dict):
+                    self.job_waiter.notify_event(event)
+        if messages:
+            self.sqs_client.delete_message_batch(
+                QueueUrl=self.queue_url,
+                Entries=[
+                    {"Id": str(index), "ReceiptHandle": message["ReceiptHandle"]}
+                    for index, message in enumerate(messages)
+                ],
+            )
+        return len(messages)
+
+    def _run(self):
+        while not self._stopped.is_set():
+            try:
+                self.receive()
+            except ClientError:
+                # The error is logged by receive.
+                self._stopped.wait(self.wait_time)
+            except BotoCoreError as err:
+                logger.error(
+                    "Couldn't receive messages from queue %s. Here's why: %s",
+                    self.queue_url,
+                    err,
+                )
+                self._stopped.wait(self.wait_time)
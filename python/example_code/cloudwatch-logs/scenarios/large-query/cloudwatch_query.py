@@ -3,10 +3,10 @@
 import logging
 import time
 from datetime import datetime
-import threading
 import boto3
 
 from date_utilities import DateUtilities
+from query_engine import DEFAULT_MAX_CONCURRENT_QUERIES, LargeQueryEngine
 
 DEFAULT_QUERY = "fields @timestamp, @message | sort @timestamp asc"
 DEFAULT_LOG_GROUP = "/workflows/cloudwatch-logs/large-query"
@@ -28,10 +28,17 @@ class CloudWatchQuery:
     :query_string str: query
     """
 
-    def __init__(self, log_group: str = DEFAULT_LOG_GROUP, query_string: str=DEFAULT_QUERY) -> None:
-        self.lock = threading.Lock()
+    def __init__(
+        self,
+        log_group: str = DEFAULT_LOG_GROUP,
+        query_string: str = DEFAULT_QUERY,
+        client=None,
+        max_concurrent_queries: int = DEFAULT_MAX_CONCURRENT_QUERIES,
+    ) -> None:
+        self.client = client if client is not None else boto3.client("logs")
         self.log_group = log_group
         self.query_string = query_string
+        self.max_concurrent_queries = max_concurrent_queries
         self.query_results = []
         self.query_duration = None
         self.datetime_format = "%Y-%m-%d %H:%M:%S.%f"
@@ -57,76 +64,40 @@ class CloudWatchQuery:
             f"\n       END:       {end_date}"
             f"\n       LOG GROUP: {self.log_group}"
         )
-        self.recursive_query((start_date, end_date))
+        self.query_results.extend(self.stream_logs((start_date, end_date)))
         end_time = datetime.now()
         self.query_duration = (end_time - start_time).total_seconds()
 
-    def recursive_query(self, date_range):
+    def stream_logs(self, date_range):
         """
-        Processes logs within a given date range, fetching batches of logs recursively if necessary.
+        Runs the query over a date range on a bounded pool of workers and yields the
+        logs in timestamp order, without holding all of them in memory.
 
-        :param date_range: The date range to fetch logs for, specified as a tuple (start_timestamp, end_timestamp).
+        :param date_range: The start and end of the range in ISO 8601 format.
         :type date_range: tuple
-        :return: None if the recursive fetching is continued or stops when the final batch of logs is processed.
-                 Although it doesn't explicitly return the query results, this method accumulates all fetched logs
-                 in the `self.query_results` attribute.
-        :rtype: None
+        :return: A generator of logs, as dicts of field names and values.
+        :rtype: generator
         """
-        batch_of_logs = self.perform_query(date_range)
-        # Add the batch to the accumulated logs
-        with self.lock:
-            self.query_results.extend(batch_of_logs)
-        if len(batch_of_logs) == self.limit:
-            logging.info(f"Fetched {self.limit}, checking for more...")
-            most_recent_log = self.find_most_recent_log(batch_of_logs)
-            most_recent_log_timestamp = next(
-                item["value"]
-                for item in most_recent_log
-                if item["field"] == "@timestamp"
-            )
-            new_range = (most_recent_log_timestamp, date_range[1])
-            midpoint = self.date_utilities.find_middle_time(new_range)
-
-            first_half_thread = threading.Thread(
-                target=self.recursive_query,
-                args=((most_recent_log_timestamp, midpoint),),
-            )
-            second_half_thread = threading.Thread(
-                target=self.recursive_query, args=((midpoint, date_range[1]),)
+        start_time, end_time = (
+            int(self.date_utilities.convert_iso8601_to_unix_timestamp(date) // 1000)
+            for date in date_range
+        )
+        engine = LargeQueryEngine(
+            self.client,
+            self.log_group,
+            query_string=self.query_string,
+            max_concurrent_queries=self.max_concurrent_queries,
+            limit=self.limit,
+        )
+        try:
+            yield from engine.stream(start_time, end_time)
+        except self.client.exceptions.ResourceNotFoundException as e:
+            raise DateOutOfBoundsError(f"Resource not found: {e}")
+        finally:
+            logging.info(
+                f"Ran {engine.queries_run} queries for {engine.records_streamed} logs."
             )
 
-            first_half_thread.start()
-            second_half_thread.start()
-
-            first_half_thread.join()
-            second_half_thread.join()
-
-    def find_most_recent_log(self, logs):
-        """
-        Search a list of log items and return most recent log entry.
-        :param logs: A list of logs to analyze.
-        :return: log
-        :type :return List containing log item details
-        """
-        most_recent_log = None
-        most_recent_date = "1970-01-01 00:00:00.000"
-
-        for log in logs:
-            for item in log:
-                if item["field"] == "@timestamp":
-                    logging.debug(f"Compared: {item['value']} to {most_recent_date}")
-                    if (
-                        self.date_utilities.compare_dates(
-                            item["value"], most_recent_date
-                        )
-                        == item["value"]
-                    ):
-                        logging.debug(f"New most recent: {item['value']}")
-                        most_recent_date = item["value"]
-                        most_recent_log = log
-        logging.info(f"Most recent log date of batch: {most_recent_date}")
-        return most_recent_log
-
     # snippet-start:[python.example_code.cloudwatch_logs.start_query]
     def perform_query(self, date_range):
         """
@@ -137,7 +108,7 @@ class CloudWatchQuery:
         :return: A list containing the query results.
         :rtype: list
         """
-        client = boto3.client("logs")
+        client = self.client
         try:
             try:
                 start_time = round(
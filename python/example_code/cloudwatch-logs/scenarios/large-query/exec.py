@@ -3,6 +3,7 @@
 import logging
 import os
 import sys
+import time
 
 import boto3
 from botocore.config import Config
@@ -36,7 +37,9 @@ class CloudWatchLogsQueryRunner:
         :rtype: boto3.client
         """
         try:
-            return boto3.client("logs", config=Config(retries={"max_attempts": 10}))
+            return boto3.client(
+                "logs", config=Config(retries={"max_attempts": 10, "mode": "adaptive"})
+            )
         except Exception as e:
             logging.error(f"Failed to create CloudWatch Logs client: {e}")
             sys.exit(1)
@@ -111,12 +114,19 @@ class CloudWatchLogsQueryRunner:
         """
         cloudwatch_query = CloudWatchQuery(
             log_group=log_group,
-            query_string=query
+            query_string=query,
+            client=self.cloudwatch_logs_client,
         )
-        cloudwatch_query.query_logs((start_date_iso8601, end_date_iso8601))
+        # Stream the logs instead of collecting them, so memory use stays flat no
+        # matter how many logs the date range holds.
+        start_time = time.perf_counter()
+        logs_found = 0
+        for _ in cloudwatch_query.stream_logs((start_date_iso8601, end_date_iso8601)):
+            logs_found += 1
+        query_duration = time.perf_counter() - start_time
         logging.info("Query executed successfully.")
         logging.info(
-            f"Queries completed in {cloudwatch_query.query_duration} seconds. Total logs found: {len(cloudwatch_query.query_results)}"
+            f"Queries completed in {query_duration:.2f} seconds. Total logs found: {logs_found}"
         )
 
 
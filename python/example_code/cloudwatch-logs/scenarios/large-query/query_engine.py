@@ -0,0 +1,296 @@
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: Apache-2.0
+"""
+Purpose
+
+Shows how to use the AWS SDK for Python (Boto3) with Amazon CloudWatch Logs Insights
+to run a query whose results exceed the 10,000 result limit of a single query.
+
+The time range is split into slices that are queried in parallel on a bounded
+pool of workers that share one client. When a slice returns a full page of results,
+the rest of the slice is split again according to how dense the logs were. Results
+are yielded as a stream in timestamp order, so the caller never has to hold all of
+them in memory.
+"""
+
+import logging
+import math
+import random
+import threading
+import time
+from collections import deque
+from concurrent.futures import ThreadPoolExecutor
+from datetime import datetime, timezone
+
+from botocore.exceptions import ClientError
+
+logger = logging.getLogger(__name__)
+
+DEFAULT_QUERY = "fields @timestamp, @message | sort @timestamp asc"
+MAX_QUERY_RESULTS = 10000
+# Every caller in the account and Region shares the quota of concurrent
+# Logs Insights queries, so stay well under it by default.
+DEFAULT_MAX_CONCURRENT_QUERIES = 10
+TERMINAL_STATUSES = ("Complete", "Failed", "Cancelled", "Timeout", "Unknown")
+RETRYABLE_START_ERRORS = ("LimitExceededException", "ThrottlingException")
+TIMESTAMP_FORMAT = "%Y-%m-%d %H:%M:%S.%f"
+
+
+class QueryFailedError(Exception):
+    """Exception raised when a query ends in a status other than Complete."""
+
+    pass
+
+
+class LargeQueryEngine:
+    """
+    Runs a CloudWatch Logs Insights query over a time range on a bounded pool of
+    workers and streams the merged results in timestamp order.
+
+    The query string must return the @timestamp field and sort by @timestamp in
+    ascending order, because the engine uses the last timestamp of a full page of
+    results to decide where to continue.
+    """
+
+    def __init__(
+        self,
+        logs_client,
+        log_group,
+        query_string=DEFAULT_QUERY,
+        max_concurrent_queries=DEFAULT_MAX_CONCURRENT_QUERIES,
+        limit=MAX_QUERY_RESULTS,
+        initial_poll_interval=0.5,
+        max_poll_interval=5.0,
+        max_start_attempts=8,
+        sleep=time.sleep,
+    ):
+        """
+        :param logs_client: A Boto3 CloudWatch Logs client. It is shared by all
+                            workers.
+        :param log_group: The name of the log group to query.
+        :param query_string: The query to run.
+        :param max_concurrent_queries: The maximum number of queries that run at the
+                                       same time.
+        :param limit: The maximum number of results returned by a single query.
+        :param initial_poll_interval: The time, in seconds, to wait before the first
+                                      check of a query's status.
+        :param max_poll_interval: The longest time, in seconds, to wait between
+                                  checks of a query's status.
+        :param max_start_attempts: The number of times to try to start a query when
+                                   the concurrent query quota is exceeded.
+        :param sleep: A function that sleeps for a number of seconds.
+        """
+        self.logs_client = logs_client
+        self.log_group = log_group
+        self.query_string = query_string
+        self.max_concurrent_queries = max_concurrent_queries
+        self.limit = limit
+        self.initial_poll_interval = initial_poll_interval
+        self.max_poll_interval = max_poll_interval
+        self.max_start_attempts = max_start_attempts
+        self.sleep = sleep
+        self.queries_run = 0
+        self.records_streamed = 0
+        self._stats_lock = threading.Lock()
+        self._cancelled = threading.Event()
+
+    @staticmethod
+    def split_range(time_range, parts):
+        """
+        Splits an inclusive range of epoch seconds into contiguous, non-overlapping
+        slices of about equal length.
+
+        :param time_range: The start and end of the range, in epoch seconds.
+        :param parts: The number of slices to make. Fewer slices are made when the
+                      range has fewer seconds than this.
+        :return: The slices, in chronological order.
+        """
+        start, end = time_range
+        total = end - start + 1
+        parts = max(1, min(parts, total))
+        bounds = [start + total * index // parts for index in range(parts + 1)]
+        return [(bounds[i], bounds[i + 1] - 1) for i in range(parts)]
+
+    @staticmethod
+    def record_second(record):
+        """
+        :param record: A query result, as a dict of field names and values.
+        :return: The @timestamp of the record, truncated to epoch seconds.
+        """
+        try:
+            stamp = record["@timestamp"]
+        except KeyError:
+            raise ValueError(
+                "Query results must include @timestamp. Add it to the fields of the "
+                "query and sort by @timestamp asc."
+            )
+        moment = datetime.strptime(stamp, TIMESTAMP_FORMAT)
+        return int(moment.replace(tzinfo=timezone.utc).timestamp())
+
+    def _start_query(self, time_range):
+        """
+        Starts a query over a slice. When the concurrent query quota of the account
+        is exceeded, waits with jittered exponential backoff and tries again.
+
+        :param time_range: The slice to query, in epoch seconds.
+        :return: The ID of the query.
+        """
+        for attempt in range(self.max_start_attempts):
+            try:
+                response = self.logs_client.start_query(
+                    logGroupName=self.log_group,
+                    startTime=time_range[0],
+                    endTime=time_range[1],
+                    queryString=self.query_string,
+                    limit=self.limit,
+                )
+                return response["queryId"]
+            except ClientError as err:
+                code = err.response["Error"]["Code"]
+                if (
+                    code not in RETRYABLE_START_ERRORS
+                    or attempt == self.max_start_attempts - 1
+                ):
+                    logger.exception("Couldn't start query for %s to %s.", *time_range)
+                    raise
+                delay = random.uniform(
+                    0, min(30, self.initial_poll_interval * 2**attempt)
+                )
+                logger.info("Got %s starting query, retrying in %.2fs.", code, delay)
+                self.sleep(delay)
+
+    def _wait_for_results(self, query_id):
+        """
+        Polls a query until it finishes. The interval between polls grows while the
+        query runs, so long queries don't use up the request rate of the account.
+
+        :param query_id: The ID of the query.
+        :return: The results of the query, as dicts of field names and values.
+        """
+        interval = self.initial_poll_interval
+        while True:
+            self.sleep(interval)
+            if self._cancelled.is_set():
+                self._stop_query(query_id)
+                return []
+            try:
+                response = self.logs_client.get_query_results(queryId=query_id)
+            except ClientError as err:
+                if err.response["Error"]["Code"] != "ThrottlingException":
+                    logger.exception("Couldn't get results for query %s.", query_id)
+                    raise
+                response = {"status": "Running"}
+            if response["status"] in TERMINAL_STATUSES:
+                break
+            interval = min(interval * 1.5, self.max_poll_interval)
+        if response["status"] != "Complete":
+            raise QueryFailedError(
+                f"Query {query_id} ended with status {response['status']}."
+            )
+        return [
+            {item["field"]: item["value"] for item in row}
+            for row in response.get("results", [])
+        ]
+
+    def _stop_query(self, query_id):
+        try:
+            self.logs_client.stop_query(queryId=query_id)
+        except ClientError:
+            logger.info(
+                "Couldn't stop query %s, it may have already finished.", query_id
+            )
+
+    def _run_query(self, time_range):
+        """
+        Runs a query over one slice and waits for its results.
+
+        :param time_range: The slice to query, in epoch seconds.
+        :return: The results of the query.
+        """
+        if self._cancelled.is_set():
+            return []
+        query_id = self._start_query(time_range)
+        with self._stats_lock:
+            self.queries_run += 1
+        records = self._wait_for_results(query_id)
+        logger.debug(
+            "Query %s for %s to %s returned %s records.",
+            query_id,
+            *time_range,
+            len(records),
+        )
+        return records
+
+    def _continue_slice(self, time_range, records):
+        """
+        Decides what to do with a slice that returned a full page of results.
+        Records in the last second of the page are dropped because the page may
+        not hold all of them; they are fetched again with the rest of the slice.
+
+        :param time_range: The slice that was queried.
+        :param records: The full page of results, in timestamp order.
+        :return: The records to emit and the slices that cover the rest of the range.
+        """
+        last_second = self.record_second(records[-1])
+        if last_second > time_range[0]:
+            complete = [
+                record for record in records if self.record_second(record) < last_second
+            ]
+            rest = (last_second, time_range[1])
+        else:
+            logger.warning(
+                "More than %s records were logged at %s. The excess is skipped.",
+                self.limit,
+                last_second,
+            )
+            complete = records
+            rest = (last_second + 1, time_range[1])
+        if rest[0] > rest[1]:
+            return complete, []
+        # Split the rest by how much time one full page covered, so dense logs are
+        # fetched with fewer rounds of queries.
+        covered = max(1, rest[0] - time_range[0])
+        parts = math.ceil((rest[1] - rest[0] + 1) / covered)
+        parts = min(parts, self.max_concurrent_queries)
+        return complete, self.split_range(rest, parts)
+
+    def stream(self, start_time, end_time):
+        """
+        Runs the query over a time range and yields its results in timestamp order.
+
+        Slices are queried in parallel, but a slice's results are held only until
+        all earlier slices have been yielded. When the generator is closed early,
+        queued queries are skipped and running queries are stopped.
+
+        :param start_time: The start of the range, in epoch seconds.
+        :param end_time: The end of the range, in epoch seconds. It is inclusive.
+        :return: A generator of results, as dicts of field names and values.
+        """
+        self._cancelled.clear()
+        slots = deque(
+            [time_range, None]
+            for time_range in self.split_range(
+                (start_time, end_time), self.max_concurrent_queries
+            )
+        )
+        with ThreadPoolExecutor(max_workers=self.max_concurrent_queries) as executor:
+            try:
+                while slots:
+                    # Keep a window of slices queued ahead of the one being yielded.
+                    # The pool bounds how many of them run at once.
+                    for slot in list(slots)[: self.max_concurrent_queries]:
+                        if slot[1] is None:
+                            slot[1] = executor.submit(self._run_query, slot[0])
+                    time_range, future = slots.popleft()
+                    records = future.result()
+                    if len(records) >= self.limit:
+                        records, rest = self._continue_slice(time_range, records)
+                        slots.extendleft([piece, None] for piece in reversed(rest))
+                    with self._stats_lock:
+                        self.records_streamed += len(records)
+                    yield from records
+            finally:
+                self._cancelled.set()
+                for _, future in slots:
+                    if future is not None:
+                        future.cancel()
@@ -0,0 +1,151 @@
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: Apache-2.0
+"""
+Unit tests for query_engine.py. These tests use a fake CloudWatch Logs client that
+answers queries from an in-memory list of log timestamps.
+"""
+
+import sys
+import threading
+from datetime import datetime, timezone
+
+import pytest
+from botocore.exceptions import ClientError
+
+sys.path.append("../")
+from query_engine import LargeQueryEngine, QueryFailedError
+
+
+def to_stamp(epoch_ms):
+    moment = datetime.fromtimestamp(epoch_ms / 1000, tz=timezone.utc)
+    return moment.strftime("%Y-%m-%d %H:%M:%S.%f")[:-3]
+
+
+class FakeLogsClient:
+    def __init__(self, timestamps_ms, final_status="Complete", limit_errors=0):
+        self.timestamps_ms = sorted(timestamps_ms)
+        self.final_status = final_status
+        self.limit_errors = limit_errors
+        self.queries = {}
+        self.polls = {}
+        self.running = 0
+        self.max_running = 0
+        self.stopped = []
+        self.lock = threading.Lock()
+
+    def start_query(self, logGroupName, startTime, endTime, queryString, limit):
+        with self.lock:
+            if self.limit_errors:
+                self.limit_errors -= 1
+                raise ClientError(
+                    {"Error": {"Code": "LimitExceededException"}}, "StartQuery"
+                )
+            query_id = f"query-{len(self.queries)}"
+            self.queries[query_id] = (startTime, endTime, limit)
+            self.polls[query_id] = 0
+            self.running += 1
+            self.max_running = max(self.max_running, self.running)
+        return {"queryId": query_id}
+
+    def get_query_results(self, queryId):
+        with self.lock:
+            self.polls[queryId] += 1
+            if self.polls[queryId] < 2:
+                return {"status": "Running", "results": []}
+            self.running -= 1
+        start, end, limit = self.queries[queryId]
+        matches = [
+            stamp
+            for stamp in self.timestamps_ms
+            if start * 1000 <= stamp < (end + 1) * 1000
+        ][:limit]
+        return {
+            "status": self.final_status,
+            "results": [
+                [
+                    {"field": "@timestamp", "value": to_stamp(stamp)},
+                    {"field": "@message", "value": str(stamp)},
+                ]
+                for stamp in matches
+            ],
+        }
+
+    def stop_query(self, queryId):
+        self.stopped.append(queryId)
+        return {"success": True}
+
+
+def make_engine(client, **kwargs):
+    kwargs.setdefault("limit", 10)
+    kwargs.setdefault("max_concurrent_queries", 3)
+    return LargeQueryEngine(client, "test-group", sleep=lambda _: None, **kwargs)
+
+
+def test_split_range():
+    assert LargeQueryEngine.split_range((0, 9), 3) == [(0, 2), (3, 5), (6, 9)]
+    assert LargeQueryEngine.split_range((5, 6), 4) == [(5, 5), (6, 6)]
+    assert LargeQueryEngine.split_range((5, 5), 1) == [(5, 5)]
+
+
+@pytest.mark.parametrize(
+    "timestamps_ms",
+    [
+        [],
+        [1000 * second + 250 for second in range(100)],
+        # Dense bursts force slices to be continued and split again.
+        [10_000 + offset * 250 for offset in range(57)]
+        + [70_000 + offset * 150 for offset in range(40)],
+    ],
+)
+def test_stream_returns_all_records_in_order(timestamps_ms):
+    client = FakeLogsClient(timestamps_ms)
+    engine = make_engine(client)
+
+    records = list(engine.stream(0, 99))
+
+    assert [int(record["@message"]) for record in records] == sorted(timestamps_ms)
+    assert engine.records_streamed == len(timestamps_ms)
+    assert client.max_running <= 3
+
+
+def test_stream_more_than_limit_in_one_second():
+    timestamps_ms = [5000 + offset for offset in range(15)] + [6000, 7000]
+    client = FakeLogsClient(timestamps_ms)
+    engine = make_engine(client, max_concurrent_queries=1)
+
+    records = list(engine.stream(5, 7))
+
+    # The page for second 5 can't be split further, so the excess is skipped.
+    assert [int(record["@message"]) for record in records] == (
+        timestamps_ms[:10] + [6000, 7000]
+    )
+
+
+def test_stream_retries_when_quota_exceeded():
+    client = FakeLogsClient([1500, 2500], limit_errors=2)
+    engine = make_engine(client, max_concurrent_queries=1)
+
+    records = list(engine.stream(0, 3))
+
+    assert len(records) == 2
+    assert engine.queries_run == 1
+
+
+def test_stream_failed_query():
+    client = FakeLogsClient([1500], final_status="Timeout")
+    engine = make_engine(client, max_concurrent_queries=1)
+
+    with pytest.raises(QueryFailedError):
+        list(engine.stream(0, 3))
+
+
+def test_stream_closed_early():
+    client = FakeLogsClient([1000 * second for second in range(100)])
+    engine = make_engine(client, max_concurrent_queries=2)
+
+    stream = engine.stream(0, 99)
+    first = next(stream)
+    stream.close()
+
+    assert first["@message"] == "0"
+    assert engine.queries_run < len(LargeQueryEngine.split_range((0, 99), 2)) + 2
@@ -0,0 +1,105 @@
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: Apache-2.0
+
+"""
+Purpose
+
+Benchmarks dynamo_batching.do_bulk_get against a local stand-in for Amazon DynamoDB
+and reports the number of keys retrieved per second for different thread pool sizes.
+
+The stand-in client simulates the round-trip latency of a BatchGetItem request and
+returns a random fraction of keys as unprocessed to simulate throttling, so the
+benchmark runs without an AWS account or network access.
+"""
+
+import argparse
+import random
+import threading
+import time
+from types import SimpleNamespace
+
+import dynamo_batching
+
+
+class StandInClient:
+    """
+    A stand-in for the low-level Amazon DynamoDB client that implements only
+    batch_get_item.
+    """
+
+    def __init__(self, latency, unprocessed_rate):
+        """
+        :param latency: The simulated round-trip time of a request, in seconds.
+        :param unprocessed_rate: The fraction of keys to return as unprocessed.
+        """
+        self.latency = latency
+        self.unprocessed_rate = unprocessed_rate
+        self.request_count = 0
+        self._lock = threading.Lock()
+
+    def batch_get_item(self, RequestItems):
+        with self._lock:
+            self.request_count += 1
+        time.sleep(self.latency)
+        responses = {}
+        unprocessed = {}
+        for table_name, table_request in RequestItems.items():
+            for key in table_request["Keys"]:
+                if random.random() < self.unprocessed_rate:
+                    unprocessed.setdefault(table_name, {"Keys": []})
+                    unprocessed[table_name]["Keys"].append(key)
+                else:
+                    responses.setdefault(table_name, []).append(dict(key))
+        return {"Responses": responses, "UnprocessedKeys": unprocessed}
+
+
+def run_benchmark(key_count, pool_sizes, latency, unprocessed_rate):
+    """
+    Runs do_bulk_get once for each pool size and prints the results.
+
+    :param key_count: The number of keys to get, split across two tables.
+    :param pool_sizes: The thread pool sizes to benchmark.
+    :param latency: The simulated round-trip time of a request, in seconds.
+    :param unprocessed_rate: The fraction of keys to return as unprocessed.
+    """
+    print(f"{'workers':>8} {'keys':>8} {'requests':>9} {'seconds':>8} {'keys/sec':>10}")
+    for pool_size in pool_sizes:
+        client = StandInClient(latency, unprocessed_rate)
+        dynamo_batching.dynamodb = SimpleNamespace(meta=SimpleNamespace(client=client))
+        batch_keys = {
+            "bench-movies": {
+                "Keys": (
+                    {"year": index, "title": f"title-{index}"}
+                    for index in range(key_count // 2)
+                )
+            },
+            "bench-actors": {
+                "Keys": ({"name": f"actor-{index}"} for index in range(key_count // 2))
+            },
+        }
+        start = time.perf_counter()
+        retrieved, unprocessed = dynamo_batching.do_bulk_get(
+            batch_keys, max_workers=pool_size, base_sleep=latency
+        )
+        elapsed = time.perf_counter() - start
+        got_count = sum(len(items) for items in retrieved.values())
+        print(
+            f"{pool_size:>8} {got_count:>8} {client.request_count:>9} "
+            f"{elapsed:>8.2f} {got_count / elapsed:>10.0f}"
+        )
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Benchmark bulk batch gets against a stand-in DynamoDB client."
+    )
+    parser.add_argument("--keys", type=int, default=20_000)
+    parser.add_argument("--pool-sizes", type=int, nargs="+", default=[1, 4, 8, 16, 32])
+    parser.add_argument("--latency", type=float, default=0.02)
+    parser.add_argument("--unprocessed-rate", type=float, default=0.05)
+    args = parser.parse_args()
+    run_benchmark(args.keys, args.pool_sizes, args.latency, args.unprocessed_rate)
+
+
+if __name__ == "__main__":
+    main()
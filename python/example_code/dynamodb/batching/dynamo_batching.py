@@ -18,14 +18,20 @@ import json
 import logging
 import os
 import pprint
+import queue
+import random
+import threading
 import time
+from concurrent.futures import ThreadPoolExecutor, as_completed
 import boto3
+from boto3.dynamodb.types import TypeDeserializer, TypeSerializer
 from botocore.exceptions import ClientError
 
 logger = logging.getLogger(__name__)
 dynamodb = boto3.resource("dynamodb")
 
 MAX_GET_SIZE = 100  # Amazon DynamoDB rejects a get batch larger than 100 items.
+MAX_GET_WORKERS = 8  # Default number of batch get requests to run concurrently.
 
 # snippet-end:[python.example_code.dynamodb.Batching_imports]
 
@@ -50,7 +56,7 @@ def create_table(table_name, schema):
                 {"AttributeName": item["name"], "AttributeType": item["type"]}
                 for item in schema
             ],
-            BillingMode='PAY_PER_REQUEST',
+            BillingMode="PAY_PER_REQUEST",
         )
         table.wait_until_exists()
         logger.info("Created table %s.", table.name)
@@ -109,6 +115,162 @@ def do_batch_get(batch_keys):
 # snippet-end:[python.example_code.dynamodb.BatchGetItem]
 
 
+# snippet-start:[python.example_code.dynamodb.BatchGetItem_Bulk]
+def _chunk_batch_keys(batch_keys, chunk_size=MAX_GET_SIZE):
+    """
+    Splits a set of keys from one or more tables into request windows that each
+    contain no more than `chunk_size` keys in total.
+
+    The keys for each table can be any iterable, so a large set of keys can be
+    generated lazily without holding more than one window in memory. Per-table
+    request options, such as ProjectionExpression or ConsistentRead, are copied
+    into every window that contains keys for that table.
+
+    :param batch_keys: The keys to retrieve, in the form
+                       {table_name: {"Keys": iterable_of_keys, ...options}}.
+    :param chunk_size: The maximum number of keys in a single window.
+    :return: A generator that yields RequestItems dictionaries.
+    """
+    window = {}
+    window_count = 0
+    for table_name, table_request in batch_keys.items():
+        options = {key: val for key, val in table_request.items() if key != "Keys"}
+        for key in table_request["Keys"]:
+            if table_name not in window:
+                window[table_name] = {**options, "Keys": []}
+            window[table_name]["Keys"].append(key)
+            window_count += 1
+            if window_count == chunk_size:
+                yield window
+                window = {}
+                window_count = 0
+    if window_count > 0:
+        yield window
+
+
+def _get_window(request_items, max_tries, base_sleep, max_sleep):
+    """
+    Gets a single window of at most 100 keys, retrying only the keys that Amazon
+    DynamoDB returns as unprocessed.
+
+    Amazon DynamoDB returns unprocessed keys when a request exceeds provisioned
+    throughput or when the response would be larger than 16 MB. The sleep between
+    retries uses full jitter so that concurrent workers don't retry in lockstep,
+    and it adapts to throughput: when most of the keys in a request were processed,
+    the next sleep is short, and when none were processed, the sleep backs off
+    exponentially.
+
+    :param request_items: The window of keys to retrieve.
+    :param max_tries: The maximum number of requests to make for this window.
+    :param base_sleep: The base sleep time, in seconds.
+    :param max_sleep: The maximum sleep time, in seconds.
+    :return: A tuple of the retrieved items grouped by table name and the
+             keys that were still unprocessed after the last try.
+    """
+    retrieved = {}
+    backoff = base_sleep
+    tries = 0
+    while True:
+        requested_count = sum(len(req["Keys"]) for req in request_items.values())
+        # The low-level client is thread safe, unlike the resource that owns it.
+        response = dynamodb.meta.client.batch_get_item(RequestItems=request_items)
+        for table_name, items in response.get("Responses", {}).items():
+            retrieved.setdefault(table_name, []).extend(items)
+        unprocessed = response.get("UnprocessedKeys", {})
+        tries += 1
+        if len(unprocessed) == 0 or tries >= max_tries:
+            return retrieved, unprocessed
+        unprocessed_count = sum(len(req["Keys"]) for req in unprocessed.values())
+        if unprocessed_count < requested_count:
+            # Some keys made it through, so throughput is available. Scale the
+            # sleep by the fraction of keys that were throttled.
+            backoff = max(base_sleep * unprocessed_count / requested_count, 0.01)
+        else:
+            backoff = min(backoff * 2, max_sleep)
+        sleepy_time = random.uniform(0, backoff)
+        logger.info(
+            "%s unprocessed keys returned. Sleeping for %.2f seconds, then retrying.",
+            unprocessed_count,
+            sleepy_time,
+        )
+        time.sleep(sleepy_time)
+        request_items = unprocessed
+
+
+def _merge_window(window_result, retrieved, unprocessed):
+    """
+    Merges the result of a single window into the overall results.
+
+    :param window_result: The tuple of items and unprocessed keys from a window.
+    :param retrieved: The overall retrieved items, grouped by table name.
+    :param unprocessed: The overall unprocessed keys, grouped by table name.
+    """
+    items, window_unprocessed = window_result
+    for table_name, table_items in items.items():
+        retrieved.setdefault(table_name, []).extend(table_items)
+    for table_name, table_request in window_unprocessed.items():
+        if table_name in unprocessed:
+            unprocessed[table_name]["Keys"].extend(table_request["Keys"])
+        else:
+            unprocessed[table_name] = {
+                **table_request,
+                "Keys": list(table_request["Keys"]),
+            }
+
+
+def do_bulk_get(
+    batch_keys, max_workers=MAX_GET_WORKERS, max_tries=8, base_sleep=0.1, max_sleep=20
+):
+    """
+    Gets an arbitrarily large set of items from one or more Amazon DynamoDB tables.
+
+    The keys are split into windows of at most 100 keys, which is the largest batch
+    that Amazon DynamoDB accepts, and the windows are requested concurrently on a
+    bounded pool of threads. Any keys that Amazon DynamoDB returns as unprocessed
+    (because of throttling or because a response exceeds 16 MB) are retried with
+    jittered, throughput-adaptive backoff. Keys that are processed successfully are
+    never requested again.
+
+    :param batch_keys: The keys to retrieve, in the form
+                       {table_name: {"Keys": iterable_of_keys, ...options}}.
+                       There is no limit on the number of keys for each table.
+    :param max_workers: The maximum number of batch get requests to run at once.
+    :param max_tries: The maximum number of requests to make for each window.
+    :param base_sleep: The base sleep time between retries, in seconds.
+    :param max_sleep: The maximum sleep time between retries, in seconds.
+    :return: A tuple of the retrieved items grouped under their respective table
+             names and any keys that were still unprocessed after all tries, in
+             the same form as the UnprocessedKeys field of a BatchGetItem response.
+    """
+    retrieved = {table_name: [] for table_name in batch_keys}
+    unprocessed = {}
+    windows = _chunk_batch_keys(batch_keys)
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        # Keep a bounded number of windows in flight so that a very large key
+        # iterable is not materialized all at once.
+        pending = set()
+        for window in windows:
+            pending.add(
+                executor.submit(_get_window, window, max_tries, base_sleep, max_sleep)
+            )
+            if len(pending) >= max_workers * 2:
+                done = next(as_completed(pending))
+                pending.remove(done)
+                _merge_window(done.result(), retrieved, unprocessed)
+        for done in as_completed(pending):
+            _merge_window(done.result(), retrieved, unprocessed)
+    if len(unprocessed) > 0:
+        logger.warning(
+            "%s keys were still unprocessed after %s tries.",
+            sum(len(req["Keys"]) for req in unprocessed.values()),
+            max_tries,
+        )
+    return retrieved, unprocessed
+
+
+# snippet-end:[python.example_code.dynamodb.BatchGetItem_Bulk]
+
+
 # snippet-start:[python.example_code.dynamodb.PutItem_BatchWriter]
 def fill_table(table, table_data):
     """
@@ -172,6 +334,268 @@ def get_batch_data(movie_table, movie_list, actor_table, actor_list):
 
 
 # snippet-start:[python.example_code.dynamodb.Usage_ArchiveMovies]
+class ArchiveCheckpoint:
+    """
+    Tracks the last evaluated key of each scan segment that has been completely
+    archived, and optionally persists it to a local JSON file so that an
+    interrupted archive can resume where it stopped.
+
+    Pages from one segment can be written by different workers and finish out of
+    order, so the checkpoint for a segment only advances past a page when that page
+    and every page before it have been written.
+    """
+
+    def __init__(self, total_segments, file_name=None):
+        """
+        :param total_segments: The number of scan segments.
+        :param file_name: The file in which to persist the checkpoint. When this is
+                          None, the checkpoint is kept only in memory.
+        """
+        self.total_segments = total_segments
+        self.file_name = file_name
+        self.start_keys = {}
+        self.finished = set()
+        self._pending = {segment: [] for segment in range(total_segments)}
+        self._lock = threading.Lock()
+        self._serializer = TypeSerializer()
+        self._deserializer = TypeDeserializer()
+        if file_name is not None and os.path.exists(file_name):
+            self._load()
+
+    def _load(self):
+        with open(self.file_name) as checkpoint_file:
+            data = json.load(checkpoint_file)
+        if data["total_segments"] != self.total_segments:
+            raise ValueError(
+                f"Checkpoint {self.file_name} was written for "
+                f"{data['total_segments']} segments, not {self.total_segments}."
+            )
+        self.start_keys = {
+            int(segment): {
+                name: self._deserializer.deserialize(value)
+                for name, value in key.items()
+            }
+            for segment, key in data["start_keys"].items()
+        }
+        self.finished = set(data["finished"])
+        logger.info(
+            "Resuming from checkpoint %s, %s segments already finished.",
+            self.file_name,
+            len(self.finished),
+        )
+
+    def _save(self):
+        if self.file_name is None:
+            return
+        data = {
+            "total_segments": self.total_segments,
+            "start_keys": {
+                segment: {
+                    name: self._serializer.serialize(value)
+                    for name, value in key.items()
+                }
+                for segment, key in self.start_keys.items()
+            },
+            "finished": sorted(self.finished),
+        }
+        temp_name = f"{self.file_name}.tmp"
+        with open(temp_name, "w") as checkpoint_file:
+            json.dump(data, checkpoint_file)
+        os.replace(temp_name, self.file_name)
+
+    def add_page(self, segment, last_key):
+        """
+        Registers a page that has been read from a segment but not yet written.
+
+        :param segment: The segment the page was read from.
+        :param last_key: The LastEvaluatedKey returned with the page, or None when
+                         the page is the last one in the segment.
+        :return: A token that identifies the page when it is completed.
+        """
+        page = {"last_key": last_key, "done": False}
+        with self._lock:
+            self._pending[segment].append(page)
+        return page
+
+    def complete_page(self, segment, page):
+        """
+        Marks a page as written and advances the checkpoint of its segment past
+        every leading page that is now complete.
+
+        :param segment: The segment the page was read from.
+        :param page: The token returned by add_page.
+        """
+        with self._lock:
+            page["done"] = True
+            pending = self._pending[segment]
+            advanced = False
+            while pending and pending[0]["done"]:
+                completed = pending.pop(0)
+                advanced = True
+                if completed["last_key"] is None:
+                    self.finished.add(segment)
+                    self.start_keys.pop(segment, None)
+                else:
+                    self.start_keys[segment] = completed["last_key"]
+            if advanced:
+                self._save()
+
+
+class TableArchiver:
+    """
+    Streams every item from a source table into an archive table and deletes it
+    from the source table.
+
+    A parallel, segmented scan feeds pages of items into a bounded queue, and a
+    pool of writer workers put each page into the archive table before deleting it
+    from the source table. Memory use is bounded by the queue size rather than by
+    the size of the table, and the progress of each segment is checkpointed so that
+    an interrupted archive can be resumed.
+    """
+
+    def __init__(
+        self,
+        source_table,
+        archive_table,
+        total_segments=4,
+        writer_count=4,
+        queue_size=16,
+        checkpoint_file=None,
+    ):
+        """
+        :param source_table: The table that contains the items to archive.
+        :param archive_table: The table that receives the archived items.
+        :param total_segments: The number of parallel scan segments.
+        :param writer_count: The number of concurrent writer workers.
+        :param queue_size: The maximum number of pages waiting to be written.
+        :param checkpoint_file: The file in which to persist scan progress.
+        """
+        self.source_table = source_table
+        self.archive_table = archive_table
+        self.total_segments = total_segments
+        self.writer_count = writer_count
+        self.checkpoint = ArchiveCheckpoint(total_segments, checkpoint_file)
+        self.items_archived = 0
+        self.start_time = None
+        self._pages = queue.Queue(maxsize=queue_size)
+        self._count_lock = threading.Lock()
+        self._key_names = None
+        self._stop = threading.Event()
+        self._error = None
+
+    @property
+    def items_per_second(self):
+        """
+        The average number of items archived per second since the archive started.
+        """
+        if self.start_time is None:
+            return 0
+        elapsed = time.perf_counter() - self.start_time
+        return self.items_archived / elapsed if elapsed > 0 else 0
+
+    def _fail(self, error):
+        """
+        Records the first error from any worker and tells the other workers to
+        stop. Writers keep draining the queue so that no scanner stays blocked.
+        """
+        with self._count_lock:
+            if self._error is None:
+                self._error = error
+        self._stop.set()
+
+    def _scan_segment(self, segment):
+        """
+        Scans one segment of the source table and queues each page of items.
+
+        :param segment: The segment to scan.
+        """
+        scan_kwargs = {"Segment": segment, "TotalSegments": self.total_segments}
+        start_key = self.checkpoint.start_keys.get(segment)
+        try:
+            while not self._stop.is_set():
+                if start_key is not None:
+                    scan_kwargs["ExclusiveStartKey"] = start_key
+                response = self.source_table.scan(**scan_kwargs)
+                start_key = response.get("LastEvaluatedKey")
+                page = self.checkpoint.add_page(segment, start_key)
+                self._pages.put((segment, page, response.get("Items", [])))
+                if start_key is None:
+                    break
+        except Exception as error:
+            self._fail(error)
+
+    def _write_pages(self):
+        """
+        Writes queued pages to the archive table and deletes them from the source
+        table until a sentinel is received.
+
+        Each page is put into the archive table before it is deleted from the
+        source table, so an interruption never loses items. Putting or deleting an
+        item twice is harmless, so a resumed archive can safely repeat a page.
+        """
+        while True:
+            entry = self._pages.get()
+            if entry is None:
+                return
+            segment, page, items = entry
+            if self._stop.is_set():
+                continue
+            try:
+                if items:
+                    with self.archive_table.batch_writer() as archive_writer:
+                        for item in items:
+                            archive_writer.put_item(Item=item)
+                    with self.source_table.batch_writer() as source_writer:
+                        for item in items:
+                            source_writer.delete_item(
+                                Key={name: item[name] for name in self._key_names}
+                            )
+                self.checkpoint.complete_page(segment, page)
+                with self._count_lock:
+                    self.items_archived += len(items)
+            except Exception as error:
+                self._fail(error)
+
+    def run(self):
+        """
+        Archives all items that have not already been archived.
+
+        :return: The number of items archived by this run.
+        """
+        self._key_names = [key["AttributeName"] for key in self.source_table.key_schema]
+        segments = [
+            segment
+            for segment in range(self.total_segments)
+            if segment not in self.checkpoint.finished
+        ]
+        self.start_time = time.perf_counter()
+        writers = [
+            threading.Thread(target=self._write_pages) for _ in range(self.writer_count)
+        ]
+        scanners = [
+            threading.Thread(target=self._scan_segment, args=(segment,))
+            for segment in segments
+        ]
+        for thread in writers + scanners:
+            thread.start()
+        for thread in scanners:
+            thread.join()
+        for _ in writers:
+            self._pages.put(None)
+        for thread in writers:
+            thread.join()
+        if self._error is not None:
+            raise self._error
+        logger.info(
+            "Archived %s items from %s to %s at %.0f items/sec.",
+            self.items_archived,
+            self.source_table.name,
+            self.archive_table.name,
+            self.items_per_second,
+        )
+        return self.items_archived
+
+
 def archive_movies(movie_table, movie_data):
     """
     Archives a list of movies to a newly created archive table and then deletes the
@@ -194,7 +618,7 @@ def archive_movies(movie_table, movie_data):
             TableName=f"{movie_table.name}-archive",
             KeySchema=movie_table.key_schema,
             AttributeDefinitions=movie_table.attribute_definitions,
-            BillingMode='PAY_PER_REQUEST',
+            BillingMode="PAY_PER_REQUEST",
         )
         logger.info("Table %s created, wait until exists.", archive_table.name)
         archive_table.wait_until_exists()
@@ -251,6 +675,69 @@ def archive_movies(movie_table, movie_data):
     return archive_table
 
 
+def archive_all_movies(
+    movie_table, total_segments=4, writer_count=4, checkpoint_file=None
+):
+    """
+    Archives all movies in a table to an archive table and deletes them from the
+    original table. Unlike archive_movies, which archives a list of movies that is
+    held in memory, this reads the movies from the table itself.
+
+    The archive table is created when it doesn't already exist, so a call that
+    specifies the checkpoint file of an interrupted archive resumes it. Items are
+    streamed from a parallel segmented scan into concurrent writers, so the amount
+    of memory used is constant no matter how large the movie table is.
+
+    :param movie_table: The table that contains movie data.
+    :param total_segments: The number of parallel scan segments.
+    :param writer_count: The number of concurrent writer workers.
+    :param checkpoint_file: The file in which to persist archive progress.
+    :return: The archive table.
+    """
+    archive_table_name = f"{movie_table.name}-archive"
+    try:
+        # Copy the schema and attribute definition from the original movie table to
+        # create the archive table.
+        archive_table = dynamodb.create_table(
+            TableName=archive_table_name,
+            KeySchema=movie_table.key_schema,
+            AttributeDefinitions=movie_table.attribute_definitions,
+            BillingMode="PAY_PER_REQUEST",
+        )
+        logger.info("Table %s created, wait until exists.", archive_table.name)
+    except ClientError as err:
+        if err.response["Error"]["Code"] == "ResourceInUseException":
+            logger.info("Table %s already exists, reusing it.", archive_table_name)
+            archive_table = dynamodb.Table(archive_table_name)
+        else:
+            logger.exception("Couldn't create archive table for %s.", movie_table.name)
+            raise
+    try:
+        archive_table.wait_until_exists()
+    except ClientError:
+        logger.exception("Couldn't wait for archive table %s.", archive_table_name)
+        raise
+
+    archiver = TableArchiver(
+        movie_table,
+        archive_table,
+        total_segments=total_segments,
+        writer_count=writer_count,
+        checkpoint_file=checkpoint_file,
+    )
+    try:
+        archiver.run()
+    except ClientError:
+        logger.exception(
+            "Couldn't archive movies from %s to %s.",
+            movie_table.name,
+            archive_table.name,
+        )
+        raise
+
+    return archive_table
+
+
 # snippet-end:[python.example_code.dynamodb.Usage_ArchiveMovies]
 
 
@@ -346,6 +833,13 @@ def usage_demo():
     archive_table = archive_movies(movie_table, movie_list)
     print(f"Movies successfully archived to {archive_table.name}.")
 
+    print(
+        "Archiving the rest of the movies by streaming them out of the main movie "
+        "table with a parallel scan."
+    )
+    archive_table = archive_all_movies(movie_table)
+    print(f"Movies successfully archived to {archive_table.name}.")
+
     archive_table.delete()
     movie_table.delete()
     actor_table.delete()
@@ -26,9 +26,7 @@ def test_create_table(
     ]
 
     with stub_runner(error_code, stop_on_method) as runner:
-        runner.add(
-            dyn_stubber.stub_create_table, table_name, schema
-        )
+        runner.add(dyn_stubber.stub_create_table, table_name, schema)
         runner.add(dyn_stubber.stub_describe_table, table_name)
 
     if error_code is None:
@@ -70,6 +68,130 @@ def test_do_batch_get(make_stubber, monkeypatch):
         assert got_data[key] == response_items[key]
 
 
+def test_chunk_batch_keys():
+    batch_keys = {
+        "test-table1": {
+            "Keys": ({"test": f"test-{index}"} for index in range(120)),
+            "ConsistentRead": True,
+        },
+        "test-table2": {"Keys": [{"test": f"test-{index}"} for index in range(130)]},
+    }
+
+    windows = list(dynamo_batching._chunk_batch_keys(batch_keys))
+
+    assert [
+        {name: len(req["Keys"]) for name, req in window.items()} for window in windows
+    ] == [
+        {"test-table1": 100},
+        {"test-table1": 20, "test-table2": 80},
+        {"test-table2": 50},
+    ]
+    assert all(
+        window["test-table1"]["ConsistentRead"]
+        for window in windows
+        if "test-table1" in window
+    )
+
+
+def test_do_bulk_get(make_stubber, monkeypatch):
+    dyn_stubber = make_stubber(dynamo_batching.dynamodb.meta.client)
+
+    def make_keys(start, stop):
+        return [{"test": f"test-{index}"} for index in range(start, stop)]
+
+    def make_items(start, stop):
+        return [{"test": {"S": f"test-{index}"}} for index in range(start, stop)]
+
+    batch_keys = {
+        "test-table1": {"Keys": make_keys(0, 120)},
+        "test-table2": {"Keys": make_keys(0, 30)},
+    }
+
+    monkeypatch.setattr(time, "sleep", lambda x: None)
+
+    # A single worker processes the windows in order, so the stubbed responses
+    # are consumed in a predictable order.
+    dyn_stubber.stub_batch_get_item(
+        {"test-table1": {"Keys": make_keys(0, 100)}},
+        response_items={"test-table1": make_items(0, 90)},
+        unprocessed_keys={"test-table1": {"Keys": make_items(90, 100)}},
+    )
+    dyn_stubber.stub_batch_get_item(
+        {"test-table1": {"Keys": make_keys(90, 100)}},
+        response_items={"test-table1": make_items(90, 100)},
+    )
+    dyn_stubber.stub_batch_get_item(
+        {
+            "test-table1": {"Keys": make_keys(100, 120)},
+            "test-table2": {"Keys": make_keys(0, 30)},
+        },
+        response_items={
+            "test-table1": make_items(100, 120),
+            "test-table2": make_items(0, 30),
+        },
+    )
+
+    got_data, unprocessed = dynamo_batching.do_bulk_get(batch_keys, max_workers=1)
+
+    assert got_data == {
+        "test-table1": make_keys(0, 120),
+        "test-table2": make_keys(0, 30),
+    }
+    assert unprocessed == {}
+
+
+def test_do_bulk_get_concurrent(monkeypatch):
+    requests = []
+
+    def mock_batch_get_item(RequestItems):
+        requests.append(RequestItems)
+        return {
+            "Responses": {
+                name: list(req["Keys"]) for name, req in RequestItems.items()
+            },
+            "UnprocessedKeys": {},
+        }
+
+    client = unittest.mock.MagicMock()
+    client.batch_get_item.side_effect = mock_batch_get_item
+    monkeypatch.setattr(dynamo_batching.dynamodb.meta, "client", client)
+    keys = [{"test": f"test-{index}"} for index in range(1050)]
+
+    got_data, unprocessed = dynamo_batching.do_bulk_get(
+        {"test-table": {"Keys": iter(keys)}}, max_workers=4
+    )
+
+    assert len(requests) == 11
+    assert sorted(got_data["test-table"], key=lambda k: int(k["test"][5:])) == keys
+    assert unprocessed == {}
+
+
+def test_do_bulk_get_exhausts_tries(make_stubber, monkeypatch):
+    dyn_stubber = make_stubber(dynamo_batching.dynamodb.meta.client)
+    batch_keys = {
+        "test-table": {"Keys": [{"test": f"test-{index}"} for index in range(5)]}
+    }
+
+    monkeypatch.setattr(time, "sleep", lambda x: None)
+
+    for _ in range(2):
+        dyn_stubber.stub_batch_get_item(
+            batch_keys,
+            unprocessed_keys={
+                "test-table": {
+                    "Keys": [{"test": {"S": f"test-{index}"}} for index in range(5)]
+                }
+            },
+        )
+
+    got_data, unprocessed = dynamo_batching.do_bulk_get(
+        batch_keys, max_workers=1, max_tries=2
+    )
+
+    assert got_data == {"test-table": []}
+    assert unprocessed == batch_keys
+
+
 @pytest.mark.parametrize(
     "item_count,error_code",
     [(0, None), (10, None), (25, None), (100, None), (13, "TestException")],
@@ -170,12 +292,7 @@ def test_archive_movies(
             schema=table_schema,
             provisioned_throughput={"ReadCapacityUnits": 10, "WriteCapacityUnits": 10},
         )
-        runner.add(
-            dyn_stubber.stub_create_table,
-            archive_table_name,
-            table_schema,
-            {"read": 10, "write": 10},
-        )
+        runner.add(dyn_stubber.stub_create_table, archive_table_name, table_schema)
         runner.add(dyn_stubber.stub_describe_table, archive_table_name)
         runner.add(
             dyn_stubber.stub_batch_write_item,
@@ -210,3 +327,123 @@ def test_archive_movies(
         with pytest.raises(ClientError) as exc_info:
             dynamo_batching.archive_movies(movie_table, movie_list)
         assert exc_info.value.response["Error"]["Code"] == error_code
+
+
+@pytest.mark.parametrize(
+    "error_code,stop_on_method",
+    [
+        (None, None),
+        ("TestException", "stub_create_table"),
+        ("TestException", "stub_scan"),
+        ("TestException", "stub_batch_write_item"),
+    ],
+)
+def test_archive_all_movies(make_stubber, stub_runner, error_code, stop_on_method):
+    dyn_stubber = make_stubber(dynamo_batching.dynamodb.meta.client)
+    movie_table = dynamo_batching.dynamodb.Table("movie-test")
+    movie_list = [{"year": index, "title": f"title-{index}"} for index in range(10)]
+    table_schema = [
+        {"name": "year", "type": "N", "key_type": "HASH"},
+        {"name": "title", "type": "S", "key_type": "RANGE"},
+    ]
+    archive_table_name = f"{movie_table.name}-archive"
+
+    with stub_runner(error_code, stop_on_method) as runner:
+        runner.add(
+            dyn_stubber.stub_describe_table, movie_table.name, schema=table_schema
+        )
+        runner.add(dyn_stubber.stub_create_table, archive_table_name, table_schema)
+        runner.add(dyn_stubber.stub_describe_table, archive_table_name)
+        runner.add(
+            dyn_stubber.stub_scan,
+            movie_table.name,
+            movie_list,
+            segment=0,
+            total_segments=1,
+        )
+        runner.add(
+            dyn_stubber.stub_batch_write_item,
+            {
+                archive_table_name: [
+                    {"PutRequest": {"Item": item}} for item in movie_list
+                ]
+            },
+        )
+        runner.add(
+            dyn_stubber.stub_batch_write_item,
+            {
+                movie_table.name: [
+                    {"DeleteRequest": {"Key": item}} for item in movie_list
+                ]
+            },
+        )
+
+    if error_code is None:
+        got_table = dynamo_batching.archive_all_movies(
+            movie_table, total_segments=1, writer_count=1
+        )
+        assert got_table.name == archive_table_name
+    else:
+        with pytest.raises(ClientError) as exc_info:
+            dynamo_batching.archive_all_movies(
+                movie_table, total_segments=1, writer_count=1
+            )
+        assert exc_info.value.response["Error"]["Code"] == error_code
+
+
+def test_archive_checkpoint_resume(tmp_path):
+    checkpoint_file = str(tmp_path / "archive.json")
+    checkpoint = dynamo_batching.ArchiveCheckpoint(2, checkpoint_file)
+    first = checkpoint.add_page(0, {"year": 1, "title": "title-1"})
+    second = checkpoint.add_page(0, {"year": 2, "title": "title-2"})
+    last = checkpoint.add_page(1, None)
+
+    # A later page finishing first must not advance the checkpoint past an
+    # earlier page that hasn't been written.
+    checkpoint.complete_page(0, second)
+    checkpoint.complete_page(1, last)
+    assert checkpoint.start_keys == {}
+    checkpoint.complete_page(0, first)
+
+    resumed = dynamo_batching.ArchiveCheckpoint(2, checkpoint_file)
+    assert resumed.start_keys == {0: {"year": 2, "title": "title-2"}}
+    assert resumed.finished == {1}
+
+    with pytest.raises(ValueError):
+        dynamo_batching.ArchiveCheckpoint(4, checkpoint_file)
+
+
+def test_table_archiver_concurrent():
+    source_table = unittest.mock.MagicMock()
+    source_table.name = "movie-test"
+    source_table.key_schema = [{"AttributeName": "title", "KeyType": "HASH"}]
+    archive_table = unittest.mock.MagicMock()
+    archived = []
+    deleted = []
+    archive_writer = archive_table.batch_writer.return_value.__enter__.return_value
+    archive_writer.put_item.side_effect = lambda Item: archived.append(Item)
+    source_writer = source_table.batch_writer.return_value.__enter__.return_value
+    source_writer.delete_item.side_effect = lambda Key: deleted.append(Key)
+
+    def mock_scan(Segment, TotalSegments, ExclusiveStartKey=None):
+        page = 0 if ExclusiveStartKey is None else ExclusiveStartKey["page"] + 1
+        response = {
+            "Items": [
+                {"title": f"title-{Segment}-{page}-{index}"} for index in range(10)
+            ]
+        }
+        if page < 2:
+            response["LastEvaluatedKey"] = {"page": page}
+        return response
+
+    source_table.scan.side_effect = mock_scan
+
+    archiver = dynamo_batching.TableArchiver(
+        source_table, archive_table, total_segments=4, writer_count=3, queue_size=2
+    )
+    assert archiver.run() == 120
+    assert len(archived) == 120
+    assert sorted(item["title"] for item in archived) == sorted(
+        key["title"] for key in deleted
+    )
+    assert archiver.checkpoint.finished == {0, 1, 2, 3}
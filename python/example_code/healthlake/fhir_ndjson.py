@@ -0,0 +1,273 @@
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: Apache-2.0
+
+"""
+Purpose
+
+Shows how to prepare large FHIR NDJSON files for an AWS HealthLake import job, and
+how to index the files written by an export job.
+
+Before an import, each source file is split into byte ranges that end at line
+breaks. The ranges are validated and written to gzip-compressed shards on a pool of
+processes, so large files are prepared on all CPUs at once. The shards are then
+uploaded to Amazon S3 on a pool of threads.
+
+After an export, the output files are read as streams from Amazon S3, one line at
+a time, and counted by resource type.
+"""
+
+import gzip
+import json
+import logging
+import os
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+from botocore.exceptions import ClientError
+
+logger = logging.getLogger(__name__)
+
+# The uncompressed size of the data written to each shard.
+DEFAULT_SHARD_SIZE = 128 * 1024 * 1024
+# The size of the byte ranges that source files are split into for processing.
+# Each range is written to its own shards, so ranges are never smaller than a shard.
+DEFAULT_RANGE_SIZE = DEFAULT_SHARD_SIZE
+# The number of files that are uploaded or read from Amazon S3 at the same time.
+DEFAULT_S3_WORKERS = 10
+
+
+def validate_resource(line: bytes) -> dict:
+    """
+    Parses one line of NDJSON and checks that it is a FHIR resource.
+
+    :param line: The line, without its line break.
+    :return: The resource.
+    """
+    resource = json.loads(line)
+    if not isinstance(resource, dict) or not isinstance(
+        resource.get("resourceType"), str
+    ):
+        raise ValueError("The line is not a FHIR resource with a resourceType.")
+    return resource
+
+
+def split_ranges(path: str, range_size: int = DEFAULT_RANGE_SIZE) -> list[tuple]:
+    """
+    Splits a file into byte ranges of about the same size that each end at a line
+    break, so that the ranges can be processed separately.
+
+    :param path: The path of the NDJSON file.
+    :param range_size: The approximate size of each range, in bytes.
+    :return: A list of (start, end) byte offsets.
+    """
+    size = os.path.getsize(path)
+    ranges = []
+    start = 0
+    with open(path, "rb") as file:
+        while start < size:
+            end = start + range_size
+            if end >= size:
+                end = size
+            else:
+                file.seek(end)
+                file.readline()
+                end = file.tell()
+            ranges.append((start, end))
+            start = end
+    return ranges
+
+
+def write_shards(
+    path: str, start: int, end: int, out_prefix: str, shard_size: int
+) -> list[dict]:
+    """
+    Validates the resources in a byte range of a file and writes them to
+    gzip-compressed shards. This is a module-level function so that it can run on
+    a process pool.
+
+    :param path: The path of the NDJSON file.
+    :param start: The offset of the first byte of the range.
+    :param end: The offset after the last byte of the range.
+    :param out_prefix: The path and name prefix of the shard files.
+    :param shard_size: The uncompressed size at which a new shard is started.
+    :return: A list that describes each shard, with its path, the number of
+             resources it holds, and its uncompressed and compressed sizes.
+    """
+    shards = []
+    shard = None
+    with open(path, "rb") as file:
+        file.seek(start)
+        offset = start
+        while offset < end:
+            line = file.readline()
+            line_offset = offset
+            offset += len(line)
+            line = line.strip()
+            if not line:
+                continue
+            try:
+                validate_resource(line)
+            except ValueError as err:
+                raise ValueError(f"{path} at byte {line_offset}: {err}") from err
+            if shard is None or shard["size"] >= shard_size:
+                if shard is not None:
+                    shard["file"].close()
+                shard = {
+                    "path": f"{out_prefix}-{len(shards):04d}.ndjson.gz",
+                    "resources": 0,
+                    "size": 0,
+                }
+                shard["file"] = gzip.open(shard["path"], "wb")
+                shards.append(shard)
+            shard["file"].write(line + b"\n")
+            shard["resources"] += 1
+            shard["size"] += len(line) + 1
+    if shard is not None:
+        shard["file"].close()
+    for shard in shards:
+        del shard["file"]
+        shard["compressed_size"] = os.path.getsize(shard["path"])
+    return shards
+
+
+def shard_ndjson(
+    source_paths: list[str],
+    out_dir: str,
+    shard_size: int = DEFAULT_SHARD_SIZE,
+    range_size: int = DEFAULT_RANGE_SIZE,
+    max_workers: int = None,
+) -> list[dict]:
+    """
+    Validates FHIR NDJSON files and writes their resources to gzip-compressed
+    shards that are ready to upload for an import job. The files are split into
+    byte ranges that are processed at the same time on a pool of processes.
+
+    :param source_paths: The paths of the NDJSON files.
+    :param out_dir: The directory to write the shards to.
+    :param shard_size: The uncompressed size at which a new shard is started.
+    :param range_size: The approximate size of the byte ranges that are processed
+                       separately. Each range is written to its own shards, so a
+                       range size smaller than the shard size is raised to the
+                       shard size.
+    :param max_workers: The number of processes. When not specified, one process
+                        is used for each CPU.
+    :return: A list that describes each shard.
+    """
+    os.makedirs(out_dir, exist_ok=True)
+    range_size = max(range_size, shard_size)
+    tasks = []
+    for source_index, path in enumerate(source_paths):
+        # Source files can share a name when they are in different folders, so
+        # the index of the source keeps the shard names unique.
+        stem = os.path.basename(path).removesuffix(".ndjson")
+        for index, (start, end) in enumerate(split_ranges(path, range_size)):
+            out_prefix = os.path.join(out_dir, f"{source_index:04d}-{stem}-{index:04d}")
+            tasks.append((path, start, end, out_prefix, shard_size))
+    with ProcessPoolExecutor(max_workers=max_workers) as executor:
+        futures = [executor.submit(write_shards, *task) for task in tasks]
+        shards = [shard for future in futures for shard in future.result()]
+    logger.info(
+        "Wrote %s resources to %s shards.",
+        sum(shard["resources"] for shard in shards),
+        len(shards),
+    )
+    return shards
+
+
+def upload_shards(
+    s3_client,
+    shards: list[dict],
+    bucket: str,
+    prefix: str,
+    max_workers: int = DEFAULT_S3_WORKERS,
+) -> str:
+    """
+    Uploads shards to Amazon S3 at the same time on a pool of threads.
+
+    :param s3_client: A Boto3 Amazon S3 client.
+    :param shards: The shards, as returned by shard_ndjson.
+    :param bucket: The bucket to upload to.
+    :param prefix: The prefix of the uploaded objects.
+    :param max_workers: The number of shards to upload at the same time.
+    :return: The S3 URI of the prefix, to use as the input of an import job.
+    """
+
+    def upload(shard):
+        key = f"{prefix}/{os.path.basename(shard['path'])}"
+        try:
+            s3_client.upload_file(shard["path"], bucket, key)
+        except ClientError as err:
+            logger.exception(
+                "Couldn't upload %s. Here's why %s",
+                key,
+                err.response["Error"]["Message"],
+            )
+            raise
+
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        for _ in executor.map(upload, shards):
+            pass
+    return f"s3://{bucket}/{prefix}/"
+
+
+def index_export(
+    s3_client,
+    output_s3_uri: str,
+    max_workers: int = DEFAULT_S3_WORKERS,
+) -> dict[str, dict]:
+    """
+    Reads the NDJSON files written by an export job and indexes them by resource
+    type. Files are read as streams one line at a time, so they are never held in
+    memory.
+
+    :param s3_client: A Boto3 Amazon S3 client.
+    :param output_s3_uri: The S3 URI where the export job wrote its files.
+    :param max_workers: The number of files to read at the same time.
+    :return: A dict keyed by resource type. Each value holds the number of
+             resources of the type and the number in each file.
+    """
+    bucket, _, prefix = output_s3_uri.removeprefix("s3://").partition("/")
+    try:
+        keys = [
+            obj["Key"]
+            for page in s3_client.get_paginator("list_objects_v2").paginate(
+                Bucket=bucket, Prefix=prefix
+            )
+            for obj in page.get("Contents", [])
+            if obj["Key"].endswith((".ndjson", ".ndjson.gz"))
+        ]
+    except ClientError as err:
+        logger.exception(
+            "Couldn't list export files. Here's why %s",
+            err.response["Error"]["Message"],
+        )
+        raise
+
+    def count(key):
+        try:
+            body = s3_client.get_object(Bucket=bucket, Key=key)["Body"]
+        except ClientError as err:
+            logger.exception(
+                "Couldn't read %s. Here's why %s",
+                key,
+                err.response["Error"]["Message"],
+            )
+            raise
+        if key.endswith(".gz"):
+            lines = gzip.GzipFile(fileobj=body)
+        else:
+            lines = body.iter_lines()
+        counts = {}
+        for line in lines:
+            if line.strip():
+                resource_type = json.loads(line)["resourceType"]
+                counts[resource_type] = counts.get(resource_type, 0) + 1
+        return key, counts
+
+    index = {}
+    with ThreadPoolExecutor(max_workers=max_workers) as executor:
+        for key, counts in executor.map(count, keys):
+            for resource_type, type_count in counts.items():
+                entry = index.setdefault(resource_type, {"count": 0, "files": {}})
+                entry["count"] += type_count
+                entry["files"][key] = type_count
+    return index
@@ -13,18 +13,32 @@ from importlib.metadata import metadata
 from boto3 import client
 import logging
 import json
+import os
+import sys
 
 import boto3
 from botocore.exceptions import ClientError
 import time
+from concurrent.futures import Future
+
+# Add relative path to include demo_tools in this code example without need for setup.
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "../.."))
+from demo_tools.job_waiter import JobWaiter
 
 logger = logging.getLogger(__name__)
 
+# The statuses that end a wait for a data store or a job.
+DATASTORE_DONE_STATES = ("ACTIVE",)
+DATASTORE_FAILED_STATES = ("CREATE_FAILED", "DELETED")
+JOB_DONE_STATES = ("COMPLETED", "COMPLETED_WITH_ERRORS")
+JOB_FAILED_STATES = ("FAILED", "CANCEL_COMPLETED", "CANCEL_FAILED")
+
 
 # snippet-start:[python.example_code.healthlake.HealthLakeWrapper]
 class HealthLakeWrapper:
-    def __init__(self, health_lake_client: client):
+    def __init__(self, health_lake_client: client, job_waiter: JobWaiter = None):
         self.health_lake_client = health_lake_client
+        self.job_waiter = job_waiter or JobWaiter()
 
     # snippet-start:[python.example_code.healthlake.HealthLakeWrapper.decl]
     @classmethod
@@ -446,42 +460,59 @@ class HealthLakeWrapper:
 
     # snippet-end:[python.example_code.healthlake.HealthLakeWrapper]
 
+    def watch_datastore_active(
+        self, datastore_id: str, timeout: int = 40 * 60
+    ) -> Future:
+        """
+        Starts waiting for a HealthLake data store to become active. The data store
+        is polled by the job waiter along with all other jobs that are waited for,
+        so many data stores can be waited for without a thread for each one.
+        :param datastore_id: The data store ID.
+        :param timeout: The number of seconds to wait. It can take a while to create
+                        a data store, so the default is 40 minutes.
+        :return: A future that resolves to the final status of the data store.
+        """
+        return self.job_waiter.submit(
+            datastore_id,
+            lambda: self.health_lake_client.describe_fhir_datastore(
+                DatastoreId=datastore_id
+            )["DatastoreProperties"]["DatastoreStatus"],
+            DATASTORE_DONE_STATES,
+            DATASTORE_FAILED_STATES,
+            timeout,
+        )
+
     def wait_datastore_active(self, datastore_id: str) -> None:
         """
         Waits for a HealthLake data store to become active.
         :param datastore_id: The data store ID.
         """
-        counter = 0
-        max_count_minutes = 40  # It can take a while to create a data store, so we'll wait up to 40 minutes.
-        status = "CREATING"
-        while counter < max_count_minutes:
-            datastore = self.health_lake_client.describe_fhir_datastore(
-                DatastoreId=datastore_id
-            )
-            status = datastore["DatastoreProperties"]["DatastoreStatus"]
-            if status == "ACTIVE" or status == "CREATE_FAILED":
-                break
-            else:
-                print(f"data store {status}, minutes {counter}")
-                counter += 1
-                time.sleep(60)
+        start = time.monotonic()
+        self.watch_datastore_active(datastore_id).result()
+        print(
+            f"Data store with ID {datastore_id} is active after "
+            f"{(time.monotonic() - start) / 60:.0f} minutes."
+        )
 
-        if status == "ACTIVE":
-            print(
-                f"Data store with ID {datastore_id} is active after {counter} minutes."
-            )
-        elif status == "CREATE_FAILED":
-            raise ClientError(
-                "Create data store with ID %s failed after %d minutes.",
-                datastore_id,
-                counter,
-            )
-        else:
-            raise ClientError(
-                "Data store with ID %s is not active after %d minutes.",
-                datastore_id,
-                counter,
-            )
+    def watch_import_job_complete(
+        self, datastore_id: str, job_id: str, timeout: int = 20 * 60
+    ) -> Future:
+        """
+        Starts waiting for a HealthLake import job to complete.
+        :param datastore_id: The data store ID.
+        :param job_id: The import job ID.
+        :param timeout: The number of seconds to wait.
+        :return: A future that resolves to the final status of the job.
+        """
+        return self.job_waiter.submit(
+            job_id,
+            lambda: self.health_lake_client.describe_fhir_import_job(
+                DatastoreId=datastore_id, JobId=job_id
+            )["ImportJobProperties"]["JobStatus"],
+            JOB_DONE_STATES,
+            JOB_FAILED_STATES,
+            timeout,
+        )
 
     def wait_import_job_complete(self, datastore_id: str, job_id: str) -> None:
         """
@@ -489,63 +520,54 @@ class HealthLakeWrapper:
         :param datastore_id: The data store ID.
         :param job_id: The import job ID.
         """
-        counter = 0
-        max_count_minutes = (
-            20
-        )
-        status = "IN_PROGRESS"
-        while counter < max_count_minutes:
-            job = self.describe_fhir_import_job(datastore_id, job_id)
-            status = job["JobStatus"]
-            if status == "COMPLETED" or status == "COMPLETED_WITH_ERRORS":
-                break
-            else:
-                print(f"Import job {status}, minutes {counter}")
-                counter += 1
-                time.sleep(60)
-
+        start = time.monotonic()
+        status = self.watch_import_job_complete(datastore_id, job_id).result()
+        minutes = (time.monotonic() - start) / 60
         if status == "COMPLETED":
-            print(f"Import job with ID {job_id} is completed after {counter} minutes.")
-        elif status == "COMPLETED_WITH_ERRORS":
             print(
-                f"Import job with ID {job_id} is completed with errors after {counter} minutes."
+                f"Import job with ID {job_id} is completed after {minutes:.0f} minutes."
             )
         else:
-            raise ClientError(
-                "Import job with ID %s is not completed after %d minutes.",
-                job_id,
-                counter,
+            print(
+                f"Import job with ID {job_id} is completed with errors after {minutes:.0f} minutes."
             )
 
+    def watch_export_job_complete(
+        self, datastore_id: str, job_id: str, timeout: int = 20 * 60
+    ) -> Future:
+        """
+        Starts waiting for a HealthLake export job to complete.
+        :param datastore_id: The data store ID.
+        :param job_id: The export job ID.
+        :param timeout: The number of seconds to wait.
+        :return: A future that resolves to the final status of the job.
+        """
+        return self.job_waiter.submit(
+            job_id,
+            lambda: self.health_lake_client.describe_fhir_export_job(
+                DatastoreId=datastore_id, JobId=job_id
+            )["ExportJobProperties"]["JobStatus"],
+            JOB_DONE_STATES,
+            JOB_FAILED_STATES,
+            timeout,
+        )
+
     def wait_export_job_complete(self, datastore_id: str, job_id: str) -> None:
         """
         Waits for a HealthLake export job to complete.
         :param datastore_id: The data store ID.
         :param job_id: The export job ID.
         """
-        counter = 0
-        max_count_minutes = (
-            20
-        )
-        status = "IN_PROGRESS"
-        while counter < max_count_minutes:
-            job = self.describe_fhir_export_job(datastore_id, job_id)
-            status = job["JobStatus"]
-            if status == "COMPLETED" or status == "COMPLETED_WITH_ERRORS":
-                break
-            else:
-                print(f"Export job {status}, minutes {counter}")
-                counter += 1
-                time.sleep(60)
+        start = time.monotonic()
+        status = self.watch_export_job_complete(datastore_id, job_id).result()
+        minutes = (time.monotonic() - start) / 60
         if status == "COMPLETED":
-            print(f"Export job with ID {job_id} is completed after {counter} minutes.")
-        elif status == "COMPLETED_WITH_ERRORS":
             print(
-                f"Export job with ID {job_id} is completed with errors after {counter} minutes."
+                f"Export job with ID {job_id} is completed after {minutes:.0f} minutes."
             )
         else:
-            raise ClientError(
-                "Job with ID %s is not completed after %d minutes.", job_id, counter
+            print(
+                f"Export job with ID {job_id} is completed with errors after {minutes:.0f} minutes."
             )
 
     def health_lake_demo(self) -> None:
@@ -0,0 +1,171 @@
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: Apache-2.0
+
+"""
+Unit tests for fhir_ndjson functions.
+"""
+
+import gzip
+import io
+import json
+import os
+import sys
+from unittest.mock import MagicMock
+
+import pytest
+from botocore.exceptions import ClientError
+from botocore.response import StreamingBody
+
+script_dir = os.path.dirname(os.path.abspath(__file__))
+
+# Append parent directory to import fhir_ndjson.
+sys.path.append(os.path.join(script_dir, ".."))
+import fhir_ndjson
+
+
+def make_ndjson(path, count):
+    with open(path, "w") as file:
+        for index in range(count):
+            resource_type = "Patient" if index % 2 == 0 else "Observation"
+            file.write(json.dumps({"resourceType": resource_type, "id": str(index)}))
+            file.write("\n")
+
+
+def test_split_ranges(tmp_path):
+    path = tmp_path / "patients.ndjson"
+    make_ndjson(path, 100)
+    data = path.read_bytes()
+
+    ranges = fhir_ndjson.split_ranges(str(path), range_size=500)
+
+    assert len(ranges) > 1
+    assert ranges[0][0] == 0
+    assert ranges[-1][1] == len(data)
+    for (_, end), (start, _) in zip(ranges, ranges[1:]):
+        assert end == start
+        assert data[end - 1 : end] == b"\n"
+
+
+def test_shard_ndjson(tmp_path):
+    path = tmp_path / "patients.ndjson"
+    make_ndjson(path, 100)
+    out_dir = tmp_path / "shards"
+
+    shards = fhir_ndjson.shard_ndjson(
+        [str(path)], str(out_dir), shard_size=1000, range_size=2000, max_workers=2
+    )
+
+    assert len(shards) > 1
+    assert sum(shard["resources"] for shard in shards) == 100
+    ids = []
+    for shard in shards:
+        with gzip.open(shard["path"], "rt") as file:
+            lines = file.read().splitlines()
+        assert len(lines) == shard["resources"]
+        assert shard["compressed_size"] == os.path.getsize(shard["path"])
+        ids += [json.loads(line)["id"] for line in lines]
+    assert sorted(ids, key=int) == [str(index) for index in range(100)]
+
+
+def test_shard_ndjson_same_names(tmp_path):
+    paths = []
+    for folder in ("a", "b"):
+        os.makedirs(tmp_path / folder)
+        for name in ("Patient.ndjson", "Patient.part1.ndjson"):
+            paths.append(tmp_path / folder / name)
+            make_ndjson(paths[-1], 10)
+
+    shards = fhir_ndjson.shard_ndjson(
+        [str(path) for path in paths], str(tmp_path / "shards"), max_workers=2
+    )
+
+    assert len(shards) == 4
+    assert len({shard["path"] for shard in shards}) == 4
+    on_disk = 0
+    for shard in shards:
+        with gzip.open(shard["path"], "rt") as file:
+            on_disk += len(file.read().splitlines())
+    assert on_disk == 40
+
+
+def test_shard_ndjson_range_size(tmp_path):
+    path = tmp_path / "patients.ndjson"
+    make_ndjson(path, 100)
+
+    shards = fhir_ndjson.shard_ndjson(
+        [str(path)], str(tmp_path / "shards"), shard_size=2000, range_size=500
+    )
+
+    assert all(shard["size"] >= 2000 for shard in shards[:-1])
+
+
+def test_write_shards_invalid(tmp_path):
+    path = tmp_path / "bad.ndjson"
+    path.write_text('{"resourceType": "Patient"}\n{"id": "1"}\n')
+
+    with pytest.raises(ValueError, match="at byte 28"):
+        fhir_ndjson.write_shards(
+            str(path), 0, path.stat().st_size, str(tmp_path / "bad"), 1000
+        )
+
+
+@pytest.mark.parametrize("error_code", [None, "TestException"])
+def test_upload_shards(tmp_path, error_code):
+    s3_client = MagicMock()
+    if error_code is not None:
+        s3_client.upload_file.side_effect = ClientError(
+            {"Error": {"Code": error_code, "Message": "test"}}, "PutObject"
+        )
+    shards = [
+        {"path": str(tmp_path / f"shard-{index}.ndjson.gz")} for index in range(3)
+    ]
+
+    if error_code is None:
+        uri = fhir_ndjson.upload_shards(s3_client, shards, "test-bucket", "import")
+        assert uri == "s3://test-bucket/import/"
+        assert sorted(call.args for call in s3_client.upload_file.call_args_list) == [
+            (shard["path"], "test-bucket", f"import/shard-{index}.ndjson.gz")
+            for index, shard in enumerate(shards)
+        ]
+    else:
+        with pytest.raises(ClientError) as exc_info:
+            fhir_ndjson.upload_shards(s3_client, shards, "test-bucket", "import")
+        assert exc_info.value.response["Error"]["Code"] == error_code
+
+
+def test_index_export():
+    files = {
+        "export/Patient-1.ndjson": b'{"resourceType": "Patient"}\n'
+        b'{"resourceType": "Patient"}\n',
+        "export/Observation-1.ndjson.gz": gzip.compress(
+            b'{"resourceType": "Observation"}\n{"resourceType": "Patient"}\n'
+        ),
+    }
+    s3_client = MagicMock()
+    s3_client.get_paginator.return_value.paginate.return_value = [
+        {"Contents": [{"Key": key} for key in files] + [{"Key": "export/manifest"}]}
+    ]
+
+    def get_object(Bucket, Key):
+        return {"Body": StreamingBody(io.BytesIO(files[Key]), len(files[Key]))}
+
+    s3_client.get_object.side_effect = get_object
+
+    index = fhir_ndjson.index_export(s3_client, "s3://test-bucket/export/")
+
+    s3_client.get_paginator.return_value.paginate.assert_called_with(
+        Bucket="test-bucket", Prefix="export/"
+    )
+    assert index == {
+        "Patient": {
+            "count": 3,
+            "files": {
+                "export/Patient-1.ndjson": 2,
+                "export/Observation-1.ndjson.gz": 1,
+            },
+        },
+        "Observation": {
+            "count": 1,
+            "files": {"export/Observation-1.ndjson.gz": 1},
+        },
+    }
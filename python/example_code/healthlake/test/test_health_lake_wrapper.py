@@ -5,8 +5,11 @@
 Unit tests for health_lake_wrapper functions.
 """
 
+import json
 import os
 import sys
+import time
+from unittest.mock import MagicMock
 
 import boto3
 import pytest
@@ -17,6 +20,12 @@ script_dir = os.path.dirname(os.path.abspath(__file__))
 # Append parent directory to import health_lake_wrapper.
 sys.path.append(os.path.join(script_dir, ".."))
 from health_lake_wrapper import HealthLakeWrapper
+from demo_tools.job_waiter import (
+    JobFailedError,
+    JobTimeoutError,
+    JobWaiter,
+    SqsEventListener,
+)
 
 
 @pytest.mark.parametrize("error_code", [None, "TestException"])
@@ -287,3 +296,132 @@ def test_list_tags_for_resource(make_stubber, error_code):
         with pytest.raises(ClientError) as exc_info:
             wrapper.list_tags_for_resource(resource_arn)
         assert exc_info.value.response["Error"]["Code"] == error_code
+
+
+@pytest.mark.parametrize("error_code", [None, "TestException"])
+def test_wait_datastore_active(make_stubber, error_code):
+    healthlake_client = boto3.client("healthlake")
+    healthlake_stubber = make_stubber(healthlake_client)
+    wrapper = HealthLakeWrapper(healthlake_client, JobWaiter(min_delay=0))
+    datastore_id = "abcdedf1234567890abcdef123456789"
+
+    healthlake_stubber.stub_describe_fhir_datastore(
+        datastore_id, datastore_status="CREATING"
+    )
+    healthlake_stubber.stub_describe_fhir_datastore(datastore_id, error_code=error_code)
+
+    if error_code is None:
+        wrapper.wait_datastore_active(datastore_id)
+    else:
+        with pytest.raises(ClientError) as exc_info:
+            wrapper.wait_datastore_active(datastore_id)
+        assert exc_info.value.response["Error"]["Code"] == error_code
+
+
+@pytest.mark.parametrize("job_status", ["COMPLETED", "COMPLETED_WITH_ERRORS", "FAILED"])
+def test_wait_import_job_complete(make_stubber, job_status):
+    healthlake_client = boto3.client("healthlake")
+    healthlake_stubber = make_stubber(healthlake_client)
+    wrapper = HealthLakeWrapper(healthlake_client, JobWaiter(min_delay=0))
+    datastore_id = "XXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXX"
+    job_id = "XXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXX"
+
+    for status in ["SUBMITTED", "IN_PROGRESS", job_status]:
+        healthlake_stubber.stub_describe_fhir_import_job(
+            datastore_id, job_id, job_status=status
+        )
+
+    if job_status == "FAILED":
+        with pytest.raises(JobFailedError) as exc_info:
+            wrapper.wait_import_job_complete(datastore_id, job_id)
+        assert exc_info.value.status == job_status
+    else:
+        wrapper.wait_import_job_complete(datastore_id, job_id)
+
+
+def test_watch_export_jobs(make_stubber):
+    healthlake_client = boto3.client("healthlake")
+    healthlake_stubber = make_stubber(healthlake_client)
+    wrapper = HealthLakeWrapper(healthlake_client, JobWaiter(min_delay=0))
+    datastore_id = "XXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXX"
+    job_id = "XXXXXXXXXXXXXXXXXXXXXXXXXXXXXXXX"
+
+    healthlake_stubber.stub_describe_fhir_export_job(
+        datastore_id, job_id, job_status="IN_PROGRESS"
+    )
+    healthlake_stubber.stub_describe_fhir_export_job(datastore_id, job_id)
+
+    future = wrapper.watch_export_job_complete(datastore_id, job_id)
+
+    assert future.result() == "COMPLETED"
+
+
+def test_job_waiter_multiplexes_jobs():
+    statuses = {
+        f"job-{index}": ["IN_PROGRESS"] * index + ["COMPLETED"] for index in range(20)
+    }
+    with JobWaiter(min_delay=0) as waiter:
+        futures = [
+            waiter.submit(key, lambda key=key: statuses[key].pop(0), ["COMPLETED"])
+            for key in statuses
+        ]
+        assert [future.result(timeout=5) for future in futures] == ["COMPLETED"] * 20
+    assert all(not remaining for remaining in statuses.values())
+
+
+def test_job_waiter_retries_throttled_polls():
+    poll = MagicMock(
+        side_effect=[
+            ClientError({"Error": {"Code": "ThrottlingException"}}, "Describe"),
+            "COMPLETED",
+        ]
+    )
+    with JobWaiter(min_delay=0) as waiter:
+        assert waiter.wait("job", poll, ["COMPLETED"]) == "COMPLETED"
+    assert poll.call_count == 2
+
+
+def test_job_waiter_times_out():
+    with JobWaiter(min_delay=0.01, max_delay=0.01) as waiter:
+        with pytest.raises(JobTimeoutError) as exc_info:
+            waiter.wait("job", lambda: "IN_PROGRESS", ["COMPLETED"], timeout=0.05)
+    assert exc_info.value.status == "IN_PROGRESS"
+
+
+def test_job_waiter_notify_event():
+    statuses = ["IN_PROGRESS", "COMPLETED"]
+    with JobWaiter(min_delay=60, max_delay=60) as waiter:
+        future = waiter.submit("job-id", lambda: statuses.pop(0), ["COMPLETED"])
+        while statuses == ["IN_PROGRESS", "COMPLETED"]:
+            time.sleep(0.01)
+        waiter.notify_event({"detail": {"other": "id"}})
+        assert not future.done()
+        waiter.notify_event({"detail": {"jobs": [{"jobId": "job-id"}]}})
+        assert future.result(timeout=5) == "COMPLETED"
+
+
+def test_sqs_event_listener():
+    sqs_client = MagicMock()
+    sqs_client.receive_message.return_value = {
+        "Messages": [
+            {
+                "MessageId": "1",
+                "ReceiptHandle": "handle-1",
+                "Body": json.dumps({"detail": {"jobId": "job-id"}}),
+            },
+            {"MessageId": "2", "ReceiptHandle": "handle-2", "Body": "not json"},
+        ]
+    }
+    job_waiter = MagicMock()
+    listener = SqsEventListener(sqs_client, "queue-url", job_waiter)
+
+    assert listener.receive() == 2
+
+    job_waiter.notify_event.assert_called_once_with({"detail": {"jobId": "job-id"}})
+    sqs_client.delete_message_batch.assert_called_once_with(
+        QueueUrl="queue-url",
+        Entries=[
+            {"Id": "0", "ReceiptHandle": "handle-1"},
+            {"Id": "1", "ReceiptHandle": "handle-2"},
+        ],
+    )
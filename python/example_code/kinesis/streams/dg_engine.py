@@ -0,0 +1,449 @@
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: Apache-2.0
+
+"""
+Purpose
+
+Shows how to use the AWS SDK for Python (Boto3) with the Amazon Kinesis API to
+generate synthetic data streams at a high, steady rate for load testing.
+
+The dg_* scripts in this folder build and send one record at a time. This engine
+generates the same kinds of data as each of them a whole batch at a time with
+NumPy, serializes each batch in bulk, paces output to a target number of records
+per second, and writes to a Kinesis stream, a local file, or stdout.
+"""
+
+import argparse
+import datetime
+import json
+import logging
+import sys
+import time
+
+import boto3
+import numpy as np
+
+logger = logging.getLogger(__name__)
+
+STREAM_NAME = "ExampleInputStream"
+TICKERS = np.array(["AAPL", "AMZN", "MSFT", "INTC", "TBV"])
+ORDER_TICKERS = np.array(["AAAA", "BBBB", "CCCC"])
+
+
+class HotspotGenerator:
+    """
+    Generates points used as input to a hotspot detection algorithm, like
+    dg_hotspots. With probability hotspot_weight, a point is drawn from the hotspot;
+    otherwise, it is drawn from the base field. The hotspot moves every
+    relocate_every points.
+    """
+
+    def __init__(self, field, hotspot_size=1, hotspot_weight=0.2, relocate_every=1000):
+        """
+        :param field: The base field, as a dict with left, width, top, and height.
+        :param hotspot_size: The width and height of the hotspot.
+        :param hotspot_weight: The probability that a point is drawn from the hotspot.
+        :param relocate_every: The number of points generated before the hotspot
+                               moves.
+        """
+        self.field = field
+        self.hotspot_size = hotspot_size
+        self.hotspot_weight = hotspot_weight
+        self.relocate_every = relocate_every
+        self.points_generated = 0
+        self.hotspot = None
+
+    def _relocate(self, rng):
+        self.hotspot = {
+            "left": self.field["left"]
+            + rng.random() * (self.field["width"] - self.hotspot_size),
+            "width": self.hotspot_size,
+            "top": self.field["top"]
+            + rng.random() * (self.field["height"] - self.hotspot_size),
+            "height": self.hotspot_size,
+        }
+
+    def __call__(self, rng, size):
+        """
+        :param rng: A NumPy random generator.
+        :param size: The number of records to generate.
+        :return: The records, serialized as JSON strings.
+        """
+        records = []
+        while len(records) < size:
+            if self.hotspot is None or self.points_generated % self.relocate_every == 0:
+                self._relocate(rng)
+            # Don't let a batch straddle a relocation of the hotspot.
+            count = min(
+                size - len(records),
+                self.relocate_every - self.points_generated % self.relocate_every,
+            )
+            is_hot = rng.random(count) < self.hotspot_weight
+            left = np.where(is_hot, self.hotspot["left"], self.field["left"])
+            width = np.where(is_hot, self.hotspot["width"], self.field["width"])
+            top = np.where(is_hot, self.hotspot["top"], self.field["top"])
+            height = np.where(is_hot, self.hotspot["height"], self.field["height"])
+            xs = left + rng.random(count) * width
+            ys = top + rng.random(count) * height
+            records += [
+                f'{{"x": {x!r}, "y": {y!r}, "is_hot": "{"Y" if hot else "N"}"}}'
+                for x, y, hot in zip(xs.tolist(), ys.tolist(), is_hot.tolist())
+            ]
+            self.points_generated += count
+        return records
+
+
+def anomaly_batch(rng, size):
+    """
+    Generates heart rates like dg_anomaly: 1% of rates are high and the rest are
+    normal.
+
+    :param rng: A NumPy random generator.
+    :param size: The number of records to generate.
+    :return: The records, serialized as JSON strings.
+    """
+    is_high = rng.random(size) < 0.01
+    rates = np.where(is_high, rng.integers(150, 201, size), rng.integers(60, 101, size))
+    return [
+        f'{{"heartRate": {rate}, "rateType": "{"HIGH" if high else "NORMAL"}"}}'
+        for rate, high in zip(rates.tolist(), is_high.tolist())
+    ]
+
+
+def anomalyex_batch(rng, size):
+    """
+    Generates blood pressure readings like dg_anomalyex: 0.5% of readings are low,
+    0.5% are high, and the rest are normal.
+
+    :param rng: A NumPy random generator.
+    :param size: The number of records to generate.
+    :return: The records, serialized as JSON strings.
+    """
+    rnd = rng.random(size)
+    level = np.select([rnd < 0.005, rnd > 0.995], [0, 2], default=1)
+    systolic_low = np.array([50, 90, 130])[level]
+    systolic_high = np.array([81, 121, 201])[level]
+    diastolic_low = np.array([30, 60, 90])[level]
+    diastolic_high = np.array([51, 81, 151])[level]
+    systolic = rng.integers(systolic_low, systolic_high)
+    diastolic = rng.integers(diastolic_low, diastolic_high)
+    names = ("LOW", "NORMAL", "HIGH")
+    return [
+        f'{{"BloodPressureLevel": "{names[lvl]}", '
+        f'"Systolic": {sys_val}, "Diastolic": {dia_val}}}'
+        for lvl, sys_val, dia_val in zip(
+            level.tolist(), systolic.tolist(), diastolic.tolist()
+        )
+    ]
+
+
+def stockticker_batch(rng, size):
+    """
+    Generates stock prices like dg_stockticker. All records in a batch share the
+    event time at which the batch was generated.
+
+    :param rng: A NumPy random generator.
+    :param size: The number of records to generate.
+    :return: The records, serialized as JSON strings.
+    """
+    event_time = datetime.datetime.now().isoformat()
+    tickers = rng.choice(TICKERS, size)
+    prices = np.round(rng.random(size) * 100, 2)
+    return [
+        f'{{"EVENT_TIME": "{event_time}", "TICKER": "{ticker}", "PRICE": {price!r}}}'
+        for ticker, price in zip(tickers.tolist(), prices.tolist())
+    ]
+
+
+class StaggerGenerator:
+    """
+    Generates stock tickers like dg_stagger: each record is repeated several times
+    with the same ticker and an event time in the past. dg_stagger sends the repeats
+    ten seconds apart; here their spacing comes from the target rate of the run, so
+    a rate of 0.1 records per second matches it.
+    """
+
+    def __init__(self, repeats=6, lag_seconds=10):
+        """
+        :param repeats: The number of times each record is repeated.
+        :param lag_seconds: How far the event time is behind the time at which the
+                            record is generated.
+        """
+        self.repeats = repeats
+        self.lag_seconds = lag_seconds
+        self.pending = []
+
+    def __call__(self, rng, size):
+        """
+        :param rng: A NumPy random generator.
+        :param size: The number of records to generate.
+        :return: The records, serialized as JSON strings. The repeats of a record
+                 that don't fit in this batch start the next one.
+        """
+        if len(self.pending) < size:
+            event_time = (
+                datetime.datetime.utcnow()
+                - datetime.timedelta(seconds=self.lag_seconds)
+            ).isoformat()
+            count = -(-(size - len(self.pending)) // self.repeats)
+            for ticker in rng.choice(TICKERS, count).tolist():
+                line = f'{{"EVENT_TIME": "{event_time}", "TICKER": "{ticker}"}}'
+                self.pending += [line] * self.repeats
+        records, self.pending = self.pending[:size], self.pending[size:]
+        return records
+
+
+class OrderTradeGenerator:
+    """
+    Generates two types of records like dg_tworecordtypes: each sell order is
+    followed by up to four trades against it. Order IDs count up across batches.
+    """
+
+    def __init__(self):
+        self.order_id = 1
+        self.pending = []
+
+    def __call__(self, rng, size):
+        """
+        :param rng: A NumPy random generator.
+        :param size: The number of records to generate.
+        :return: The records, serialized as JSON strings. The trades of an order
+                 that don't fit in this batch start the next one.
+        """
+        while len(self.pending) < size:
+            # An order brings 1.67 trades on average, so this is usually one pass.
+            count = -(-(size - len(self.pending)) // 2)
+            tickers = rng.choice(ORDER_TICKERS, count).tolist()
+            order_prices = rng.integers(500, 10001, count).tolist()
+            # Like range(1, randint(0, 6)) in dg_tworecordtypes.
+            trade_counts = np.maximum(rng.integers(0, 6, count) - 1, 0)
+            trade_prices = iter(rng.integers(0, 3001, trade_counts.sum()).tolist())
+            for ticker, order_price, trade_count in zip(
+                tickers, order_prices, trade_counts.tolist()
+            ):
+                oid = self.order_id
+                self.pending.append(
+                    f'{{"RecordType": "Order", "Oid": {oid}, "Oticker": "{ticker}", '
+                    f'"Oprice": {order_price}, "Otype": "Sell"}}'
+                )
+                self.pending += [
+                    f'{{"RecordType": "Trade", "Tid": {tid}, "Toid": {oid}, '
+                    f'"Tticker": "{ticker}", "Tprice": {next(trade_prices)}}}'
+                    for tid in range(1, trade_count + 1)
+                ]
+                self.order_id += 1
+        records, self.pending = self.pending[:size], self.pending[size:]
+        return records
+
+
+def static_batch(record):
+    """
+    Makes a generator that repeats a single record, like dg_weblog, dg_referrer,
+    dg_columnlog, and dg_regexlog.
+
+    :param record: The record to repeat.
+    :return: A batch generator function.
+    """
+    line = json.dumps(record)
+    return lambda rng, size: [line] * size
+
+
+GENERATORS = {
+    "hotspots": lambda: HotspotGenerator(
+        {"left": 0, "width": 10, "top": 0, "height": 10}
+    ),
+    "anomaly": lambda: anomaly_batch,
+    "anomalyex": lambda: anomalyex_batch,
+    "stockticker": lambda: stockticker_batch,
+    "weblog": lambda: static_batch(
+        {
+            "log": "192.168.254.30 - John [24/May/2004:22:01:02 -0700] "
+            '"GET /icons/apache_pb.gif HTTP/1.1" 304 0'
+        }
+    ),
+    "referrer": lambda: static_batch({"REFERRER": "http://www.amazon.com"}),
+    "columnlog": lambda: static_batch(
+        {"Col_A": "a", "Col_B": "b", "Col_C": "c", "Col_E_Unstructured": "x,y,z"}
+    ),
+    "regexlog": lambda: static_batch(
+        {
+            "LOGENTRY": "203.0.113.24 - - [25/Mar/2018:15:25:37 -0700] "
+            '"GET /index.php HTTP/1.1" 200 125 "-" '
+            '"Mozilla/5.0 [en] Gecko/20100101 Firefox/52.0"'
+        }
+    ),
+    "stagger": StaggerGenerator,
+    "tworecordtypes": OrderTradeGenerator,
+}
+
+
+class RatePacer:
+    """
+    Paces output to a target number of records per second. Instead of sleeping a
+    fixed time between batches, the pacer sleeps only as long as output is ahead
+    of schedule, so time spent generating and sending is not added on top.
+    """
+
+    def __init__(self, records_per_second, clock=time.monotonic, sleep=time.sleep):
+        """
+        :param records_per_second: The target rate. When this is None, output is
+                                   not paced.
+        :param clock: A function that returns the current time, in seconds.
+        :param sleep: A function that sleeps for a number of seconds.
+        """
+        self.records_per_second = records_per_second
+        self.clock = clock
+        self.sleep = sleep
+        self.start = None
+        self.sent = 0
+
+    def wait(self, count):
+        """
+        Records that a number of records were sent, and sleeps when output is ahead
+        of the target rate.
+
+        :param count: The number of records that were sent.
+        """
+        if self.start is None:
+            self.start = self.clock()
+        self.sent += count
+        if self.records_per_second is None:
+            return
+        ahead = self.start + self.sent / self.records_per_second - self.clock()
+        if ahead > 0:
+            self.sleep(ahead)
+
+
+class StdoutSink:
+    """Writes records to stdout, one per line."""
+
+    def __init__(self, stream=None):
+        self.stream = stream if stream is not None else sys.stdout
+
+    def write(self, records):
+        self.stream.write("\n".join(records) + "\n")
+
+    def close(self):
+        self.stream.flush()
+
+
+class FileSink:
+    """Writes records to a local file, one per line."""
+
+    def __init__(self, file_name):
+        self.file = open(file_name, "w")
+
+    def write(self, records):
+        self.file.write("\n".join(records) + "\n")
+
+    def close(self):
+        self.file.close()
+
+
+class KinesisSink:
+    """
+    Writes records to a Kinesis stream through a KinesisProducer, which batches them
+    into put_records calls and spreads them across shards.
+    """
+
+    def __init__(self, producer, partition_key=None):
+        """
+        :param producer: A KinesisProducer for the stream.
+        :param partition_key: The partition key for every record. When this is None,
+                              records are spread across the shards of the stream.
+        """
+        self.producer = producer
+        self.partition_key = partition_key
+
+    def write(self, records):
+        for record in records:
+            self.producer.add_encoded(record.encode("utf-8"), self.partition_key)
+
+    def close(self):
+        self.producer.close()
+
+
+def run(
+    generator,
+    sink,
+    records_per_second=None,
+    batch_size=500,
+    total_records=None,
+    seed=None,
+):
+    """
+    Generates batches of records and writes them to a sink until the total number of
+    records is reached or the run is interrupted.
+
+    :param generator: A function that takes a NumPy random generator and a batch
+                      size and returns that many records serialized as JSON.
+    :param sink: The sink that receives each batch.
+    :param records_per_second: The target output rate. When this is None, records
+                               are generated as fast as the sink accepts them.
+    :param batch_size: The number of records in each batch.
+    :param total_records: The number of records to generate. When this is None,
+                          records are generated until the run is interrupted.
+    :param seed: The seed of the random generator, for repeatable output.
+    :return: The number of records generated and the achieved records per second.
+    """
+    rng = np.random.default_rng(seed)
+    pacer = RatePacer(records_per_second)
+    start = time.perf_counter()
+    generated = 0
+    try:
+        while total_records is None or generated < total_records:
+            size = batch_size
+            if total_records is not None:
+                size = min(size, total_records - generated)
+            sink.write(generator(rng, size))
+            generated += size
+            pacer.wait(size)
+    except KeyboardInterrupt:
+        pass
+    finally:
+        sink.close()
+    elapsed = time.perf_counter() - start
+    rate = generated / elapsed if elapsed > 0 else 0
+    logger.info("Generated %s records at %.0f records/sec.", generated, rate)
+    return generated, rate
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Generate synthetic stream data at a target rate."
+    )
+    parser.add_argument("generator", choices=sorted(GENERATORS))
+    parser.add_argument(
+        "--output", choices=["kinesis", "file", "stdout"], default="stdout"
+    )
+    parser.add_argument("--stream-name", default=STREAM_NAME)
+    parser.add_argument("--file-name", default="records.jsonl")
+    parser.add_argument("--rate", type=float, help="Target records per second.")
+    parser.add_argument("--batch-size", type=int, default=500)
+    parser.add_argument("--count", type=int, help="Total records to generate.")
+    parser.add_argument("--seed", type=int)
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format="%(levelname)s: %(message)s")
+
+    if args.output == "kinesis":
+        from kinesis_stream import KinesisStream
+
+        stream = KinesisStream(boto3.client("kinesis"))
+        stream.describe(args.stream_name)
+        sink = KinesisSink(stream.producer())
+    elif args.output == "file":
+        sink = FileSink(args.file_name)
+    else:
+        sink = StdoutSink()
+    run(
+        GENERATORS[args.generator](),
+        sink,
+        records_per_second=args.rate,
+        batch_size=args.batch_size,
+        total_records=args.count,
+        seed=args.seed,
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -8,12 +8,25 @@ Shows how to use the AWS SDK for Python (Boto3) with Amazon Kinesis to create an
 manage streams.
 """
 
+import itertools
 import json
 import logging
-from botocore.exceptions import ClientError
+import os
+import queue
+import random
+import sqlite3
+import threading
+import time
+import uuid
+from botocore.exceptions import BotoCoreError, ClientError
 
 logger = logging.getLogger(__name__)
 
+MAX_PUT_RECORDS_COUNT = 500  # Kinesis rejects a put_records call with more records.
+MAX_PUT_RECORDS_BYTES = 5 * 1024 * 1024  # Kinesis limit on the size of a request.
+MAX_RECORD_BYTES = 1024 * 1024  # Kinesis limit on the size of a single record.
+SHARD_END = "SHARD_END"  # Checkpoint value for a shard that has been read to its end.
+
 
 # snippet-start:[python.example_code.kinesis.KinesisStream.class]
 class KinesisStream:
@@ -125,6 +138,30 @@ class KinesisStream:
 
     # snippet-end:[python.example_code.kinesis.PutRecord]
 
+    def producer(self, **kwargs):
+        """
+        Creates a buffered producer that batches records into put_records calls
+        for this stream. The producer is a context manager that flushes all
+        buffered records when the context exits.
+
+        :param kwargs: Keyword arguments that are passed to KinesisProducer.
+        :return: The producer.
+        """
+        return KinesisProducer(self.kinesis_client, self.name, self.details, **kwargs)
+
+    def consumer(self, process_records, **kwargs):
+        """
+        Creates a consumer that reads every shard of this stream in parallel.
+
+        :param process_records: A function that is called with the shard ID and
+                                each batch of records.
+        :param kwargs: Keyword arguments that are passed to KinesisConsumer.
+        :return: The consumer.
+        """
+        return KinesisConsumer(
+            self.kinesis_client, self.name, process_records, **kwargs
+        )
+
     # snippet-start:[python.example_code.kinesis.GetRecords]
     def get_records(self, max_records):
         """
@@ -161,3 +198,530 @@ class KinesisStream:
 
 
 # snippet-end:[python.example_code.kinesis.GetRecords]
+
+
+class KinesisProducer:
+    """
+    Buffers records and sends them to a Kinesis stream in batches.
+
+    Records are serialized when they are added and are sent by a background thread
+    with put_records when a batch reaches 500 records or 5 MB, or when the oldest
+    buffered record has waited longer than the linger time. Only the entries that
+    Kinesis reports as failed are retried. When the buffer is full, add blocks the
+    caller until there is room, which applies back-pressure to the data source.
+    """
+
+    def __init__(
+        self,
+        kinesis_client,
+        stream_name,
+        stream_details=None,
+        max_buffered=10000,
+        linger_seconds=0.1,
+        max_retries=5,
+        base_backoff=0.1,
+    ):
+        """
+        :param kinesis_client: A Boto3 Kinesis client.
+        :param stream_name: The name of the stream.
+        :param stream_details: The stream metadata returned by describe_stream.
+                               When it includes shards, records that are added
+                               without a partition key are spread evenly across
+                               the open shards.
+        :param max_buffered: The maximum number of records to buffer before add
+                             blocks.
+        :param linger_seconds: The maximum time a record waits for a batch to fill.
+        :param max_retries: The maximum number of times to retry failed entries.
+        :param base_backoff: The base backoff time between retries, in seconds.
+        """
+        self.kinesis_client = kinesis_client
+        self.stream_name = stream_name
+        self.linger_seconds = linger_seconds
+        self.max_retries = max_retries
+        self.base_backoff = base_backoff
+        self.records_sent = 0
+        self.failed_records = []
+        self._buffer = queue.Queue(maxsize=max_buffered)
+        self._hash_keys = self._shard_hash_keys(stream_details)
+        self._closed = False
+        self._sender = threading.Thread(target=self._send_loop, daemon=True)
+        self._sender.start()
+
+    @staticmethod
+    def _shard_hash_keys(stream_details):
+        """
+        Gets a hash key in the middle of the hash key range of each open shard.
+
+        :param stream_details: The stream metadata returned by describe_stream.
+        :return: A cycle of hash keys, or None when no shards are known.
+        """
+        if not stream_details:
+            return None
+        hash_keys = []
+        for shard in stream_details.get("Shards", []):
+            if "EndingSequenceNumber" in shard.get("SequenceNumberRange", {}):
+                continue
+            key_range = shard["HashKeyRange"]
+            start = int(key_range["StartingHashKey"])
+            end = int(key_range["EndingHashKey"])
+            hash_keys.append(str((start + end) // 2))
+        return itertools.cycle(hash_keys) if hash_keys else None
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def add(self, data, partition_key=None, timeout=None):
+        """
+        Adds a record to the buffer. The data is formatted as JSON.
+
+        :param data: The data to put in the stream.
+        :param partition_key: The partition key to use for the data. When this is
+                              None, records are spread across the shards of the
+                              stream.
+        :param timeout: The maximum time to wait for room in the buffer. When this
+                        is None, add waits until there is room.
+        """
+        self.add_encoded(json.dumps(data).encode("utf-8"), partition_key, timeout)
+
+    def add_encoded(self, encoded, partition_key=None, timeout=None):
+        """
+        Adds a record that is already serialized to bytes to the buffer.
+
+        :param encoded: The bytes to put in the stream.
+        :param partition_key: The partition key to use for the data. When this is
+                              None, records are spread across the shards of the
+                              stream.
+        :param timeout: The maximum time to wait for room in the buffer. When this
+                        is None, add waits until there is room.
+        """
+        if self._closed:
+            raise RuntimeError("Can't add records to a closed producer.")
+        entry = {"Data": encoded}
+        if partition_key is None:
+            entry["PartitionKey"] = uuid.uuid4().hex
+            if self._hash_keys is not None:
+                entry["ExplicitHashKey"] = next(self._hash_keys)
+        else:
+            entry["PartitionKey"] = partition_key
+        if len(encoded) + len(entry["PartitionKey"]) > MAX_RECORD_BYTES:
+            raise ValueError("The record is larger than the 1 MB Kinesis limit.")
+        self._buffer.put(entry, timeout=timeout)
+
+    def flush(self):
+        """
+        Waits until every record that has been added is sent or has failed.
+        """
+        self._buffer.join()
+
+    def close(self):
+        """
+        Sends all buffered records and stops the background sender.
+        """
+        if self._closed:
+            return
+        self._closed = True
+        self._buffer.put(None)
+        self._sender.join()
+        if self.failed_records:
+            logger.warning(
+                "%s records could not be put in stream %s.",
+                len(self.failed_records),
+                self.stream_name,
+            )
+
+    def _next_batch(self, first=None):
+        """
+        Collects the next batch from the buffer, waiting no longer than the linger
+        time after the first record of the batch arrives.
+
+        :param first: A record left over from the previous batch, if any.
+        :return: The batch, a record that didn't fit in the batch or None, and a
+                 flag that is True when the producer is closing.
+        """
+        batch = []
+        batch_bytes = 0
+        entry = first if first is not None else self._buffer.get()
+        if entry is None:
+            self._buffer.task_done()
+            return batch, None, True
+        deadline = time.monotonic() + self.linger_seconds
+        while True:
+            batch.append(entry)
+            batch_bytes += len(entry["Data"]) + len(entry["PartitionKey"])
+            if len(batch) == MAX_PUT_RECORDS_COUNT:
+                return batch, None, False
+            try:
+                entry = self._buffer.get(timeout=max(deadline - time.monotonic(), 0))
+            except queue.Empty:
+                return batch, None, False
+            if entry is None:
+                self._buffer.task_done()
+                return batch, None, True
+            entry_bytes = len(entry["Data"]) + len(entry["PartitionKey"])
+            if batch_bytes + entry_bytes > MAX_PUT_RECORDS_BYTES:
+                return batch, entry, False
+
+    def _send_loop(self):
+        """
+        Sends batches until the producer is closed.
+        """
+        carry = None
+        closing = False
+        while not closing:
+            batch, carry, closing = self._next_batch(carry)
+            if batch:
+                try:
+                    self._send_batch(batch)
+                except Exception:
+                    # Any error must not stop the sender, or flush and add would
+                    # wait forever for records that are never sent.
+                    logger.exception(
+                        "Couldn't put records in stream %s.", self.stream_name
+                    )
+                    self.failed_records.extend(batch)
+                finally:
+                    for _ in batch:
+                        self._buffer.task_done()
+
+    def _send_batch(self, batch):
+        """
+        Sends a batch with put_records and retries only the entries that fail.
+
+        :param batch: The records to send.
+        """
+        pending = batch
+        for attempt in range(self.max_retries + 1):
+            try:
+                response = self.kinesis_client.put_records(
+                    StreamName=self.stream_name, Records=pending
+                )
+            except ClientError as err:
+                if (
+                    err.response["Error"]["Code"]
+                    != "ProvisionedThroughputExceededException"
+                ):
+                    logger.exception(
+                        "Couldn't put records in stream %s.", self.stream_name
+                    )
+                    self.failed_records.extend(pending)
+                    return
+            except BotoCoreError:
+                logger.exception("Couldn't put records in stream %s.", self.stream_name)
+                self.failed_records.extend(pending)
+                return
+            else:
+                failed = [
+                    entry
+                    for entry, result in zip(pending, response["Records"])
+                    if "ErrorCode" in result
+                ]
+                self.records_sent += len(pending) - len(failed)
+                if not failed:
+                    return
+                logger.info(
+                    "%s of %s records failed, retrying.", len(failed), len(pending)
+                )
+                pending = failed
+            if attempt < self.max_retries:
+                time.sleep(random.uniform(0, self.base_backoff * 2**attempt))
+        self.failed_records.extend(pending)
+
+
+class FileCheckpointStore:
+    """
+    Stores the last processed sequence number of each shard in a local JSON file.
+    """
+
+    def __init__(self, file_name):
+        """
+        :param file_name: The file in which to store checkpoints.
+        """
+        self.file_name = file_name
+        self._lock = threading.Lock()
+        try:
+            with open(file_name) as checkpoint_file:
+                self._checkpoints = json.load(checkpoint_file)
+        except FileNotFoundError:
+            self._checkpoints = {}
+
+    def get(self, stream_name, shard_id):
+        """
+        :return: The checkpoint of the shard, or None when there isn't one.
+        """
+        with self._lock:
+            return self._checkpoints.get(stream_name, {}).get(shard_id)
+
+    def put(self, stream_name, shard_id, sequence_number):
+        """
+        Saves the checkpoint of a shard.
+        """
+        with self._lock:
+            self._checkpoints.setdefault(stream_name, {})[shard_id] = sequence_number
+            temp_name = f"{self.file_name}.tmp"
+            with open(temp_name, "w") as checkpoint_file:
+                json.dump(self._checkpoints, checkpoint_file)
+            os.replace(temp_name, self.file_name)
+
+
+class SQLiteCheckpointStore:
+    """
+    Stores the last processed sequence number of each shard in a SQLite database.
+    """
+
+    def __init__(self, database):
+        """
+        :param database: The SQLite database file, or ":memory:".
+        """
+        self._lock = threading.Lock()
+        self._connection = sqlite3.connect(database, check_same_thread=False)
+        with self._connection:
+            self._connection.execute(
+                "CREATE TABLE IF NOT EXISTS checkpoints ("
+                "stream_name TEXT, shard_id TEXT, sequence_number TEXT, "
+                "PRIMARY KEY (stream_name, shard_id))"
+            )
+
+    def get(self, stream_name, shard_id):
+        """
+        :return: The checkpoint of the shard, or None when there isn't one.
+        """
+        with self._lock:
+            row = self._connection.execute(
+                "SELECT sequence_number FROM checkpoints "
+                "WHERE stream_name = ? AND shard_id = ?",
+                (stream_name, shard_id),
+            ).fetchone()
+        return row[0] if row else None
+
+    def put(self, stream_name, shard_id, sequence_number):
+        """
+        Saves the checkpoint of a shard.
+        """
+        with self._lock, self._connection:
+            self._connection.execute(
+                "INSERT OR REPLACE INTO checkpoints VALUES (?, ?, ?)",
+                (stream_name, shard_id, sequence_number),
+            )
+
+
+class _MemoryCheckpointStore:
+    """
+    Keeps checkpoints in memory only.
+    """
+
+    def __init__(self):
+        self._checkpoints = {}
+
+    def get(self, stream_name, shard_id):
+        return self._checkpoints.get((stream_name, shard_id))
+
+    def put(self, stream_name, shard_id, sequence_number):
+        self._checkpoints[(stream_name, shard_id)] = sequence_number
+
+
+class KinesisConsumer:
+    """
+    Reads records from every shard of a Kinesis stream, one worker thread per shard.
+
+    Shards created by resharding are read only after their parent shards have been
+    read to the end, so records for a partition key are processed in order. After
+    each batch is processed, the sequence number of its last record is saved to the
+    checkpoint store, and a restarted consumer resumes after that record. A shard
+    that is caught up with the tip of the stream, as reported by MillisBehindLatest,
+    is polled less often than one that is behind.
+    """
+
+    def __init__(
+        self,
+        kinesis_client,
+        stream_name,
+        process_records,
+        checkpoint_store=None,
+        batch_limit=1000,
+        initial_position="TRIM_HORIZON",
+        min_poll_interval=0.2,
+        idle_poll_interval=1.0,
+        shard_refresh_interval=30,
+    ):
+        """
+        :param kinesis_client: A Boto3 Kinesis client.
+        :param stream_name: The name of the stream.
+        :param process_records: A function that is called with the shard ID and each
+                                batch of records. It is called from the worker
+                                thread of the shard.
+        :param checkpoint_store: The store that persists checkpoints. When this is
+                                 None, checkpoints are kept only in memory.
+        :param batch_limit: The maximum number of records to get in one call.
+        :param initial_position: The iterator type used for a shard that has no
+                                 checkpoint, such as TRIM_HORIZON or LATEST.
+        :param min_poll_interval: The shortest time between reads of a shard. Kinesis
+                                  allows five reads per second per shard.
+        :param idle_poll_interval: The time between reads of a caught-up shard.
+        :param shard_refresh_interval: The time between checks for new shards.
+        """
+        self.kinesis_client = kinesis_client
+        self.stream_name = stream_name
+        self.process_records = process_records
+        self.checkpoint_store = (
+            checkpoint_store
+            if checkpoint_store is not None
+            else _MemoryCheckpointStore()
+        )
+        self.batch_limit = batch_limit
+        self.initial_position = initial_position
+        self.min_poll_interval = min_poll_interval
+        self.idle_poll_interval = idle_poll_interval
+        self.shard_refresh_interval = shard_refresh_interval
+        self.records_processed = 0
+        self._stop = threading.Event()
+        self._lock = threading.Lock()
+        self._workers = {}
+        self._errors = []
+
+    def list_shards(self):
+        """
+        Lists all shards of the stream, including closed shards that still hold
+        records, by following NextToken.
+
+        :return: The list of shards.
+        """
+        shards = []
+        kwargs = {"StreamName": self.stream_name}
+        while True:
+            response = self.kinesis_client.list_shards(**kwargs)
+            shards.extend(response["Shards"])
+            next_token = response.get("NextToken")
+            if next_token is None:
+                return shards
+            kwargs = {"NextToken": next_token}
+
+    def _is_finished(self, shard_id):
+        return self.checkpoint_store.get(self.stream_name, shard_id) == SHARD_END
+
+    def _ready_shards(self, shards):
+        """
+        Finds the shards that can be read now: shards that aren't finished or already
+        being read, and whose parents are finished or have expired from the stream.
+
+        :param shards: The shards of the stream.
+        :return: The IDs of the shards to start reading.
+        """
+        known = {shard["ShardId"] for shard in shards}
+        ready = []
+        for shard in shards:
+            shard_id = shard["ShardId"]
+            if shard_id in self._workers or self._is_finished(shard_id):
+                continue
+            parents = [
+                shard.get("ParentShardId"),
+                shard.get("AdjacentParentShardId"),
+            ]
+            if all(
+                parent is None or parent not in known or self._is_finished(parent)
+                for parent in parents
+            ):
+                ready.append(shard_id)
+        return ready
+
+    def _get_iterator(self, shard_id):
+        checkpoint = self.checkpoint_store.get(self.stream_name, shard_id)
+        kwargs = {"StreamName": self.stream_name, "ShardId": shard_id}
+        if checkpoint is None:
+            kwargs["ShardIteratorType"] = self.initial_position
+        else:
+            kwargs["ShardIteratorType"] = "AFTER_SEQUENCE_NUMBER"
+            kwargs["StartingSequenceNumber"] = checkpoint
+        return self.kinesis_client.get_shard_iterator(**kwargs)["ShardIterator"]
+
+    def _read_shard(self, shard_id):
+        """
+        Reads a shard until it is closed and fully read or the consumer is stopped.
+
+        :param shard_id: The shard to read.
+        """
+        backoff = self.min_poll_interval
+        try:
+            shard_iter = self._get_iterator(shard_id)
+            while shard_iter is not None and not self._stop.is_set():
+                try:
+                    response = self.kinesis_client.get_records(
+                        ShardIterator=shard_iter, Limit=self.batch_limit
+                    )
+                except ClientError as err:
+                    code = err.response["Error"]["Code"]
+                    if code == "ExpiredIteratorException":
+                        shard_iter = self._get_iterator(shard_id)
+                        continue
+                    if code == "ProvisionedThroughputExceededException":
+                        backoff = min(backoff * 2, 10)
+                        self._stop.wait(random.uniform(backoff / 2, backoff))
+                        continue
+                    raise
+                backoff = self.min_poll_interval
+                records = response["Records"]
+                if records:
+                    self.process_records(shard_id, records)
+                    self.checkpoint_store.put(
+                        self.stream_name, shard_id, records[-1]["SequenceNumber"]
+                    )
+                    with self._lock:
+                        self.records_processed += len(records)
+                shard_iter = response.get("NextShardIterator")
+                if shard_iter is None:
+                    self.checkpoint_store.put(self.stream_name, shard_id, SHARD_END)
+                    logger.info("Finished reading closed shard %s.", shard_id)
+                    break
+                if response.get("MillisBehindLatest", 0) > 0:
+                    self._stop.wait(self.min_poll_interval)
+                else:
+                    self._stop.wait(self.idle_poll_interval)
+        except Exception as error:
+            logger.exception("Couldn't read shard %s.", shard_id)
+            with self._lock:
+                self._errors.append(error)
+            self._stop.set()
+
+    def run(self, duration=None):
+        """
+        Reads all shards until the consumer is stopped, the duration elapses, or
+        every shard is closed and fully read.
+
+        :param duration: The maximum time to run, in seconds.
+        :return: The number of records processed.
+        """
+        deadline = None if duration is None else time.monotonic() + duration
+        next_refresh = 0
+        shards = []
+        while not self._stop.is_set():
+            now = time.monotonic()
+            if deadline is not None and now >= deadline:
+                break
+            if now >= next_refresh:
+                shards = self.list_shards()
+                next_refresh = now + self.shard_refresh_interval
+            for shard_id in self._ready_shards(shards):
+                worker = threading.Thread(
+                    target=self._read_shard, args=(shard_id,), daemon=True
+                )
+                self._workers[shard_id] = worker
+                worker.start()
+                logger.info("Started reading shard %s.", shard_id)
+            running = any(worker.is_alive() for worker in self._workers.values())
+            if not running and not self._ready_shards(shards):
+                break
+            self._stop.wait(self.min_poll_interval)
+        self.stop()
+        if self._errors:
+            raise self._errors[0]
+        return self.records_processed
+
+    def stop(self):
+        """
+        Stops all shard workers and waits for them to finish.
+        """
+        self._stop.set()
+        for worker in self._workers.values():
+            worker.join()
@@ -0,0 +1,102 @@
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: Apache-2.0
+
+"""
+Purpose
+
+Benchmarks KinesisStream.put_record against the buffered KinesisProducer by using a
+stand-in Kinesis client that simulates request latency and throttling, and reports
+the number of records sent per second for each approach.
+"""
+
+import argparse
+import random
+import time
+
+from kinesis_stream import KinesisStream
+
+
+class StandInClient:
+    """
+    A stand-in for the Kinesis client that implements put_record and put_records.
+    """
+
+    def __init__(self, latency, failure_rate):
+        """
+        :param latency: The simulated round-trip time of a request, in seconds.
+        :param failure_rate: The fraction of put_records entries that fail.
+        """
+        self.latency = latency
+        self.failure_rate = failure_rate
+
+    def get_waiter(self, name):
+        return None
+
+    def put_record(self, StreamName, Data, PartitionKey):
+        time.sleep(self.latency)
+        return {"ShardId": "shardId-000000000000", "SequenceNumber": "1"}
+
+    def put_records(self, StreamName, Records):
+        time.sleep(self.latency)
+        results = []
+        for _ in Records:
+            if random.random() < self.failure_rate:
+                results.append(
+                    {
+                        "ErrorCode": "ProvisionedThroughputExceededException",
+                        "ErrorMessage": "Rate exceeded for shard.",
+                    }
+                )
+            else:
+                results.append(
+                    {"ShardId": "shardId-000000000000", "SequenceNumber": "1"}
+                )
+        failed = sum(1 for result in results if "ErrorCode" in result)
+        return {"FailedRecordCount": failed, "Records": results}
+
+
+def run_benchmark(record_count, latency, failure_rate):
+    """
+    Sends the same records one at a time and through the producer, and prints the
+    throughput of each.
+
+    :param record_count: The number of records to send.
+    :param latency: The simulated round-trip time of a request, in seconds.
+    :param failure_rate: The fraction of put_records entries that fail.
+    """
+    stream = KinesisStream(StandInClient(latency, failure_rate))
+    stream.name = "bench-stream"
+    records = [{"id": index, "value": random.random()} for index in range(record_count)]
+
+    start = time.perf_counter()
+    for record in records:
+        stream.put_record(record, "partition_key")
+    single_rate = record_count / (time.perf_counter() - start)
+
+    start = time.perf_counter()
+    with stream.producer(base_backoff=latency) as producer:
+        for record in records:
+            producer.add(record)
+    batched_rate = producer.records_sent / (time.perf_counter() - start)
+
+    print(f"{'mode':>12} {'records/sec':>12}")
+    print(f"{'put_record':>12} {single_rate:>12.0f}")
+    print(f"{'producer':>12} {batched_rate:>12.0f}")
+    print(f"Speedup: {batched_rate / single_rate:.1f}x")
+    if producer.failed_records:
+        print(f"{len(producer.failed_records)} records failed after all retries.")
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Benchmark the buffered Kinesis producer against put_record."
+    )
+    parser.add_argument("--records", type=int, default=2000)
+    parser.add_argument("--latency", type=float, default=0.01)
+    parser.add_argument("--failure-rate", type=float, default=0.01)
+    args = parser.parse_args()
+    run_benchmark(args.records, args.latency, args.failure_rate)
+
+
+if __name__ == "__main__":
+    main()
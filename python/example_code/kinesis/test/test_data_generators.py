@@ -6,8 +6,10 @@ Unit tests for stream data generators.
 """
 
 import importlib
+import json
 import random
 import time
+import unittest.mock
 import boto3
 import pytest
 
@@ -158,3 +160,137 @@ def test_tworecordtypes_generator(make_stubber, monkeypatch):
 
     with pytest.raises(IndexError):
         module.generate(stream, kinesis_client)
+
+
+@pytest.mark.parametrize(
+    "generator_name,fields",
+    [
+        ("hotspots", {"x", "y", "is_hot"}),
+        ("anomaly", {"heartRate", "rateType"}),
+        ("anomalyex", {"BloodPressureLevel", "Systolic", "Diastolic"}),
+        ("stockticker", {"EVENT_TIME", "TICKER", "PRICE"}),
+        ("weblog", {"log"}),
+        ("referrer", {"REFERRER"}),
+        ("columnlog", {"Col_A", "Col_B", "Col_C", "Col_E_Unstructured"}),
+        ("regexlog", {"LOGENTRY"}),
+        ("stagger", {"EVENT_TIME", "TICKER"}),
+    ],
+)
+def test_engine_generators(generator_name, fields):
+    dg_engine = importlib.import_module("streams.dg_engine")
+    generator = dg_engine.GENERATORS[generator_name]()
+    rng = dg_engine.np.random.default_rng(7)
+
+    records = [json.loads(record) for record in generator(rng, 2500)]
+
+    assert len(records) == 2500
+    assert all(set(record) == fields for record in records)
+
+
+def test_engine_stagger_repeats():
+    dg_engine = importlib.import_module("streams.dg_engine")
+    generator = dg_engine.StaggerGenerator(repeats=6)
+    rng = dg_engine.np.random.default_rng(7)
+
+    # Batches that split a group of repeats carry the rest into the next batch.
+    records = generator(rng, 10) + generator(rng, 14)
+
+    assert len(records) == 24
+    assert all(len(set(records[index : index + 6])) == 1 for index in range(0, 24, 6))
+
+
+def test_engine_order_trades():
+    dg_engine = importlib.import_module("streams.dg_engine")
+    generator = dg_engine.OrderTradeGenerator()
+    rng = dg_engine.np.random.default_rng(7)
+
+    records = [
+        json.loads(record) for size in (7, 500, 993) for record in generator(rng, size)
+    ]
+
+    assert len(records) == 1500
+    assert records[0]["RecordType"] == "Order"
+    order = None
+    for record in records:
+        if record["RecordType"] == "Order":
+            assert order is None or record["Oid"] == order["Oid"] + 1
+            assert 500 <= record["Oprice"] <= 10000
+            order, trade_id = record, 0
+        else:
+            trade_id += 1
+            assert record["Tid"] == trade_id <= 4
+            assert record["Toid"] == order["Oid"]
+            assert record["Tticker"] == order["Oticker"]
+            assert 0 <= record["Tprice"] <= 3000
+
+
+def test_engine_hotspot_points():
+    dg_engine = importlib.import_module("streams.dg_engine")
+    field = {"left": 0, "width": 10, "top": 0, "height": 10}
+    generator = dg_engine.HotspotGenerator(field, hotspot_size=1, relocate_every=100)
+    rng = dg_engine.np.random.default_rng(7)
+
+    points = [json.loads(record) for record in generator(rng, 150)]
+    hotspot = generator.hotspot
+
+    assert generator.points_generated == 150
+    for point in points[100:]:
+        if point["is_hot"] == "Y":
+            assert hotspot["left"] <= point["x"] <= hotspot["left"] + 1
+            assert hotspot["top"] <= point["y"] <= hotspot["top"] + 1
+        assert 0 <= point["x"] <= 10 and 0 <= point["y"] <= 10
+
+
+def test_engine_rate_pacer():
+    dg_engine = importlib.import_module("streams.dg_engine")
+    now = [100.0]
+    sleeps = []
+
+    def fake_sleep(seconds):
+        sleeps.append(seconds)
+        now[0] += seconds
+
+    pacer = dg_engine.RatePacer(1000, clock=lambda: now[0], sleep=fake_sleep)
+    pacer.wait(500)
+    now[0] += 0.2  # Generating the next batch takes part of the time budget.
+    pacer.wait(500)
+
+    assert sleeps == [pytest.approx(0.5), pytest.approx(0.3)]
+
+
+def test_engine_run_to_file(tmp_path):
+    dg_engine = importlib.import_module("streams.dg_engine")
+    file_name = str(tmp_path / "records.jsonl")
+
+    generated, _ = dg_engine.run(
+        dg_engine.anomaly_batch,
+        dg_engine.FileSink(file_name),
+        batch_size=300,
+        total_records=1000,
+        seed=1,
+    )
+
+    with open(file_name) as records_file:
+        lines = records_file.read().splitlines()
+    assert generated == len(lines) == 1000
+
+
+def test_engine_run_to_kinesis():
+    dg_engine = importlib.import_module("streams.dg_engine")
+    kinesis_stream = importlib.import_module("streams.kinesis_stream")
+    kinesis_client = unittest.mock.MagicMock()
+    kinesis_client.put_records.side_effect = lambda StreamName, Records: {
+        "FailedRecordCount": 0,
+        "Records": [{"ShardId": "test-id", "SequenceNumber": "1"} for _ in Records],
+    }
+    producer = kinesis_stream.KinesisProducer(kinesis_client, "test-stream")
+
+    generated, _ = dg_engine.run(
+        dg_engine.stockticker_batch,
+        dg_engine.KinesisSink(producer, "partitionkey"),
+        total_records=1200,
+    )
+
+    assert generated == producer.records_sent == 1200
+    for call in kinesis_client.put_records.call_args_list:
+        assert len(call.kwargs["Records"]) <= kinesis_stream.MAX_PUT_RECORDS_COUNT
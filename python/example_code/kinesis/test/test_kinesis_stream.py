@@ -5,10 +5,15 @@
 Unit tests for kinesis_stream.py.
 """
 
+import queue
+import threading
+import time
+import unittest.mock
 import boto3
-from botocore.exceptions import ClientError
+from botocore.exceptions import ClientError, EndpointConnectionError
 import pytest
 
+from streams import kinesis_stream
 from streams.kinesis_stream import KinesisStream
 
 
@@ -128,3 +133,262 @@ def test_get_records(make_stubber, error_code):
             for _ in stream.get_records(max_records):
                 pass
         assert exc_info.value.response["Error"]["Code"] == error_code
+
+
+def test_producer_batches_and_retries_failed(monkeypatch):
+    kinesis_client = unittest.mock.MagicMock()
+    stream = KinesisStream(kinesis_client)
+    stream.name = "test-stream"
+    stream.details = {
+        "Shards": [
+            {
+                "ShardId": f"shard-{index}",
+                "HashKeyRange": {
+                    "StartingHashKey": str(index * 100),
+                    "EndingHashKey": str(index * 100 + 99),
+                },
+                "SequenceNumberRange": {"StartingSequenceNumber": "1"},
+            }
+            for index in range(2)
+        ]
+    }
+    calls = []
+
+    def mock_put_records(StreamName, Records):
+        calls.append(list(Records))
+        # Fail the first entry of the first call only.
+        results = [{"ShardId": "shard-0", "SequenceNumber": "1"} for _ in Records]
+        if len(calls) == 1:
+            results[0] = {"ErrorCode": "ProvisionedThroughputExceededException"}
+        return {"FailedRecordCount": len(calls) == 1, "Records": results}
+
+    kinesis_client.put_records.side_effect = mock_put_records
+    monkeypatch.setattr(time, "sleep", lambda x: None)
+
+    with stream.producer(linger_seconds=1) as producer:
+        for index in range(kinesis_stream.MAX_PUT_RECORDS_COUNT + 10):
+            producer.add({"index": index})
+
+    assert [len(call) for call in calls] == [
+        kinesis_stream.MAX_PUT_RECORDS_COUNT,
+        1,
+        10,
+    ]
+    assert calls[1][0] == calls[0][0]
+    assert {entry["ExplicitHashKey"] for entry in calls[0]} == {"49", "149"}
+    assert producer.records_sent == kinesis_stream.MAX_PUT_RECORDS_COUNT + 10
+    assert producer.failed_records == []
+
+
+def test_producer_splits_by_size():
+    kinesis_client = unittest.mock.MagicMock()
+    kinesis_client.put_records.side_effect = lambda StreamName, Records: {
+        "FailedRecordCount": 0,
+        "Records": [{"ShardId": "shard-0", "SequenceNumber": "1"} for _ in Records],
+    }
+    data = "x" * (kinesis_stream.MAX_RECORD_BYTES // 2)
+
+    with KinesisStream(kinesis_client).producer(linger_seconds=1) as producer:
+        for _ in range(12):
+            producer.add(data, "test-key")
+
+    batch_sizes = [
+        len(call.kwargs["Records"])
+        for call in kinesis_client.put_records.call_args_list
+    ]
+    assert batch_sizes == [9, 3]
+    assert producer.records_sent == 12
+
+
+def test_producer_back_pressure():
+    kinesis_client = unittest.mock.MagicMock()
+    release = threading.Event()
+
+    def mock_put_records(StreamName, Records):
+        release.wait()
+        return {
+            "FailedRecordCount": 0,
+            "Records": [{"ShardId": "shard-0", "SequenceNumber": "1"} for _ in Records],
+        }
+
+    kinesis_client.put_records.side_effect = mock_put_records
+    producer = KinesisStream(kinesis_client).producer(max_buffered=2, linger_seconds=0)
+    producer.add("first", "test-key")
+    # Wait for the sender to take the first record and block in put_records.
+    while kinesis_client.put_records.call_count == 0:
+        time.sleep(0.01)
+    producer.add("second", "test-key")
+    producer.add("third", "test-key")
+    with pytest.raises(queue.Full):
+        producer.add("fourth", "test-key", timeout=0.01)
+    release.set()
+    producer.close()
+    assert producer.records_sent == 3
+
+
+def test_producer_gives_up_on_client_error():
+    kinesis_client = unittest.mock.MagicMock()
+    kinesis_client.put_records.side_effect = ClientError(
+        {"Error": {"Code": "TestException"}}, "PutRecords"
+    )
+
+    with KinesisStream(kinesis_client).producer() as producer:
+        producer.add("test-data", "test-key")
+
+    assert len(producer.failed_records) == 1
+    with pytest.raises(RuntimeError):
+        producer.add("test-data", "test-key")
+
+
+@pytest.mark.parametrize(
+    "error",
+    [
+        EndpointConnectionError(endpoint_url="https://kinesis"),
+        ValueError("test error"),
+    ],
+)
+def test_producer_survives_other_errors(error):
+    kinesis_client = unittest.mock.MagicMock()
+    kinesis_client.put_records.side_effect = [
+        error,
+        {"Records": [{"SequenceNumber": "1", "ShardId": "shard-1"}]},
+    ]
+
+    with KinesisStream(kinesis_client).producer(linger_seconds=0) as producer:
+        producer.add("test-data", "test-key")
+        producer.flush()
+        producer.add("more-data", "test-key")
+        producer.flush()
+
+    assert len(producer.failed_records) == 1
+    assert producer.records_sent == 1
+
+
+@pytest.mark.parametrize("store_type", ["file", "sqlite"])
+def test_checkpoint_stores(tmp_path, store_type):
+    if store_type == "file":
+        make_store = lambda: kinesis_stream.FileCheckpointStore(
+            str(tmp_path / "checkpoints.json")
+        )
+    else:
+        make_store = lambda: kinesis_stream.SQLiteCheckpointStore(
+            str(tmp_path / "checkpoints.db")
+        )
+    store = make_store()
+    assert store.get("test-stream", "shard-0") is None
+    store.put("test-stream", "shard-0", "100")
+    store.put("test-stream", "shard-0", "200")
+    store.put("other-stream", "shard-0", "300")
+
+    reopened = make_store()
+    assert reopened.get("test-stream", "shard-0") == "200"
+    assert reopened.get("other-stream", "shard-0") == "300"
+
+
+def test_consumer_reads_parents_before_children():
+    kinesis_client = unittest.mock.MagicMock()
+    kinesis_client.list_shards.side_effect = [
+        {
+            "Shards": [{"ShardId": "parent-0"}, {"ShardId": "parent-1"}],
+            "NextToken": "test-token",
+        },
+        {
+            "Shards": [
+                {
+                    "ShardId": "child-0",
+                    "ParentShardId": "parent-0",
+                    "AdjacentParentShardId": "parent-1",
+                }
+            ]
+        },
+    ]
+    pages = {
+        "parent-0": [{"Records": [{"SequenceNumber": "1"}], "MillisBehindLatest": 5}],
+        "parent-1": [{"Records": [{"SequenceNumber": "2"}]}],
+        "child-0": [
+            {
+                "Records": [{"SequenceNumber": "3"}],
+                "NextShardIterator": "child-0",
+                "MillisBehindLatest": 0,
+            },
+            {"Records": [{"SequenceNumber": "4"}]},
+        ],
+    }
+    kinesis_client.get_shard_iterator.side_effect = lambda **kwargs: {
+        "ShardIterator": kwargs["ShardId"]
+    }
+    kinesis_client.get_records.side_effect = lambda ShardIterator, Limit: pages[
+        ShardIterator
+    ].pop(0)
+    processed = []
+    store = kinesis_stream.SQLiteCheckpointStore(":memory:")
+
+    stream = KinesisStream(kinesis_client)
+    stream.name = "test-stream"
+    consumer = stream.consumer(
+        lambda shard_id, records: processed.append((shard_id, records)),
+        checkpoint_store=store,
+        min_poll_interval=0,
+        idle_poll_interval=0,
+    )
+
+    assert consumer.run(duration=5) == 4
+    assert processed[-2:] == [
+        ("child-0", [{"SequenceNumber": "3"}]),
+        ("child-0", [{"SequenceNumber": "4"}]),
+    ]
+    assert kinesis_client.list_shards.call_args_list[1].kwargs == {
+        "NextToken": "test-token"
+    }
+    for shard_id in pages:
+        assert store.get("test-stream", shard_id) == kinesis_stream.SHARD_END
+
+
+def test_consumer_resumes_from_checkpoint():
+    kinesis_client = unittest.mock.MagicMock()
+    kinesis_client.list_shards.return_value = {"Shards": [{"ShardId": "shard-0"}]}
+    kinesis_client.get_shard_iterator.return_value = {"ShardIterator": "test-iter"}
+    kinesis_client.get_records.side_effect = [
+        ClientError(
+            {"Error": {"Code": "ProvisionedThroughputExceededException"}},
+            "GetRecords",
+        ),
+        {"Records": [{"SequenceNumber": "11"}]},
+    ]
+    store = kinesis_stream.SQLiteCheckpointStore(":memory:")
+    store.put("test-stream", "shard-0", "10")
+
+    consumer = kinesis_stream.KinesisConsumer(
+        kinesis_client,
+        "test-stream",
+        lambda shard_id, records: None,
+        checkpoint_store=store,
+        batch_limit=100,
+        min_poll_interval=0.01,
+    )
+
+    assert consumer.run(duration=5) == 1
+    kinesis_client.get_shard_iterator.assert_called_once_with(
+        StreamName="test-stream",
+        ShardId="shard-0",
+        ShardIteratorType="AFTER_SEQUENCE_NUMBER",
+        StartingSequenceNumber="10",
+    )
+    kinesis_client.get_records.assert_called_with(ShardIterator="test-iter", Limit=100)
+
+
+def test_consumer_raises_processing_error():
+    kinesis_client = unittest.mock.MagicMock()
+    kinesis_client.list_shards.return_value = {"Shards": [{"ShardId": "shard-0"}]}
+    kinesis_client.get_shard_iterator.return_value = {"ShardIterator": "test-iter"}
+    kinesis_client.get_records.side_effect = ClientError(
+        {"Error": {"Code": "TestException"}}, "GetRecords"
+    )
+
+    consumer = kinesis_stream.KinesisConsumer(
+        kinesis_client, "test-stream", lambda shard_id, records: None
+    )
+
+    with pytest.raises(ClientError) as exc_info:
+        consumer.run(duration=5)
+    assert exc_info.value.response["Error"]["Code"] == "TestException"
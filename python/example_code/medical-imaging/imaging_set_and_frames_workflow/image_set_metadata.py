@@ -0,0 +1,155 @@
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: Apache-2.0
+
+"""
+Purpose
+
+Shows how to read the metadata of an AWS HealthImaging image set straight from the
+response stream, index its series, instances, and image frames, and keep recently
+used metadata in memory so that it isn't downloaded and parsed again.
+
+The same module is used by the medical-imaging and imaging_set_and_frames_workflow
+examples. Each example runs on its own, so each keeps its own copy.
+"""
+
+import gzip
+import io
+import json
+import threading
+from collections import OrderedDict
+
+# The number of image set metadata documents that are kept in memory.
+DEFAULT_CACHE_SIZE = 16
+
+
+def load_metadata(metadata_blob):
+    """
+    Decompresses and parses image set metadata while it is read from the response
+    stream, without first writing it to a file or reading the compressed data
+    into memory.
+
+    :param metadata_blob: The imageSetMetadataBlob stream of a
+                          get_image_set_metadata response.
+    :return: The metadata, as a dict.
+    """
+    with gzip.GzipFile(fileobj=metadata_blob, mode="rb") as gz:
+        return json.load(io.TextIOWrapper(gz, encoding="utf-8"))
+
+
+class ImageSetMetadata:
+    """
+    Indexes the metadata of an image set by series, instance, and image frame.
+    """
+
+    def __init__(self, image_set_id, metadata):
+        """
+        :param image_set_id: The ID of the image set.
+        :param metadata: The image set metadata, as a dict.
+        """
+        self.image_set_id = image_set_id
+        self.metadata = metadata
+        self.series = {}
+        self.frames = {}
+        for series_id, series in metadata.get("Study", {}).get("Series", {}).items():
+            instances = {}
+            for instance_id, instance in series.get("Instances", {}).items():
+                dicom = instance.get("DICOM", {})
+                frames = []
+                for image_frame in instance.get("ImageFrames", []):
+                    checksums = image_frame.get(
+                        "PixelDataChecksumFromBaseToFullResolution", []
+                    )
+                    full_resolution = max(
+                        checksums, key=lambda checksum: checksum["Width"], default={}
+                    )
+                    frame = {
+                        "imageSetId": image_set_id,
+                        "imageFrameId": image_frame["ID"],
+                        "seriesId": series_id,
+                        "instanceId": instance_id,
+                        "rescaleIntercept": dicom.get("RescaleIntercept"),
+                        "rescaleSlope": dicom.get("RescaleSlope"),
+                        "minPixelValue": image_frame.get("MinPixelValue"),
+                        "maxPixelValue": image_frame.get("MaxPixelValue"),
+                        "fullResolutionChecksum": full_resolution.get("Checksum"),
+                    }
+                    frames.append(frame)
+                    self.frames[frame["imageFrameId"]] = frame
+                instances[instance_id] = frames
+            self.series[series_id] = instances
+
+    def get_frames(self, series_id=None, instance_id=None):
+        """
+        Gets image frames, optionally only those of one series or instance.
+
+        :param series_id: The series instance UID of the series.
+        :param instance_id: The SOP instance UID of the instance.
+        :return: The image frames, as dicts of frame information.
+        """
+        series_list = (
+            self.series.values() if series_id is None else [self.series[series_id]]
+        )
+        return [
+            frame
+            for instances in series_list
+            for inst_id, frames in instances.items()
+            if instance_id is None or inst_id == instance_id
+            for frame in frames
+        ]
+
+    def get_frame(self, image_frame_id):
+        """
+        Gets one image frame.
+
+        :param image_frame_id: The ID of the image frame.
+        :return: The frame information.
+        """
+        return self.frames[image_frame_id]
+
+
+class MetadataCache:
+    """
+    Keeps recently used image set metadata in memory. When the cache is full, the
+    metadata that was used longest ago is removed.
+    """
+
+    def __init__(self, max_size=DEFAULT_CACHE_SIZE):
+        """
+        :param max_size: The number of image set metadata documents to keep.
+        """
+        self.max_size = max_size
+        self._entries = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get_or_load(self, key, load):
+        """
+        Gets metadata from the cache, or loads and caches it when it isn't there.
+
+        :param key: The data store ID, image set ID, and version ID of the image set.
+        :param load: A function that loads the metadata.
+        :return: The metadata.
+        """
+        with self._lock:
+            if key in self._entries:
+                self._entries.move_to_end(key)
+                return self._entries[key]
+        value = load()
+        with self._lock:
+            self._entries[key] = value
+            self._entries.move_to_end(key)
+            while len(self._entries) > self.max_size:
+                self._entries.popitem(last=False)
+        return value
+
+    def invalidate(self, datastore_id, image_set_id):
+        """
+        Removes all versions of an image set from the cache.
+
+        :param datastore_id: The ID of the data store.
+        :param image_set_id: The ID of the image set.
+        """
+        with self._lock:
+            for key in [
+                key for key in self._entries if key[:2] == (datastore_id, image_set_id)
+            ]:
+                del self._entries[key]
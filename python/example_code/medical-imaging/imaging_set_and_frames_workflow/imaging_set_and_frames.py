@@ -19,8 +19,9 @@ import sys
 import os
 
 import boto3
+from botocore.config import Config
 from botocore.exceptions import ClientError
-from threading import Thread
+from concurrent.futures import ThreadPoolExecutor
 
 # Import the wrapper for the service functionality.
 from medicalimaging import MedicalImagingWrapper
@@ -55,6 +56,15 @@ IDC_IMAGE_CHOICES = [
 
 IMPORT_JOB_MANIFEST_FILE_NAME = "job-output-manifest.json"
 
+# The number of objects that are copied at the same time.
+COPY_WORKERS = 10
+# Objects at least this large are copied in parts with UploadPartCopy.
+MULTIPART_COPY_THRESHOLD = 100 * 1024 * 1024
+MULTIPART_COPY_PART_SIZE = 64 * 1024 * 1024
+# Copies that are throttled by Amazon S3 are tried this many times.
+MAX_COPY_TRIES = 5
+THROTTLING_ERROR_CODES = {"SlowDown", "Throttling", "ThrottlingException", "503"}
+
 
 class MedicalImagingWorkflowScenario:
     input_bucket_name = ""
@@ -248,46 +258,128 @@ class MedicalImagingWorkflowScenario:
         print("-" * 88)
 
     # snippet-start:[python.example_code.medical-imaging.workflow.copy]
-    def copy_single_object(self, key, source_bucket, target_bucket, target_directory):
+    def copy_single_object(
+        self, key, source_bucket, target_bucket, target_directory, size=0
+    ):
         """
-        Copies a single object from a source to a target bucket.
+        Copies a single object from a source to a target bucket. Large objects are
+        copied in parts. Copies that are throttled are tried again after a delay
+        that grows with each try.
 
         :param key: The key of the object to copy.
         :param source_bucket: The source bucket for the copy.
         :param target_bucket: The target bucket for the copy.
         :param target_directory: The target directory for the copy.
+        :param size: The size of the object, in bytes.
         """
         new_key = target_directory + "/" + key
         copy_source = {"Bucket": source_bucket, "Key": key}
-        self.s3_client.copy_object(
-            CopySource=copy_source, Bucket=target_bucket, Key=new_key
-        )
+        for tries in range(1, MAX_COPY_TRIES + 1):
+            try:
+                if size >= MULTIPART_COPY_THRESHOLD:
+                    self.copy_object_in_parts(copy_source, target_bucket, new_key, size)
+                else:
+                    self.s3_client.copy_object(
+                        CopySource=copy_source, Bucket=target_bucket, Key=new_key
+                    )
+                break
+            except ClientError as err:
+                if (
+                    err.response["Error"]["Code"] not in THROTTLING_ERROR_CODES
+                    or tries == MAX_COPY_TRIES
+                ):
+                    raise
+                time.sleep(random.uniform(0, 2**tries * 0.1))
         print(f"\n\t\tCopying {key}.")
 
+    def copy_object_in_parts(self, copy_source, target_bucket, target_key, size):
+        """
+        Copies an object with a multipart upload whose parts are copied from the
+        source object by Amazon S3.
+
+        :param copy_source: The bucket and key of the source object.
+        :param target_bucket: The target bucket for the copy.
+        :param target_key: The target key for the copy.
+        :param size: The size of the source object, in bytes.
+        """
+        upload_id = self.s3_client.create_multipart_upload(
+            Bucket=target_bucket, Key=target_key
+        )["UploadId"]
+        try:
+            parts = []
+            for part_number, start in enumerate(
+                range(0, size, MULTIPART_COPY_PART_SIZE), start=1
+            ):
+                end = min(start + MULTIPART_COPY_PART_SIZE, size) - 1
+                response = self.s3_client.upload_part_copy(
+                    Bucket=target_bucket,
+                    Key=target_key,
+                    UploadId=upload_id,
+                    PartNumber=part_number,
+                    CopySource=copy_source,
+                    CopySourceRange=f"bytes={start}-{end}",
+                )
+                parts.append(
+                    {
+                        "PartNumber": part_number,
+                        "ETag": response["CopyPartResult"]["ETag"],
+                    }
+                )
+            self.s3_client.complete_multipart_upload(
+                Bucket=target_bucket,
+                Key=target_key,
+                UploadId=upload_id,
+                MultipartUpload={"Parts": parts},
+            )
+        except ClientError:
+            self.s3_client.abort_multipart_upload(
+                Bucket=target_bucket, Key=target_key, UploadId=upload_id
+            )
+            raise
+
     def copy_images(
         self, source_bucket, source_directory, target_bucket, target_directory
     ):
         """
         Copies the images from the source to the target bucket using multiple threads.
 
+        Objects are listed a page at a time, and the objects in each page are
+        copied while the next page is listed.
+
         :param source_bucket: The source bucket for the images.
         :param source_directory: Directory within the source bucket.
         :param target_bucket: The target bucket for the images.
         :param target_directory: Directory within the target bucket.
         """
-
-        # Get list of all objects in source bucket.
-        list_response = self.s3_client.list_objects_v2(
-            Bucket=source_bucket, Prefix=source_directory
+        start = time.perf_counter()
+        total_size = 0
+        futures = []
+        with ThreadPoolExecutor(max_workers=COPY_WORKERS) as executor:
+            paginator = self.s3_client.get_paginator("list_objects_v2")
+            for page in paginator.paginate(
+                Bucket=source_bucket, Prefix=source_directory
+            ):
+                for obj in page.get("Contents", []):
+                    total_size += obj["Size"]
+                    futures.append(
+                        executor.submit(
+                            self.copy_single_object,
+                            obj["Key"],
+                            source_bucket,
+                            target_bucket,
+                            target_directory,
+                            obj["Size"],
+                        )
+                    )
+        for future in futures:
+            future.result()
+
+        elapsed = time.perf_counter() - start
+        print(
+            f"\t\tDone copying all objects. Copied {len(futures)} objects and "
+            f"{total_size / 1024 / 1024:.1f} MB in {elapsed:.1f} seconds "
+            f"({total_size / 1024 / 1024 / elapsed if elapsed else 0:.1f} MB/sec)."
         )
-        objs = list_response["Contents"]
-        keys = [obj["Key"] for obj in objs]
-
-        # Copy the objects in the bucket.
-        for key in keys:
-            self.copy_single_object(key, source_bucket, target_bucket, target_directory)
-
-        print("\t\tDone copying all objects.")
 
     # snippet-end:[python.example_code.medical-imaging.workflow.copy]
 
@@ -384,7 +476,8 @@ class MedicalImagingWorkflowScenario:
 
 if __name__ == "__main__":
     try:
-        s3 = boto3.client("s3")
+        # The connection pool is large enough for all of the copy threads.
+        s3 = boto3.client("s3", config=Config(max_pool_connections=COPY_WORKERS))
         cf = boto3.resource("cloudformation")
         medical_imaging_wrapper = MedicalImagingWrapper.from_client()
 
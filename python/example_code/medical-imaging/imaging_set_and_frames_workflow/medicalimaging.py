@@ -4,16 +4,38 @@
 import logging
 import boto3
 import os
-import gzip
+import threading
 import zlib
 import openjpeg
 import json
 import jmespath
 import time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
 from botocore.exceptions import ClientError
 
+from image_set_metadata import ImageSetMetadata, MetadataCache, load_metadata
+
 logger = logging.getLogger(__name__)
 
+# The number of image frames that are downloaded at the same time. This matches the
+# default connection pool size of a Boto3 client.
+DEFAULT_DOWNLOAD_WORKERS = 10
+# The number of downloaded image frames that can wait to be decoded, which limits
+# how much memory is used when decoding is slower than downloading.
+DEFAULT_MAX_PENDING_FRAMES = 64
+
+
+def decode_and_checksum(frame_data):
+    """
+    Decodes an HTJ2K image frame and calculates the CRC32 checksum of the decoded
+    bitmap. This is a module-level function so that it can run on a process pool.
+
+    :param frame_data: The HTJ2K encoded image frame, as bytes.
+    :return: The CRC32 checksum of the decoded bitmap.
+    """
+    image_array = MedicalImagingWrapper.jph_image_to_opj_bitmap(frame_data)
+    return zlib.crc32(image_array)
+
 
 # snippet-start:[python.example_code.medical-imaging.MedicalImagingWorkflowWrapper.class]
 # snippet-start:[python.example_code.medical-imaging.MedicalImagingWorkflowWrapper.decl]
@@ -22,13 +44,16 @@ logger = logging.getLogger(__name__)
 class MedicalImagingWrapper:
     """Encapsulates AWS HealthImaging functionality."""
 
-    def __init__(self, medical_imaging_client, s3_client):
+    def __init__(self, medical_imaging_client, s3_client, metadata_cache=None):
         """
         :param medical_imaging_client: A Boto3 Amazon MedicalImaging client.
         :param s3_client: A Boto3 S3 client.
+        :param metadata_cache: A cache of image set metadata. When not specified, a
+                               new cache is used.
         """
         self.medical_imaging_client = medical_imaging_client
         self.s3_client = s3_client
+        self.metadata_cache = metadata_cache or MetadataCache()
 
     @classmethod
     def from_client(cls):
@@ -77,6 +102,39 @@ class MedicalImagingWrapper:
 
     # snippet-end:[python.example_code.medical-imaging.workflow.GetImageSetMetadata]
 
+    def get_image_set_metadata_index(self, datastore_id, image_set_id, version_id=None):
+        """
+        Get the metadata of an image set, indexed by series, instance, and image
+        frame. The metadata is parsed as it is read from the response, and is kept
+        in a cache so that later calls for the same version don't download it again.
+
+        :param datastore_id: The ID of the data store.
+        :param image_set_id: The ID of the image set.
+        :param version_id: The version of the image set.
+        :return: The indexed image set metadata.
+        """
+
+        def load():
+            params = {"datastoreId": datastore_id, "imageSetId": image_set_id}
+            if version_id:
+                params["versionId"] = version_id
+            try:
+                response = self.medical_imaging_client.get_image_set_metadata(**params)
+            except ClientError as err:
+                logger.error(
+                    "Couldn't get image metadata. Here's why: %s: %s",
+                    err.response["Error"]["Code"],
+                    err.response["Error"]["Message"],
+                )
+                raise
+            return ImageSetMetadata(
+                image_set_id, load_metadata(response["imageSetMetadataBlob"])
+            )
+
+        return self.metadata_cache.get_or_load(
+            (datastore_id, image_set_id, version_id), load
+        )
+
     # snippet-start:[python.example_code.medical-imaging.workflow.StartDICOMImportJob]
     def start_dicom_import_job(
         self,
@@ -194,53 +252,21 @@ class MedicalImagingWrapper:
     # snippet-end:[python.example_code.medical-imaging.workflow.SearchImageSets]
 
     # snippet-start:[python.example_code.medical-imaging.workflow.GetImageFrames]
-    def get_image_frames_for_image_set(self, datastore_id, image_set_id, out_directory):
+    def get_image_frames_for_image_set(
+        self, datastore_id, image_set_id, out_directory=None
+    ):
         """
         Get the image frames for an image set.
 
         :param datastore_id: The ID of the data store.
         :param image_set_id: The ID of the image set.
-        :param out_directory: The directory to save the file.
+        :param out_directory: Not used. The metadata is read in memory instead of
+                              from a file in this directory.
         :return: The image frames.
         """
-        image_frames = []
-        file_name = os.path.join(out_directory, f"{image_set_id}_metadata.json.gzip")
-        file_name = file_name.replace("/", "\\\\")
-        self.get_image_set_metadata(file_name, datastore_id, image_set_id)
-        try:
-            with gzip.open(file_name, "rb") as f_in:
-                doc = json.load(f_in)
-            instances = jmespath.search("Study.Series.*.Instances[].*[]", doc)
-            for instance in instances:
-                rescale_slope = jmespath.search("DICOM.RescaleSlope", instance)
-                rescale_intercept = jmespath.search("DICOM.RescaleIntercept", instance)
-                image_frames_json = jmespath.search("ImageFrames[][]", instance)
-                for image_frame in image_frames_json:
-                    checksum_json = jmespath.search(
-                        "max_by(PixelDataChecksumFromBaseToFullResolution, &Width)",
-                        image_frame,
-                    )
-                    image_frame_info = {
-                        "imageSetId": image_set_id,
-                        "imageFrameId": image_frame["ID"],
-                        "rescaleIntercept": rescale_intercept,
-                        "rescaleSlope": rescale_slope,
-                        "minPixelValue": image_frame["MinPixelValue"],
-                        "maxPixelValue": image_frame["MaxPixelValue"],
-                        "fullResolutionChecksum": checksum_json["Checksum"],
-                    }
-                    image_frames.append(image_frame_info)
-            return image_frames
-        except TypeError:
-            return {}
-        except ClientError as err:
-            logger.error(
-                "Couldn't get image frames for image set. Here's why: %s: %s",
-                err.response["Error"]["Code"],
-                err.response["Error"]["Message"],
-            )
-            raise
-        return image_frames
+        return self.get_image_set_metadata_index(
+            datastore_id, image_set_id
+        ).get_frames()
 
     # snippet-end:[python.example_code.medical-imaging.workflow.GetImageFrames]
 
@@ -279,50 +305,97 @@ class MedicalImagingWrapper:
 
     # snippet-start:[python.example_code.medical-imaging.workflow.downloadAndCheck]
     def download_decode_and_check_image_frames(
-        self, data_store_id, image_frames, out_directory
+        self,
+        data_store_id,
+        image_frames,
+        out_directory=None,
+        download_workers=DEFAULT_DOWNLOAD_WORKERS,
+        decode_executor=None,
+        max_pending=DEFAULT_MAX_PENDING_FRAMES,
     ):
         """
         Downloads image frames, decodes them, and uses the checksum to validate
         the decoded images.
 
+        Frames are downloaded into memory by a pool of threads. Decoding is
+        CPU-bound, so each downloaded frame is decoded and checked on a pool of
+        processes while other frames are still downloading.
+
         :param data_store_id: The HealthImaging data store ID.
         :param image_frames: A list of dicts containing image frame information.
-        :param out_directory: A directory for the downloaded images.
+        :param out_directory: A directory for the downloaded images. When not
+                              specified, the images are not written to files.
+        :param download_workers: The number of frames to download at the same time.
+        :param decode_executor: The executor that decodes frames. When not
+                                specified, a process pool with one process per CPU
+                                is used.
+        :param max_pending: The maximum number of downloaded frames that wait to be
+                            decoded.
         :return: True if the function succeeded; otherwise, False.
         """
-        total_result = True
-        for image_frame in image_frames:
-            image_file_path = f"{out_directory}/image_{image_frame['imageFrameId']}.jph"
-            self.get_pixel_data(
-                image_file_path,
-                data_store_id,
-                image_frame["imageSetId"],
-                image_frame["imageFrameId"],
-            )
+        pending = threading.BoundedSemaphore(max_pending)
+        own_executor = decode_executor is None
+        if own_executor:
+            decode_executor = ProcessPoolExecutor()
 
-            image_array = self.jph_image_to_opj_bitmap(image_file_path)
-            crc32_checksum = image_frame["fullResolutionChecksum"]
-            # Verify checksum.
-            crc32_calculated = zlib.crc32(image_array)
-            image_result = crc32_checksum == crc32_calculated
-            print(
-                f"\t\tImage checksum verified for {image_frame['imageFrameId']}: {image_result }"
-            )
-            total_result = total_result and image_result
+        def download(image_frame):
+            pending.acquire()
+            try:
+                frame_data = self.get_image_frame_data(
+                    data_store_id,
+                    image_frame["imageSetId"],
+                    image_frame["imageFrameId"],
+                )
+                if out_directory is not None:
+                    image_file_path = os.path.join(
+                        out_directory, f"image_{image_frame['imageFrameId']}.jph"
+                    )
+                    with open(image_file_path, "wb") as f:
+                        f.write(frame_data)
+                decoded = decode_executor.submit(decode_and_checksum, frame_data)
+            except BaseException:
+                pending.release()
+                raise
+            decoded.add_done_callback(lambda _: pending.release())
+            return decoded
+
+        start = time.perf_counter()
+        total_result = True
+        downloader = ThreadPoolExecutor(max_workers=download_workers)
+        try:
+            decoded_frames = [
+                (image_frame, downloader.submit(download, image_frame))
+                for image_frame in image_frames
+            ]
+            for image_frame, downloaded in decoded_frames:
+                crc32_calculated = downloaded.result().result()
+                image_result = image_frame["fullResolutionChecksum"] == crc32_calculated
+                print(
+                    f"\t\tImage checksum verified for {image_frame['imageFrameId']}: {image_result}"
+                )
+                total_result = total_result and image_result
+        finally:
+            # When a frame fails, frames that haven't started downloading are
+            # cancelled.
+            downloader.shutdown(cancel_futures=True)
+            if own_executor:
+                decode_executor.shutdown(cancel_futures=True)
+        elapsed = time.perf_counter() - start
+        print(
+            f"\t\tChecked {len(image_frames)} image frames in {elapsed:.1f} seconds "
+            f"({len(image_frames) / elapsed if elapsed else 0:.1f} frames/sec)."
+        )
         return total_result
 
     @staticmethod
-    def jph_image_to_opj_bitmap(jph_file):
+    def jph_image_to_opj_bitmap(jph_data):
         """
         Decode the image to a bitmap using an OPENJPEG library.
-        :param jph_file: The file to decode.
+        :param jph_data: The HTJ2K encoded image, as bytes or the path of a file.
         :return: The decoded bitmap as an array.
         """
         # Use format 2 for the JPH file.
-        params = openjpeg.utils.get_parameters(jph_file, 2)
-        print(f"\n\t\tImage parameters for {jph_file}: \n\t\t{params}")
-
-        image_array = openjpeg.utils.decode(jph_file, 2)
+        image_array = openjpeg.utils.decode(jph_data, 2)
 
         return image_array
 
@@ -359,6 +432,30 @@ class MedicalImagingWrapper:
 
     # snippet-end:[python.example_code.medical-imaging.workflow.GetPixelData]
 
+    def get_image_frame_data(self, datastore_id, image_set_id, image_frame_id):
+        """
+        Get an image frame's pixel data in memory.
+
+        :param datastore_id: The ID of the data store.
+        :param image_set_id: The ID of the image set.
+        :param image_frame_id: The ID of the image frame.
+        :return: The HTJ2K encoded pixel data, as bytes.
+        """
+        try:
+            image_frame = self.medical_imaging_client.get_image_frame(
+                datastoreId=datastore_id,
+                imageSetId=image_set_id,
+                imageFrameInformation={"imageFrameId": image_frame_id},
+            )
+            return image_frame["imageFrameBlob"].read()
+        except ClientError as err:
+            logger.error(
+                "Couldn't get image frame. Here's why: %s: %s",
+                err.response["Error"]["Code"],
+                err.response["Error"]["Message"],
+            )
+            raise
+
     # snippet-start:[python.example_code.medical-imaging.workflow.DeleteImageSet]
     def delete_image_set(self, datastore_id, image_set_id):
         """
@@ -378,6 +475,8 @@ class MedicalImagingWrapper:
                 err.response["Error"]["Message"],
             )
             raise
+        else:
+            self.metadata_cache.invalidate(datastore_id, image_set_id)
 
     # snippet-end:[python.example_code.medical-imaging.workflow.DeleteImageSet]
 
@@ -5,11 +5,19 @@
 Tests for imaging_set_and_frames workflow.
 """
 
+import io
+import zlib
+from concurrent.futures import ThreadPoolExecutor
+from unittest.mock import MagicMock
+
 import boto3
 from botocore.exceptions import ClientError
+import botocore.response
 import pytest
 import os
 
+import imaging_set_and_frames
+import medicalimaging
 from medicalimaging import MedicalImagingWrapper
 from imaging_set_and_frames import MedicalImagingWorkflowScenario
 
@@ -45,6 +53,60 @@ def test_run_imaging_set_and_frames_scenario_integ(input_mocker, capsys):
     assert "Thanks for watching!" in capt.out
 
 
+@pytest.mark.parametrize("error_code", [None, "SlowDown", "TestException"])
+def test_copy_images(monkeypatch, error_code):
+    # Objects are copied from several threads, so the client is mocked instead
+    # of stubbed.
+    monkeypatch.setattr(imaging_set_and_frames.time, "sleep", lambda _: None)
+    monkeypatch.setattr(imaging_set_and_frames, "MULTIPART_COPY_THRESHOLD", 100)
+    monkeypatch.setattr(imaging_set_and_frames, "MULTIPART_COPY_PART_SIZE", 40)
+    pages = [
+        {"Contents": [{"Key": f"dir/small-{index}", "Size": 10} for index in range(3)]},
+        {"Contents": [{"Key": "dir/large", "Size": 100}]},
+    ]
+    s3_client = MagicMock()
+    s3_client.get_paginator.return_value.paginate.return_value = pages
+    errors = []
+    if error_code is not None:
+        errors.append(ClientError({"Error": {"Code": error_code}}, "CopyObject"))
+
+    def copy_object(**kwargs):
+        if errors and kwargs["Key"] == "input/dir/small-1":
+            raise errors.pop()
+        return {}
+
+    s3_client.copy_object.side_effect = copy_object
+    s3_client.create_multipart_upload.return_value = {"UploadId": "upload-1"}
+    s3_client.upload_part_copy.side_effect = lambda **kwargs: {
+        "CopyPartResult": {"ETag": f"etag-{kwargs['PartNumber']}"}
+    }
+    scenario = MedicalImagingWorkflowScenario(MagicMock(), s3_client, MagicMock())
+
+    if error_code == "TestException":
+        with pytest.raises(ClientError):
+            scenario.copy_images("source", "dir", "target", "input")
+    else:
+        scenario.copy_images("source", "dir", "target", "input")
+        copied = {call.kwargs["Key"] for call in s3_client.copy_object.call_args_list}
+        assert copied == {f"input/dir/small-{index}" for index in range(3)}
+        assert s3_client.copy_object.call_count == 3 + (error_code is not None)
+        assert [
+            call.kwargs["CopySourceRange"]
+            for call in s3_client.upload_part_copy.call_args_list
+        ] == ["bytes=0-39", "bytes=40-79", "bytes=80-99"]
+        s3_client.complete_multipart_upload.assert_called_once_with(
+            Bucket="target",
+            Key="input/dir/large",
+            UploadId="upload-1",
+            MultipartUpload={
+                "Parts": [
+                    {"PartNumber": number, "ETag": f"etag-{number}"}
+                    for number in range(1, 4)
+                ]
+            },
+        )
+
+
 @pytest.mark.parametrize("error_code", [None, "TestException"])
 def test_get_image_set_metadata(make_stubber, error_code):
     medical_imaging_client = boto3.client("medical-imaging")
@@ -178,6 +240,33 @@ def test_search_mage_sets(make_stubber, error_code):
         assert exc_info.value.response["Error"]["Code"] == error_code
 
 
+IMAGE_SET_METADATA = {
+    "SchemaVersion": "1.1",
+    "Study": {
+        "Series": {
+            "series-1": {
+                "Instances": {
+                    "instance-1": {
+                        "DICOM": {"RescaleSlope": 1, "RescaleIntercept": -1024},
+                        "ImageFrames": [
+                            {
+                                "ID": "frame-1",
+                                "MinPixelValue": 0,
+                                "MaxPixelValue": 4095,
+                                "PixelDataChecksumFromBaseToFullResolution": [
+                                    {"Width": 256, "Height": 256, "Checksum": 11},
+                                    {"Width": 512, "Height": 512, "Checksum": 22},
+                                ],
+                            }
+                        ],
+                    }
+                }
+            }
+        }
+    },
+}
+
+
 @pytest.mark.parametrize("error_code", [None, "TestException"])
 def test_get_image_frames_for_image_set(make_stubber, error_code):
     medical_imaging_client = boto3.client("medical-imaging")
@@ -187,12 +276,37 @@ def test_get_image_frames_for_image_set(make_stubber, error_code):
     datastore_id = "abcdedf1234567890abcdef123456789"
     image_set_id = "cccccc1234567890abcdef123456789"
     directory = "output"
+    medical_imaging_stubber.stub_get_image_set_metadata(
+        datastore_id, image_set_id, error_code=error_code, metadata=IMAGE_SET_METADATA
+    )
 
     if error_code is None:
-        medical_imaging_stubber.stub_get_image_set_metadata(
-            datastore_id, image_set_id, error_code=error_code
+        frames = wrapper.get_image_frames_for_image_set(
+            datastore_id, image_set_id, directory
         )
-        wrapper.get_image_frames_for_image_set(datastore_id, image_set_id, directory)
+        assert frames == [
+            {
+                "imageSetId": image_set_id,
+                "imageFrameId": "frame-1",
+                "seriesId": "series-1",
+                "instanceId": "instance-1",
+                "rescaleIntercept": -1024,
+                "rescaleSlope": 1,
+                "minPixelValue": 0,
+                "maxPixelValue": 4095,
+                "fullResolutionChecksum": 22,
+            }
+        ]
+        # The metadata is cached, so it is not downloaded again.
+        assert (
+            wrapper.get_image_frames_for_image_set(datastore_id, image_set_id) == frames
+        )
+    else:
+        with pytest.raises(ClientError) as exc_info:
+            wrapper.get_image_frames_for_image_set(
+                datastore_id, image_set_id, directory
+            )
+        assert exc_info.value.response["Error"]["Code"] == error_code
 
 
 @pytest.mark.parametrize("error_code", [None, "TestException"])
@@ -222,6 +336,71 @@ def test_get_pixel_data(make_stubber, error_code):
         assert exc_info.value.response["Error"]["Code"] == error_code
 
 
+@pytest.mark.parametrize("error_code", [None, "TestException"])
+def test_get_image_frame_data(make_stubber, error_code):
+    medical_imaging_client = boto3.client("medical-imaging")
+    medical_imaging_stubber = make_stubber(medical_imaging_client)
+    s3_client = boto3.client("s3")
+    wrapper = MedicalImagingWrapper(medical_imaging_client, s3_client)
+    datastore_id = "abcdedf1234567890abcdef123456789"
+    image_set_id = "cccccc1234567890abcdef123456789"
+    image_frame_id = "cccccc1234567890abcdef123456789"
+    medical_imaging_stubber.stub_get_pixel_data(
+        datastore_id, image_set_id, image_frame_id, error_code=error_code
+    )
+
+    if error_code is None:
+        frame_data = wrapper.get_image_frame_data(
+            datastore_id, image_set_id, image_frame_id
+        )
+        assert frame_data == b"akdelfaldkflakdflkajs"
+    else:
+        with pytest.raises(ClientError) as exc_info:
+            wrapper.get_image_frame_data(datastore_id, image_set_id, image_frame_id)
+        assert exc_info.value.response["Error"]["Code"] == error_code
+
+
+@pytest.mark.parametrize("bad_frame", [None, 3])
+def test_download_decode_and_check_image_frames(monkeypatch, bad_frame):
+    # Frames are downloaded from several threads, so the client is mocked instead
+    # of stubbed, and decoding returns the encoded bytes unchanged.
+    monkeypatch.setattr(medicalimaging.openjpeg.utils, "decode", lambda data, fmt: data)
+    frames = {f"frame-{index}": f"pixels {index}".encode() for index in range(8)}
+
+    def get_image_frame(**kwargs):
+        data = frames[kwargs["imageFrameInformation"]["imageFrameId"]]
+        return {
+            "imageFrameBlob": botocore.response.StreamingBody(
+                io.BytesIO(data), len(data)
+            )
+        }
+
+    medical_imaging_client = MagicMock()
+    medical_imaging_client.get_image_frame.side_effect = get_image_frame
+    wrapper = MedicalImagingWrapper(medical_imaging_client, MagicMock())
+    image_frames = [
+        {
+            "imageSetId": "set-1",
+            "imageFrameId": frame_id,
+            "fullResolutionChecksum": zlib.crc32(data)
+            + (1 if index == bad_frame else 0),
+        }
+        for index, (frame_id, data) in enumerate(frames.items())
+    ]
+
+    with ThreadPoolExecutor(max_workers=2) as decode_executor:
+        result = wrapper.download_decode_and_check_image_frames(
+            "store-1",
+            image_frames,
+            download_workers=3,
+            decode_executor=decode_executor,
+            max_pending=2,
+        )
+
+    assert result == (bad_frame is None)
+    assert medical_imaging_client.get_image_frame.call_count == len(frames)
+
+
 @pytest.mark.parametrize("error_code", [None, "TestException"])
 def test_delete_image_set(make_stubber, error_code):
     medical_imaging_client = boto3.client("medical-imaging")
@@ -9,22 +9,30 @@ functions.
 """
 
 import datetime
-import gzip
 import json
 import logging
+import os
 import random
-import time
+import sys
 
 import boto3
 from botocore.exceptions import ClientError
 
+from image_set_metadata import ImageSetMetadata, MetadataCache, load_metadata
+
+# Add relative path to include demo_tools in this code example without need for setup.
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "../.."))
+from demo_tools.job_waiter import JobWaiter
+
 logger = logging.getLogger(__name__)
 
 
 # snippet-start:[python.example_code.medical-imaging.MedicalImagingWrapper]
 class MedicalImagingWrapper:
-    def __init__(self, health_imaging_client):
+    def __init__(self, health_imaging_client, metadata_cache=None, job_waiter=None):
         self.health_imaging_client = health_imaging_client
+        self.metadata_cache = metadata_cache or MetadataCache()
+        self.job_waiter = job_waiter or JobWaiter()
 
     # snippet-end:[python.example_code.medical-imaging.MedicalImagingWrapper]
 
@@ -315,6 +323,41 @@ class MedicalImagingWrapper:
 
     # snippet-end:[python.example_code.medical-imaging.GetImageSetMetadata]
 
+    def get_image_set_metadata_index(self, datastore_id, image_set_id, version_id=None):
+        """
+        Get the metadata of an image set, indexed by series, instance, and image
+        frame. The metadata is parsed as it is read from the response, and is kept
+        in a cache so that later calls for the same version don't download it again.
+        When no version is specified, the latest version is cached until this
+        wrapper updates, copies to, or deletes the image set.
+
+        :param datastore_id: The ID of the data store.
+        :param image_set_id: The ID of the image set.
+        :param version_id: The version of the image set.
+        :return: The indexed image set metadata.
+        """
+
+        def load():
+            params = {"datastoreId": datastore_id, "imageSetId": image_set_id}
+            if version_id:
+                params["versionId"] = version_id
+            try:
+                response = self.health_imaging_client.get_image_set_metadata(**params)
+            except ClientError as err:
+                logger.error(
+                    "Couldn't get image metadata. Here's why: %s: %s",
+                    err.response["Error"]["Code"],
+                    err.response["Error"]["Message"],
+                )
+                raise
+            return ImageSetMetadata(
+                image_set_id, load_metadata(response["imageSetMetadataBlob"])
+            )
+
+        return self.metadata_cache.get_or_load(
+            (datastore_id, image_set_id, version_id), load
+        )
+
     # snippet-start:[python.example_code.medical-imaging.GetImageFrame]
     def get_pixel_data(
         self, file_path_to_write, datastore_id, image_set_id, image_frame_id
@@ -410,6 +453,7 @@ class MedicalImagingWrapper:
             )
             raise
         else:
+            self.metadata_cache.invalidate(datastore_id, image_set_id)
             return updated_metadata
 
     # snippet-end:[python.example_code.medical-imaging.UpdateImageSetMetadata]
@@ -482,7 +526,9 @@ class MedicalImagingWrapper:
             )
             raise
         else:
-            return copy_results["destinationImageSetProperties"]["imageSetId"]
+            destination_id = copy_results["destinationImageSetProperties"]["imageSetId"]
+            self.metadata_cache.invalidate(datastore_id, destination_id)
+            return destination_id
 
     # snippet-end:[python.example_code.medical-imaging.CopyImageSet]
 
@@ -507,6 +553,7 @@ class MedicalImagingWrapper:
             )
             raise
         else:
+            self.metadata_cache.invalidate(datastore_id, image_set_id)
             return delete_results
 
     # snippet-end:[python.example_code.medical-imaging.DeleteImageSet]
@@ -689,21 +736,102 @@ class MedicalImagingWrapper:
 
         return recent_image_sets
 
+    def watch_datastore_active(self, datastore_id, timeout=None):
+        """
+        Starts waiting for a data store to become active. The data store is polled
+        by the job waiter along with everything else that is waited for, so many
+        data stores and jobs can be waited for without a thread for each one.
+
+        :param datastore_id: The ID of the data store.
+        :param timeout: The number of seconds to wait. When not specified, waits
+                        until the data store is created or fails.
+        :return: A future that resolves to the final status of the data store.
+        """
+        return self.job_waiter.submit(
+            datastore_id,
+            lambda: self.health_imaging_client.get_datastore(datastoreId=datastore_id)[
+                "datastoreProperties"
+            ]["datastoreStatus"],
+            ["ACTIVE"],
+            ["CREATE_FAILED", "DELETED"],
+            timeout,
+        )
+
+    def watch_dicom_import_job(self, datastore_id, job_id, timeout=None):
+        """
+        Starts waiting for a DICOM import job to finish.
+
+        :param datastore_id: The ID of the data store.
+        :param job_id: The ID of the import job.
+        :param timeout: The number of seconds to wait. When not specified, waits
+                        until the job finishes.
+        :return: A future that resolves to the final status of the job.
+        """
+        return self.job_waiter.submit(
+            job_id,
+            lambda: self.health_imaging_client.get_dicom_import_job(
+                datastoreId=datastore_id, jobId=job_id
+            )["jobProperties"]["jobStatus"],
+            ["COMPLETED"],
+            ["FAILED"],
+            timeout,
+        )
+
+    def _get_image_set_state(self, datastore_id, image_set_id):
+        """
+        Gets the state of an image set, or DELETED when the image set isn't found.
+        """
+        try:
+            return self.health_imaging_client.get_image_set(
+                datastoreId=datastore_id, imageSetId=image_set_id
+            )["imageSetState"]
+        except ClientError as err:
+            if err.response["Error"]["Code"] == "ResourceNotFoundException":
+                return "DELETED"
+            raise
+
+    def watch_image_set_unlocked(self, datastore_id, image_set_id, timeout=None):
+        """
+        Starts waiting for an image set to be unlocked after a copy or an update.
+
+        :param datastore_id: The ID of the data store.
+        :param image_set_id: The ID of the image set.
+        :param timeout: The number of seconds to wait. When not specified, waits
+                        until the image set is unlocked.
+        :return: A future that resolves to the final state of the image set.
+        """
+        return self.job_waiter.submit(
+            image_set_id,
+            lambda: self._get_image_set_state(datastore_id, image_set_id),
+            ["ACTIVE", "DELETED"],
+            timeout=timeout,
+        )
+
+    def watch_image_set_deleted(self, datastore_id, image_set_id, timeout=None):
+        """
+        Starts waiting for an image set to be deleted.
+
+        :param datastore_id: The ID of the data store.
+        :param image_set_id: The ID of the image set.
+        :param timeout: The number of seconds to wait. When not specified, waits
+                        until the image set is deleted.
+        :return: A future that resolves to the final state of the image set.
+        """
+        return self.job_waiter.submit(
+            image_set_id,
+            lambda: self._get_image_set_state(datastore_id, image_set_id),
+            ["DELETED"],
+            timeout=timeout,
+        )
+
     def usage_demo(self, source_s3_uri, dest_s3_uri, data_access_role_arn):
         data_store_name = f"python_usage_demo_data_store_{random.randint(0, 200000)}"
 
         data_store_id = self.create_datastore(data_store_name)
         print(f"Data store created with id : {data_store_id}")
 
-        while True:
-            time.sleep(1)
-            datastore_properties = self.get_datastore_properties(data_store_id)
-            datastore_status = datastore_properties["datastoreStatus"]
-            print(f'data store status: "{datastore_status}"')
-            if datastore_status == "ACTIVE":
-                break
-            elif datastore_status == "CREATE_FAILED":
-                raise Exception("Create datastore job failed")
+        datastore_status = self.watch_datastore_active(data_store_id).result()
+        print(f'data store status: "{datastore_status}"')
 
         datastores = self.list_datastores()
         print(f"datastores : {datastores}")
@@ -714,15 +842,8 @@ class MedicalImagingWrapper:
         )
         print(f"Started import job with id: {job_id}")
 
-        while True:
-            time.sleep(1)
-            job = self.get_dicom_import_job(data_store_id, job_id)
-            job_status = job["jobStatus"]
-            print(f'Status of import job : "{job_status}"')
-            if job_status == "COMPLETED":
-                break
-            elif job_status == "FAILED":
-                raise Exception("DICOM import job failed")
+        job_status = self.watch_dicom_import_job(data_store_id, job_id).result()
+        print(f'Status of import job : "{job_status}"')
 
         import_jobs = self.list_dicom_import_jobs(data_store_id)
         print(import_jobs)
@@ -742,17 +863,13 @@ class MedicalImagingWrapper:
         )
         print(returned_image_set)
 
-        image_metadata_file_name = "metadata.json.gzip"
-        self.get_image_set_metadata(
-            image_metadata_file_name, data_store_id, image_set_id
+        image_set_metadata = self.get_image_set_metadata_index(
+            data_store_id, image_set_id
         )
         image_frame_id = ""
-        with gzip.open(image_metadata_file_name, "rb") as f_in:
-            data = json.load(f_in)
-            series = data["Study"]["Series"]
-            for value in series.values():
-                for instance in value["Instances"].values():
-                    image_frame_id = instance["ImageFrames"][0]["ID"]
+        for instances in image_set_metadata.series.values():
+            for frames in instances.values():
+                image_frame_id = frames[0]["imageFrameId"]
 
         if image_frame_id == "":
             raise Exception("Image frame id is empty")
@@ -774,24 +891,12 @@ class MedicalImagingWrapper:
         image_set_ids.append(copied_image_set_id)
 
         # Wait for copied image set to be ACTIVE before updating the metadata.
-        while True:
-            time.sleep(1)
-            try:
-                image_set_properties = self.get_image_set(
-                    data_store_id, copied_image_set_id
-                )
-            except ClientError as err:
-                print(
-                    f"get_image_set raised an error {err.response['Error']['Message']}"
-                )
-                break
-
-            image_set_state = image_set_properties["imageSetState"]
-            print(
-                f'Image set with id : "{copied_image_set_id}" has status: "{image_set_state}"'
-            )
-            if image_set_state != "LOCKED":
-                break
+        image_set_state = self.watch_image_set_unlocked(
+            data_store_id, copied_image_set_id
+        ).result()
+        print(
+            f'Image set with id : "{copied_image_set_id}" has status: "{image_set_state}"'
+        )
 
         attributes = (
             '{"SchemaVersion":1.1,"Patient":{"DICOM":{"PatientName":"Garcia^Gloria"}}}'
@@ -804,50 +909,29 @@ class MedicalImagingWrapper:
         print(f"Updated metadata for image set with id : {copied_image_set_id}")
 
         # Wait for all image sets to change from LOCKED status before deleting.
-        for image_set_id in image_set_ids:
-            while True:
-                time.sleep(1)
-                try:
-                    image_set_properties = self.get_image_set(
-                        data_store_id, image_set_id
-                    )
-                except ClientError as err:
-                    print(
-                        f"get_image_set raised an error {err.response['Error']['Message']}"
-                    )
-                    break
-
-                image_set_state = image_set_properties["imageSetState"]
-                print(
-                    f'Image set with id : "{image_set_id}" has status: "{image_set_state}"'
-                )
-                if image_set_state != "LOCKED":
-                    break
+        # The image sets are waited for together, on the job waiter's thread.
+        futures = [
+            self.watch_image_set_unlocked(data_store_id, image_set_id)
+            for image_set_id in image_set_ids
+        ]
+        for image_set_id, future in zip(image_set_ids, futures):
+            print(
+                f'Image set with id : "{image_set_id}" has status: "{future.result()}"'
+            )
 
         for image_set_id in image_set_ids:
             self.delete_image_set(data_store_id, image_set_id)
             print(f"Deleted image set with id : {image_set_id}")
 
         # Wait for image sets to be deleted before deleting the data store.
-        for image_set_id in image_set_ids:
-            while True:
-                time.sleep(1)
-                try:
-                    image_set_properties = self.get_image_set(
-                        data_store_id, image_set_id
-                    )
-                except ClientError as err:
-                    print(
-                        f"get_image_set raised an error {err.response['Error']['Message']}"
-                    )
-                    break
-
-                image_set_state = image_set_properties["imageSetState"]
-                print(
-                    f'Image set with id : "{image_set_id}" has status: "{image_set_state}"'
-                )
-                if image_set_state == "DELETED":
-                    break
+        futures = [
+            self.watch_image_set_deleted(data_store_id, image_set_id)
+            for image_set_id in image_set_ids
+        ]
+        for image_set_id, future in zip(image_set_ids, futures):
+            print(
+                f'Image set with id : "{image_set_id}" has status: "{future.result()}"'
+            )
 
         self.delete_datastore(data_store_id)
         print(f"Data store deleted with id : {data_store_id}")
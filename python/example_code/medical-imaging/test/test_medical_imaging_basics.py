@@ -11,6 +11,8 @@ import boto3
 import pytest
 from botocore.exceptions import ClientError
 
+from demo_tools.job_waiter import JobFailedError, JobWaiter
+from image_set_metadata import MetadataCache
 from medical_imaging_basics import MedicalImagingWrapper
 
 
@@ -241,6 +243,66 @@ def test_get_image_set_metadata(make_stubber, error_code):
         assert exc_info.value.response["Error"]["Code"] == error_code
 
 
+def test_get_image_set_metadata_index(make_stubber):
+    medical_imaging_client = boto3.client("medical-imaging")
+    medical_imaging_stubber = make_stubber(medical_imaging_client)
+    wrapper = MedicalImagingWrapper(medical_imaging_client)
+    datastore_id = "abcdedf1234567890abcdef123456789"
+    image_set_id = "cccccc1234567890abcdef123456789"
+    metadata = {
+        "Study": {
+            "Series": {
+                f"series-{series}": {
+                    "Instances": {
+                        f"instance-{series}-{instance}": {
+                            "DICOM": {},
+                            "ImageFrames": [
+                                {"ID": f"frame-{series}-{instance}-{frame}"}
+                                for frame in range(2)
+                            ],
+                        }
+                        for instance in range(2)
+                    }
+                }
+                for series in range(2)
+            }
+        }
+    }
+    # The metadata is downloaded again only after the image set is deleted.
+    medical_imaging_stubber.stub_get_image_set_metadata(
+        datastore_id, image_set_id, metadata=metadata
+    )
+    medical_imaging_stubber.stub_delete_image_set(datastore_id, image_set_id)
+    medical_imaging_stubber.stub_get_image_set_metadata(
+        datastore_id, image_set_id, metadata=metadata
+    )
+
+    index = wrapper.get_image_set_metadata_index(datastore_id, image_set_id)
+    assert len(index.get_frames()) == 8
+    assert [frame["imageFrameId"] for frame in index.get_frames("series-1")] == [
+        f"frame-1-{instance}-{frame}" for instance in range(2) for frame in range(2)
+    ]
+    assert [
+        frame["imageFrameId"] for frame in index.get_frames("series-0", "instance-0-1")
+    ] == ["frame-0-1-0", "frame-0-1-1"]
+    assert index.get_frame("frame-1-0-1")["instanceId"] == "instance-1-0"
+    assert wrapper.get_image_set_metadata_index(datastore_id, image_set_id) is index
+
+    wrapper.delete_image_set(datastore_id, image_set_id)
+    assert wrapper.get_image_set_metadata_index(datastore_id, image_set_id) is not index
+
+
+def test_metadata_cache_evicts_least_recently_used():
+    cache = MetadataCache(max_size=2)
+    cache.get_or_load(("store", "set-1", None), lambda: 1)
+    cache.get_or_load(("store", "set-2", None), lambda: 2)
+    cache.get_or_load(("store", "set-1", None), lambda: -1)
+    cache.get_or_load(("store", "set-3", None), lambda: 3)
+
+    assert cache.get_or_load(("store", "set-1", None), lambda: -1) == 1
+    assert cache.get_or_load(("store", "set-2", None), lambda: 22) == 22
+
+
 @pytest.mark.parametrize("error_code", [None, "TestException"])
 def test_get_pixel_data(make_stubber, error_code):
     medical_imaging_client = boto3.client("medical-imaging")
@@ -413,6 +475,87 @@ def test_delete_image_set(make_stubber, error_code):
         assert exc_info.value.response["Error"]["Code"] == error_code
 
 
+@pytest.mark.parametrize("final_status", ["ACTIVE", "CREATE_FAILED"])
+def test_watch_datastore_active(make_stubber, final_status):
+    medical_imaging_client = boto3.client("medical-imaging")
+    medical_imaging_stubber = make_stubber(medical_imaging_client)
+    wrapper = MedicalImagingWrapper(
+        medical_imaging_client, job_waiter=JobWaiter(min_delay=0)
+    )
+    datastore_id = "abcdedf1234567890abcdef123456789"
+
+    for status in ["CREATING", "CREATING", final_status]:
+        medical_imaging_stubber.stub_get_datastore_properties(
+            datastore_id, datastore_status=status
+        )
+
+    future = wrapper.watch_datastore_active(datastore_id)
+
+    if final_status == "ACTIVE":
+        assert future.result() == final_status
+    else:
+        with pytest.raises(JobFailedError) as exc_info:
+            future.result()
+        assert exc_info.value.status == final_status
+
+
+@pytest.mark.parametrize("error_code", [None, "TestException"])
+def test_watch_dicom_import_job(make_stubber, error_code):
+    medical_imaging_client = boto3.client("medical-imaging")
+    medical_imaging_stubber = make_stubber(medical_imaging_client)
+    wrapper = MedicalImagingWrapper(
+        medical_imaging_client, job_waiter=JobWaiter(min_delay=0)
+    )
+    datastore_id = "abcdedf1234567890abcdef123456789"
+    job_id = "cccccc1234567890abcdef123456789"
+
+    medical_imaging_stubber.stub_get_dicom_import_job(
+        job_id, datastore_id, "IN_PROGRESS"
+    )
+    medical_imaging_stubber.stub_get_dicom_import_job(
+        job_id, datastore_id, "COMPLETED", error_code=error_code
+    )
+
+    future = wrapper.watch_dicom_import_job(datastore_id, job_id)
+
+    if error_code is None:
+        assert future.result() == "COMPLETED"
+    else:
+        with pytest.raises(ClientError) as exc_info:
+            future.result()
+        assert exc_info.value.response["Error"]["Code"] == error_code
+
+
+def test_watch_image_set_unlocked_and_deleted(make_stubber):
+    medical_imaging_client = boto3.client("medical-imaging")
+    medical_imaging_stubber = make_stubber(medical_imaging_client)
+    wrapper = MedicalImagingWrapper(
+        medical_imaging_client, job_waiter=JobWaiter(min_delay=0)
+    )
+    datastore_id = "abcdedf1234567890abcdef123456789"
+    image_set_id = "cccccc1234567890abcdef123456789"
+
+    medical_imaging_stubber.stub_get_image_set(
+        datastore_id, image_set_id, None, image_set_state="LOCKED"
+    )
+    medical_imaging_stubber.stub_get_image_set(datastore_id, image_set_id, None)
+    medical_imaging_stubber.stub_get_image_set(
+        datastore_id, image_set_id, None, image_set_state="LOCKED"
+    )
+    medical_imaging_stubber.stub_get_image_set(
+        datastore_id, image_set_id, None, error_code="ResourceNotFoundException"
+    )
+
+    assert (
+        wrapper.watch_image_set_unlocked(datastore_id, image_set_id).result()
+        == "ACTIVE"
+    )
+    assert (
+        wrapper.watch_image_set_deleted(datastore_id, image_set_id).result()
+        == "DELETED"
+    )
+
+
 @pytest.mark.parametrize("error_code", [None, "TestException"])
 def test_tag_resource(make_stubber, error_code):
     medical_imaging_client = boto3.client("medical-imaging")
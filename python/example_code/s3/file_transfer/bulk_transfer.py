@@ -0,0 +1,546 @@
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: Apache-2.0
+
+"""
+Use Boto 3 managed file transfers to synchronize a local folder with an Amazon S3
+bucket prefix by transferring thousands of files concurrently.
+
+All files share a single transfer manager and a single pool for the parts of
+resumable uploads. The max_concurrency of the transfer configuration is split
+between the two, so the number of concurrent requests stays within it no matter
+how many files are transferred. Files whose size and ETag already match are skipped. Large
+uploads use multipart uploads whose state is saved to a local file after each
+part, so an interrupted upload resumes with the parts that are still missing.
+Progress is aggregated in counters that can be reported at an interval, instead
+of being written to stdout on every callback.
+"""
+
+import argparse
+import copy
+import hashlib
+import json
+import logging
+import os
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+import boto3
+from boto3.s3.transfer import (
+    ProgressCallbackInvoker,
+    TransferConfig,
+    create_transfer_manager,
+)
+from botocore.config import Config
+from botocore.exceptions import ClientError
+
+from file_transfer import MB
+
+logger = logging.getLogger(__name__)
+
+
+def compute_etag(file_path, multipart_threshold, multipart_chunksize):
+    """
+    Computes the ETag that Amazon S3 assigns to an object uploaded from a file
+    without server-side encryption with KMS or customer-provided keys.
+
+    A file smaller than the multipart threshold is uploaded in a single request and
+    its ETag is the MD5 digest of the file. A larger file is uploaded in parts and
+    its ETag is the MD5 digest of the concatenated part digests, followed by a dash
+    and the number of parts.
+
+    :param file_path: The path of the file.
+    :param multipart_threshold: The size at which uploads become multipart.
+    :param multipart_chunksize: The size of each part of a multipart upload.
+    :return: The ETag, without surrounding quotes.
+    """
+    file_size = os.path.getsize(file_path)
+    with open(file_path, "rb") as file:
+        if file_size < multipart_threshold:
+            digest = hashlib.md5()
+            for chunk in iter(lambda: file.read(MB), b""):
+                digest.update(chunk)
+            return digest.hexdigest()
+        part_digests = []
+        for chunk in iter(lambda: file.read(multipart_chunksize), b""):
+            part_digests.append(hashlib.md5(chunk).digest())
+    return f"{hashlib.md5(b''.join(part_digests)).hexdigest()}-{len(part_digests)}"
+
+
+class BulkProgress:
+    """
+    Aggregates progress across every file in a bulk transfer.
+
+    Transfer callbacks only add to counters under a lock. When an interval is given,
+    a background thread reports the totals at that interval.
+    """
+
+    def __init__(self, total_bytes=0, interval=None):
+        """
+        :param total_bytes: The number of bytes to transfer.
+        :param interval: The number of seconds between progress reports. When this
+                         is None, progress is not reported.
+        """
+        self.total_bytes = total_bytes
+        self.transferred_bytes = 0
+        self.completed_files = 0
+        self.skipped_files = 0
+        self.failed_files = []
+        self.start_time = time.perf_counter()
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._reporter = None
+        if interval is not None:
+            self._reporter = threading.Thread(
+                target=self._report_loop, args=(interval,), daemon=True
+            )
+            self._reporter.start()
+
+    def add_bytes(self, byte_count):
+        with self._lock:
+            self.transferred_bytes += byte_count
+
+    def file_completed(self):
+        with self._lock:
+            self.completed_files += 1
+
+    def file_skipped(self):
+        with self._lock:
+            self.skipped_files += 1
+
+    def file_failed(self, name, error):
+        with self._lock:
+            self.failed_files.append((name, error))
+
+    @property
+    def bytes_per_second(self):
+        elapsed = time.perf_counter() - self.start_time
+        return self.transferred_bytes / elapsed if elapsed > 0 else 0
+
+    def summary(self):
+        """
+        :return: A dict that summarizes the transfer so far.
+        """
+        with self._lock:
+            return {
+                "completed": self.completed_files,
+                "skipped": self.skipped_files,
+                "failed": len(self.failed_files),
+                "transferred_bytes": self.transferred_bytes,
+                "total_bytes": self.total_bytes,
+                "bytes_per_second": self.bytes_per_second,
+            }
+
+    def _report_loop(self, interval):
+        while not self._stop.wait(interval):
+            summary = self.summary()
+            logger.info(
+                "%s of %s bytes transferred, %s files done, %s skipped, %.1f MB/s.",
+                summary["transferred_bytes"],
+                summary["total_bytes"],
+                summary["completed"],
+                summary["skipped"],
+                summary["bytes_per_second"] / MB,
+            )
+
+    def close(self):
+        self._stop.set()
+        if self._reporter is not None:
+            self._reporter.join()
+
+
+class UploadStateStore:
+    """
+    Persists the state of in-progress multipart uploads to a local JSON file so that
+    an interrupted bulk upload can resume.
+    """
+
+    def __init__(self, file_name=None):
+        """
+        :param file_name: The file in which to keep upload state. When this is None,
+                          state is kept only in memory.
+        """
+        self.file_name = file_name
+        self._lock = threading.Lock()
+        self._uploads = {}
+        if file_name is not None and os.path.exists(file_name):
+            with open(file_name) as state_file:
+                self._uploads = json.load(state_file)
+
+    @staticmethod
+    def _name(bucket, key):
+        return f"{bucket}/{key}"
+
+    def get(self, bucket, key):
+        with self._lock:
+            return self._uploads.get(self._name(bucket, key))
+
+    def start(self, bucket, key, upload_id, file_stat, chunksize):
+        with self._lock:
+            self._uploads[self._name(bucket, key)] = {
+                "upload_id": upload_id,
+                "size": file_stat.st_size,
+                "mtime": file_stat.st_mtime,
+                "chunksize": chunksize,
+                "parts": {},
+            }
+            self._save()
+
+    def add_part(self, bucket, key, part_number, etag):
+        with self._lock:
+            self._uploads[self._name(bucket, key)]["parts"][str(part_number)] = etag
+            self._save()
+
+    def remove(self, bucket, key):
+        with self._lock:
+            self._uploads.pop(self._name(bucket, key), None)
+            self._save()
+
+    def _save(self):
+        if self.file_name is None:
+            return
+        temp_name = f"{self.file_name}.tmp"
+        with open(temp_name, "w") as state_file:
+            json.dump(self._uploads, state_file)
+        os.replace(temp_name, self.file_name)
+
+
+class BulkTransfer:
+    """
+    Uploads and downloads folders of files to and from Amazon S3 concurrently.
+    """
+
+    def __init__(self, s3_client, config=None, state_file=None, progress_interval=None):
+        """
+        :param s3_client: A Boto3 Amazon S3 client. Its connection pool must hold at
+                          least config.max_concurrency connections, or transfers
+                          wait for connections.
+        :param config: The TransferConfig that is shared by all transfers.
+        :param state_file: The file in which to keep multipart upload state.
+        :param progress_interval: The number of seconds between progress reports.
+        """
+        self.s3_client = s3_client
+        self.config = config if config is not None else TransferConfig()
+        self.state = UploadStateStore(state_file)
+        self.progress_interval = progress_interval
+        # Resumable multipart uploads send their parts on a separate pool, so the
+        # concurrency budget is split between that pool and the transfer manager.
+        part_workers = max(self.config.max_concurrency // 2, 1)
+        manager_config = copy.copy(self.config)
+        manager_config.max_concurrency = max(
+            self.config.max_concurrency - part_workers, 1
+        )
+        self.transfer_manager = create_transfer_manager(s3_client, manager_config)
+        self._part_executor = ThreadPoolExecutor(max_workers=part_workers)
+
+    def close(self):
+        """
+        Waits for outstanding transfers and releases the threads they use.
+        """
+        self.transfer_manager.shutdown()
+        self._part_executor.shutdown()
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, exc_type, exc_val, exc_tb):
+        self.close()
+
+    def list_objects(self, bucket, prefix):
+        """
+        Lists all objects under a prefix.
+
+        :return: A dict of object key to a tuple of size and ETag.
+        """
+        objects = {}
+        paginator = self.s3_client.get_paginator("list_objects_v2")
+        for page in paginator.paginate(Bucket=bucket, Prefix=prefix):
+            for obj in page.get("Contents", []):
+                objects[obj["Key"]] = (obj["Size"], obj["ETag"].strip('"'))
+        return objects
+
+    def _is_unchanged(self, file_path, size, etag):
+        """
+        Checks whether a local file matches an object by size and then by ETag.
+        """
+        if not os.path.exists(file_path) or os.path.getsize(file_path) != size:
+            return False
+        chunksize = self.config.multipart_chunksize
+        threshold = self.config.multipart_threshold
+        if "-" in etag:
+            # The object was uploaded in parts. Assume the configured part size.
+            threshold = min(threshold, size)
+        else:
+            threshold = size + 1
+        return compute_etag(file_path, threshold, chunksize) == etag
+
+    def upload_directory(self, local_dir, bucket, prefix=""):
+        """
+        Uploads every file in a local folder and its subfolders to a bucket,
+        skipping files that match the object already stored under the same key.
+
+        :param local_dir: The folder to upload.
+        :param bucket: The name of the bucket.
+        :param prefix: The prefix to add to each object key.
+        :return: A summary of the transfer.
+        """
+        remote = self.list_objects(bucket, prefix)
+        files = []
+        for root, _, names in os.walk(local_dir):
+            for name in names:
+                file_path = os.path.join(root, name)
+                rel_path = os.path.relpath(file_path, local_dir)
+                files.append((file_path, prefix + rel_path.replace(os.sep, "/")))
+
+        progress = BulkProgress(
+            sum(os.path.getsize(path) for path, _ in files), self.progress_interval
+        )
+        futures = []
+        multipart = []
+        for file_path, key in files:
+            if key in remote and self._is_unchanged(file_path, *remote[key]):
+                progress.file_skipped()
+                progress.add_bytes(remote[key][0])
+                continue
+            if os.path.getsize(file_path) >= self.config.multipart_threshold:
+                try:
+                    multipart.append(
+                        (key, self._start_multipart(file_path, bucket, key, progress))
+                    )
+                except ClientError as err:
+                    logger.error(
+                        "Couldn't start upload of %s. Here's why: %s: %s",
+                        key,
+                        err.response["Error"]["Code"],
+                        err.response["Error"]["Message"],
+                    )
+                    progress.file_failed(key, err)
+            else:
+                futures.append(
+                    (
+                        key,
+                        self.transfer_manager.upload(
+                            file_path,
+                            bucket,
+                            key,
+                            subscribers=[ProgressCallbackInvoker(progress.add_bytes)],
+                        ),
+                    )
+                )
+        self._wait(futures, progress)
+        for key, (upload, part_futures) in multipart:
+            try:
+                self._finish_multipart(upload, part_futures)
+                progress.file_completed()
+            except Exception as error:
+                logger.error("Couldn't upload %s: %s", key, error)
+                progress.file_failed(key, error)
+        progress.close()
+        return progress.summary()
+
+    def download_directory(self, bucket, prefix, local_dir):
+        """
+        Downloads every object under a prefix to a local folder, skipping objects
+        that match the local file already stored under the same path.
+
+        :param bucket: The name of the bucket.
+        :param prefix: The prefix of the objects to download.
+        :param local_dir: The folder to download to.
+        :return: A summary of the transfer.
+        """
+        remote = self.list_objects(bucket, prefix)
+        progress = BulkProgress(
+            sum(size for size, _ in remote.values()), self.progress_interval
+        )
+        futures = []
+        for key, (size, etag) in remote.items():
+            if key.endswith("/"):
+                continue
+            file_path = os.path.join(local_dir, *key[len(prefix) :].split("/"))
+            if self._is_unchanged(file_path, size, etag):
+                progress.file_skipped()
+                progress.add_bytes(size)
+                continue
+            os.makedirs(os.path.dirname(file_path), exist_ok=True)
+            futures.append(
+                (
+                    key,
+                    self.transfer_manager.download(
+                        bucket,
+                        key,
+                        file_path,
+                        subscribers=[ProgressCallbackInvoker(progress.add_bytes)],
+                    ),
+                )
+            )
+        self._wait(futures, progress)
+        progress.close()
+        return progress.summary()
+
+    @staticmethod
+    def _wait(futures, progress):
+        for key, future in futures:
+            try:
+                future.result()
+                progress.file_completed()
+            except Exception as error:
+                logger.error("Couldn't transfer %s: %s", key, error)
+                progress.file_failed(key, error)
+
+    def _start_multipart(self, file_path, bucket, key, progress):
+        """
+        Starts or resumes a multipart upload and submits every part that hasn't
+        been uploaded yet to the shared part executor.
+
+        :return: The upload description and the futures of the submitted parts.
+        """
+        file_stat = os.stat(file_path)
+        chunksize = self.config.multipart_chunksize
+        saved = self.state.get(bucket, key)
+        done_parts = {}
+        if (
+            saved is not None
+            and saved["size"] == file_stat.st_size
+            and saved["mtime"] == file_stat.st_mtime
+        ):
+            upload_id = saved["upload_id"]
+            chunksize = saved["chunksize"]
+            try:
+                done_parts = self._list_parts(bucket, key, upload_id)
+                logger.info(
+                    "Resuming upload of %s with %s parts done.", key, len(done_parts)
+                )
+            except ClientError as err:
+                if err.response["Error"]["Code"] != "NoSuchUpload":
+                    raise
+                saved = None
+        else:
+            if saved is not None:
+                self._abort(bucket, key, saved["upload_id"])
+            saved = None
+        if saved is None:
+            upload_id = self.s3_client.create_multipart_upload(Bucket=bucket, Key=key)[
+                "UploadId"
+            ]
+            self.state.start(bucket, key, upload_id, file_stat, chunksize)
+
+        part_count = max((file_stat.st_size + chunksize - 1) // chunksize, 1)
+        upload = {
+            "bucket": bucket,
+            "key": key,
+            "upload_id": upload_id,
+            "parts": dict(done_parts),
+        }
+        part_futures = []
+        for part_number in range(1, part_count + 1):
+            if part_number in done_parts:
+                progress.add_bytes(
+                    min(chunksize, file_stat.st_size - (part_number - 1) * chunksize)
+                )
+                continue
+            part_futures.append(
+                self._part_executor.submit(
+                    self._upload_part,
+                    upload,
+                    file_path,
+                    part_number,
+                    chunksize,
+                    progress,
+                )
+            )
+        return upload, part_futures
+
+    def _list_parts(self, bucket, key, upload_id):
+        parts = {}
+        paginator = self.s3_client.get_paginator("list_parts")
+        for page in paginator.paginate(Bucket=bucket, Key=key, UploadId=upload_id):
+            for part in page.get("Parts", []):
+                parts[part["PartNumber"]] = part["ETag"]
+        return parts
+
+    def _upload_part(self, upload, file_path, part_number, chunksize, progress):
+        with open(file_path, "rb") as file:
+            file.seek((part_number - 1) * chunksize)
+            body = file.read(chunksize)
+        response = self.s3_client.upload_part(
+            Bucket=upload["bucket"],
+            Key=upload["key"],
+            UploadId=upload["upload_id"],
+            PartNumber=part_number,
+            Body=body,
+        )
+        self.state.add_part(
+            upload["bucket"], upload["key"], part_number, response["ETag"]
+        )
+        progress.add_bytes(len(body))
+        return part_number, response["ETag"]
+
+    def _finish_multipart(self, upload, part_futures):
+        """
+        Waits for the parts of an upload and completes it. When a part fails, the
+        upload is left in place so that a later run can resume it.
+        """
+        parts = upload["parts"]
+        for future in part_futures:
+            part_number, etag = future.result()
+            parts[part_number] = etag
+        self.s3_client.complete_multipart_upload(
+            Bucket=upload["bucket"],
+            Key=upload["key"],
+            UploadId=upload["upload_id"],
+            MultipartUpload={
+                "Parts": [
+                    {"PartNumber": number, "ETag": parts[number]}
+                    for number in sorted(parts)
+                ]
+            },
+        )
+        self.state.remove(upload["bucket"], upload["key"])
+
+    def _abort(self, bucket, key, upload_id):
+        try:
+            self.s3_client.abort_multipart_upload(
+                Bucket=bucket, Key=key, UploadId=upload_id
+            )
+        except ClientError:
+            logger.warning("Couldn't abort stale upload %s of %s.", upload_id, key)
+        self.state.remove(bucket, key)
+
+
+def main():
+    parser = argparse.ArgumentParser(
+        description="Upload or download a folder to or from an Amazon S3 prefix."
+    )
+    parser.add_argument("direction", choices=["upload", "download"])
+    parser.add_argument("local_dir")
+    parser.add_argument("bucket")
+    parser.add_argument("--prefix", default="")
+    parser.add_argument("--state-file", default=".bulk_transfer_state.json")
+    parser.add_argument("--max-concurrency", type=int, default=32)
+    parser.add_argument("--progress-interval", type=float, default=5)
+    args = parser.parse_args()
+    logging.basicConfig(level=logging.INFO, format="%(levelname)s: %(message)s")
+
+    config = TransferConfig(max_concurrency=args.max_concurrency)
+    with BulkTransfer(
+        boto3.client("s3", config=Config(max_pool_connections=args.max_concurrency)),
+        config=config,
+        state_file=args.state_file,
+        progress_interval=args.progress_interval,
+    ) as transfer:
+        if args.direction == "upload":
+            summary = transfer.upload_directory(
+                args.local_dir, args.bucket, args.prefix
+            )
+        else:
+            summary = transfer.download_directory(
+                args.bucket, args.prefix, args.local_dir
+            )
+    print(
+        f"{summary['completed']} files transferred, {summary['skipped']} unchanged, "
+        f"{summary['failed']} failed, at {summary['bytes_per_second'] / MB:.1f} MB/s."
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -13,10 +13,16 @@ TransferDemoManager
 """
 
 # snippet-start:[python.example_code.s3.Scenario_FileTransfer_Demo]
+import argparse
+import csv
 import hashlib
+import itertools
+import json
 import os
 import platform
 import shutil
+import statistics
+import tempfile
 import time
 
 import boto3
@@ -37,6 +43,17 @@ CONFIG_ATTRS = (
 )
 # These configuration attributes affect only downloads.
 DOWNLOAD_CONFIG_ATTRS = ("max_io_queue", "io_chunksize", "num_download_attempts")
+# The default grid of configuration values swept by the benchmark mode.
+BENCHMARK_GRID = {
+    "multipart_threshold": [8 * MB, 64 * MB],
+    "multipart_chunksize": [8 * MB, 16 * MB, 64 * MB],
+    "max_concurrency": [1, 4, 10, 32],
+    "use_threads": [True, False],
+}
+# The columns of the benchmark results that come before and after the
+# configuration attributes that are swept.
+BENCHMARK_KEY_FIELDS = ("size_mb", "direction")
+BENCHMARK_METRIC_FIELDS = ("seconds", "mb_per_second")
 
 
 class TransferDemoManager:
@@ -267,6 +284,196 @@ class TransferDemoManager:
         print(f"Your transfer took {elapsed:.2f} seconds.")
 
 
+class TransferBenchmark:
+    """
+    Runs a non-interactive sweep of transfer configurations over a set of file
+    sizes, records the throughput and latency of each upload and download, and
+    recommends the fastest configuration for each file size.
+
+    The benchmark can run against Amazon S3 or against a local S3-compatible
+    endpoint, such as a moto server or MinIO, so that settings can be tuned for a
+    new host type without incurring transfer charges.
+    """
+
+    def __init__(self, s3_client, bucket_name, work_folder, grid=None, repeat=1):
+        """
+        :param s3_client: A Boto3 Amazon S3 client.
+        :param bucket_name: The bucket used to store benchmark objects.
+        :param work_folder: The local folder used to store benchmark files.
+        :param grid: A dict of configuration attribute to the values to sweep.
+        :param repeat: The number of times each transfer is timed. The median time
+                       is reported.
+        """
+        self.s3_client = s3_client
+        self.bucket_name = bucket_name
+        self.work_folder = work_folder
+        self.grid = grid if grid is not None else BENCHMARK_GRID
+        self.repeat = repeat
+        self.results = []
+
+    def configurations(self):
+        """
+        Yields every combination of the grid. When use_threads is False,
+        max_concurrency has no effect, so only one such combination is kept.
+        """
+        seen = set()
+        names = list(self.grid)
+        for values in itertools.product(*(self.grid[name] for name in names)):
+            config = dict(zip(names, values))
+            if not config.get("use_threads", True):
+                config["max_concurrency"] = 1
+            key = tuple(sorted(config.items()))
+            if key not in seen:
+                seen.add(key)
+                yield config
+
+    def _make_file(self, size_mb):
+        file_path = os.path.join(self.work_folder, f"benchmark-{size_mb}mb.bin")
+        with open(file_path, "wb") as file:
+            for _ in range(int(size_mb)):
+                file.write(os.urandom(MB))
+            file.write(os.urandom(int((size_mb % 1) * MB)))
+        return file_path
+
+    def _time(self, func):
+        times = []
+        for _ in range(self.repeat):
+            start_time = time.perf_counter()
+            func()
+            times.append(time.perf_counter() - start_time)
+        return statistics.median(times)
+
+    def run(self, file_sizes_mb):
+        """
+        Uploads and downloads a file of each size with every configuration.
+
+        :param file_sizes_mb: The file sizes to benchmark, in MB.
+        :return: The list of results.
+        """
+        for size_mb in file_sizes_mb:
+            local_path = self._make_file(size_mb)
+            download_path = f"{local_path}.download"
+            object_key = os.path.basename(local_path)
+            try:
+                for config_values in self.configurations():
+                    config = TransferConfig(**config_values)
+                    upload_seconds = self._time(
+                        lambda: self.s3_client.upload_file(
+                            local_path, self.bucket_name, object_key, Config=config
+                        )
+                    )
+                    self._add_result(size_mb, "upload", config_values, upload_seconds)
+                    download_seconds = self._time(
+                        lambda: self.s3_client.download_file(
+                            self.bucket_name, object_key, download_path, Config=config
+                        )
+                    )
+                    self._add_result(
+                        size_mb, "download", config_values, download_seconds
+                    )
+            finally:
+                for path in (local_path, download_path):
+                    if os.path.exists(path):
+                        os.remove(path)
+                self.s3_client.delete_object(Bucket=self.bucket_name, Key=object_key)
+        return self.results
+
+    def _add_result(self, size_mb, direction, config_values, seconds):
+        result = {
+            "size_mb": size_mb,
+            "direction": direction,
+            **config_values,
+            "seconds": round(seconds, 4),
+            "mb_per_second": round(size_mb / seconds, 2) if seconds > 0 else None,
+        }
+        self.results.append(result)
+        print(
+            f"{size_mb:>8} MB {direction:<8} "
+            + " ".join(f"{attr}={config_values.get(attr)}" for attr in CONFIG_ATTRS)
+            + f" {seconds:.3f}s"
+        )
+
+    def recommendations(self):
+        """
+        Finds the fastest configuration for each file size and direction.
+
+        :return: A dict of (size_mb, direction) to the fastest result.
+        """
+        best = {}
+        for result in self.results:
+            key = (result["size_mb"], result["direction"])
+            if key not in best or result["seconds"] < best[key]["seconds"]:
+                best[key] = result
+        return best
+
+    def config_names(self):
+        """
+        Gets the names of the configuration attributes in the results, in the order
+        that they are first found.
+
+        :return: The list of attribute names.
+        """
+        names = {}
+        for result in self.results:
+            for name in result:
+                if name not in BENCHMARK_KEY_FIELDS + BENCHMARK_METRIC_FIELDS:
+                    names[name] = None
+        return list(names)
+
+    def write(self, output_path):
+        """
+        Writes the results as CSV or JSON, depending on the extension of the output
+        path. The JSON output also includes the recommended configurations.
+        """
+        if output_path.endswith(".json"):
+            with open(output_path, "w") as output_file:
+                json.dump(
+                    {
+                        "results": self.results,
+                        "recommendations": list(self.recommendations().values()),
+                    },
+                    output_file,
+                    indent=2,
+                )
+        else:
+            with open(output_path, "w", newline="") as output_file:
+                writer = csv.DictWriter(
+                    output_file,
+                    fieldnames=[
+                        *BENCHMARK_KEY_FIELDS,
+                        *self.config_names(),
+                        *BENCHMARK_METRIC_FIELDS,
+                    ],
+                )
+                writer.writeheader()
+                writer.writerows(self.results)
+
+
+def run_benchmark(args):
+    """
+    Run the benchmark mode with settings from the command line.
+    """
+    s3_client = boto3.client("s3", endpoint_url=args.endpoint_url)
+    if args.create_bucket:
+        s3_client.create_bucket(Bucket=args.bucket)
+    grid = json.loads(args.grid) if args.grid else None
+    with tempfile.TemporaryDirectory() as work_folder:
+        benchmark = TransferBenchmark(
+            s3_client, args.bucket, work_folder, grid=grid, repeat=args.repeat
+        )
+        benchmark.run(args.sizes)
+    benchmark.write(args.output)
+    print(f"Wrote {len(benchmark.results)} results to {args.output}.")
+    print("Recommended configuration by file size:")
+    config_names = benchmark.config_names()
+    for (size_mb, direction), result in sorted(benchmark.recommendations().items()):
+        settings = ", ".join(f"{attr}={result.get(attr)}" for attr in config_names)
+        print(
+            f"{'':4}{size_mb:>8} MB {direction:<8} {settings} "
+            f"({result['mb_per_second']} MB/s)"
+        )
+
+
 def main():
     """
     Run the demonstration script for s3_file_transfer.
@@ -352,9 +559,47 @@ def main():
         demo_manager.cleanup()
 
 
+def parse_args():
+    parser = argparse.ArgumentParser(
+        description="Demonstrate or benchmark Amazon S3 managed file transfers."
+    )
+    parser.add_argument(
+        "--benchmark",
+        action="store_true",
+        help="Run a non-interactive sweep of transfer configurations.",
+    )
+    parser.add_argument(
+        "--endpoint-url",
+        help="An S3-compatible endpoint, such as a local moto server or MinIO.",
+    )
+    parser.add_argument("--bucket", help="The bucket used by the benchmark.")
+    parser.add_argument(
+        "--create-bucket",
+        action="store_true",
+        help="Create the benchmark bucket first.",
+    )
+    parser.add_argument(
+        "--sizes", type=float, nargs="+", default=[1, 16, 128], help="File sizes in MB."
+    )
+    parser.add_argument(
+        "--grid", help="A JSON object of TransferConfig attributes to value lists."
+    )
+    parser.add_argument("--repeat", type=int, default=1)
+    parser.add_argument(
+        "--output", default="transfer_benchmark.csv", help="A .csv or .json file."
+    )
+    return parser.parse_args()
+
+
 if __name__ == "__main__":
+    cmd_args = parse_args()
     try:
-        main()
+        if cmd_args.benchmark:
+            if not cmd_args.bucket:
+                raise SystemExit("The --bucket argument is required for a benchmark.")
+            run_benchmark(cmd_args)
+        else:
+            main()
     except NoCredentialsError as error:
         print(error)
         print(
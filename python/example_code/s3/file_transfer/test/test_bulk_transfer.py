@@ -0,0 +1,251 @@
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: Apache-2.0
+
+"""
+Tests for the Amazon S3 bulk transfer example.
+
+Like the file transfer tests, these tests use mocks instead of the botocore Stubber,
+because the transfer manager and the part uploads run on many threads and the
+order of their requests is not predictable.
+"""
+
+import hashlib
+import os
+import unittest.mock
+import pytest
+
+import bulk_transfer
+
+
+class FakeTransferManager:
+    """Records transfers and completes them immediately."""
+
+    def __init__(self):
+        self.uploads = []
+        self.downloads = []
+
+    def _future(self, size, subscribers):
+        for subscriber in subscribers:
+            subscriber.on_progress(future=None, bytes_transferred=size)
+        future = unittest.mock.MagicMock()
+        future.result.return_value = None
+        return future
+
+    def upload(self, file_path, bucket, key, subscribers):
+        self.uploads.append((file_path, bucket, key))
+        return self._future(os.path.getsize(file_path), subscribers)
+
+    def download(self, bucket, key, file_path, subscribers):
+        self.downloads.append((bucket, key, file_path))
+        with open(file_path, "wb") as file:
+            file.write(b"downloaded")
+        return self._future(10, subscribers)
+
+    def shutdown(self):
+        pass
+
+
+@pytest.fixture
+def make_transfer(monkeypatch):
+    def _make_transfer(s3_client, **kwargs):
+        manager = FakeTransferManager()
+        monkeypatch.setattr(
+            bulk_transfer, "create_transfer_manager", lambda client, config: manager
+        )
+        config = bulk_transfer.TransferConfig(
+            multipart_threshold=1024, multipart_chunksize=1024, max_concurrency=4
+        )
+        return bulk_transfer.BulkTransfer(s3_client, config=config, **kwargs), manager
+
+    return _make_transfer
+
+
+def make_client(objects, parts=None):
+    s3_client = unittest.mock.MagicMock()
+
+    def get_paginator(name):
+        paginator = unittest.mock.MagicMock()
+        if name == "list_objects_v2":
+            paginator.paginate.return_value = [
+                {
+                    "Contents": [
+                        {"Key": key, "Size": size, "ETag": f'"{etag}"'}
+                        for key, (size, etag) in objects.items()
+                    ]
+                }
+            ]
+        else:
+            paginator.paginate.return_value = [{"Parts": parts or []}]
+        return paginator
+
+    s3_client.get_paginator.side_effect = get_paginator
+    s3_client.create_multipart_upload.return_value = {"UploadId": "test-upload"}
+    s3_client.upload_part.side_effect = lambda **kwargs: {
+        "ETag": f"etag-{kwargs['PartNumber']}"
+    }
+    return s3_client
+
+
+def write_file(path, size):
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    with open(path, "wb") as file:
+        file.write(os.urandom(size))
+
+
+def test_compute_etag(tmp_path):
+    file_path = str(tmp_path / "data")
+    write_file(file_path, 2500)
+    with open(file_path, "rb") as file:
+        data = file.read()
+
+    assert (
+        bulk_transfer.compute_etag(file_path, 4096, 1024)
+        == hashlib.md5(data).hexdigest()
+    )
+    part_digests = b"".join(
+        hashlib.md5(data[start : start + 1024]).digest() for start in (0, 1024, 2048)
+    )
+    assert (
+        bulk_transfer.compute_etag(file_path, 1024, 1024)
+        == f"{hashlib.md5(part_digests).hexdigest()}-3"
+    )
+
+
+def test_upload_directory(tmp_path, make_transfer):
+    local_dir = tmp_path / "local"
+    write_file(str(local_dir / "same.txt"), 100)
+    write_file(str(local_dir / "sub" / "small.txt"), 200)
+    write_file(str(local_dir / "large.bin"), 2500)
+    same_etag = bulk_transfer.compute_etag(str(local_dir / "same.txt"), 1024, 1024)
+    s3_client = make_client({"data/same.txt": (100, same_etag)})
+    transfer, manager = make_transfer(s3_client)
+
+    with transfer:
+        summary = transfer.upload_directory(str(local_dir), "test-bucket", "data/")
+
+    assert summary["completed"] == 2
+    assert summary["skipped"] == 1
+    assert summary["failed"] == 0
+    assert summary["transferred_bytes"] == summary["total_bytes"] == 2800
+    assert [upload[2] for upload in manager.uploads] == ["data/sub/small.txt"]
+    assert s3_client.upload_part.call_count == 3
+    s3_client.complete_multipart_upload.assert_called_once_with(
+        Bucket="test-bucket",
+        Key="data/large.bin",
+        UploadId="test-upload",
+        MultipartUpload={
+            "Parts": [
+                {"PartNumber": number, "ETag": f"etag-{number}"} for number in (1, 2, 3)
+            ]
+        },
+    )
+
+
+def test_upload_directory_resumes(tmp_path, make_transfer):
+    local_dir = tmp_path / "local"
+    file_path = str(local_dir / "large.bin")
+    write_file(file_path, 2500)
+    state_file = str(tmp_path / "state.json")
+    state = bulk_transfer.UploadStateStore(state_file)
+    state.start("test-bucket", "large.bin", "old-upload", os.stat(file_path), 1024)
+    state.add_part("test-bucket", "large.bin", 1, "etag-1")
+    s3_client = make_client({}, parts=[{"PartNumber": 1, "ETag": "etag-1"}])
+    transfer, _ = make_transfer(s3_client, state_file=state_file)
+
+    with transfer:
+        summary = transfer.upload_directory(str(local_dir), "test-bucket")
+
+    assert summary["completed"] == 1
+    s3_client.create_multipart_upload.assert_not_called()
+    assert sorted(
+        call.kwargs["PartNumber"] for call in s3_client.upload_part.call_args_list
+    ) == [2, 3]
+    complete_kwargs = s3_client.complete_multipart_upload.call_args.kwargs
+    assert complete_kwargs["UploadId"] == "old-upload"
+    assert len(complete_kwargs["MultipartUpload"]["Parts"]) == 3
+    assert (
+        bulk_transfer.UploadStateStore(state_file).get("test-bucket", "large.bin")
+        is None
+    )
+
+
+def test_upload_directory_keeps_state_on_failure(tmp_path, make_transfer):
+    local_dir = tmp_path / "local"
+    write_file(str(local_dir / "large.bin"), 2500)
+    state_file = str(tmp_path / "state.json")
+    s3_client = make_client({})
+
+    def fail_part_two(**kwargs):
+        if kwargs["PartNumber"] == 2:
+            raise bulk_transfer.ClientError({"Error": {"Code": "TestException"}}, "op")
+        return {"ETag": f"etag-{kwargs['PartNumber']}"}
+
+    s3_client.upload_part.side_effect = fail_part_two
+    transfer, _ = make_transfer(s3_client, state_file=state_file)
+
+    with transfer:
+        summary = transfer.upload_directory(str(local_dir), "test-bucket")
+
+    assert summary["failed"] == 1
+    s3_client.complete_multipart_upload.assert_not_called()
+    saved = bulk_transfer.UploadStateStore(state_file).get("test-bucket", "large.bin")
+    assert saved["upload_id"] == "test-upload"
+    assert set(saved["parts"]) == {"1", "3"}
+
+
+def test_upload_directory_start_fails(tmp_path, make_transfer):
+    local_dir = tmp_path / "local"
+    write_file(str(local_dir / "large.bin"), 2500)
+    write_file(str(local_dir / "small.txt"), 200)
+    s3_client = make_client({})
+    s3_client.create_multipart_upload.side_effect = bulk_transfer.ClientError(
+        {"Error": {"Code": "TestException", "Message": "test"}}, "op"
+    )
+    transfer, manager = make_transfer(s3_client)
+
+    with transfer:
+        summary = transfer.upload_directory(str(local_dir), "test-bucket")
+
+    assert summary["completed"] == 1
+    assert summary["failed"] == 1
+    assert [upload[2] for upload in manager.uploads] == ["small.txt"]
+    s3_client.upload_part.assert_not_called()
+
+
+def test_concurrency_is_shared(monkeypatch):
+    configs = []
+    monkeypatch.setattr(
+        bulk_transfer,
+        "create_transfer_manager",
+        lambda client, config: configs.append(config) or FakeTransferManager(),
+    )
+    config = bulk_transfer.TransferConfig(max_concurrency=10)
+
+    with bulk_transfer.BulkTransfer(unittest.mock.MagicMock(), config=config) as bulk:
+        part_workers = bulk._part_executor._max_workers
+
+    assert configs[0].max_concurrency + part_workers == 10
+    assert config.max_concurrency == 10
+
+
+def test_download_directory(tmp_path, make_transfer):
+    local_dir = tmp_path / "local"
+    write_file(str(local_dir / "same.txt"), 100)
+    same_etag = bulk_transfer.compute_etag(str(local_dir / "same.txt"), 1024, 1024)
+    s3_client = make_client(
+        {
+            "data/same.txt": (100, same_etag),
+            "data/sub/new.txt": (10, "abc"),
+            "data/folder/": (0, "d41d8cd98f00b204e9800998ecf8427e"),
+        }
+    )
+    transfer, manager = make_transfer(s3_client)
+
+    with transfer:
+        summary = transfer.download_directory("test-bucket", "data/", str(local_dir))
+
+    assert summary["completed"] == 1
+    assert summary["skipped"] == 1
+    assert manager.downloads == [
+        ("test-bucket", "data/sub/new.txt", str(local_dir / "sub" / "new.txt"))
+    ]
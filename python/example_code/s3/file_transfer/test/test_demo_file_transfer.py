@@ -0,0 +1,109 @@
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: Apache-2.0
+
+"""
+Tests for the benchmark mode of the Amazon S3 file transfer demo.
+
+These tests use a mock client instead of the botocore Stubber for the same reason
+as the file transfer tests: the transfer manager works below the Stubber.
+"""
+
+import csv
+import json
+import os
+import unittest.mock
+import pytest
+
+import demo_file_transfer
+
+
+def make_benchmark(tmp_path, grid):
+    s3_client = unittest.mock.MagicMock()
+
+    def mock_upload_file(file_path, bucket, key, Config):
+        assert os.path.getsize(file_path) == 2 * demo_file_transfer.MB
+
+    def mock_download_file(bucket, key, file_path, Config):
+        with open(file_path, "wb") as file:
+            file.write(b"test")
+
+    s3_client.upload_file.side_effect = mock_upload_file
+    s3_client.download_file.side_effect = mock_download_file
+    return s3_client, demo_file_transfer.TransferBenchmark(
+        s3_client, "test-bucket", str(tmp_path), grid=grid
+    )
+
+
+def test_benchmark_configurations(tmp_path):
+    _, benchmark = make_benchmark(
+        tmp_path,
+        {
+            "multipart_threshold": [8],
+            "multipart_chunksize": [8],
+            "max_concurrency": [1, 4, 10],
+            "use_threads": [True, False],
+        },
+    )
+
+    configs = list(benchmark.configurations())
+
+    # Concurrency doesn't matter without threads, so those combinations collapse.
+    assert len(configs) == 4
+    assert [c["max_concurrency"] for c in configs if not c["use_threads"]] == [1]
+
+
+@pytest.mark.parametrize("output_name", ["results.csv", "results.json"])
+def test_benchmark_run(tmp_path, monkeypatch, output_name):
+    grid = {"max_concurrency": [2, 8]}
+    s3_client, benchmark = make_benchmark(tmp_path, grid)
+    times = iter([0, 4, 10, 11, 20, 22, 30, 38])
+    monkeypatch.setattr(demo_file_transfer.time, "perf_counter", lambda: next(times))
+
+    results = benchmark.run([2])
+
+    assert [(r["direction"], r["max_concurrency"], r["seconds"]) for r in results] == [
+        ("upload", 2, 4),
+        ("download", 2, 1),
+        ("upload", 8, 2),
+        ("download", 8, 8),
+    ]
+    recommendations = benchmark.recommendations()
+    assert recommendations[(2, "upload")]["max_concurrency"] == 8
+    assert recommendations[(2, "download")]["max_concurrency"] == 2
+    assert recommendations[(2, "upload")]["mb_per_second"] == 1
+    s3_client.delete_object.assert_called_once_with(
+        Bucket="test-bucket", Key="benchmark-2mb.bin"
+    )
+    assert os.listdir(tmp_path) == []
+
+    output_path = str(tmp_path / output_name)
+    benchmark.write(output_path)
+    with open(output_path) as output_file:
+        if output_name.endswith(".json"):
+            data = json.load(output_file)
+            assert len(data["results"]) == 4
+            assert len(data["recommendations"]) == 2
+        else:
+            rows = list(csv.DictReader(output_file))
+            assert len(rows) == 4
+            assert rows[0]["direction"] == "upload"
+
+
+def test_benchmark_write_csv_download_attrs(tmp_path):
+    _, benchmark = make_benchmark(tmp_path, {"io_chunksize": [262144]})
+    benchmark._add_result(2, "download", {"io_chunksize": 262144}, 1)
+
+    output_path = str(tmp_path / "results.csv")
+    benchmark.write(output_path)
+    with open(output_path) as output_file:
+        reader = csv.DictReader(output_file)
+        rows = list(reader)
+
+    assert reader.fieldnames == [
+        "size_mb",
+        "direction",
+        "io_chunksize",
+        "seconds",
+        "mb_per_second",
+    ]
+    assert rows[0]["io_chunksize"] == "262144"
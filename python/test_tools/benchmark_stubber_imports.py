@@ -0,0 +1,86 @@
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: Apache-2.0
+
+"""
+Measures how long a test session takes to import the common test fixtures,
+compared with how long it took when the stubber factory imported every stubber.
+
+Each measurement runs in a new Python process so that no modules are already
+imported. This script must be run from the root of the GitHub repo.
+
+    py -m python.test_tools.benchmark_stubber_imports
+"""
+
+import argparse
+import os
+import statistics
+import subprocess
+import sys
+
+# Imports the fixtures and gets one stubber, which is what a typical test folder
+# does.
+LAZY_IMPORT = (
+    "import test_tools.fixtures.common\n"
+    "from test_tools.stubber_factory import stubber_factory\n"
+    "stubber_factory('s3')\n"
+)
+# Imports the fixtures and then every stubber, which is what importing the
+# stubber factory did before stubbers were imported on first use.
+EAGER_IMPORT = (
+    "import test_tools.fixtures.common\n"
+    "from test_tools.stubber_factory import STUBBERS, stubber_factory\n"
+    "for service_name in list(STUBBERS):\n"
+    "    stubber_factory(service_name)\n"
+)
+TIMED = (
+    "import time\n"
+    "start = time.perf_counter()\n"
+    "exec({code!r})\n"
+    "print(time.perf_counter() - start)\n"
+)
+
+
+def time_import(code, python_dir):
+    """
+    Runs code in a new Python process and times it.
+
+    :param code: The code to run.
+    :param python_dir: The folder that contains the test_tools package.
+    :return: How long the code took to run, in seconds.
+    """
+    output = subprocess.run(
+        [sys.executable, "-c", TIMED.format(code=code)],
+        cwd=python_dir,
+        check=True,
+        stdout=subprocess.PIPE,
+        text=True,
+    ).stdout
+    return float(output.strip())
+
+
+def main():
+    parser = argparse.ArgumentParser()
+    parser.add_argument(
+        "--repeat",
+        type=int,
+        default=10,
+        help="The number of times to run each measurement.",
+    )
+    args = parser.parse_args()
+    python_dir = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+
+    results = {}
+    for name, code in (("eager", EAGER_IMPORT), ("lazy", LAZY_IMPORT)):
+        results[name] = statistics.median(
+            time_import(code, python_dir) for _ in range(args.repeat)
+        )
+        print(f"{name:>5}: {results[name] * 1000:.1f} ms (median of {args.repeat})")
+    saved = results["eager"] - results["lazy"]
+    print(
+        f"Lazy imports save {saved * 1000:.1f} ms for each test folder "
+        f"({saved / results['eager']:.0%})."
+    )
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,192 @@
+# Copyright Amazon.com, Inc. or its affiliates. All Rights Reserved.
+# SPDX-License-Identifier: Apache-2.0
+
+"""
+Cassettes hold the requests and responses of calls that Boto 3 clients made to AWS
+so that the calls can be replayed by a stubber without a network connection.
+
+A cassette is saved as a gzip-compressed JSON file. Each interaction in it holds the
+name of the service and operation, the parameters of the request, and either the
+response or the error that AWS returned. When a cassette is replayed, interactions
+are found by an index of their service, operation, and parameters, so calls that
+are made in a different order, such as from several threads, still get the response
+that was recorded for them.
+"""
+
+import base64
+import datetime
+import gzip
+import io
+import json
+import threading
+from collections import defaultdict, deque
+
+from botocore.response import StreamingBody
+
+
+def _encode(value):
+    """Encodes values that JSON can't represent as tagged dicts."""
+    if isinstance(value, dict):
+        return {key: _encode(val) for key, val in value.items()}
+    if isinstance(value, (list, tuple)):
+        return [_encode(val) for val in value]
+    if isinstance(value, datetime.datetime):
+        return {"__datetime__": value.isoformat()}
+    if isinstance(value, (bytes, bytearray)):
+        return {"__bytes__": base64.b64encode(value).decode()}
+    return value
+
+
+def _decode(value):
+    """Decodes the tagged dicts made by _encode."""
+    if isinstance(value, dict):
+        if "__datetime__" in value:
+            return datetime.datetime.fromisoformat(value["__datetime__"])
+        if "__bytes__" in value:
+            return base64.b64decode(value["__bytes__"])
+        if "__stream__" in value:
+            data = base64.b64decode(value["__stream__"])
+            return StreamingBody(io.BytesIO(data), len(data))
+        return {key: _decode(val) for key, val in value.items()}
+    if isinstance(value, list):
+        return [_decode(val) for val in value]
+    return value
+
+
+def _read_streams(parsed):
+    """
+    Reads the streaming bodies of a response so they can be recorded, and replaces
+    them with new streams over the same data so the caller can still read them.
+
+    :param parsed: The parsed response.
+    :return: The response, with streams encoded for the cassette.
+    """
+    encoded = {}
+    for key, value in parsed.items():
+        if isinstance(value, StreamingBody):
+            data = value.read()
+            parsed[key] = StreamingBody(io.BytesIO(data), len(data))
+            encoded[key] = {"__stream__": base64.b64encode(data).decode()}
+        else:
+            encoded[key] = _encode(value)
+    return encoded
+
+
+def request_key(service_name, operation_name, params):
+    """
+    Makes the key that an interaction is indexed by.
+
+    :param service_name: The name of the service, such as 's3'.
+    :param operation_name: The name of the operation, such as 'ListBuckets'.
+    :param params: The parameters of the request, encoded for JSON.
+    :return: The key, as a string.
+    """
+    return json.dumps(
+        [service_name, operation_name, params], sort_keys=True, default=str
+    )
+
+
+class Cassette:
+    """
+    Holds the interactions between clients and AWS that are recorded during a test,
+    and serves them back in replay.
+    """
+
+    def __init__(self, interactions=None):
+        """
+        :param interactions: The recorded interactions. Each is a dict with service,
+                             operation, params, status, and response keys.
+        """
+        self.interactions = interactions or []
+        self._index = None
+        self._lock = threading.Lock()
+
+    @classmethod
+    def load(cls, path):
+        """
+        Loads a cassette from a file.
+
+        :param path: The path of the gzip-compressed JSON file.
+        :return: The cassette.
+        """
+        with gzip.open(path, "rt", encoding="utf-8") as file:
+            return cls(json.load(file)["interactions"])
+
+    def save(self, path):
+        """
+        Saves the cassette to a file.
+
+        :param path: The path of the gzip-compressed JSON file.
+        """
+        with gzip.open(path, "wt", encoding="utf-8") as file:
+            json.dump({"interactions": self.interactions}, file, indent=1)
+
+    def record(self, service_name, operation_name, params, status, parsed):
+        """
+        Adds an interaction to the cassette.
+
+        :param service_name: The name of the service.
+        :param operation_name: The name of the operation.
+        :param params: The parameters of the request.
+        :param status: The HTTP status code of the response.
+        :param parsed: The parsed response or error. Streaming bodies in the
+                       response are read, and replaced with new streams over the
+                       same data.
+        """
+        interaction = {
+            "service": service_name,
+            "operation": operation_name,
+            "params": _encode(params),
+            "status": status,
+            "response": _read_streams(parsed),
+        }
+        with self._lock:
+            self.interactions.append(interaction)
+            self._index = None
+
+    def _get_index(self):
+        if self._index is None:
+            self._index = defaultdict(deque)
+            for interaction in self.interactions:
+                key = request_key(
+                    interaction["service"],
+                    interaction["operation"],
+                    interaction["params"],
+                )
+                self._index[key].append(interaction)
+        return self._index
+
+    def play(self, service_name, operation_name, params):
+        """
+        Gets the next recorded response for a request. When the same request was
+        recorded more than once, such as while polling, the responses are
+        returned in the order they were recorded.
+
+        :param service_name: The name of the service.
+        :param operation_name: The name of the operation.
+        :param params: The parameters of the request.
+        :return: The HTTP status code and the parsed response, or None when there is
+                 no recorded response left for the request.
+        """
+        key = request_key(service_name, operation_name, _encode(params))
+        with self._lock:
+            responses = self._get_index().get(key)
+            if not responses:
+                return None
+            interaction = responses.popleft()
+        return interaction["status"], _decode(interaction["response"])
+
+    def pending(self, service_name):
+        """
+        Counts the recorded responses of a service that haven't been played.
+
+        :param service_name: The name of the service.
+        :return: The number of responses left.
+        """
+        with self._lock:
+            return sum(
+                1
+                for responses in self._get_index().values()
+                for interaction in responses
+                if interaction["service"] == service_name
+            )
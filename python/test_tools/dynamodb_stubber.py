@@ -211,9 +211,14 @@ class DynamoStubber(ExampleStubber):
         expression_attrs=None,
         start_key=None,
         last_key=None,
+        segment=None,
+        total_segments=None,
         error_code=None,
     ):
         expected_params = {"TableName": table_name}
+        if segment is not None:
+            expected_params["Segment"] = segment
+            expected_params["TotalSegments"] = total_segments
         if select:
             expected_params["Select"] = select
         if filter_expression:
@@ -239,9 +244,14 @@ class DynamoStubber(ExampleStubber):
         projection=None,
         expression_attrs=None,
         expression_attr_vals=None,
+        index_name=None,
+        start_key=None,
+        last_key=None,
         error_code=None,
     ):
         expected_params = {"TableName": table_name}
+        if index_name is not None:
+            expected_params["IndexName"] = index_name
         if key_condition is not None:
             expected_params["KeyConditionExpression"] = key_condition
         if projection is not None:
@@ -250,12 +260,14 @@ class DynamoStubber(ExampleStubber):
             expected_params["ExpressionAttributeNames"] = expression_attrs
         if expression_attr_vals is not None:
             expected_params["ExpressionAttributeValues"] = expression_attr_vals
-        response_items = [
-            self._build_out_item(output_item) for output_item in output_items
-        ]
-        self._stub_bifurcator(
-            "query", expected_params, {"Items": response_items}, error_code=error_code
-        )
+        if start_key is not None:
+            expected_params["ExclusiveStartKey"] = start_key
+        response = {
+            "Items": [self._build_out_item(output_item) for output_item in output_items]
+        }
+        if last_key is not None:
+            response["LastEvaluatedKey"] = last_key
+        self._stub_bifurcator("query", expected_params, response, error_code=error_code)
 
     def stub_batch_write_item(
         self, request_items, unprocessed_items=None, error_code=None
@@ -3,10 +3,15 @@
 
 """
 A base class for stubbers that are used by the Python code example unit tests.
+
+Besides stubs, a stubber can record the calls its client makes to AWS to a
+cassette, and replay a cassette so that a test that ran against AWS can run again
+offline.
 """
 
 import contextlib
-from botocore.stub import Stubber
+from botocore.awsrequest import AWSResponse
+from botocore.stub import Stubber, UnStubbedResponseError
 
 
 class ExampleStubber(Stubber):
@@ -15,6 +20,11 @@ class ExampleStubber(Stubber):
     intercept requests during tests or pass calls through to AWS.
 
     All stubbers used in Python unit tests must inherit from this base class.
+
+    A stubber can also record the calls its client makes to AWS to a cassette, or
+    replay a cassette in place of stubs. In replay, responses are matched to
+    requests by their operation and parameters instead of by the order they were
+    added, and stubs added by stub functions are ignored.
     """
 
     def __init__(self, client, use_stubs=True):
@@ -28,14 +38,113 @@ class ExampleStubber(Stubber):
         """
         self.use_stubs = use_stubs
         self.region_name = client.meta.region_name
+        self.cassette = None
+        self.recording = False
+        self._cassette_params_event_id = "example_stubber_cassette_params"
+        self._cassette_record_event_id = "example_stubber_cassette_record"
+        super().__init__(client)
+
+    def record_to(self, cassette):
+        """
+        Records the calls that the client makes to AWS. Calls are passed through to
+        AWS, so recording incurs the same charges as running against AWS.
+
+        :param cassette: The cassette to record calls to.
+        """
+        self.use_stubs = False
+        self.recording = True
+        self.cassette = cassette
+
+    def replay_from(self, cassette):
+        """
+        Replays the responses recorded in a cassette instead of using stubs.
+
+        :param cassette: The cassette to replay.
+        """
+        self.use_stubs = True
+        self.recording = False
+        self.cassette = cassette
+
+    def activate(self):
+        """Activates stubs or recording on the client."""
         if self.use_stubs:
-            super().__init__(client)
-        else:
-            self.client = client
+            super().activate()
+        if self.cassette is not None:
+            # Registered last, so the parameters are the ones sent to AWS, after
+            # they are transformed by resources such as the DynamoDB Table.
+            self.client.meta.events.register_last(
+                "before-parameter-build.*.*",
+                self._index_request,
+                unique_id=self._cassette_params_event_id,
+            )
+            if self.recording:
+                self.client.meta.events.register(
+                    "after-call.*.*",
+                    self._record_response,
+                    unique_id=self._cassette_record_event_id,
+                )
+
+    def deactivate(self):
+        """Deactivates stubs or recording on the client."""
+        if self.use_stubs:
+            super().deactivate()
+        if self.cassette is not None:
+            self.client.meta.events.unregister(
+                "before-parameter-build.*.*",
+                unique_id=self._cassette_params_event_id,
+            )
+            if self.recording:
+                self.client.meta.events.unregister(
+                    "after-call.*.*", unique_id=self._cassette_record_event_id
+                )
+
+    def _index_request(self, params, model, context, **kwargs):
+        # Idempotency tokens are made anew for each call, so they are left out.
+        tokens = (
+            {
+                name
+                for name, shape in model.input_shape.members.items()
+                if shape.metadata.get("idempotencyToken")
+            }
+            if model.input_shape is not None
+            else set()
+        )
+        context["cassette_params"] = {
+            key: val for key, val in params.items() if key not in tokens
+        }
+
+    def _record_response(self, http_response, parsed, model, context, **kwargs):
+        self.cassette.record(
+            self.client.meta.service_model.service_name,
+            model.name,
+            context.get("cassette_params", {}),
+            http_response.status_code,
+            parsed,
+        )
+
+    def _get_response_handler(self, model, params, context, **kwargs):
+        if self.cassette is None:
+            return super()._get_response_handler(model, params, context, **kwargs)
+        played = self.cassette.play(
+            self.client.meta.service_model.service_name,
+            model.name,
+            context.get("cassette_params", {}),
+        )
+        if played is None:
+            raise UnStubbedResponseError(
+                operation_name=model.name,
+                reason="No response to this request was recorded in the cassette.",
+            )
+        status, parsed = played
+        return AWSResponse(None, status, {}, None), parsed
+
+    def _assert_expected_params(self, model, params, context, **kwargs):
+        if self.cassette is None:
+            super()._assert_expected_params(model, params, context, **kwargs)
 
     def add_response(self, method, service_response, expected_params=None):
         """When using stubs, add a stubbed response."""
-        if self.use_stubs:
+        if self.use_stubs and self.cassette is None:
             super().add_response(method, service_response, expected_params)
 
     def add_client_error(
@@ -50,7 +159,7 @@ class ExampleStubber(Stubber):
         modeled_fields=None,
     ):
         """When using stubs, add a stubbed error response."""
-        if self.use_stubs:
+        if self.use_stubs and self.cassette is None:
             super().add_client_error(
                 method,
                 service_error_code,
@@ -62,8 +171,18 @@ class ExampleStubber(Stubber):
             )
 
     def assert_no_pending_responses(self):
-        """When using stubs, verify no more responses are waiting in the queue."""
-        if self.use_stubs:
+        """
+        When using stubs, verify no more responses are waiting in the queue. When
+        replaying a cassette, verify all of the responses recorded for the client's
+        service were played.
+        """
+        if self.use_stubs and self.cassette is not None:
+            remaining = self.cassette.pending(
+                self.client.meta.service_model.service_name
+            )
+            if remaining != 0:
+                raise AssertionError(f"{remaining} responses remaining in cassette.")
+        elif self.use_stubs:
             super().assert_no_pending_responses()
 
     def _stub_bifurcator(
@@ -8,14 +8,33 @@ code examples.
 
 import contextlib
 import logging
+import os
+import re
 import time
 import pytest
 
+from test_tools.cassette import Cassette
 from test_tools.stubber_factory import stubber_factory
 
 logger = logging.getLogger(__name__)
 
 
+def pytest_addoption(parser):
+    try:
+        parser.addoption(
+            "--cassettes",
+            choices=["record", "replay"],
+            help="When 'record', stubbers pass calls through to AWS and record them "
+            "to a cassette for each test. When 'replay', stubbers replay the "
+            "cassette of each test that has one instead of using stubs. Recording "
+            "is likely to incur charges on your account.",
+        )
+    except ValueError:
+        # The option was already added by another conftest that imports these
+        # fixtures.
+        pass
+
+
 def pytest_configure(config):
     config.addinivalue_line(
         "markers",
@@ -24,6 +43,47 @@ def pytest_configure(config):
     )
 
 
+def _cassette_path(request):
+    """
+    Gets the path of the cassette file for a test, in a cassettes folder next to the
+    test module.
+    """
+    test_name = re.sub(r"[^\w.-]", "_", request.node.name)
+    return os.path.join(
+        os.path.dirname(str(request.node.fspath)),
+        "cassettes",
+        request.module.__name__.split(".")[-1],
+        f"{test_name}.json.gz",
+    )
+
+
+def _open_cassette(request):
+    """
+    Opens the cassette for the current test when the --cassettes option is used.
+
+    When recording, a new cassette is made and is saved after the test completes.
+    When replaying, the cassette is loaded from its file.
+
+    :param request: The Pytest request object of the test.
+    :return: The cassette, or None when cassettes aren't used or the test has no
+             cassette to replay.
+    """
+    mode = request.config.getoption("--cassettes", default=None)
+    path = _cassette_path(request)
+    if mode == "record":
+        cassette = Cassette()
+
+        def fin():
+            os.makedirs(os.path.dirname(path), exist_ok=True)
+            cassette.save(path)
+
+        request.addfinalizer(fin)
+        return cassette
+    elif mode == "replay" and os.path.exists(path):
+        return Cassette.load(path)
+    return None
+
+
 @pytest.fixture(name="make_stubber")
 def fixture_make_stubber(request, monkeypatch):
     """
@@ -34,6 +94,7 @@ def fixture_make_stubber(request, monkeypatch):
     :param monkeypatch: The Pytest monkeypatch object.
     :return: A factory function that makes the stubber object.
     """
+    cassette = _open_cassette(request)
 
     def _make_stubber(service_client):
         """
@@ -52,6 +113,11 @@ def fixture_make_stubber(request, monkeypatch):
         """
         fact = stubber_factory(service_client.meta.service_model.service_name)
         stubber = fact(service_client)
+        if cassette is not None:
+            if request.config.getoption("--cassettes") == "record":
+                stubber.record_to(cassette)
+            else:
+                stubber.replay_from(cassette)
 
         def fin():
             stubber.assert_no_pending_responses()
@@ -59,7 +59,10 @@ class HealthLakeStubber(ExampleStubber):
         )
 
     def stub_describe_fhir_datastore(
-        self, data_store_id, error_code: str = None
+        self,
+        data_store_id,
+        error_code: str = None,
+        datastore_status: str = "ACTIVE",
     ) -> None:
         expected_params = {"DatastoreId": data_store_id}
 
@@ -67,7 +70,7 @@ class HealthLakeStubber(ExampleStubber):
             "DatastoreProperties": {
                 "DatastoreId": data_store_id,
                 "DatastoreArn": "datastore_arn",
-                "DatastoreStatus": "ACTIVE",
+                "DatastoreStatus": datastore_status,
                 "DatastoreEndpoint": f"https://healthlake.us-east-1.amazonaws.com/datastore/{data_store_id}/r4/",
                 "CreatedAt": datetime.now(timezone.utc),
                 "DatastoreName": "datastore_name",
@@ -148,7 +151,11 @@ class HealthLakeStubber(ExampleStubber):
         )
 
     def stub_describe_fhir_import_job(
-        self, datastore_id, job_id, error_code: str = None
+        self,
+        datastore_id,
+        job_id,
+        error_code: str = None,
+        job_status: str = "COMPLETED",
     ):
         expected_params = {"DatastoreId": datastore_id, "JobId": job_id}
 
@@ -156,7 +163,7 @@ class HealthLakeStubber(ExampleStubber):
             "ImportJobProperties": {
                 "JobId": job_id,
                 "JobName": "my_import_job",
-                "JobStatus": "COMPLETED",
+                "JobStatus": job_status,
                 "DatastoreId": datastore_id,
                 "SubmitTime": datetime.now(timezone.utc),
                 "EndTime": datetime.now(timezone.utc),
@@ -286,7 +293,11 @@ class HealthLakeStubber(ExampleStubber):
         )
     
     def stub_describe_fhir_export_job(
-        self, datastore_id, job_id, error_code: str = None
+        self,
+        datastore_id,
+        job_id,
+        error_code: str = None,
+        job_status: str = "COMPLETED",
     ):
         expected_params = {"DatastoreId": datastore_id, "JobId": job_id}
 
@@ -294,7 +305,7 @@ class HealthLakeStubber(ExampleStubber):
             "ExportJobProperties": {
                 "JobId": job_id,
                 "JobName": "my_export_job",
-                "JobStatus": "COMPLETED",
+                "JobStatus": job_status,
                 "DatastoreId": datastore_id,
                 "SubmitTime": datetime.now(timezone.utc),
                 "EndTime": datetime.now(timezone.utc),
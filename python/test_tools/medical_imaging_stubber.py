@@ -43,12 +43,14 @@ class MedicalImagingStubber(ExampleStubber):
             "create_datastore", expected_params, response, error_code=error_code
         )
 
-    def stub_get_datastore_properties(self, datastore_id, error_code=None):
+    def stub_get_datastore_properties(
+        self, datastore_id, error_code=None, datastore_status="ACTIVE"
+    ):
         expected_params = {"datastoreId": datastore_id}
         response = {
             "datastoreProperties": {
                 "datastoreId": datastore_id,
-                "datastoreStatus": "ACTIVE",
+                "datastoreStatus": datastore_status,
                 "datastoreName": "MyDataStore",
             }
         }
@@ -164,35 +166,47 @@ class MedicalImagingStubber(ExampleStubber):
         )
 
     def stub_get_image_set(
-        self, datastore_id, image_set_id, version_id, error_code=None
+        self,
+        datastore_id,
+        image_set_id,
+        version_id,
+        error_code=None,
+        image_set_state="ACTIVE",
     ):
         expected_params = {
             "datastoreId": datastore_id,
             "imageSetId": image_set_id,
-            "versionId": version_id,
         }
+        if version_id is not None:
+            expected_params["versionId"] = version_id
         response = {
             "datastoreId": "12345678901234567890123456789012",
             "imageSetId": image_set_id,
             "versionId": "1",
-            "imageSetState": "ACTIVE",
+            "imageSetState": image_set_state,
         }
 
         self._stub_bifurcator(
             "get_image_set", expected_params, response, error_code=error_code
         )
 
-    def stub_get_image_set_metadata(self, datastore_id, image_set_id, error_code=None):
+    def stub_get_image_set_metadata(
+        self, datastore_id, image_set_id, error_code=None, metadata=None
+    ):
         expected_params = {"datastoreId": datastore_id, "imageSetId": image_set_id}
 
-        data_string = b'"{data: akdelfaldkflakdflkajs}"'
+        if metadata is None:
+            data_string = b'"{data: akdelfaldkflakdflkajs}"'
+        else:
+            data_string = json.dumps(metadata).encode()
 
         gzip_stream = io.BytesIO()
         with gzip.open(gzip_stream, "wb") as f:
             f.write(data_string)
+        gzip_size = gzip_stream.tell()
         gzip_stream.seek(0)
 
-        stream = botocore.response.StreamingBody(gzip_stream, 49)
+        stream = botocore.response.StreamingBody(gzip_stream, gzip_size)
 
         response = {
             "contentType": " text/plain",
@@ -2,8 +2,20 @@
 # SPDX-License-Identifier: Apache-2.0
 
 """
-Finds all modules in the Python folder that have unit tests and runs them all
-sequentially as separate PyTest sessions.
+Finds all modules in the Python folder that have unit tests and runs them as
+separate PyTest sessions, in parallel subprocesses.
+
+Each test folder runs in its own Python process with the folder as its working
+directory, so folders can't change each other's imports or state. Folders are
+started longest first, based on how long they took the last time they ran, and each
+worker takes the next folder as soon as it finishes one, so a few slow folders
+don't hold up the whole run. The results of all folders are combined into one
+JUnit XML report, and the script exits with a non-zero status when any folder fails.
+
+The duration and result of each folder are saved in a cache file. A folder that
+passed the last time it ran is skipped when none of its files, the requirements
+files of the folders above it, the shared test and demo tools, or the Python
+version have changed since then.
 
 This script must be run from the root of the GitHub repo.
 
@@ -11,10 +23,15 @@ This script must be run from the root of the GitHub repo.
 """
 
 import argparse
+import hashlib
+import json
 import os
-import platform
+import subprocess
 import sys
-import pytest
+import tempfile
+import time
+import xml.etree.ElementTree as ET
+from concurrent.futures import ThreadPoolExecutor, as_completed
 
 IGNORE_FOLDERS = {
     "venv",
@@ -23,39 +40,266 @@ IGNORE_FOLDERS = {
     ".pytest_cache",
     "node_modules",
 }
+TOOLS_DIR = os.path.join("python", "test_tools")
+# Folders of code that is imported by the tests of many other folders.
+SHARED_DIRS = [TOOLS_DIR, os.path.join("python", "demo_tools")]
+DEFAULT_CACHE_FILE = os.path.join("python", ".test_results_cache.json")
+DEFAULT_JUNIT_FILE = os.path.join("python", "test-results.xml")
+# PyTest exits with this code when no tests are selected, such as a folder that
+# has only integration tests when unit tests are run. This isn't a failure.
+NO_TESTS_COLLECTED = 5
+
+
+def find_test_dirs(root="python"):
+    """
+    Finds all subfolders of a folder that contain a `test` folder and
+    assumes the parent folder is testable.
+
+    :param root: The folder to search.
+    :return: The testable folders.
+    """
+    test_dirs = []
+    for folder, dirs, _ in os.walk(root):
+        dirs[:] = sorted(d for d in dirs if d not in IGNORE_FOLDERS)
+        if "test" in dirs:
+            test_dirs.append(folder)
+    return test_dirs
+
+
+def hash_folder(folder, digest=None):
+    """
+    Hashes the names and contents of all files in a folder and its subfolders,
+    except for ignored folders.
+
+    :param folder: The folder to hash.
+    :param digest: A hashlib object to update. When not specified, a new one is made.
+    :return: The updated hashlib object.
+    """
+    digest = digest or hashlib.sha256()
+    for current, dirs, files in os.walk(folder):
+        dirs[:] = sorted(d for d in dirs if d not in IGNORE_FOLDERS)
+        for file_name in sorted(files):
+            if file_name.endswith(".pyc"):
+                continue
+            path = os.path.join(current, file_name)
+            digest.update(os.path.relpath(path, folder).encode())
+            with open(path, "rb") as file:
+                for chunk in iter(lambda: file.read(1024 * 1024), b""):
+                    digest.update(chunk)
+    return digest
+
+
+def hash_requirements(test_dir, digest, root="python"):
+    """
+    Hashes the requirements files in the folders above a test folder, up to and
+    including the root folder. Requirements files in the test folder itself are
+    hashed with the rest of its files.
+
+    :param test_dir: The test folder.
+    :param digest: A hashlib object to update.
+    :param root: The folder to stop at.
+    :return: The updated hashlib object.
+    """
+    root = os.path.abspath(root)
+    folder = os.path.abspath(test_dir)
+    while folder != root and folder.startswith(root):
+        folder = os.path.dirname(folder)
+        for file_name in sorted(os.listdir(folder)):
+            if file_name.startswith("requirements") and file_name.endswith(".txt"):
+                path = os.path.join(folder, file_name)
+                digest.update(os.path.relpath(path, root).encode())
+                with open(path, "rb") as file:
+                    digest.update(file.read())
+    return digest
+
+
+def load_cache(cache_file):
+    """
+    Loads the results of the last run.
+
+    :param cache_file: The path of the cache file.
+    :return: A dict of results, keyed by test folder. When the file doesn't exist or
+             can't be read, an empty dict is returned.
+    """
+    try:
+        with open(cache_file) as file:
+            return json.load(file)
+    except (OSError, ValueError):
+        return {}
+
+
+def save_cache(cache_file, cache):
+    """
+    Saves the results of a run.
+
+    :param cache_file: The path of the cache file.
+    :param cache: A dict of results, keyed by test folder.
+    """
+    with open(cache_file, "w") as file:
+        json.dump(cache, file, indent=2, sort_keys=True)
+
+
+def run_test_dir(test_dir, test_kind, junit_file):
+    """
+    Runs the tests of one folder in a PyTest subprocess.
+
+    :param test_dir: The folder to test.
+    :param test_kind: The PyTest marker expression that selects the tests to run.
+    :param junit_file: The path of the JUnit XML report that PyTest writes.
+    :return: The exit code of PyTest, its output, and how long it ran, in seconds.
+    """
+    env = dict(os.environ)
+    env["PYTHONPATH"] = os.pathsep.join(
+        [os.path.abspath(test_dir)]
+        + ([env["PYTHONPATH"]] if env.get("PYTHONPATH") else [])
+    )
+    start = time.perf_counter()
+    process = subprocess.run(
+        [
+            sys.executable,
+            "-m",
+            "pytest",
+            "-m",
+            test_kind,
+            f"--junitxml={junit_file}",
+            "-p",
+            "no:cacheprovider",
+        ],
+        cwd=test_dir,
+        env=env,
+        stdout=subprocess.PIPE,
+        stderr=subprocess.STDOUT,
+        text=True,
+    )
+    return process.returncode, process.stdout, time.perf_counter() - start
+
+
+def merge_junit(junit_files, output_file):
+    """
+    Combines the JUnit XML reports of several PyTest sessions into one report.
+
+    :param junit_files: A dict of report paths, keyed by the name of the test folder.
+    :param output_file: The path of the combined report.
+    """
+    totals = {"tests": 0, "errors": 0, "failures": 0, "skipped": 0}
+    elapsed = 0.0
+    merged = ET.Element("testsuites")
+    for name, junit_file in sorted(junit_files.items()):
+        try:
+            tree = ET.parse(junit_file)
+        except (OSError, ET.ParseError):
+            continue
+        root = tree.getroot()
+        suites = [root] if root.tag == "testsuite" else root.findall("testsuite")
+        for suite in suites:
+            suite.set("name", name)
+            for key in totals:
+                totals[key] += int(suite.get(key, 0))
+            elapsed += float(suite.get("time", 0))
+            merged.append(suite)
+    for key, value in totals.items():
+        merged.set(key, str(value))
+    merged.set("time", f"{elapsed:.3f}")
+    ET.ElementTree(merged).write(output_file, encoding="utf-8", xml_declaration=True)
 
 
 def main():
     """
-    Finds all subfolders of the `python` folder that contain a `test` folder and
-    assume the parent folder is testable.
-    Runs each testable folder as a separate PyTest session.
+    Finds all test folders and runs them in parallel, skipping folders that
+    haven't changed since they last passed.
+
+    :return: 0 when all folders pass; otherwise, 1.
     """
     parser = argparse.ArgumentParser()
     parser.add_argument(
         "--integ", action="store_true", help="When specified, run integration tests."
     )
+    parser.add_argument(
+        "--workers",
+        type=int,
+        default=os.cpu_count(),
+        help="The number of test folders to run at the same time.",
+    )
+    parser.add_argument(
+        "--junit-xml",
+        default=DEFAULT_JUNIT_FILE,
+        help="The path of the combined JUnit XML report.",
+    )
+    parser.add_argument(
+        "--cache-file",
+        default=DEFAULT_CACHE_FILE,
+        help="The path of the file that holds the results of the last run.",
+    )
+    parser.add_argument(
+        "--no-cache",
+        action="store_true",
+        help="When specified, run all folders even if they haven't changed.",
+    )
     args = parser.parse_args()
+    test_kind = "integ" if args.integ else "not integ"
 
-    test_dirs = []
-    for root, dirs, files in os.walk("python"):
-        dirs[:] = [d for d in dirs if d not in IGNORE_FOLDERS]
-        if "test" in dirs:
-            test_dirs.append(root)
-
-    original_path = sys.path.copy()
-    root_dir = os.getcwd()
-    for test_dir in test_dirs:
-        test_path = os.path.join(root_dir, test_dir)
-        sys.path.append(test_path)
-        os.chdir(test_path)
-        test_kind = "integ" if args.integ else "not integ"
-        if platform.system() == "Windows":
-            os.system(f'py -m pytest -m "{test_kind}"')
+    cache = load_cache(args.cache_file)
+    shared_digest = hashlib.sha256(f"{test_kind}:{sys.version}".encode())
+    for shared_dir in SHARED_DIRS:
+        hash_folder(shared_dir, shared_digest)
+    to_run = []
+    skipped = []
+    for test_dir in find_test_dirs():
+        digest = hash_requirements(test_dir, shared_digest.copy())
+        content_hash = hash_folder(test_dir, digest).hexdigest()
+        cached = cache.get(test_dir, {})
+        if (
+            not args.no_cache
+            and cached.get("hash") == content_hash
+            and cached.get("passed")
+        ):
+            skipped.append(test_dir)
         else:
-            os.system(f'python -m pytest -m "{test_kind}"')
-        sys.path = original_path.copy()
+            to_run.append((test_dir, content_hash))
+    # Longest first, with folders that have never run before all others.
+    to_run.sort(key=lambda run: -cache.get(run[0], {}).get("duration", float("inf")))
+
+    print(
+        f"Running {len(to_run)} test folders with {args.workers} workers. "
+        f"Skipping {len(skipped)} unchanged folders that passed before."
+    )
+    failed = []
+    with tempfile.TemporaryDirectory() as junit_dir:
+        junit_files = {
+            test_dir: os.path.join(junit_dir, f"{index}.xml")
+            for index, (test_dir, _) in enumerate(to_run)
+        }
+        with ThreadPoolExecutor(max_workers=args.workers) as executor:
+            futures = {
+                executor.submit(
+                    run_test_dir, test_dir, test_kind, junit_files[test_dir]
+                ): (test_dir, content_hash)
+                for test_dir, content_hash in to_run
+            }
+            for future in as_completed(futures):
+                test_dir, content_hash = futures[future]
+                exit_code, output, duration = future.result()
+                passed = exit_code in (0, NO_TESTS_COLLECTED)
+                cache[test_dir] = {
+                    "hash": content_hash,
+                    "passed": passed,
+                    "duration": round(duration, 3),
+                }
+                print(f"{'PASS' if passed else 'FAIL'} {test_dir} ({duration:.1f}s)")
+                if not passed:
+                    failed.append(test_dir)
+                    print(output)
+        merge_junit(junit_files, args.junit_xml)
+
+    save_cache(args.cache_file, cache)
+    if failed:
+        print(f"{len(failed)} test folders failed:")
+        for test_dir in sorted(failed):
+            print(f"  {test_dir}")
+        return 1
+    print("All test folders passed.")
+    return 0
 
 
 if __name__ == "__main__":
-    main()
+    sys.exit(main())